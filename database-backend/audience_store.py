@@ -0,0 +1,136 @@
+"""
+Audience Store for DataQuery Pro
+
+Keeps campaign audiences prepared by /campaigns/load-rb-automatic on the server
+as Parquet files keyed by an audience id. /campaigns/create takes the id instead
+of the full IIN list, so large audiences never travel through the browser and
+their filters are not applied a second time.
+
+Each audience is <audience_id>.parquet plus <audience_id>.json with its owner,
+row count, columns and the filter stats of the load step. Audiences expire after
+AUDIENCE_RETENTION_HOURS.
+"""
+
+import os
+import re
+import json
+import uuid
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+AUDIENCE_STORE_DIR = os.getenv("AUDIENCE_STORE_DIR", "state/audiences")
+AUDIENCE_RETENTION_HOURS = int(os.getenv("AUDIENCE_RETENTION_HOURS", "24"))
+
+AUDIENCE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _json_default(value: Any):
+    """Filter stats may hold numpy scalars"""
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class AudienceStore:
+    """Parquet-backed store of prepared campaign audiences"""
+
+    def __init__(self, store_dir: str = AUDIENCE_STORE_DIR, retention_hours: int = AUDIENCE_RETENTION_HOURS):
+        self.store_dir = Path(store_dir)
+        self.retention_hours = retention_hours
+
+    @staticmethod
+    def is_valid_id(audience_id: Optional[str]) -> bool:
+        return bool(audience_id) and bool(AUDIENCE_ID_PATTERN.match(audience_id))
+
+    def _data_path(self, audience_id: str) -> Path:
+        return self.store_dir / f"{audience_id}.parquet"
+
+    def _meta_path(self, audience_id: str) -> Path:
+        return self.store_dir / f"{audience_id}.json"
+
+    def _is_expired(self, meta_path: Path) -> bool:
+        return meta_path.stat().st_mtime < datetime.now().timestamp() - self.retention_hours * 3600
+
+    def save(self, data: pd.DataFrame, created_by: Optional[str] = None,
+             stats: Optional[Dict[str, Any]] = None, workflow: Optional[str] = None) -> str:
+        """Persist an audience and return its id"""
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.cleanup_expired()
+
+        audience_id = uuid.uuid4().hex
+        data.to_parquet(self._data_path(audience_id), index=False)
+        meta = {
+            "audience_id": audience_id,
+            "created_by": created_by,
+            "created_at": datetime.now().isoformat(),
+            "workflow": workflow,
+            "rows": len(data),
+            "columns": list(data.columns),
+            "stats": stats or {},
+        }
+        with open(self._meta_path(audience_id), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, default=_json_default)
+
+        logger.info(f"Saved audience {audience_id} with {len(data)} rows")
+        return audience_id
+
+    def get_meta(self, audience_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata of a stored audience, None if it does not exist or has expired"""
+        if not self.is_valid_id(audience_id):
+            return None
+        meta_path = self._meta_path(audience_id)
+        if not meta_path.is_file() or not self._data_path(audience_id).is_file():
+            return None
+        try:
+            # Expired audiences are pruned on read, not only when the next one is saved
+            if self._is_expired(meta_path):
+                self.delete(audience_id)
+                logger.info(f"Removed expired audience {audience_id}")
+                return None
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable audience metadata {meta_path}: {e}")
+            return None
+
+    def load(self, audience_id: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read an audience, optionally only some of its columns"""
+        meta = self.get_meta(audience_id)
+        if meta is None:
+            raise FileNotFoundError(f"Audience {audience_id} not found")
+        if columns is not None:
+            columns = [column for column in columns if column in meta["columns"]]
+        return pd.read_parquet(self._data_path(audience_id), columns=columns)
+
+    def delete(self, audience_id: str) -> bool:
+        if not self.is_valid_id(audience_id):
+            return False
+        deleted = False
+        for path in (self._data_path(audience_id), self._meta_path(audience_id)):
+            if path.is_file():
+                path.unlink()
+                deleted = True
+        return deleted
+
+    def cleanup_expired(self) -> int:
+        """Delete audiences older than the retention period"""
+        if not self.store_dir.is_dir():
+            return 0
+        deleted = 0
+        for path in self.store_dir.glob("*.json"):
+            try:
+                if self._is_expired(path) and self.delete(path.stem):
+                    deleted += 1
+            except OSError as e:
+                logger.warning(f"Could not remove expired audience {path.stem}: {e}")
+        if deleted:
+            logger.info(f"Removed {deleted} expired audiences")
+        return deleted
+
+
+# Global instance
+audience_store = AudienceStore()
@@ -0,0 +1,65 @@
+-- Campaign Code Sequences
+-- Used by code_allocator.py to allocate RB1 CAMPAIGNCODE, RB3 XLS_OW_ID and SC campaign IDs
+-- without scanning the campaign tables for MAX(code).
+--
+-- INCREMENT BY is the block size: one NEXTVAL reserves that many codes for one backend
+-- process, which then hands them out from memory. Unused codes of a block are skipped
+-- when the process restarts, so keep the block small for the 4-digit XLS_OW_ID range.
+-- Each sequence starts right after the highest code already in use.
+--
+-- Single allocator: once these sequences exist, every application that creates campaign codes
+-- must take them from the sequences (the backend via code_allocator.py, the Streamlit app via
+-- fetch_next_code_from_sequence in market.py). MAX(code) + 1 on the campaign tables is no longer
+-- safe: it returns a number inside a block a backend process has reserved but not used yet, and
+-- that code is later allocated twice. Deploy the sequence-based market.py together with the backend.
+
+-- Step 1: RB1/RB3 CAMPAIGNCODE (C000012345), run as DSSB_OCDS
+DECLARE
+    v_start NUMBER;
+BEGIN
+    SELECT NVL(MAX(TO_NUMBER(SUBSTR(CAMPAIGNCODE, 2))), 0) + 1
+    INTO v_start
+    FROM dssb_ocds.mb01_camp_dict
+    WHERE LENGTH(CAMPAIGNCODE) = 10 AND CAMPAIGNCODE LIKE 'C0000%';
+
+    EXECUTE IMMEDIATE 'CREATE SEQUENCE dssb_ocds.campaign_code_seq START WITH ' || v_start ||
+                      ' INCREMENT BY 20 NOCYCLE';
+END;
+/
+
+-- Step 2: RB3 XLS_OW_ID (KKB_0123), run as DSSB_OCDS
+DECLARE
+    v_start NUMBER;
+BEGIN
+    SELECT NVL(MAX(TO_NUMBER(SUBSTR(XLS_OW_ID, 5))), 0) + 1
+    INTO v_start
+    FROM dssb_ocds.rb3_tr_campaign_dict
+    WHERE LENGTH(XLS_OW_ID) = 8 AND XLS_OW_ID LIKE 'KKB_%';
+
+    EXECUTE IMMEDIATE 'CREATE SEQUENCE dssb_ocds.rb3_xls_ow_id_seq START WITH ' || v_start ||
+                      ' INCREMENT BY 1 MAXVALUE 9999 NOCYCLE';
+END;
+/
+
+-- Step 3: SC campaign IDs for stratification theories (SC00000001), run as the DSSB_APP user
+DECLARE
+    v_start NUMBER;
+BEGIN
+    SELECT NVL(MAX(TO_NUMBER(SUBSTR(theory_id, 3, 8))), 0) + 1
+    INTO v_start
+    FROM SoftCollection_theories
+    WHERE REGEXP_LIKE(theory_id, '^SC[0-9]{8}\.[0-9]+$');
+
+    EXECUTE IMMEDIATE 'CREATE SEQUENCE sc_campaign_id_seq START WITH ' || v_start ||
+                      ' INCREMENT BY 10 NOCYCLE';
+END;
+/
+
+-- Step 4: Verify (the backend reads INCREMENT_BY to know its block size)
+SELECT sequence_owner, sequence_name, last_number, increment_by
+FROM all_sequences
+WHERE sequence_name IN ('CAMPAIGN_CODE_SEQ', 'RB3_XLS_OW_ID_SEQ', 'SC_CAMPAIGN_ID_SEQ');
+
+-- The DSSB_OCDS backend user needs SELECT on the DSSB_OCDS sequences if it is a different account:
+-- GRANT SELECT ON dssb_ocds.campaign_code_seq TO <backend_user>;
+-- GRANT SELECT ON dssb_ocds.rb3_xls_ow_id_seq TO <backend_user>;
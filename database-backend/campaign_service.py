@@ -7,92 +7,151 @@ to multiple Oracle tables. Replaces the campaign functionality from market.py.
 
 import logging
 import os
-from typing import List, Dict, Any, Optional, Tuple
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
 from datetime import datetime, date
 import pandas as pd
+from starlette.concurrency import run_in_threadpool
 from database import (
     get_connection_DSSB_APP, get_connection_DSSB_OCDS, 
     get_connection_SPSS, get_connection_ED_OCDS
 )
 from parquet_service import parquet_service
+from code_allocator import code_allocator, CODE_RB1, CODE_RB3_XLS
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Rows sent per executemany call when deploying campaign users
+CAMPAIGN_DEPLOY_BATCH_SIZE = int(os.getenv("CAMPAIGN_DEPLOY_BATCH_SIZE", "10000"))
+CAMPAIGN_DEPLOY_MAX_BATCH_SIZE = 100000
+# Rejected rows listed in the deployment result (all of them are counted)
+CAMPAIGN_DEPLOY_MAX_REPORTED_ERRORS = int(os.getenv("CAMPAIGN_DEPLOY_MAX_REPORTED_ERRORS", "100"))
+# How long finished deployments stay visible in /campaigns/deploy-progress
+CAMPAIGN_DEPLOY_PROGRESS_TTL_SECONDS = int(os.getenv("CAMPAIGN_DEPLOY_PROGRESS_TTL_SECONDS", "3600"))
+
+# Databases written by a deployment; each one is loaded in its own transaction
+DATABASE_DSSB_OCDS = "DSSB_OCDS"
+DATABASE_SPSS = "SPSS"
+
+# Table names as seen from the deployment connections (used for compensating deletes)
+DEPLOY_TABLE_SQL_NAMES = {
+    "dssb_ocds.mb01_camp_dict": "dssb_ocds.mb01_camp_dict",
+    "dssb_ocds.rb3_tr_campaign_dict": "dssb_ocds.rb3_tr_campaign_dict",
+    "dssb_ocds.mb22_local_target": "dssb_ocds.mb22_local_target",
+    "spss.fd_rb2_campaigns_users": "fd_rb2_campaigns_users",
+    "spss.off_limit_campaigns_users": "off_limit_campaigns_users",
+}
+
+
+class CampaignDeployProgress:
+    """In-memory progress of running and recently finished deployments, keyed by campaign code"""
+    
+    def __init__(self, ttl_seconds: int = CAMPAIGN_DEPLOY_PROGRESS_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._deploys: Dict[str, Dict[str, Any]] = {}
+    
+    def _prune(self):
+        now = datetime.now()
+        expired = [
+            code for code, deploy in self._deploys.items()
+            if deploy["finished_at"] and (now - deploy["finished_at"]).total_seconds() > self.ttl_seconds
+        ]
+        for code in expired:
+            del self._deploys[code]
+    
+    def start(self, campaign_code: str, campaign_type: str, total_users: int, created_by: Optional[str] = None):
+        with self._lock:
+            self._prune()
+            self._deploys[campaign_code] = {
+                "campaign_code": campaign_code,
+                "campaign_type": campaign_type,
+                "created_by": created_by,
+                "status": "running",
+                "total_users": total_users,
+                "current_table": None,
+                "tables": {},
+                "started_at": datetime.now(),
+                "finished_at": None,
+            }
+    
+    def update(self, campaign_code: str, table: str, rows_processed: int, rows_total: int,
+               rows_failed: int = 0, status: str = "running"):
+        with self._lock:
+            deploy = self._deploys.get(campaign_code)
+            if deploy is None:
+                return
+            deploy["current_table"] = table if status == "running" else None
+            deploy["tables"][table] = {
+                "status": status,
+                "rows_processed": rows_processed,
+                "rows_total": rows_total,
+                "rows_failed": rows_failed,
+            }
+    
+    def finish(self, campaign_code: str, success: bool):
+        with self._lock:
+            deploy = self._deploys.get(campaign_code)
+            if deploy is not None:
+                deploy["status"] = "succeeded" if success else "failed"
+                deploy["current_table"] = None
+                deploy["finished_at"] = datetime.now()
+    
+    @staticmethod
+    def _to_dict(deploy: Dict[str, Any]) -> Dict[str, Any]:
+        result = dict(deploy)
+        result["tables"] = {table: dict(stats) for table, stats in deploy["tables"].items()}
+        result["started_at"] = deploy["started_at"].isoformat()
+        result["finished_at"] = deploy["finished_at"].isoformat() if deploy["finished_at"] else None
+        return result
+    
+    def get(self, campaign_code: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            deploy = self._deploys.get(campaign_code)
+            return self._to_dict(deploy) if deploy else None
+    
+    def list(self, created_by: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._prune()
+            deploys = [
+                self._to_dict(deploy) for deploy in self._deploys.values()
+                if created_by is None or deploy["created_by"] == created_by
+            ]
+        return sorted(deploys, key=lambda deploy: deploy["started_at"], reverse=True)
+
+
+deploy_progress = CampaignDeployProgress()
+
 class CampaignCodeService:
     """Service for generating campaign codes"""
     
     @staticmethod
     async def generate_next_rb1_code() -> str:
-        """Generate next available RB1 CAMPAIGNCODE (format: C000012345)"""
-        try:
-            with get_connection_DSSB_OCDS() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT MAX(CAMPAIGNCODE) as CAMPAIGNCODE 
-                    FROM dssb_ocds.mb01_camp_dict 
-                    WHERE LENGTH(CAMPAIGNCODE) = 10 AND CAMPAIGNCODE LIKE 'C0000%'
-                """
-                cursor.execute(query)
-                result = cursor.fetchone()
-                
-                if result and result[0]:
-                    # Extract numeric part and increment
-                    current_code = result[0]
-                    numeric_part = int(current_code[1:])  # Remove 'C' prefix
-                    next_numeric = numeric_part + 1
-                    next_code = f"C{next_numeric:09d}"  # Format with leading zeros
-                    logger.info(f"Generated next RB1 code: {next_code}")
-                    return next_code
-                else:
-                    # First campaign
-                    first_code = "C000000001"
-                    logger.info(f"Generated first RB1 code: {first_code}")
-                    return first_code
-                    
-        except Exception as e:
-            logger.error(f"Error generating RB1 campaign code: {e}")
-            # Fallback to timestamp-based code
-            timestamp = datetime.now().strftime("%m%d%H%M%S")
-            fallback_code = f"C{timestamp:0>9}"[:10]
-            logger.warning(f"Using fallback RB1 code: {fallback_code}")
-            return fallback_code
+        """Allocate the next RB1 CAMPAIGNCODE (format: C000012345) from dssb_ocds.campaign_code_seq"""
+        next_code = await run_in_threadpool(code_allocator.next_code, CODE_RB1)
+        logger.info(f"Generated next RB1 code: {next_code}")
+        return next_code
     
     @staticmethod
     async def generate_next_rb3_xls_code() -> str:
-        """Generate next available RB3 XLS_OW_ID (format: KKB_0123)"""
-        try:
-            with get_connection_DSSB_OCDS() as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT MAX(XLS_OW_ID) as XLS_OW_ID 
-                    FROM dssb_ocds.rb3_tr_campaign_dict 
-                    WHERE LENGTH(XLS_OW_ID) = 8 AND XLS_OW_ID LIKE 'KKB_%'
-                """
-                cursor.execute(query)
-                result = cursor.fetchone()
-                
-                if result and result[0]:
-                    # Extract numeric part and increment
-                    current_code = result[0]  # KKB_0123
-                    numeric_part = int(current_code[4:])  # Extract 0123
-                    next_numeric = numeric_part + 1
-                    next_code = f"KKB_{next_numeric:04d}"  # Format with leading zeros
-                    logger.info(f"Generated next RB3 XLS code: {next_code}")
-                    return next_code
-                else:
-                    # First RB3 campaign
-                    first_code = "KKB_0001"
-                    logger.info(f"Generated first RB3 XLS code: {first_code}")
-                    return first_code
-                    
-        except Exception as e:
-            logger.error(f"Error generating RB3 XLS code: {e}")
-            # Fallback to timestamp-based code
-            timestamp = datetime.now().strftime("%H%M")
-            fallback_code = f"KKB_{timestamp:0>4}"
-            logger.warning(f"Using fallback RB3 XLS code: {fallback_code}")
-            return fallback_code
+        """Allocate the next RB3 XLS_OW_ID (format: KKB_0123) from dssb_ocds.rb3_xls_ow_id_seq"""
+        next_code = await run_in_threadpool(code_allocator.next_code, CODE_RB3_XLS)
+        logger.info(f"Generated next RB3 XLS code: {next_code}")
+        return next_code
+    
+    @staticmethod
+    async def preview_next_rb1_code() -> str:
+        """Next RB1 code for display; campaign creation allocates its own code"""
+        return await run_in_threadpool(code_allocator.peek_code, CODE_RB1)
+    
+    @staticmethod
+    async def preview_next_rb3_xls_code() -> str:
+        """Next RB3 XLS_OW_ID for display; campaign creation allocates its own code"""
+        return await run_in_threadpool(code_allocator.peek_code, CODE_RB3_XLS)
 
 class CampaignDataProcessor:
     """Service for processing and filtering campaign data"""
@@ -285,294 +344,538 @@ class CampaignDeploymentService:
         campaign_code: str,
         campaign_metadata: Dict[str, Any],
         user_data: pd.DataFrame,
-        deploy_options: Dict[str, bool]
+        deploy_options: Dict[str, Any],
+        created_by: Optional[str] = None
     ) -> Dict[str, Any]:
         """Deploy RB1 campaign to multiple Oracle tables"""
+        steps = []
+        # 1. mb01_camp_dict (campaign metadata)
+        if deploy_options.get("deploy_metadata", True):
+            steps.append((DATABASE_DSSB_OCDS, "dssb_ocds.mb01_camp_dict",
+                          CampaignDeploymentService._deploy_to_mb01_camp_dict, False))
+        # 2. mb22_local_target (targeting)
+        if deploy_options.get("deploy_targeting", True):
+            steps.append((DATABASE_DSSB_OCDS, "dssb_ocds.mb22_local_target",
+                          CampaignDeploymentService._deploy_to_mb22_local_target, True))
+        # 3. fd_rb2_campaigns_users (main user list)
+        if deploy_options.get("deploy_users", True):
+            steps.append((DATABASE_SPSS, "spss.fd_rb2_campaigns_users",
+                          CampaignDeploymentService._deploy_to_fd_rb2_campaigns_users, True))
+        # 4. off_limit_campaigns_users (tracking)
+        if deploy_options.get("deploy_offlimit", True):
+            steps.append((DATABASE_SPSS, "spss.off_limit_campaigns_users",
+                          CampaignDeploymentService._deploy_to_off_limit_campaigns_users, True))
+        
+        return CampaignDeploymentService._deploy_tables(
+            campaign_code, "RB1", campaign_metadata, user_data, deploy_options, steps, created_by
+        )
+    
+    @staticmethod
+    def deploy_rb3_campaign(
+        campaign_code: str,
+        campaign_metadata: Dict[str, Any],
+        user_data: pd.DataFrame,
+        deploy_options: Dict[str, Any],
+        created_by: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Deploy RB3 campaign to multiple Oracle tables"""
+        steps = []
+        # 1. rb3_tr_campaign_dict (RB3 metadata)
+        if deploy_options.get("deploy_metadata", True):
+            steps.append((DATABASE_DSSB_OCDS, "dssb_ocds.rb3_tr_campaign_dict",
+                          CampaignDeploymentService._deploy_to_rb3_tr_campaign_dict, False))
+        # RB3 campaigns also use the same user tables as RB1
+        # 2. mb22_local_target
+        if deploy_options.get("deploy_targeting", True):
+            steps.append((DATABASE_DSSB_OCDS, "dssb_ocds.mb22_local_target",
+                          CampaignDeploymentService._deploy_to_mb22_local_target, True))
+        # 3. fd_rb2_campaigns_users
+        if deploy_options.get("deploy_users", True):
+            steps.append((DATABASE_SPSS, "spss.fd_rb2_campaigns_users",
+                          CampaignDeploymentService._deploy_to_fd_rb2_campaigns_users, True))
+        
+        return CampaignDeploymentService._deploy_tables(
+            campaign_code, "RB3", campaign_metadata, user_data, deploy_options, steps, created_by
+        )
+    
+    @staticmethod
+    def _connect(database: str):
+        if database == DATABASE_DSSB_OCDS:
+            return get_connection_DSSB_OCDS()
+        return get_connection_SPSS()
+    
+    @staticmethod
+    def _deploy_tables(
+        campaign_code: str,
+        campaign_type: str,
+        campaign_metadata: Dict[str, Any],
+        user_data: pd.DataFrame,
+        deploy_options: Dict[str, Any],
+        steps: List[Tuple[str, str, Callable[..., Any], bool]],
+        created_by: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Deploy ``steps`` (database, table, deploy function, is user table) in two phases:
+        1. prepare: every database gets one connection and one transaction holding all
+           of its tables; the databases are loaded in parallel and nothing is committed
+        2. commit: only when every table was prepared. If a commit fails after another
+           database has already committed, the committed rows are deleted by CAMPAIGNCODE
+        A failed deployment therefore leaves no partial campaign behind.
+        """
         results = {
             "campaign_code": campaign_code,
             "tables_updated": [],
             "total_users": len(user_data),
-            "errors": []
+            "errors": [],
+            "rows_inserted": {},
+            "skipped_records": 0,
+            "failed_records": [],
+            "table_durations": {},
+            "rolled_back": False,
+            "compensated_tables": []
         }
+        deploy_progress.start(campaign_code, campaign_type, len(user_data), created_by)
+        
+        databases: Dict[str, list] = {}
+        for step in steps:
+            databases.setdefault(step[0], []).append(step)
         
+        # Phase 1: prepare every database in parallel
+        prepared = {}
+        with ThreadPoolExecutor(max_workers=max(len(databases), 1)) as executor:
+            futures = {
+                database: executor.submit(
+                    CampaignDeploymentService._prepare_database, database, database_steps,
+                    campaign_code, campaign_metadata, user_data, deploy_options
+                )
+                for database, database_steps in databases.items()
+            }
+            for database, future in futures.items():
+                prepared[database] = future.result()
+        
+        for database, (conn, tables, error) in prepared.items():
+            for table_name, stats in tables:
+                results["table_durations"][table_name] = stats["duration_seconds"]
+            if error:
+                results["errors"].append(error)
+        
+        # Phase 2: commit all databases, or roll all of them back
+        committed = []
         try:
-            # 1. Deploy to mb01_camp_dict (campaign metadata)
-            if deploy_options.get("deploy_metadata", True):
-                try:
-                    CampaignDeploymentService._deploy_to_mb01_camp_dict(
-                        campaign_code, campaign_metadata
-                    )
-                    results["tables_updated"].append("dssb_ocds.mb01_camp_dict")
-                except Exception as e:
-                    results["errors"].append(f"mb01_camp_dict: {str(e)}")
-            
-            # 2. Deploy to mb22_local_target (targeting)
-            if deploy_options.get("deploy_targeting", True):
-                try:
-                    CampaignDeploymentService._deploy_to_mb22_local_target(
-                        campaign_code, campaign_metadata, user_data
-                    )
-                    results["tables_updated"].append("dssb_ocds.mb22_local_target")
-                except Exception as e:
-                    results["errors"].append(f"mb22_local_target: {str(e)}")
+            if not results["errors"]:
+                for database, (conn, tables, error) in prepared.items():
+                    try:
+                        conn.commit()
+                        committed.append(database)
+                    except Exception as e:
+                        results["errors"].append(f"{database} commit: {str(e)}")
+                        break
             
-            # 3. Deploy to fd_rb2_campaigns_users (main user list)
-            if deploy_options.get("deploy_users", True):
-                try:
-                    CampaignDeploymentService._deploy_to_fd_rb2_campaigns_users(
-                        campaign_code, campaign_metadata, user_data
+            if results["errors"]:
+                results["rolled_back"] = True
+                for database, (conn, tables, error) in prepared.items():
+                    if conn is not None and database not in committed:
+                        try:
+                            conn.rollback()
+                        except Exception as e:
+                            logger.warning(f"Rollback of {database} failed for campaign {campaign_code}: {e}")
+        finally:
+            for conn, tables, error in prepared.values():
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+        
+        if results["errors"]:
+            for database in committed:
+                tables = [table_name for table_name, stats in prepared[database][1]]
+                CampaignDeploymentService._compensate(database, campaign_code, tables, results)
+        else:
+            for conn, tables, error in prepared.values():
+                for table_name, stats in tables:
+                    deploy_progress.update(
+                        campaign_code, table_name, stats["rows_processed"], len(user_data),
+                        stats["rows_failed"], status="done"
                     )
-                    results["tables_updated"].append("spss.fd_rb2_campaigns_users")
-                except Exception as e:
-                    results["errors"].append(f"fd_rb2_campaigns_users: {str(e)}")
-            
-            # 4. Deploy to off_limit_campaigns_users (tracking)
-            if deploy_options.get("deploy_offlimit", True):
-                try:
-                    CampaignDeploymentService._deploy_to_off_limit_campaigns_users(
-                        campaign_code, campaign_metadata, user_data
+                    results["tables_updated"].append(table_name)
+                    results["rows_inserted"][table_name] = stats["rows_inserted"]
+                    results["skipped_records"] += stats["rows_failed"]
+                    room = CAMPAIGN_DEPLOY_MAX_REPORTED_ERRORS - len(results["failed_records"])
+                    results["failed_records"].extend(
+                        dict(record, table=table_name) for record in stats["failed_records"][:max(room, 0)]
                     )
-                    results["tables_updated"].append("spss.off_limit_campaigns_users")
-                except Exception as e:
-                    results["errors"].append(f"off_limit_campaigns_users: {str(e)}")
-            
-            results["success"] = len(results["errors"]) == 0
-            
-        except Exception as e:
-            logger.error(f"Error deploying RB1 campaign: {e}")
-            results["errors"].append(f"General deployment error: {str(e)}")
-            results["success"] = False
         
+        results["success"] = len(results["errors"]) == 0
+        if not results["success"]:
+            logger.error(f"Error deploying {campaign_type} campaign {campaign_code}: {results['errors']}")
+        deploy_progress.finish(campaign_code, results["success"])
         return results
     
     @staticmethod
-    def deploy_rb3_campaign(
+    def _prepare_database(
+        database: str,
+        steps: List[Tuple[str, str, Callable[..., Any], bool]],
         campaign_code: str,
         campaign_metadata: Dict[str, Any],
         user_data: pd.DataFrame,
-        deploy_options: Dict[str, bool]
-    ) -> Dict[str, Any]:
-        """Deploy RB3 campaign to multiple Oracle tables"""
-        results = {
-            "campaign_code": campaign_code,
-            "tables_updated": [],
-            "total_users": len(user_data),
-            "errors": []
-        }
-        
+        deploy_options: Dict[str, Any]
+    ):
+        """
+        Insert every table of one database in a single uncommitted transaction.
+        Returns (connection, [(table, stats)], error); the connection is None on failure.
+        """
+        tables = []
+        conn = None
         try:
-            # 1. Deploy to rb3_tr_campaign_dict (RB3 metadata)
-            if deploy_options.get("deploy_metadata", True):
+            conn = CampaignDeploymentService._connect(database)
+            cursor = conn.cursor()
+            for _database, table_name, deploy_fn, user_table in steps:
+                started = time.monotonic()
                 try:
-                    CampaignDeploymentService._deploy_to_rb3_tr_campaign_dict(
-                        campaign_code, campaign_metadata
-                    )
-                    results["tables_updated"].append("dssb_ocds.rb3_tr_campaign_dict")
+                    if user_table:
+                        def progress(rows_processed: int, rows_failed: int, table_name=table_name):
+                            deploy_progress.update(
+                                campaign_code, table_name, rows_processed, len(user_data), rows_failed
+                            )
+                        
+                        stats = deploy_fn(
+                            cursor, campaign_code, campaign_metadata, user_data,
+                            batch_size=deploy_options.get("batch_size"),
+                            skip_bad_records=deploy_options.get("skip_bad_records", False),
+                            progress=progress
+                        )
+                    else:
+                        deploy_fn(cursor, campaign_code, campaign_metadata)
+                        stats = {"rows_processed": 1, "rows_inserted": 1, "rows_failed": 0, "failed_records": []}
                 except Exception as e:
-                    results["errors"].append(f"rb3_tr_campaign_dict: {str(e)}")
-            
-            # RB3 campaigns also use the same user tables as RB1
-            # 2. Deploy to mb22_local_target
-            if deploy_options.get("deploy_targeting", True):
+                    deploy_progress.update(campaign_code, table_name, 0, len(user_data), status="failed")
+                    tables.append((table_name, {"duration_seconds": round(time.monotonic() - started, 3)}))
+                    raise RuntimeError(f"{table_name.split('.')[-1]}: {str(e)}") from e
+                
+                stats["duration_seconds"] = round(time.monotonic() - started, 3)
+                tables.append((table_name, stats))
+                deploy_progress.update(
+                    campaign_code, table_name, stats["rows_processed"], len(user_data),
+                    stats["rows_failed"], status="prepared"
+                )
+            return conn, tables, None
+        except Exception as e:
+            if conn is not None:
                 try:
-                    CampaignDeploymentService._deploy_to_mb22_local_target(
-                        campaign_code, campaign_metadata, user_data
+                    conn.rollback()
+                    conn.close()
+                except Exception:
+                    pass
+            return None, tables, str(e)
+    
+    @staticmethod
+    def _compensate(database: str, campaign_code: str, tables: List[str], results: Dict[str, Any]):
+        """Delete rows of a campaign that were committed before another database failed"""
+        try:
+            with CampaignDeploymentService._connect(database) as conn:
+                cursor = conn.cursor()
+                for table_name in tables:
+                    cursor.execute(
+                        f"DELETE FROM {DEPLOY_TABLE_SQL_NAMES[table_name]} WHERE CAMPAIGNCODE = :1",
+                        [campaign_code]
                     )
-                    results["tables_updated"].append("dssb_ocds.mb22_local_target")
-                except Exception as e:
-                    results["errors"].append(f"mb22_local_target: {str(e)}")
+                conn.commit()
+            results["compensated_tables"].extend(tables)
+            logger.warning(f"Removed committed rows of campaign {campaign_code} from {', '.join(tables)}")
+        except Exception as e:
+            results["errors"].append(
+                f"{database} compensation failed, remove campaign {campaign_code} manually "
+                f"from {', '.join(tables)}: {str(e)}"
+            )
+    
+    @staticmethod
+    def _insert_in_batches(
+        cursor,
+        insert_query: str,
+        rows: Iterable[tuple],
+        batch_size: Optional[int] = None,
+        skip_bad_records: bool = False,
+        progress: Optional[Callable[[int, int], None]] = None,
+        iin_position: int = 1
+    ) -> Dict[str, Any]:
+        """
+        executemany in chunks of ``batch_size`` rows. With ``skip_bad_records`` rows
+        rejected by Oracle are collected through batcherrors and the rest are kept;
+        otherwise the first bad row fails the table. The caller commits.
+        """
+        batch_size = min(max(int(batch_size or CAMPAIGN_DEPLOY_BATCH_SIZE), 1), CAMPAIGN_DEPLOY_MAX_BATCH_SIZE)
+        rows = iter(rows)
+        rows_processed = 0
+        rows_failed = 0
+        failed_records = []
+        
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
             
-            # 3. Deploy to fd_rb2_campaigns_users
-            if deploy_options.get("deploy_users", True):
-                try:
-                    CampaignDeploymentService._deploy_to_fd_rb2_campaigns_users(
-                        campaign_code, campaign_metadata, user_data
-                    )
-                    results["tables_updated"].append("spss.fd_rb2_campaigns_users")
-                except Exception as e:
-                    results["errors"].append(f"fd_rb2_campaigns_users: {str(e)}")
+            try:
+                cursor.executemany(insert_query, batch, batcherrors=skip_bad_records)
+            except Exception as e:
+                # For DML errors cx_Oracle reports the offset of the failing row in the batch
+                offset = getattr(e.args[0], 'offset', None) if e.args else None
+                if isinstance(offset, int) and 0 <= offset < len(batch):
+                    raise RuntimeError(
+                        f"row {rows_processed + offset + 1} (IIN {batch[offset][iin_position]}): {e}"
+                    ) from e
+                raise
             
-            results["success"] = len(results["errors"]) == 0
+            if skip_bad_records:
+                for error in cursor.getbatcherrors():
+                    rows_failed += 1
+                    if len(failed_records) < CAMPAIGN_DEPLOY_MAX_REPORTED_ERRORS:
+                        failed_records.append({
+                            "row_index": rows_processed + error.offset,
+                            "iin": str(batch[error.offset][iin_position]),
+                            "error": error.message
+                        })
             
-        except Exception as e:
-            logger.error(f"Error deploying RB3 campaign: {e}")
-            results["errors"].append(f"General deployment error: {str(e)}")
-            results["success"] = False
+            rows_processed += len(batch)
+            if progress:
+                progress(rows_processed, rows_failed)
         
-        return results
+        return {
+            "rows_processed": rows_processed,
+            "rows_inserted": rows_processed - rows_failed,
+            "rows_failed": rows_failed,
+            "failed_records": failed_records
+        }
     
     @staticmethod
-    def _deploy_to_mb01_camp_dict(campaign_code: str, metadata: Dict[str, Any]):
+    def _deploy_to_mb01_camp_dict(cursor, campaign_code: str, metadata: Dict[str, Any]):
         """Deploy RB1 campaign metadata to mb01_camp_dict table"""
-        with get_connection_DSSB_OCDS() as conn:
-            cursor = conn.cursor()
-            
-            insert_query = """
-                INSERT INTO dssb_ocds.mb01_camp_dict (
-                    CAMPAIGNCODE, STREAM, SUB_STREAM, TARGET_ACTION, CHANNEL,
-                    CAMPAIGN_TYPE, CAMPAIGN_NAME, CAMPAIGN_DESC, CAMPAIGN_TEXT,
-                    CAMPAIGN_MODEL, CDS_LAUNCHER, CAMPAIGN_TEXT_KZ, OUT_DATE,
-                    CAMP_CNT, INSERT_DATETIME
-                ) VALUES (
-                    :1, :2, :3, :4, :5, :6, :7, :8, :9, :10, :11, :12, :13, :14, :15
-                )
-            """
-            
-            cursor.execute(insert_query, [
-                campaign_code,
-                metadata.get('stream'),
-                metadata.get('sub_stream'),
-                metadata.get('target_action'),
-                metadata.get('channel'),
-                metadata.get('campaign_type'),
-                metadata.get('campaign_name'),
-                metadata.get('campaign_desc'),
-                metadata.get('campaign_text'),
-                metadata.get('campaign_model'),
-                metadata.get('cds_launcher'),
-                metadata.get('campaign_text_kz'),
-                metadata.get('out_date'),
-                metadata.get('camp_cnt'),
-                datetime.now()
-            ])
-            
-            conn.commit()
-            logger.info(f"Deployed RB1 metadata for campaign {campaign_code}")
+        insert_query = """
+            INSERT INTO dssb_ocds.mb01_camp_dict (
+                CAMPAIGNCODE, STREAM, SUB_STREAM, TARGET_ACTION, CHANNEL,
+                CAMPAIGN_TYPE, CAMPAIGN_NAME, CAMPAIGN_DESC, CAMPAIGN_TEXT,
+                CAMPAIGN_MODEL, CDS_LAUNCHER, CAMPAIGN_TEXT_KZ, OUT_DATE,
+                CAMP_CNT, INSERT_DATETIME
+            ) VALUES (
+                :1, :2, :3, :4, :5, :6, :7, :8, :9, :10, :11, :12, :13, :14, :15
+            )
+        """
+        
+        cursor.execute(insert_query, [
+            campaign_code,
+            metadata.get('stream'),
+            metadata.get('sub_stream'),
+            metadata.get('target_action'),
+            metadata.get('channel'),
+            metadata.get('campaign_type'),
+            metadata.get('campaign_name'),
+            metadata.get('campaign_desc'),
+            metadata.get('campaign_text'),
+            metadata.get('campaign_model'),
+            metadata.get('cds_launcher'),
+            metadata.get('campaign_text_kz'),
+            metadata.get('out_date'),
+            metadata.get('camp_cnt'),
+            datetime.now()
+        ])
+        
+        logger.info(f"Deployed RB1 metadata for campaign {campaign_code}")
     
     @staticmethod
-    def _deploy_to_rb3_tr_campaign_dict(campaign_code: str, metadata: Dict[str, Any]):
+    def _deploy_to_rb3_tr_campaign_dict(cursor, campaign_code: str, metadata: Dict[str, Any]):
         """Deploy RB3 campaign metadata to rb3_tr_campaign_dict table"""
-        with get_connection_DSSB_OCDS() as conn:
-            cursor = conn.cursor()
-            
-            insert_query = """
-                INSERT INTO dssb_ocds.rb3_tr_campaign_dict (
-                    CAMPAIGNCODE, DATE_START, DATE_END, XLS_OW_ID, TARGET_ACTION,
-                    BONUS, CHARACTERISTIC_JSON
-                ) VALUES (
-                    :1, :2, :3, :4, :5, :6, :7
-                )
-            """
-            
-            cursor.execute(insert_query, [
-                campaign_code,
-                metadata.get('date_start'),
-                metadata.get('date_end'),
-                metadata.get('xls_ow_id'),
-                metadata.get('target_action'),
-                metadata.get('bonus'),
-                metadata.get('characteristic_json')
-            ])
-            
-            conn.commit()
-            logger.info(f"Deployed RB3 metadata for campaign {campaign_code}")
+        insert_query = """
+            INSERT INTO dssb_ocds.rb3_tr_campaign_dict (
+                CAMPAIGNCODE, DATE_START, DATE_END, XLS_OW_ID, TARGET_ACTION,
+                BONUS, CHARACTERISTIC_JSON
+            ) VALUES (
+                :1, :2, :3, :4, :5, :6, :7
+            )
+        """
+        
+        cursor.execute(insert_query, [
+            campaign_code,
+            metadata.get('date_start'),
+            metadata.get('date_end'),
+            metadata.get('xls_ow_id'),
+            metadata.get('target_action'),
+            metadata.get('bonus'),
+            metadata.get('characteristic_json')
+        ])
+        
+        logger.info(f"Deployed RB3 metadata for campaign {campaign_code}")
+    
+    @staticmethod
+    def _user_bind_columns(
+        user_data: pd.DataFrame,
+        zfill_iin: bool = False,
+        integer_p_sid: bool = False
+    ) -> Tuple[List[Any], List[Any]]:
+        """IIN and P_SID bind values as Python lists, P_SID falls back to IIN when the column is missing"""
+        iin = user_data['IIN']
+        p_sid = user_data['P_SID'] if 'P_SID' in user_data.columns else iin
+        if integer_p_sid:
+            p_sid = pd.to_numeric(p_sid, errors='raise').astype('int64')
+        if zfill_iin:
+            iin = iin.astype(str).str.zfill(12)
+        # tolist() yields Python scalars, which cx_Oracle binds without conversion
+        return iin.tolist(), p_sid.tolist()
+    
+    @staticmethod
+    def _reject_non_numeric_p_sid(user_data: pd.DataFrame) -> Tuple[pd.DataFrame, List[int], List[Dict[str, Any]]]:
+        """
+        Split off rows whose P_SID (IIN when the column is missing) is not a number.
+        Returns the remaining rows, their positions in ``user_data`` and the rejected rows as failed records.
+        """
+        p_sid = user_data['P_SID'] if 'P_SID' in user_data.columns else user_data['IIN']
+        bad = pd.to_numeric(p_sid, errors='coerce').isna().to_numpy()
+        positions = list(range(len(user_data)))
+        if not bad.any():
+            return user_data, positions, []
+        failed_records = [
+            {
+                "row_index": position,
+                "iin": str(user_data['IIN'].iloc[position]),
+                "error": f"P_SID {p_sid.iloc[position]!r} is not a number"
+            }
+            for position in positions if bad[position]
+        ]
+        return user_data[~bad], [position for position in positions if not bad[position]], failed_records
     
     @staticmethod
     def _deploy_to_mb22_local_target(
+        cursor,
         campaign_code: str, 
         metadata: Dict[str, Any], 
-        user_data: pd.DataFrame
-    ):
+        user_data: pd.DataFrame,
+        batch_size: Optional[int] = None,
+        skip_bad_records: bool = False,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
         """Deploy campaign users to mb22_local_target table"""
-        with get_connection_DSSB_OCDS() as conn:
-            cursor = conn.cursor()
-            
-            insert_query = """
-                INSERT INTO dssb_ocds.mb22_local_target (
-                    CAMPAIGNCODE, IIN, P_SID, STREAM, DATE_START, DATE_END, INSET_DATETIME
-                ) VALUES (
-                    :1, :2, :3, :4, :5, :6, :7
-                )
-            """
-            
-            # Prepare batch data
-            batch_data = []
-            for _, row in user_data.iterrows():
-                batch_data.append([
-                    campaign_code,
-                    row['IIN'],
-                    row.get('P_SID', row['IIN']),  # Use IIN as P_SID if not available
-                    metadata.get('stream'),
-                    metadata.get('date_start'),
-                    metadata.get('date_end'),
-                    datetime.now()
-                ])
-            
-            # Execute batch insert
-            cursor.executemany(insert_query, batch_data)
-            conn.commit()
-            
-            logger.info(f"Deployed {len(batch_data)} users to mb22_local_target for campaign {campaign_code}")
+        insert_query = """
+            INSERT INTO dssb_ocds.mb22_local_target (
+                CAMPAIGNCODE, IIN, P_SID, STREAM, DATE_START, DATE_END, INSET_DATETIME
+            ) VALUES (
+                :1, :2, :3, :4, :5, :6, :7
+            )
+        """
+        
+        # Prepare batch data column-wise, constants are shared by every row
+        iins, p_sids = CampaignDeploymentService._user_bind_columns(user_data)
+        stream = metadata.get('stream')
+        date_start = metadata.get('date_start')
+        date_end = metadata.get('date_end')
+        inserted_at = datetime.now()
+        batch_data = (
+            (campaign_code, iin, p_sid, stream, date_start, date_end, inserted_at)
+            for iin, p_sid in zip(iins, p_sids)
+        )
+        
+        # Execute batch insert in chunks, the deployment commits all tables together
+        stats = CampaignDeploymentService._insert_in_batches(
+            cursor, insert_query, batch_data, batch_size, skip_bad_records, progress
+        )
+        
+        logger.info(
+            f"Deployed {stats['rows_inserted']} users to mb22_local_target for campaign {campaign_code}"
+            f" ({stats['rows_failed']} rejected)"
+        )
+        return stats
     
     @staticmethod
     def _deploy_to_fd_rb2_campaigns_users(
+        cursor,
         campaign_code: str, 
         metadata: Dict[str, Any], 
-        user_data: pd.DataFrame
-    ):
+        user_data: pd.DataFrame,
+        batch_size: Optional[int] = None,
+        skip_bad_records: bool = False,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
         """Deploy campaign users to fd_rb2_campaigns_users table"""
-        with get_connection_SPSS() as conn:
-            cursor = conn.cursor()
-            
-            insert_query = """
-                INSERT INTO fd_rb2_campaigns_users (
-                    CAMPAIGNCODE, IIN, P_SID, UPLOAD_DATE, SHORT_DESC
-                ) VALUES (
-                    :1, :2, :3, :4, :5
-                )
-            """
-            
-            # Prepare batch data
-            batch_data = []
-            for _, row in user_data.iterrows():
-                batch_data.append([
-                    campaign_code,
-                    str(row['IIN']).zfill(12),  # Ensure 12-digit string format
-                    int(row.get('P_SID', row['IIN'])),  # Ensure integer format
-                    metadata.get('date_start'),
-                    metadata.get('short_desc')
-                ])
-            
-            # Execute batch insert
-            cursor.executemany(insert_query, batch_data)
-            conn.commit()
-            
-            logger.info(f"Deployed {len(batch_data)} users to fd_rb2_campaigns_users for campaign {campaign_code}")
+        insert_query = """
+            INSERT INTO fd_rb2_campaigns_users (
+                CAMPAIGNCODE, IIN, P_SID, UPLOAD_DATE, SHORT_DESC
+            ) VALUES (
+                :1, :2, :3, :4, :5
+            )
+        """
+        
+        # With skip_bad_records a P_SID that is not a number rejects its row instead of the table
+        rejected = []
+        if skip_bad_records:
+            user_data, positions, rejected = CampaignDeploymentService._reject_non_numeric_p_sid(user_data)
+        
+        # Prepare batch data: 12-digit string IIN, integer P_SID
+        iins, p_sids = CampaignDeploymentService._user_bind_columns(
+            user_data, zfill_iin=True, integer_p_sid=True
+        )
+        upload_date = metadata.get('date_start')
+        short_desc = metadata.get('short_desc')
+        batch_data = (
+            (campaign_code, iin, p_sid, upload_date, short_desc)
+            for iin, p_sid in zip(iins, p_sids)
+        )
+        
+        # Execute batch insert in chunks, the deployment commits all tables together
+        stats = CampaignDeploymentService._insert_in_batches(
+            cursor, insert_query, batch_data, batch_size, skip_bad_records, progress
+        )
+        if rejected:
+            # Report every failure against its row in the original audience
+            for record in stats["failed_records"]:
+                record["row_index"] = positions[record["row_index"]]
+            stats["rows_processed"] += len(rejected)
+            stats["rows_failed"] += len(rejected)
+            stats["failed_records"] = sorted(
+                rejected + stats["failed_records"], key=lambda record: record["row_index"]
+            )[:CAMPAIGN_DEPLOY_MAX_REPORTED_ERRORS]
+        
+        logger.info(
+            f"Deployed {stats['rows_inserted']} users to fd_rb2_campaigns_users for campaign {campaign_code}"
+            f" ({stats['rows_failed']} rejected)"
+        )
+        return stats
     
     @staticmethod
     def _deploy_to_off_limit_campaigns_users(
+        cursor,
         campaign_code: str, 
         metadata: Dict[str, Any], 
-        user_data: pd.DataFrame
-    ):
+        user_data: pd.DataFrame,
+        batch_size: Optional[int] = None,
+        skip_bad_records: bool = False,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
         """Deploy campaign users to off_limit_campaigns_users table"""
-        with get_connection_SPSS() as conn:
-            cursor = conn.cursor()
-            
-            insert_query = """
-                INSERT INTO off_limit_campaigns_users (
-                    CAMPAIGNCODE, IIN, P_SID, UPLOAD_DATE, SHORT_DESC
-                ) VALUES (
-                    :1, :2, :3, :4, :5
-                )
-            """
-            
-            # Prepare batch data
-            batch_data = []
-            for _, row in user_data.iterrows():
-                batch_data.append([
-                    campaign_code,
-                    row['IIN'],
-                    row.get('P_SID', row['IIN']),
-                    metadata.get('date_start'),
-                    metadata.get('short_desc')
-                ])
-            
-            # Execute batch insert
-            cursor.executemany(insert_query, batch_data)
-            conn.commit()
-            
-            logger.info(f"Deployed {len(batch_data)} users to off_limit_campaigns_users for campaign {campaign_code}")
+        insert_query = """
+            INSERT INTO off_limit_campaigns_users (
+                CAMPAIGNCODE, IIN, P_SID, UPLOAD_DATE, SHORT_DESC
+            ) VALUES (
+                :1, :2, :3, :4, :5
+            )
+        """
+        
+        # Prepare batch data
+        iins, p_sids = CampaignDeploymentService._user_bind_columns(user_data)
+        upload_date = metadata.get('date_start')
+        short_desc = metadata.get('short_desc')
+        batch_data = (
+            (campaign_code, iin, p_sid, upload_date, short_desc)
+            for iin, p_sid in zip(iins, p_sids)
+        )
+        
+        # Execute batch insert in chunks, the deployment commits all tables together
+        stats = CampaignDeploymentService._insert_in_batches(
+            cursor, insert_query, batch_data, batch_size, skip_bad_records, progress
+        )
+        
+        logger.info(
+            f"Deployed {stats['rows_inserted']} users to off_limit_campaigns_users for campaign {campaign_code}"
+            f" ({stats['rows_failed']} rejected)"
+        )
+        return stats
 
 class CampaignService:
     """Main campaign management service"""
@@ -655,16 +958,23 @@ class CampaignService:
         campaign_metadata: Dict[str, Any],
         user_data: pd.DataFrame,
         filter_config: Optional[Dict[str, Any]] = None,
-        deploy_options: Optional[Dict[str, bool]] = None
+        deploy_options: Optional[Dict[str, Any]] = None,
+        created_by: Optional[str] = None,
+        filter_stats: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Create complete RB1 campaign with filtering and deployment"""
+        # A stored audience (filter_stats given) was filtered when it was loaded
+        if filter_stats is not None and filter_config:
+            raise ValueError("filter_config cannot be applied to an audience that was already filtered")
         
         # Generate campaign code
         campaign_code = await self.code_service.generate_next_rb1_code()
         campaign_metadata['campaign_code'] = campaign_code
         
-        # Apply filters if specified
-        if filter_config:
+        # Apply filters if specified (a stored audience comes with the stats of its own filtering)
+        if filter_stats is not None:
+            filtered_data = user_data
+        elif filter_config:
             filtered_data, filter_stats = self.data_processor.apply_filters_to_data(
                 user_data, filter_config
             )
@@ -681,9 +991,10 @@ class CampaignService:
                 "deploy_offlimit": True
             }
         
-        # Deploy campaign
-        deployment_result = self.deployment_service.deploy_rb1_campaign(
-            campaign_code, campaign_metadata, filtered_data, deploy_options
+        # Deploy campaign (in the threadpool so deploy progress can be polled meanwhile)
+        deployment_result = await run_in_threadpool(
+            self.deployment_service.deploy_rb1_campaign,
+            campaign_code, campaign_metadata, filtered_data, deploy_options, created_by
         )
         
         return {
@@ -699,9 +1010,14 @@ class CampaignService:
         campaign_metadata: Dict[str, Any],
         user_data: pd.DataFrame,
         filter_config: Optional[Dict[str, Any]] = None,
-        deploy_options: Optional[Dict[str, bool]] = None
+        deploy_options: Optional[Dict[str, Any]] = None,
+        created_by: Optional[str] = None,
+        filter_stats: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Create complete RB3 campaign with filtering and deployment"""
+        # A stored audience (filter_stats given) was filtered when it was loaded
+        if filter_stats is not None and filter_config:
+            raise ValueError("filter_config cannot be applied to an audience that was already filtered")
         
         # Generate campaign code and XLS code
         campaign_code = await self.code_service.generate_next_rb1_code()  # RB3 uses same format
@@ -710,8 +1026,10 @@ class CampaignService:
         campaign_metadata['campaign_code'] = campaign_code
         campaign_metadata['xls_ow_id'] = xls_code
         
-        # Apply filters if specified
-        if filter_config:
+        # Apply filters if specified (a stored audience comes with the stats of its own filtering)
+        if filter_stats is not None:
+            filtered_data = user_data
+        elif filter_config:
             filtered_data, filter_stats = self.data_processor.apply_filters_to_data(
                 user_data, filter_config
             )
@@ -727,9 +1045,10 @@ class CampaignService:
                 "deploy_users": True
             }
         
-        # Deploy campaign
-        deployment_result = self.deployment_service.deploy_rb3_campaign(
-            campaign_code, campaign_metadata, filtered_data, deploy_options
+        # Deploy campaign (in the threadpool so deploy progress can be polled meanwhile)
+        deployment_result = await run_in_threadpool(
+            self.deployment_service.deploy_rb3_campaign,
+            campaign_code, campaign_metadata, filtered_data, deploy_options, created_by
         )
         
         return {
@@ -0,0 +1,122 @@
+"""
+Code Allocator for DataQuery Pro
+
+Hands out campaign identifiers from Oracle sequences instead of scanning the
+campaign tables for MAX(code):
+- RB1 CAMPAIGNCODE (C000012345) from dssb_ocds.campaign_code_seq
+- RB3 XLS_OW_ID (KKB_0123) from dssb_ocds.rb3_xls_ow_id_seq
+- SC campaign IDs for stratification theories (SC00000001) from sc_campaign_id_seq
+
+A sequence created with INCREMENT BY n reserves a block of n numbers with a single
+NEXTVAL, atomically across users, workers and servers. The block is handed out from
+process memory, so most allocations do not touch Oracle at all. Numbers left in a
+block when the process stops are never reused, so codes can have gaps.
+
+The sequences are created by backend_documentation/create_campaign_code_sequences.sql,
+starting above the codes already in use.
+
+The sequences must be the only source of these codes. Anything that still computes
+MAX(code) + 1 on the campaign tables would pick a number inside a block this process
+has reserved but not handed out yet, and both would insert the same code. The
+Streamlit app (market.py) takes its codes from the same sequences.
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CODE_RB1 = "rb1"
+CODE_RB3_XLS = "rb3_xls"
+CODE_SC = "sc"
+
+
+class CodeSequence:
+    """An Oracle sequence and the code format built from its numbers"""
+
+    def __init__(self, database: str, owner: Optional[str], name: str, code_format: str, max_value: int):
+        self.database = database
+        self.owner = owner
+        self.name = name
+        self.code_format = code_format
+        self.max_value = max_value
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.owner}.{self.name}" if self.owner else self.name
+
+    def format(self, number: int) -> str:
+        if number > self.max_value:
+            raise ValueError(f"Sequence {self.qualified_name} exceeded the code range ({number} > {self.max_value})")
+        return self.code_format.format(number)
+
+
+DEFAULT_SEQUENCES = {
+    CODE_RB1: CodeSequence("DSSB_OCDS", "DSSB_OCDS", "CAMPAIGN_CODE_SEQ", "C{:09d}", 999999999),
+    CODE_RB3_XLS: CodeSequence("DSSB_OCDS", "DSSB_OCDS", "RB3_XLS_OW_ID_SEQ", "KKB_{:04d}", 9999),
+    CODE_SC: CodeSequence("DSSB_APP", None, "SC_CAMPAIGN_ID_SEQ", "SC{:08d}", 99999999),
+}
+
+
+def _connect(database: str):
+    import database as database_module
+    return getattr(database_module, f"get_connection_{database}")()
+
+
+class CodeAllocator:
+    """Allocates codes from blocks reserved with one sequence NEXTVAL each"""
+
+    def __init__(self, sequences: Optional[Dict[str, CodeSequence]] = None,
+                 connect: Callable[[str], object] = _connect):
+        self.sequences = sequences or DEFAULT_SEQUENCES
+        self._connect = connect
+        self._locks = {kind: threading.Lock() for kind in self.sequences}
+        # kind -> [next number, end of block (exclusive)]
+        self._blocks: Dict[str, list] = {}
+
+    def _reserve_block(self, kind: str) -> Tuple[int, int]:
+        """NEXTVAL returns the first number of a block as long as INCREMENT BY"""
+        sequence = self.sequences[kind]
+        conn = self._connect(sequence.database)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {sequence.qualified_name}.NEXTVAL FROM dual")
+            start = int(cursor.fetchone()[0])
+            cursor.execute("""
+                SELECT increment_by FROM all_sequences
+                WHERE sequence_owner = NVL(:owner, USER) AND sequence_name = :name
+            """, {"owner": sequence.owner, "name": sequence.name})
+            row = cursor.fetchone()
+            cursor.close()
+        finally:
+            conn.close()
+
+        block_size = max(int(row[0]), 1) if row else 1
+        logger.info(f"Reserved {sequence.qualified_name} block {start}..{start + block_size - 1}")
+        return start, start + block_size
+
+    def _take(self, kind: str, advance: bool) -> int:
+        if kind not in self.sequences:
+            raise ValueError(f"Unknown code kind: {kind}")
+        with self._locks[kind]:
+            block = self._blocks.get(kind)
+            if block is None or block[0] >= block[1]:
+                block = list(self._reserve_block(kind))
+                self._blocks[kind] = block
+            number = block[0]
+            if advance:
+                block[0] += 1
+            return number
+
+    def next_code(self, kind: str) -> str:
+        """Allocate a code; it is never handed out again"""
+        return self.sequences[kind].format(self._take(kind, advance=True))
+
+    def peek_code(self, kind: str) -> str:
+        """The code this process would allocate next (for display, not reserved for the caller)"""
+        return self.sequences[kind].format(self._take(kind, advance=False))
+
+
+# Global instance
+code_allocator = CodeAllocator()
@@ -0,0 +1,81 @@
+"""
+Count Estimates for DataQuery Pro
+
+Fast audience sizing for QueryBuilder ("fast estimate" mode):
+- row counts are estimated from a block sample (SAMPLE BLOCK (p)) and scaled
+  by 100 / p; the 95% interval treats the matching rows in the sample as a
+  binomial draw, which assumes the matching rows are spread over the table's
+  blocks and is wider in practice for data clustered by load date
+- distinct counts use APPROX_COUNT_DISTINCT over the whole filtered table (no
+  sort, no per-value hash table); Oracle documents its relative error as
+  within a few percent at 95% confidence (APPROX_DISTINCT_RELATIVE_ERROR)
+
+The exact COUNT(*) keeps running as a background job and lands in the query cache.
+"""
+
+import os
+import math
+from typing import Any, Dict, Optional
+
+COUNT_ESTIMATE_SAMPLE_PERCENT = float(os.getenv("COUNT_ESTIMATE_SAMPLE_PERCENT", "1"))
+APPROX_DISTINCT_RELATIVE_ERROR = float(os.getenv("APPROX_DISTINCT_RELATIVE_ERROR", "0.03"))
+
+# Two-sided 95% normal quantile
+CONFIDENCE_Z = 1.96
+CONFIDENCE_LEVEL = 0.95
+
+MIN_SAMPLE_PERCENT = 0.000001
+
+
+def normalize_sample_percent(sample_percent: Optional[float]) -> float:
+    """Validate the sample size; Oracle accepts 0.000001 <= p < 100"""
+    if sample_percent is None:
+        sample_percent = COUNT_ESTIMATE_SAMPLE_PERCENT
+    sample_percent = float(sample_percent)
+    if not MIN_SAMPLE_PERCENT <= sample_percent <= 100:
+        raise ValueError(f"Размер выборки должен быть от {MIN_SAMPLE_PERCENT} до 100 процентов")
+    return sample_percent
+
+
+def estimate_count(sample_rows: int, sample_percent: float) -> Dict[str, Any]:
+    """Scale the rows matched in a sample to the full table with a 95% interval"""
+    if sample_percent >= 100:
+        return {
+            "estimate": int(sample_rows), "lower_bound": int(sample_rows), "upper_bound": int(sample_rows),
+            "relative_error": 0.0, "method": "exact", "confidence": CONFIDENCE_LEVEL,
+            "sample_percent": 100.0, "sample_rows": int(sample_rows),
+        }
+
+    fraction = sample_percent / 100
+    estimate = sample_rows / fraction
+    if sample_rows > 0:
+        # Var(X) = N f (1 - f) for X ~ Binomial(N, f), estimated with N ~ X / f
+        margin = CONFIDENCE_Z * math.sqrt(sample_rows * (1 - fraction)) / fraction
+    else:
+        # Rule of three: no hits in the sample still allows up to ~3 / f matching rows
+        margin = 3 / fraction
+
+    return {
+        "estimate": int(round(estimate)),
+        "lower_bound": int(max(sample_rows, math.floor(estimate - margin))),
+        "upper_bound": int(math.ceil(estimate + margin)),
+        "relative_error": round(margin / estimate, 4) if estimate else None,
+        "method": "block_sample",
+        "confidence": CONFIDENCE_LEVEL,
+        "sample_percent": sample_percent,
+        "sample_rows": int(sample_rows),
+    }
+
+
+def estimate_distinct(approx_distinct: int, relative_error: float = APPROX_DISTINCT_RELATIVE_ERROR) -> Dict[str, Any]:
+    """Bounds around an APPROX_COUNT_DISTINCT result"""
+    approx_distinct = int(approx_distinct or 0)
+    margin = approx_distinct * relative_error
+    return {
+        "estimate": approx_distinct,
+        "lower_bound": int(math.floor(approx_distinct - margin)),
+        "upper_bound": int(math.ceil(approx_distinct + margin)),
+        "relative_error": relative_error,
+        "method": "approx_count_distinct",
+        "confidence": CONFIDENCE_LEVEL,
+    }
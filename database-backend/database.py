@@ -1,12 +1,18 @@
 import os
+import time
+import threading
 import cx_Oracle
-from typing import List, Dict, Optional
+from types import MappingProxyType
+from typing import Any, Callable, List, Dict, Optional, Mapping
 from dotenv import load_dotenv
 from datetime import datetime
 
 # Load environment variables
 load_dotenv()
 
+from rollup_service import rollup_service, SOURCE_CONTROL, SOURCE_TARGET, SOURCE_SPSS
+from metrics import record_oracle_call, record_connection_acquire, estimate_fetch_round_trips
+
 # Hardcoded list of tables that frontend has access to
 ALLOWED_TABLES = {
     'DSSB_APP': {
@@ -75,6 +81,97 @@ ALLOWED_TABLES = {
     }
 }
 
+def _build_table_metadata_index(allowed_tables: Dict) -> Mapping:
+    """
+    Build a read-only, case-folded index over ALLOWED_TABLES:
+    DATABASE -> TABLE -> {"name", "description", "columns": (...), "columns_by_name": {column_lower: column}}
+    """
+    databases = {}
+    for database_id, tables in allowed_tables.items():
+        table_index = {}
+        for table_name, table_info in tables.items():
+            columns_by_name = {
+                column['name'].lower(): MappingProxyType(dict(column))
+                for column in table_info['columns']
+            }
+            table_index[table_name.upper()] = MappingProxyType({
+                "name": table_name,
+                "description": table_info['description'],
+                "columns": tuple(table_info['columns']),
+                "columns_by_name": MappingProxyType(columns_by_name),
+            })
+        databases[database_id.upper()] = MappingProxyType(table_index)
+    return MappingProxyType(databases)
+
+# Built once at import; all table/column validation goes through this index
+TABLE_METADATA_INDEX = _build_table_metadata_index(ALLOWED_TABLES)
+
+def get_table_metadata(database_id: str, table_name: str) -> Optional[Mapping]:
+    """Get indexed metadata for a table (case-insensitive), or None if the table is not allowed"""
+    tables = TABLE_METADATA_INDEX.get((database_id or '').upper())
+    if not tables:
+        return None
+    return tables.get((table_name or '').upper())
+
+def get_column_metadata(database_id: str, table_name: str, column_name: str) -> Optional[Mapping]:
+    """Get metadata (name, type, description) for a column (case-insensitive), or None"""
+    table = get_table_metadata(database_id, table_name)
+    if not table or not column_name:
+        return None
+    return table["columns_by_name"].get(column_name.lower())
+
+class InstrumentedCursor(cx_Oracle.Cursor):
+    """Cursor that reports calls, estimated round-trips and fetched rows to the request metrics"""
+
+    def execute(self, statement, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().execute(statement, *args, **kwargs)
+        finally:
+            record_oracle_call(time.perf_counter() - started)
+
+    def executemany(self, statement, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().executemany(statement, *args, **kwargs)
+        finally:
+            record_oracle_call(time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        record_oracle_call(time.perf_counter() - started, rows=1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        record_oracle_call(time.perf_counter() - started, rows=len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        record_oracle_call(
+            time.perf_counter() - started, rows=len(rows),
+            round_trips=estimate_fetch_round_trips(len(rows), self.arraysize)
+        )
+        return rows
+
+class InstrumentedConnection(cx_Oracle.Connection):
+    """Connection whose cursors are instrumented"""
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self, *args, **kwargs)
+
+def _timed_connect(**kwargs):
+    """Open an instrumented connection and record how long it took"""
+    started = time.perf_counter()
+    try:
+        return InstrumentedConnection(**kwargs)
+    finally:
+        record_connection_acquire(time.perf_counter() - started)
+
 def get_connection_DSSB_APP():
     """Establish a connection to the DSSB_APP database"""
     try:
@@ -89,7 +186,7 @@ def get_connection_DSSB_APP():
             raise ValueError("Missing required database environment variables. Please check ORACLE_HOST, ORACLE_SID, ORACLE_USER, and ORACLE_PASSWORD.")
         
         dsn = cx_Oracle.makedsn(oracle_host, oracle_port, sid=oracle_sid)
-        return cx_Oracle.connect(user=oracle_user, password=oracle_password, dsn=dsn)
+        return _timed_connect(user=oracle_user, password=oracle_password, dsn=dsn)
     except cx_Oracle.Error as e:
         print(f"Database connection error: {str(e)}")
         raise
@@ -114,7 +211,7 @@ def get_connection_SPSS():
             raise ValueError("Missing required SPSS database environment variables. Please check SPSS_ORACLE_HOST, SPSS_ORACLE_SID, SPSS_ORACLE_USER, and SPSS_ORACLE_PASSWORD.")
         
         dsn = cx_Oracle.makedsn(spss_host, spss_port, sid=spss_sid)
-        return cx_Oracle.connect(user=spss_user, password=spss_password, dsn=dsn)
+        return _timed_connect(user=spss_user, password=spss_password, dsn=dsn)
     except cx_Oracle.Error as e:
         print(f"SPSS Database connection error: {str(e)}")
         raise
@@ -139,7 +236,7 @@ def get_connection_DSSB_OCDS():
             raise ValueError("Missing required DSSB_OCDS database environment variables. Please check DSSB_OCDS_ORACLE_HOST, DSSB_OCDS_ORACLE_SID, DSSB_OCDS_ORACLE_USER, and DSSB_OCDS_ORACLE_PASSWORD.")
         
         dsn = cx_Oracle.makedsn(dssb_ocds_host, dssb_ocds_port, sid=dssb_ocds_sid)
-        return cx_Oracle.connect(user=dssb_ocds_user, password=dssb_ocds_password, dsn=dsn)
+        return _timed_connect(user=dssb_ocds_user, password=dssb_ocds_password, dsn=dsn)
     except cx_Oracle.Error as e:
         print(f"DSSB_OCDS Database connection error: {str(e)}")
         raise
@@ -166,7 +263,7 @@ def get_connection_ED_OCDS():
             raise ValueError("Missing required ED_OCDS database environment variables. Please check ED_OCDS_ORACLE_HOST, ED_OCDS_ORACLE_SID, ED_OCDS_ORACLE_USER, and ED_OCDS_ORACLE_PASSWORD.")
         
         dsn = cx_Oracle.makedsn(ed_ocds_host, ed_ocds_port, sid=ed_ocds_sid)
-        return cx_Oracle.connect(user=ed_ocds_user, password=ed_ocds_password, dsn=dsn)
+        return _timed_connect(user=ed_ocds_user, password=ed_ocds_password, dsn=dsn)
     except cx_Oracle.Error as e:
         print(f"ED_OCDS Database connection error: {str(e)}")
         raise
@@ -177,6 +274,78 @@ def get_connection_ED_OCDS():
         print(f"Unexpected error in ED_OCDS database connection: {str(e)}")
         raise
 
+# Session pools for read-heavy endpoints: env prefix of the credentials per database
+POOL_ENV_PREFIXES = {
+    "DSSB_APP": "ORACLE",
+    "SPSS": "SPSS_ORACLE",
+}
+ORACLE_POOL_MIN = int(os.getenv('ORACLE_POOL_MIN', '1'))
+ORACLE_POOL_MAX = int(os.getenv('ORACLE_POOL_MAX', '8'))
+
+_session_pools = {}
+_session_pools_lock = threading.Lock()
+
+def _get_session_pool(database_id: str):
+    pool = _session_pools.get(database_id)
+    if pool is not None:
+        return pool
+    with _session_pools_lock:
+        pool = _session_pools.get(database_id)
+        if pool is None:
+            prefix = POOL_ENV_PREFIXES[database_id]
+            host = os.getenv(f'{prefix}_HOST', '')
+            port = os.getenv(f'{prefix}_PORT', '1521')
+            sid = os.getenv(f'{prefix}_SID', '')
+            user = os.getenv(f'{prefix}_USER', '')
+            password = os.getenv(f'{prefix}_PASSWORD', '')
+            if not all([host, sid, user, password]):
+                raise ValueError(f"Missing required {database_id} database environment variables ({prefix}_*)")
+            pool = cx_Oracle.SessionPool(
+                user=user, password=password, dsn=cx_Oracle.makedsn(host, port, sid=sid),
+                min=ORACLE_POOL_MIN, max=ORACLE_POOL_MAX, increment=1,
+                threaded=True, getmode=cx_Oracle.SPOOL_ATTRVAL_WAIT,
+                connectiontype=InstrumentedConnection
+            )
+            _session_pools[database_id] = pool
+            print(f"Created {database_id} session pool (min={ORACLE_POOL_MIN}, max={ORACLE_POOL_MAX})")
+    return pool
+
+def get_pooled_connection(database_id: str):
+    """Acquire a connection from the session pool of DSSB_APP or SPSS; close() returns it to the pool"""
+    pool = _get_session_pool(database_id)
+    started = time.perf_counter()
+    try:
+        return pool.acquire()
+    finally:
+        record_connection_acquire(time.perf_counter() - started)
+
+def fetch_rows(database_id: str, sql: str, params: Dict = None, call_timeout_ms: int = None) -> List[Dict]:
+    """Run a read query on a pooled connection and return rows as dicts with lowercase keys.
+    Errors are raised to the caller; call_timeout_ms bounds every round-trip to the database."""
+    conn = get_pooled_connection(database_id)
+    try:
+        if call_timeout_ms:
+            conn.callTimeout = int(call_timeout_ms)
+        cursor = conn.cursor()
+        cursor.execute(sql, params or {})
+        columns = [desc[0].lower() for desc in cursor.description] if cursor.description else []
+        rows = []
+        for row in cursor.fetchall():
+            rows.append({
+                column: value.isoformat() if hasattr(value, 'isoformat') else value
+                for column, value in zip(columns, row)
+            })
+        cursor.close()
+        return rows
+    finally:
+        # Pooled sessions keep their attributes, reset the timeout before releasing
+        if call_timeout_ms:
+            try:
+                conn.callTimeout = 0
+            except cx_Oracle.Error:
+                pass
+        conn.close()
+
 def test_connection() -> Dict:
     """Test database connection and return status"""
     try:
@@ -360,27 +529,8 @@ def get_table_columns(database_id: str, table_name: str) -> List[Dict]:
 
 def get_table_columns_case_insensitive(database_id: str, table_name: str) -> List[Dict]:
     """Get columns for a specific table with case-insensitive table name lookup"""
-    # First try exact database_id match
-    db_key = None
-    for key in ALLOWED_TABLES.keys():
-        if key.upper() == database_id.upper():
-            db_key = key
-            break
-    
-    if not db_key:
-        return []
-    
-    # Now try case-insensitive table name lookup
-    table_key = None
-    for key in ALLOWED_TABLES[db_key].keys():
-        if key.upper() == table_name.upper():
-            table_key = key
-            break
-    
-    if not table_key:
-        return []
-    
-    return ALLOWED_TABLES[db_key][table_key]["columns"]
+    table = get_table_metadata(database_id, table_name)
+    return list(table["columns"]) if table else []
 
 def is_table_allowed(database_id: str, table_name: str) -> bool:
     """Check if table access is allowed"""
@@ -388,27 +538,23 @@ def is_table_allowed(database_id: str, table_name: str) -> bool:
 
 def is_table_allowed_case_insensitive(database_id: str, table_name: str) -> bool:
     """Check if table access is allowed with case-insensitive lookup"""
-    # First try exact database_id match
-    db_key = None
-    for key in ALLOWED_TABLES.keys():
-        if key.upper() == database_id.upper():
-            db_key = key
-            break
-    
-    if not db_key:
-        return False
-    
-    # Now try case-insensitive table name lookup
-    for key in ALLOWED_TABLES[db_key].keys():
-        if key.upper() == table_name.upper():
-            return True
-    
-    return False
+    return get_table_metadata(database_id, table_name) is not None
 
-def execute_query(sql: str, params: Dict = None) -> Dict:
-    """Execute SQL query and return results"""
+def execute_query(sql: str, params: Dict = None, call_timeout_ms: Optional[int] = None,
+                  on_connect: Optional[Callable[[Any], None]] = None) -> Dict:
+    """
+    Execute SQL query and return results.
+    ``call_timeout_ms`` bounds every round-trip (cx_Oracle callTimeout); ``on_connect``
+    receives the connection before execution so the caller can cancel it, and may raise
+    to stop the query before it is sent (reported as a failed result).
+    """
+    conn = None
     try:
         conn = get_connection_DSSB_APP()
+        if call_timeout_ms:
+            conn.callTimeout = int(call_timeout_ms)
+        if on_connect is not None:
+            on_connect(conn)
         cursor = conn.cursor()
         
         # Execute query
@@ -449,43 +595,71 @@ def execute_query(sql: str, params: Dict = None) -> Dict:
         
     except Exception as e:
         print(f"Query execution error: {e}")
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
         return {
             "success": False,
             "message": f"Database query failed: {str(e)}",
             "error": str(e)
         }
 
-# Theory Management Functions
-def get_next_sc_campaign_id():
-    """Get next available SC campaign ID in format SC00000001, SC00000002, etc."""
+def _export_column_type(description) -> str:
+    """Map a cursor.description entry to a simple type name used by export writers"""
+    type_code, precision, scale = description[1], description[4], description[5]
+    if type_code is cx_Oracle.NUMBER:
+        if scale == 0 and precision:
+            # int64 holds every NUMBER(18,0); wider whole numbers stay exact as decimals
+            return "integer" if precision <= 18 else "decimal"
+        return "number"
+    if type_code in (cx_Oracle.DATETIME, cx_Oracle.TIMESTAMP):
+        return "date"
+    if type_code in (cx_Oracle.BLOB, cx_Oracle.BINARY):
+        return "binary"
+    return "string"
+
+def iter_query_batches(sql: str, params: Dict = None, batch_size: int = 5000):
+    """
+    Execute a query and yield (columns, column_types, rows) batches using fetchmany.
+    Only one batch is held in memory at a time; at least one (possibly empty) batch is yielded.
+    """
+    conn = get_connection_DSSB_APP()
+    cursor = conn.cursor()
     try:
-        connection = get_connection_DSSB_APP()
-        cursor = connection.cursor()
-        
-        # Find the highest SC campaign number
-        cursor.execute(r"""
-        SELECT NVL(MAX(
-            CASE 
-                WHEN REGEXP_LIKE(theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN 
-                    TO_NUMBER(SUBSTR(theory_id, 3, 8))
-                ELSE 0
-            END
-        ), 0) + 1 as next_campaign_id
-        FROM SoftCollection_theories
-        """)
-        result = cursor.fetchone()
-        next_campaign_num = result[0] if result else 1
-        
+        cursor.arraysize = batch_size
+        cursor.prefetchrows = batch_size + 1
+        cursor.execute(sql, params or {})
+
+        columns = [desc[0].lower() for desc in cursor.description]
+        column_types = [_export_column_type(desc) for desc in cursor.description]
+        has_lobs = any(desc[1] in (cx_Oracle.CLOB, cx_Oracle.BLOB, cx_Oracle.NCLOB) for desc in cursor.description)
+
+        yielded = False
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if has_lobs:
+                rows = [
+                    tuple(value.read() if isinstance(value, cx_Oracle.LOB) else value for value in row)
+                    for row in rows
+                ]
+            yielded = True
+            yield columns, column_types, rows
+
+        if not yielded:
+            yield columns, column_types, []
+    finally:
         cursor.close()
-        connection.close()
-        
-        # Format as SC00000001, SC00000002, etc.
-        return f"SC{next_campaign_num:08d}"
-        
-    except Exception as e:
-        print(f"Error getting next SC campaign ID: {e}")
-        # Return a safe default
-        return "SC00000001"
+        conn.close()
+
+# Theory Management Functions
+def get_next_sc_campaign_id():
+    """Allocate the next SC campaign ID (SC00000001, SC00000002, ...) from sc_campaign_id_seq"""
+    from code_allocator import code_allocator, CODE_SC
+    return code_allocator.next_code(CODE_SC)
 
 def get_next_theory_id():
     """Get next available theory ID for backward compatibility (numeric format)"""
@@ -718,6 +892,11 @@ def extract_iin_values(data, iin_column):
     return list(iin_values)
 
 # SC Local Tables Management Functions
+def _database_sysdate(cursor):
+    """SYSDATE of the cursor's database; one batch is stamped and rolled up with the same Oracle time"""
+    cursor.execute("SELECT SYSDATE FROM dual")
+    return cursor.fetchone()[0]
+
 def insert_control_group(theory_id, iin_values, date_start, date_end, additional_fields=None):
     """Insert control group users into SC_local_control table"""
     try:
@@ -735,10 +914,12 @@ def insert_control_group(theory_id, iin_values, date_start, date_end, additional
         insert_sql = """
         INSERT INTO SC_local_control 
         (IIN, THEORY_ID, date_start, date_end, insert_datetime, tab1, tab2, tab3, tab4, tab5)
-        VALUES (:1, :2, TO_DATE(:3, 'YYYY-MM-DD'), TO_DATE(:4, 'YYYY-MM-DD'), SYSDATE, :5, :6, :7, :8, :9)
+        VALUES (:1, :2, TO_DATE(:3, 'YYYY-MM-DD'), TO_DATE(:4, 'YYYY-MM-DD'), :5, :6, :7, :8, :9, :10)
         """
         
+        inserted_at = _database_sysdate(cursor)
         inserted_count = 0
+        inserted_iins = []
         for iin in iin_values:
             try:
                 cursor.execute(insert_sql, (
@@ -746,9 +927,11 @@ def insert_control_group(theory_id, iin_values, date_start, date_end, additional
                     theory_id,
                     date_start,
                     date_end,
+                    inserted_at,
                     tab1, tab2, tab3, tab4, tab5
                 ))
                 inserted_count += 1
+                inserted_iins.append(iin)
             except Exception as e:
                 print(f"Error inserting control IIN {iin}: {e}")
                 continue
@@ -756,6 +939,7 @@ def insert_control_group(theory_id, iin_values, date_start, date_end, additional
         connection.commit()
         cursor.close()
         connection.close()
+        rollup_service.record_insert(SOURCE_CONTROL, theory_id, inserted_iins, additional_fields, inserted_at)
         
         return {
             "success": True,
@@ -787,10 +971,12 @@ def insert_into_spss_theory_users(theory_id, iin_values, date_start, date_end, a
         insert_sql = """
         INSERT INTO SC_theory_users 
         (IIN, THEORY_ID, date_start, date_end, insert_datetime, tab1, tab2, tab3, tab4, tab5)
-        VALUES (:1, :2, TO_DATE(:3, 'YYYY-MM-DD'), TO_DATE(:4, 'YYYY-MM-DD'), SYSDATE, :5, :6, :7, :8, :9)
+        VALUES (:1, :2, TO_DATE(:3, 'YYYY-MM-DD'), TO_DATE(:4, 'YYYY-MM-DD'), :5, :6, :7, :8, :9, :10)
         """
         
+        inserted_at = _database_sysdate(cursor)
         inserted_count = 0
+        inserted_iins = []
         for iin in iin_values:
             try:
                 cursor.execute(insert_sql, (
@@ -798,9 +984,11 @@ def insert_into_spss_theory_users(theory_id, iin_values, date_start, date_end, a
                     theory_id,
                     date_start,
                     date_end,
+                    inserted_at,
                     tab1, tab2, tab3, tab4, tab5
                 ))
                 inserted_count += 1
+                inserted_iins.append(iin)
             except Exception as e:
                 print(f"Error inserting target IIN {iin} into SPSS: {e}")
                 continue
@@ -808,6 +996,7 @@ def insert_into_spss_theory_users(theory_id, iin_values, date_start, date_end, a
         connection.commit()
         cursor.close()
         connection.close()
+        rollup_service.record_insert(SOURCE_SPSS, theory_id, inserted_iins, additional_fields, inserted_at)
         
         return {
             "success": True,
@@ -848,10 +1037,12 @@ def insert_target_groups(theory_id, iin_values, date_start, date_end, additional
         insert_sql = """
         INSERT INTO SC_local_target 
         (IIN, THEORY_ID, date_start, date_end, insert_datetime, tab1, tab2, tab3, tab4, tab5)
-        VALUES (:1, :2, TO_DATE(:3, 'YYYY-MM-DD'), TO_DATE(:4, 'YYYY-MM-DD'), SYSDATE, :5, :6, :7, :8, :9)
+        VALUES (:1, :2, TO_DATE(:3, 'YYYY-MM-DD'), TO_DATE(:4, 'YYYY-MM-DD'), :5, :6, :7, :8, :9, :10)
         """
         
+        inserted_at = _database_sysdate(cursor)
         dssb_inserted_count = 0
+        inserted_iins = []
         for iin in iin_values:
             try:
                 cursor.execute(insert_sql, (
@@ -859,9 +1050,11 @@ def insert_target_groups(theory_id, iin_values, date_start, date_end, additional
                     theory_id,
                     date_start,
                     date_end,
+                    inserted_at,
                     tab1, tab2, tab3, tab4, tab5
                 ))
                 dssb_inserted_count += 1
+                inserted_iins.append(iin)
             except Exception as e:
                 print(f"Error inserting target IIN {iin} into DSSB_APP: {e}")
                 continue
@@ -869,6 +1062,7 @@ def insert_target_groups(theory_id, iin_values, date_start, date_end, additional
         connection.commit()
         cursor.close()
         connection.close()
+        rollup_service.record_insert(SOURCE_TARGET, theory_id, inserted_iins, additional_fields, inserted_at)
         
         results["dssb_app"] = {
             "success": True,
@@ -0,0 +1,222 @@
+"""
+Data Export Service for DataQuery Pro
+
+Streams query results as CSV, Parquet or XLSX without materializing the whole
+result set. Rows arrive in batches from database.iter_query_batches and each
+format writer yields bytes as soon as a batch is encoded, so memory stays flat
+regardless of the number of exported rows.
+"""
+
+import io
+import os
+import csv
+import zlib
+import logging
+import tempfile
+from datetime import date, datetime
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "5000"))
+EXPORT_CHUNK_BYTES = 256 * 1024
+
+# Excel hard limit per sheet (including the header row)
+XLSX_MAX_ROWS_PER_SHEET = 1_048_576
+
+# (columns, column_types, rows) as produced by database.iter_query_batches
+Batch = Tuple[List[str], List[str], List[tuple]]
+
+
+class _StreamSink:
+    """Write-only file object that collects bytes written by pyarrow so they can be yielded"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class DataExportService:
+    """Service for streaming query results in export formats"""
+
+    media_types = {
+        "csv": "text/csv",
+        "parquet": "application/vnd.apache.parquet",
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+
+    def is_supported_format(self, export_format: str) -> bool:
+        return export_format in self.media_types
+
+    def stream(self, batches: Iterable[Batch], export_format: str, use_gzip: bool = False,
+               label: str = "") -> Iterator[bytes]:
+        """Encode batches in the requested format, optionally gzip them, and log the totals"""
+        writers = {
+            "csv": self._stream_csv,
+            "parquet": self._stream_parquet,
+            "xlsx": self._stream_xlsx,
+        }
+        counter = {"rows": 0}
+        chunks = writers[export_format](self._count_rows(batches, counter))
+        if use_gzip:
+            chunks = self._gzip(chunks)
+
+        bytes_sent = 0
+        try:
+            for chunk in chunks:
+                if chunk:
+                    bytes_sent += len(chunk)
+                    yield chunk
+        except Exception as e:
+            logger.error(f"Export {label} ({export_format}) failed after {counter['rows']} rows: {e}")
+            raise
+        finally:
+            logger.info(
+                f"Export {label} ({export_format}{', gzip' if use_gzip else ''}): "
+                f"{counter['rows']} rows, {bytes_sent} bytes streamed"
+            )
+
+    @staticmethod
+    def _count_rows(batches: Iterable[Batch], counter: dict) -> Iterator[Batch]:
+        for columns, column_types, rows in batches:
+            counter["rows"] += len(rows)
+            yield columns, column_types, rows
+
+    @staticmethod
+    def _format_csv_value(value: Any) -> Any:
+        if value is None:
+            return ""
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+
+    def _stream_csv(self, batches: Iterable[Batch]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        header_written = False
+
+        for columns, _column_types, rows in batches:
+            if not header_written:
+                writer.writerow(columns)
+                header_written = True
+            for row in rows:
+                writer.writerow([self._format_csv_value(value) for value in row])
+                if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate(0)
+
+        yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def _arrow_schema(columns: List[str], column_types: List[str]):
+        import pyarrow as pa
+
+        arrow_types = {
+            "integer": pa.int64(),
+            "decimal": pa.decimal128(38, 0),
+            "number": pa.float64(),
+            "date": pa.timestamp("us"),
+            "binary": pa.binary(),
+        }
+        return pa.schema([
+            pa.field(name, arrow_types.get(column_type, pa.string()))
+            for name, column_type in zip(columns, column_types)
+        ])
+
+    def _stream_parquet(self, batches: Iterable[Batch]) -> Iterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        sink = _StreamSink()
+        writer: Optional[pq.ParquetWriter] = None
+        schema = None
+
+        try:
+            for columns, column_types, rows in batches:
+                if writer is None:
+                    schema = self._arrow_schema(columns, column_types)
+                    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+                if not rows:
+                    continue
+                # One row group per fetched batch
+                arrays = [
+                    pa.array([row[i] for row in rows], type=field.type)
+                    for i, field in enumerate(schema)
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                yield sink.drain()
+        finally:
+            if writer is not None:
+                writer.close()
+        yield sink.drain()
+
+    def _stream_xlsx(self, batches: Iterable[Batch]) -> Iterator[bytes]:
+        from openpyxl import Workbook
+
+        # XLSX is a zip archive that can only be finalized at the end, so rows are written
+        # through openpyxl's write-only mode into a temporary file which is then streamed
+        workbook = Workbook(write_only=True)
+        sheet = None
+        sheet_rows = 0
+        columns: List[str] = []
+
+        for batch_columns, _column_types, rows in batches:
+            columns = batch_columns
+            if sheet is None:
+                sheet = workbook.create_sheet("Export")
+                sheet.append(columns)
+                sheet_rows = 1
+            for row in rows:
+                if sheet_rows >= XLSX_MAX_ROWS_PER_SHEET:
+                    sheet = workbook.create_sheet(f"Export_{len(workbook.worksheets) + 1}")
+                    sheet.append(columns)
+                    sheet_rows = 1
+                sheet.append(list(row))
+                sheet_rows += 1
+
+        if sheet is None:
+            workbook.create_sheet("Export")
+
+        with tempfile.TemporaryFile(suffix=".xlsx") as tmp_file:
+            workbook.save(tmp_file)
+            tmp_file.seek(0)
+            while True:
+                chunk = tmp_file.read(EXPORT_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+
+    @staticmethod
+    def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+
+# Global instance
+export_service = DataExportService()
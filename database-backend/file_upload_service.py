@@ -6,18 +6,74 @@ Replicates the file upload functionality from the original market.py.
 """
 
 import os
+import re
+import json
+import time
+import hashlib
 import logging
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from datetime import datetime
 import tempfile
 import shutil
 from pathlib import Path
 
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Multipart boundaries and part headers on top of the file itself
+UPLOAD_MULTIPART_OVERHEAD = 64 * 1024
+# Rows per batch when streaming CSV / Parquet files
+UPLOAD_READ_BATCH_ROWS = int(os.getenv("UPLOAD_READ_BATCH_ROWS", "100000"))
+# Rows read up front for column detection and the sample shown to the user
+UPLOAD_SAMPLE_ROWS = 1000
+# Bytes of a CSV file used to detect its encoding
+CSV_ENCODING_SAMPLE_BYTES = 256 * 1024
+
+# Convert .xlsx uploads to a Parquet sidecar on first read so later reads skip Excel parsing
+UPLOAD_EXCEL_PARQUET_SIDECAR = os.getenv("UPLOAD_EXCEL_PARQUET_SIDECAR", "true").lower() == "true"
+
+# Form field carrying the file in /files/upload
+UPLOAD_FIELD_NAME = "file"
+# Stored uploads are named <first 16 hex chars of sha256>_<original filename>
+UPLOAD_HASH_PREFIX_LENGTH = 16
+
+
+class UploadTooLargeError(Exception):
+    """Raised while streaming an upload once it exceeds the size limit"""
+
+
+def _xls_supported() -> bool:
+    """Legacy .xls files need xlrd, which is not part of requirements.txt"""
+    try:
+        import xlrd  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _excel_cell_text(value: Any) -> Optional[str]:
+    """
+    Text form of an openpyxl cell value. Numbers keep a decimal point
+    ("90010130012.0") so IINs that Excel stored as numbers are still recognised
+    as numeric and zero-padded by normalize_iins.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, (int, float)):
+        return repr(float(value))
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
 class FileUploadService:
     """Service for handling file uploads and processing"""
     
@@ -26,8 +82,10 @@ class FileUploadService:
         self.upload_dir = Path("uploads")
         self.upload_dir.mkdir(exist_ok=True)
         
-        # Supported file types
-        self.supported_extensions = {'.xlsx', '.xls', '.csv', '.parquet'}
+        # Supported file types (.xls only when the optional xlrd package is installed)
+        self.supported_extensions = {'.xlsx', '.csv', '.parquet'}
+        if _xls_supported():
+            self.supported_extensions.add('.xls')
         
         # Maximum file size (50MB)
         self.max_file_size = 50 * 1024 * 1024
@@ -104,23 +162,70 @@ class FileUploadService:
     def _validate_iin_column(self, series: pd.Series) -> bool:
         """Validate if a series contains IIN-like values"""
         
-        # Convert to string and clean
-        clean_series = series.astype(str).str.strip()
+        # Check the first 100 non-empty values for performance
+        sample = series.dropna().head(100)
+        if sample.dtype == object:
+            sample = sample[sample.astype(str).str.strip().ne('')]
+        if len(sample) == 0:
+            return False
         
-        # Remove NaN/null values
-        non_null_series = clean_series[clean_series != 'nan']
+        # At least 80% of values must be IINs
+        _, valid = self.normalize_iins(sample)
+        return valid.mean() >= 0.8
+    
+    def _has_iin_structure(self, iins: pd.Series) -> pd.Series:
+        """Mask of 12-digit strings that start with a YYMMDD birth date and a century/sex digit 1-6"""
+        pattern = rf'\d{{2}}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])[1-6]\d{{{self.iin_length - 7}}}'
+        return iins.str.fullmatch(pattern).fillna(False).astype(bool)
+    
+    def _iins_from_numbers(self, numbers: pd.Series) -> pd.Series:
+        """
+        IINs from a numeric column (or numbers written as text): Excel and CSV readers turn
+        IINs into int/float and drop leading zeros (birth years 2000-2009). Whole numbers
+        with 10-11 digits are zero-padded back to 12 digits only when the padded value has
+        the IIN structure, so phone or account numbers are not turned into IINs.
+        """
+        numbers = pd.to_numeric(numbers, errors='coerce')
+        result = pd.Series(pd.NA, index=numbers.index, dtype="string")
+        present = numbers.notna()
+        whole = present & (numbers % 1 == 0) & (numbers >= 10 ** (self.iin_length - 3)) & (numbers < 10 ** self.iin_length)
+        digits = numbers[whole].astype('int64').astype(str)
+        padded = digits.str.zfill(self.iin_length)
+        restored = (digits.str.len() == self.iin_length) | self._has_iin_structure(padded)
+        result[whole] = padded.where(restored, digits)
+        # Keep the original value of anything else so it is reported as invalid
+        result[present & ~whole] = numbers[present & ~whole].astype(str)
+        return result
+    
+    def normalize_iins(self, values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        """
+        Vectorized IIN cleaning.
         
-        if len(non_null_series) == 0:
-            return False
+        Returns ``(iins, valid)`` aligned positionally with ``values``: the cleaned
+        value (12-digit string for valid IINs, <NA> for empty cells) and a boolean mask
+        of valid IINs. Non-empty cells outside the mask are invalid.
+        """
+        values = values.reset_index(drop=True)
         
-        # Check if at least 80% of values are 12-digit numbers
-        valid_iins = 0
-        for value in non_null_series.head(100):  # Check first 100 values for performance
-            if len(value) == self.iin_length and value.isdigit():
-                valid_iins += 1
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            iins = self._iins_from_numbers(values)
+        else:
+            text = values.astype("string").str.strip()
+            text = text.mask(text.isin(['', 'nan', 'NaN', 'None']))
+            
+            # Drop separators ("900101-300123", "900 101 300 123")
+            iins = text.str.replace(r'\D', '', regex=True)
+            
+            # Numbers stored as text: "900101300123.0", and "9.00101300123E+11" when no digits were lost
+            as_float = text.str.fullmatch(r'\d+\.0+').fillna(False)
+            scientific = text.str.extract(r'^\d\.(\d+)[eE]\+?(\d+)$')
+            lossless = scientific[0].str.len() >= pd.to_numeric(scientific[1], errors='coerce')
+            numeric_text = as_float | lossless.fillna(False).astype(bool)
+            if numeric_text.any():
+                iins[numeric_text] = self._iins_from_numbers(text[numeric_text])
         
-        validation_ratio = valid_iins / min(len(non_null_series), 100)
-        return validation_ratio >= 0.8
+        valid = self._has_iin_structure(iins)
+        return iins, valid
     
     def load_file_data(self, file_path: str, file_type: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
         """Load data from uploaded file"""
@@ -137,23 +242,14 @@ class FileUploadService:
         try:
             if file_type in ['.xlsx', '.xls']:
                 # Load Excel file
+                if file_type == '.xls' and not _xls_supported():
+                    raise ValueError("Для файлов .xls требуется пакет xlrd; сохраните файл в формате .xlsx или CSV")
                 df = pd.read_excel(file_path, engine='openpyxl' if file_type == '.xlsx' else 'xlrd')
                 
             elif file_type == '.csv':
-                # Try different encodings for CSV
-                encodings = ['utf-8', 'cp1251', 'windows-1251', 'iso-8859-1']
-                df = None
-                
-                for encoding in encodings:
-                    try:
-                        df = pd.read_csv(file_path, encoding=encoding)
-                        logger.info(f"CSV loaded successfully with encoding: {encoding}")
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                
-                if df is None:
-                    raise ValueError("Не удалось загрузить CSV файл с поддерживаемыми кодировками")
+                encoding = self.detect_encoding(file_path)
+                df = pd.read_csv(file_path, encoding=encoding)
+                logger.info(f"CSV loaded successfully with encoding: {encoding}")
             
             elif file_type == '.parquet':
                 # Load Parquet file
@@ -177,82 +273,289 @@ class FileUploadService:
             logger.error(f"Error loading file: {e}")
             raise ValueError(f"Ошибка загрузки файла: {str(e)}")
     
+    def detect_encoding(self, file_path: str) -> str:
+        """Detect the encoding of a CSV file once, from a sample of its first bytes"""
+        with open(file_path, 'rb') as f:
+            sample = f.read(CSV_ENCODING_SAMPLE_BYTES)
+        
+        if sample.startswith(b'\xef\xbb\xbf'):
+            return 'utf-8-sig'
+        try:
+            sample.decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError as e:
+            # The sample may end in the middle of a multi-byte character
+            if len(sample) == CSV_ENCODING_SAMPLE_BYTES and e.start >= len(sample) - 3:
+                return 'utf-8'
+        try:
+            sample.decode('cp1251')
+            return 'cp1251'
+        except UnicodeDecodeError:
+            return 'iso-8859-1'
+    
+    def _iter_excel_rows(self, file_path: str, column_index: Optional[int] = None) -> Iterator[Tuple[Any, ...]]:
+        """
+        Stream rows of the first sheet with openpyxl read-only mode (header row first).
+        The header is padded to the sheet dimension; sheets saved without one yield
+        ragged rows and columns to the right of the header are ignored.
+        """
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            if column_index is None:
+                rows = sheet.iter_rows(values_only=True)
+                header = next(rows, ())
+                yield tuple(header) + (None,) * max(0, (sheet.max_column or 0) - len(header))
+                yield from rows
+            else:
+                yield from sheet.iter_rows(min_col=column_index + 1, max_col=column_index + 1, values_only=True)
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _excel_header(row: Tuple[Any, ...]) -> List[str]:
+        """Column names as pandas would produce them ("Unnamed: 3", duplicates as "name.1")"""
+        header, seen = [], {}
+        for i, value in enumerate(row):
+            name = str(value).strip() if value is not None and str(value).strip() else f"Unnamed: {i}"
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            header.append(name)
+        return header
+    
+    def excel_sidecar_path(self, file_path: str) -> Path:
+        """Parquet copy of an .xlsx upload (hidden file next to it, removed by cleanup_old_files)"""
+        path = Path(file_path)
+        return path.with_name(f".{path.name}.parquet")
+    
+    def convert_excel_to_parquet(self, file_path: str, batch_rows: int = UPLOAD_READ_BATCH_ROWS) -> Path:
+        """
+        Stream the first sheet of an .xlsx file into a Parquet sidecar in one pass.
+        All columns are stored as text (see _excel_cell_text); later reads use the
+        Parquet batch reader instead of parsing the workbook again.
+        """
+        sidecar = self.excel_sidecar_path(file_path)
+        temp_path = sidecar.with_name(sidecar.name + ".tmp")
+        started = time.perf_counter()
+        rows = self._iter_excel_rows(file_path)
+        header = self._excel_header(next(rows, ()))
+        schema = pa.schema([pa.field(name, pa.string()) for name in header])
+        
+        total = 0
+        with pq.ParquetWriter(temp_path, schema) as writer:
+            batch: List[Tuple[Any, ...]] = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_rows:
+                    writer.write_table(self._excel_batch_table(batch, schema))
+                    total += len(batch)
+                    batch = []
+            if batch or total == 0:
+                writer.write_table(self._excel_batch_table(batch, schema))
+                total += len(batch)
+        os.replace(temp_path, sidecar)
+        
+        logger.info(f"Excel converted to parquet sidecar: {total} rows in {time.perf_counter() - started:.2f}s")
+        return sidecar
+    
+    @staticmethod
+    def _excel_batch_table(batch: List[Tuple[Any, ...]], schema: pa.Schema) -> pa.Table:
+        width = len(schema)
+        columns = [[] for _ in range(width)]
+        for row in batch:
+            for i in range(width):
+                columns[i].append(_excel_cell_text(row[i]) if i < len(row) else None)
+        return pa.Table.from_arrays([pa.array(column, type=pa.string()) for column in columns], schema=schema)
+    
+    def _excel_parquet(self, file_path: str) -> Optional[str]:
+        """Parquet sidecar of an .xlsx file, created on first use when enabled"""
+        sidecar = self.excel_sidecar_path(file_path)
+        if sidecar.is_file():
+            return str(sidecar)
+        if UPLOAD_EXCEL_PARQUET_SIDECAR:
+            return str(self.convert_excel_to_parquet(file_path))
+        return None
+    
+    def read_file_head(self, file_path: str, file_type: str, rows: int = UPLOAD_SAMPLE_ROWS) -> pd.DataFrame:
+        """First rows of a file (column detection and sample data) without reading the rest"""
+        if file_type == '.xlsx':
+            sidecar = self._excel_parquet(file_path)
+            if sidecar:
+                df = self.read_file_head(sidecar, '.parquet', rows)
+            else:
+                excel_rows = self._iter_excel_rows(file_path)
+                header = self._excel_header(next(excel_rows, ()))
+                head = [
+                    [_excel_cell_text(row[i]) if i < len(row) else None for i in range(len(header))]
+                    for _, row in zip(range(rows), excel_rows)
+                ]
+                excel_rows.close()
+                df = pd.DataFrame(head, columns=header, dtype="string")
+            # Excel cells are read as text; show numeric columns as numbers
+            for column in df.columns:
+                try:
+                    df[column] = pd.to_numeric(df[column])
+                except (ValueError, TypeError):
+                    pass
+            return df
+        if file_type == '.csv':
+            df = pd.read_csv(file_path, encoding=self.detect_encoding(file_path), nrows=rows)
+        elif file_type == '.parquet':
+            parquet_file = pq.ParquetFile(file_path)
+            batch = next(parquet_file.iter_batches(batch_size=rows), None)
+            df = batch.to_pandas() if batch is not None else parquet_file.schema_arrow.empty_table().to_pandas()
+        else:
+            df, _ = self.load_file_data(file_path, file_type)
+            df = df.head(rows)
+        return df
+    
+    def iter_column_batches(self, file_path: str, file_type: str, column: str,
+                            batch_rows: int = UPLOAD_READ_BATCH_ROWS) -> Iterator[pd.Series]:
+        """Stream one column of a file in batches; CSV in chunks, Parquet and .xlsx sidecars by record batches"""
+        if file_type == '.xlsx':
+            sidecar = self._excel_parquet(file_path)
+            if sidecar:
+                yield from self.iter_column_batches(sidecar, '.parquet', column, batch_rows)
+                return
+            # No sidecar: stream just this column from the workbook
+            excel_rows = self._iter_excel_rows(file_path)
+            header = self._excel_header(next(excel_rows, ()))
+            excel_rows.close()
+            column_rows = self._iter_excel_rows(file_path, header.index(column))
+            next(column_rows, None)
+            values: List[Optional[str]] = []
+            for row in column_rows:
+                values.append(_excel_cell_text(row[0]) if row else None)
+                if len(values) >= batch_rows:
+                    yield pd.Series(values, dtype="string")
+                    values = []
+            if values:
+                yield pd.Series(values, dtype="string")
+            return
+        if file_type == '.csv':
+            reader = pd.read_csv(
+                file_path, encoding=self.detect_encoding(file_path), usecols=[column], chunksize=batch_rows
+            )
+            with reader:
+                for chunk in reader:
+                    yield chunk[column]
+        elif file_type == '.parquet':
+            parquet_file = pq.ParquetFile(file_path)
+            for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=[column]):
+                yield batch.column(0).to_pandas()
+        else:
+            df, _ = self.load_file_data(file_path, file_type)
+            yield df[column.strip()]
+    
     def extract_iins_from_file(
         self, 
         file_path: str, 
         file_type: str,
         iin_column: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Extract IINs from uploaded file"""
+        """
+        Extract IINs from uploaded file.
+        
+        Only the first rows are loaded as a DataFrame (column detection, sample data);
+        the IIN column is then streamed in batches and collected as unique int64
+        values, so memory grows with the number of distinct IINs, not the file size.
+        """
         
+        start_time = datetime.now()
         try:
-            # Load file data
-            df, load_stats = self.load_file_data(file_path, file_type)
+            head = self.read_file_head(file_path, file_type)
+            # Column names are shown stripped; the raw name is needed to read the column
+            raw_columns = {str(column).strip(): column for column in head.columns}
+            head.columns = head.columns.astype(str).str.strip()
+            columns_detected = list(head.columns)
+            sample = head.head(5).astype(object)
+            sample_data = sample.where(sample.notna(), None).to_dict('records')
             
             # Auto-detect IIN column if not specified
             if not iin_column:
-                iin_column = self.detect_iin_column(df)
+                iin_column = self.detect_iin_column(head)
                 if not iin_column:
                     return {
                         "success": False,
                         "message": "Не удалось автоматически определить колонку с IIN. Укажите колонку вручную.",
-                        "columns_detected": load_stats["columns_detected"],
-                        "sample_data": df.head(5).to_dict('records')
+                        "columns_detected": columns_detected,
+                        "sample_data": sample_data
                     }
             
             # Validate IIN column exists
-            if iin_column not in df.columns:
+            if iin_column not in head.columns:
                 return {
                     "success": False,
                     "message": f"Колонка '{iin_column}' не найдена в файле.",
-                    "columns_detected": load_stats["columns_detected"],
-                    "sample_data": df.head(5).to_dict('records')
+                    "columns_detected": columns_detected,
+                    "sample_data": sample_data
                 }
             
-            # Extract and clean IINs
-            raw_iins = df[iin_column].astype(str).str.strip()
-            
-            # Filter valid IINs (12 digits)
-            valid_iins = []
+            rows = valid_count = invalid_count = 0
             validation_errors = []
+            unique_parts: List[np.ndarray] = []
+            collected = compacted = 0
             
-            for idx, iin in enumerate(raw_iins):
-                if pd.isna(iin) or iin == 'nan' or iin == '':
-                    continue
+            for values in self.iter_column_batches(file_path, file_type, raw_columns[iin_column]):
+                iins, valid = self.normalize_iins(values)
+                invalid = (iins.notna() & ~valid).to_numpy()
+                
+                # Report the first 10 invalid values
+                if len(validation_errors) < 10:
+                    for idx in np.flatnonzero(invalid)[:10 - len(validation_errors)]:
+                        validation_errors.append(
+                            f"Строка {rows + idx + 1}: '{values.iloc[idx]}' не является корректным IIN"
+                        )
                 
-                # Clean IIN (remove non-digits)
-                clean_iin = ''.join(filter(str.isdigit, iin))
+                rows += len(values)
+                valid_count += int(valid.sum())
+                invalid_count += int(invalid.sum())
                 
-                if len(clean_iin) == self.iin_length:
-                    valid_iins.append(clean_iin)
-                else:
-                    validation_errors.append(f"Строка {idx + 1}: '{iin}' не является корректным IIN")
+                batch_unique = pd.unique(iins[valid].astype('int64').to_numpy())
+                unique_parts.append(batch_unique)
+                collected += len(batch_unique)
+                # Merge per-batch uniques once they outgrow the merged set
+                if collected > 2 * compacted + UPLOAD_READ_BATCH_ROWS:
+                    unique_parts = [pd.unique(np.concatenate(unique_parts))]
+                    collected = compacted = len(unique_parts[0])
             
             # Remove duplicates while preserving order
-            unique_iins = list(dict.fromkeys(valid_iins))
+            unique_values = pd.unique(np.concatenate(unique_parts)) if unique_parts else np.array([], dtype='int64')
+            unique_iins = self.format_iins(unique_values)
             
-            # Prepare sample data (first 5 rows)
-            sample_data = df.head(5).to_dict('records')
+            load_stats = {
+                "rows_loaded": rows,
+                "columns_detected": columns_detected,
+                "file_type": file_type,
+                "load_time": (datetime.now() - start_time).total_seconds()
+            }
             
             result = {
                 "success": True,
-                "message": f"Успешно извлечено {len(unique_iins)} уникальных IIN из {len(valid_iins)} корректных записей",
+                "message": f"Успешно извлечено {len(unique_iins)} уникальных IIN из {valid_count} корректных записей",
                 "filename": os.path.basename(file_path),
                 "file_type": file_type,
-                "rows_processed": len(df),
-                "columns_detected": load_stats["columns_detected"],
+                "rows_processed": rows,
+                "columns_detected": columns_detected,
                 "iin_column": iin_column,
                 "iins_extracted": len(unique_iins),
                 "iins": unique_iins,
+                "iin_values": unique_values,
                 "sample_data": sample_data,
-                "validation_errors": validation_errors[:10],  # Show first 10 errors
+                "validation_errors": validation_errors,  # First 10 errors
+                "invalid_count": invalid_count,
                 "load_stats": load_stats
             }
             
             # Log statistics
-            logger.info(f"IIN extraction completed: {len(unique_iins)} unique IINs from {len(df)} rows")
-            if validation_errors:
-                logger.warning(f"Found {len(validation_errors)} validation errors")
+            logger.info(f"IIN extraction completed: {len(unique_iins)} unique IINs from {rows} rows")
+            if invalid_count:
+                logger.warning(f"Found {invalid_count} validation errors")
             
             return result
             
@@ -284,6 +587,240 @@ class FileUploadService:
             logger.error(f"Error saving file {filename}: {e}")
             raise ValueError(f"Ошибка сохранения файла: {str(e)}")
     
+    def _safe_filename(self, filename: str) -> str:
+        """Strip directories and characters that are unsafe in a file name"""
+        name = Path(filename.replace("\\", "/")).name
+        name = re.sub(r'[^\w.\-]+', '_', name, flags=re.UNICODE).strip('._')
+        return name or "upload"
+    
+    def find_upload(self, content_hash: str) -> Optional[Path]:
+        """Return the stored upload with the given content hash, if any"""
+        prefix = content_hash[:UPLOAD_HASH_PREFIX_LENGTH]
+        for path in self.upload_dir.glob(f"{prefix}_*"):
+            if path.is_file():
+                return path
+        return None
+    
+    def resolve_upload(self, filename: str) -> Optional[Path]:
+        """Find an upload by the stored name returned from /files/upload (or the original name)"""
+        stored = self.upload_dir / Path(filename).name
+        if stored.is_file():
+            return stored
+        # Stored names carry the sanitized original name, see receive_upload
+        pattern = f"*_{self._safe_filename(filename)}"
+        for path in sorted(self.upload_dir.glob(pattern), key=lambda p: p.stat().st_mtime, reverse=True):
+            return path
+        return None
+    
+    async def receive_upload(self, request) -> Dict[str, Any]:
+        """
+        Stream the file part of a multipart/form-data request to disk.
+
+        Chunks are hashed (sha256) and written to a temporary file as they arrive;
+        the size limit is checked on every chunk, so oversized uploads are aborted
+        with UploadTooLargeError without being buffered. Content already uploaded
+        (same hash) is not stored twice: the existing file is returned with
+        ``duplicate=True``.
+        """
+        content_type, options = parse_options_header(request.headers.get("content-type", ""))
+        boundary = options.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise ValueError("Ожидается multipart/form-data с файлом")
+        
+        max_size_mb = self.max_file_size / 1024 / 1024
+        content_length = int(request.headers.get("content-length") or 0)
+        if content_length > self.max_file_size + UPLOAD_MULTIPART_OVERHEAD:
+            raise UploadTooLargeError(
+                f"Файл слишком большой: {content_length / 1024 / 1024:.1f}MB. Максимум: {max_size_mb}MB"
+            )
+        
+        state = {
+            "header_field": b"", "header_value": b"", "disposition": b"",
+            "in_file": False, "filename": None, "size": 0, "done": False,
+        }
+        pending: List[bytes] = []
+        hasher = hashlib.sha256()
+        temp = tempfile.NamedTemporaryFile(dir=self.upload_dir, prefix=".upload_", delete=False)
+        
+        def on_part_begin():
+            state["disposition"] = b""
+        
+        def on_header_field(data, start, end):
+            state["header_field"] += data[start:end]
+        
+        def on_header_value(data, start, end):
+            state["header_value"] += data[start:end]
+        
+        def on_header_end():
+            if state["header_field"].lower() == b"content-disposition":
+                state["disposition"] = state["header_value"]
+            state["header_field"] = state["header_value"] = b""
+        
+        def on_headers_finished():
+            _, part_options = parse_options_header(state["disposition"])
+            is_file = (
+                part_options.get(b"name") == UPLOAD_FIELD_NAME.encode()
+                and b"filename" in part_options
+                and not state["done"]
+            )
+            state["in_file"] = is_file
+            if is_file:
+                state["filename"] = part_options[b"filename"].decode("utf-8", errors="replace")
+                file_ext = Path(state["filename"]).suffix.lower()
+                if file_ext not in self.supported_extensions:
+                    raise ValueError(
+                        f"Неподдерживаемый формат файла: {file_ext}. Поддерживаются: {', '.join(self.supported_extensions)}"
+                    )
+        
+        def on_part_data(data, start, end):
+            if not state["in_file"]:
+                return
+            chunk = data[start:end]
+            state["size"] += len(chunk)
+            if state["size"] > self.max_file_size:
+                raise UploadTooLargeError(
+                    f"Файл слишком большой: более {max_size_mb}MB. Максимум: {max_size_mb}MB"
+                )
+            hasher.update(chunk)
+            pending.append(chunk)
+        
+        def on_part_end():
+            if state["in_file"]:
+                state["in_file"] = False
+                state["done"] = True
+        
+        parser = MultipartParser(boundary, {
+            "on_part_begin": on_part_begin,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+        })
+        
+        started = time.perf_counter()
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                if pending:
+                    # Disk writes run in the threadpool so large uploads do not block the event loop
+                    await run_in_threadpool(temp.write, b"".join(pending))
+                    pending.clear()
+            parser.finalize()
+            temp.close()
+        except BaseException:
+            temp.close()
+            os.remove(temp.name)
+            raise
+        
+        if not state["done"]:
+            os.remove(temp.name)
+            raise ValueError("Файл не найден в запросе (ожидается поле 'file')")
+        
+        content_hash = hasher.hexdigest()
+        existing = self.find_upload(content_hash)
+        if existing is not None:
+            os.remove(temp.name)
+            # Keep re-uploaded files from being removed by cleanup_old_files
+            os.utime(existing)
+            path, duplicate = existing, True
+        else:
+            path = self.upload_dir / (
+                f"{content_hash[:UPLOAD_HASH_PREFIX_LENGTH]}_{self._safe_filename(state['filename'])}"
+            )
+            os.replace(temp.name, path)
+            duplicate = False
+        
+        logger.info(
+            f"Upload streamed: {state['filename']} ({state['size']} bytes, sha256 {content_hash[:12]}, "
+            f"{'duplicate' if duplicate else 'new'}) in {time.perf_counter() - started:.2f}s"
+        )
+        return {
+            "path": str(path),
+            "filename": state["filename"],
+            "size": state["size"],
+            "sha256": content_hash,
+            "duplicate": duplicate,
+        }
+    
+    @staticmethod
+    def upload_id_for(content_hash: str) -> str:
+        """Upload ID: the content hash prefix that also starts the stored file name"""
+        return content_hash[:UPLOAD_HASH_PREFIX_LENGTH]
+    
+    @staticmethod
+    def is_valid_upload_id(upload_id: str) -> bool:
+        return bool(re.fullmatch(rf'[0-9a-f]{{{UPLOAD_HASH_PREFIX_LENGTH}}}', upload_id or ''))
+    
+    def upload_id_from_path(self, file_path: str) -> Optional[str]:
+        """Upload ID of a stored file name (None for files stored before content hashing)"""
+        prefix = Path(file_path).name.split('_', 1)[0]
+        return prefix if self.is_valid_upload_id(prefix) else None
+    
+    def _iins_path(self, upload_id: str, iin_column: str) -> Path:
+        column_key = hashlib.sha1(str(iin_column).encode('utf-8')).hexdigest()[:8]
+        return self.upload_dir / f"{upload_id}.iins.{column_key}.npy"
+    
+    def save_upload_iins(self, upload_id: str, iin_column: str, iin_values: np.ndarray):
+        """Persist the unique, normalized IINs of an upload column as an int64 .npy sidecar"""
+        path = self._iins_path(upload_id, iin_column)
+        temp_path = path.with_name(path.name + ".tmp")
+        try:
+            with open(temp_path, 'wb') as f:
+                np.save(f, np.asarray(iin_values, dtype=np.int64), allow_pickle=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not save IIN sidecar {path}: {e}")
+    
+    def has_upload_iins(self, upload_id: Optional[str], iin_column: str) -> bool:
+        return self.is_valid_upload_id(upload_id) and self._iins_path(upload_id, iin_column).is_file()
+    
+    def load_upload_iins(self, upload_id: str, iin_column: str) -> Optional[np.ndarray]:
+        """IINs extracted at upload time, or None if this column was not extracted yet"""
+        if not self.is_valid_upload_id(upload_id):
+            return None
+        path = self._iins_path(upload_id, iin_column)
+        if not path.is_file():
+            return None
+        try:
+            iin_values = np.load(path, allow_pickle=False)
+            os.utime(path)
+            return iin_values
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable IIN sidecar {path}: {e}")
+            return None
+    
+    def format_iins(self, iin_values: np.ndarray) -> List[str]:
+        """int64 IINs back to 12-digit strings"""
+        return pd.Series(iin_values, dtype='int64').astype(str).str.zfill(self.iin_length).tolist()
+    
+    def _summary_path(self, content_hash: str) -> Path:
+        return self.upload_dir / f"{content_hash[:UPLOAD_HASH_PREFIX_LENGTH]}.summary.json"
+    
+    def load_upload_summary(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Extraction summary of an earlier upload of the same content"""
+        path = self._summary_path(content_hash)
+        if not path.is_file():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                summary = json.load(f)
+            os.utime(path)
+            return summary
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable upload summary {path}: {e}")
+            return None
+    
+    def save_upload_summary(self, content_hash: str, extraction_result: Dict[str, Any]):
+        """Persist the extraction result without the IIN list so re-uploads skip processing"""
+        summary = {key: value for key, value in extraction_result.items() if key not in ("iins", "iin_values")}
+        try:
+            with open(self._summary_path(content_hash), "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, default=str)
+        except OSError as e:
+            logger.warning(f"Could not save upload summary: {e}")
+    
     def cleanup_old_files(self, hours: int = 24):
         """Clean up old uploaded files"""
         
@@ -307,24 +844,39 @@ class FileUploadService:
     
     def process_file_with_filters(
         self,
-        file_path: str,
+        file_path: Optional[str],
         iin_column: str,
-        filter_config: Optional[Dict[str, Any]] = None
+        filter_config: Optional[Dict[str, Any]] = None,
+        upload_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Process file and apply filters using campaign service"""
+        """
+        Process file and apply filters using campaign service.
+        IINs come from the upload's sidecar when it exists; the file is only read
+        (and the sidecar written) for a column that was not extracted before.
+        """
         
         try:
-            # First extract IINs from file
-            extraction_result = self.extract_iins_from_file(
-                file_path, 
-                Path(file_path).suffix.lower(),
-                iin_column
-            )
+            iin_values = self.load_upload_iins(upload_id, iin_column) if upload_id else None
             
-            if not extraction_result["success"]:
-                return extraction_result
+            if iin_values is None:
+                if not file_path:
+                    return {"success": False, "message": "Файл загрузки не найден"}
+                
+                # Extract IINs from file
+                extraction_result = self.extract_iins_from_file(
+                    file_path, 
+                    Path(file_path).suffix.lower(),
+                    iin_column
+                )
+                
+                if not extraction_result["success"]:
+                    return extraction_result
+                
+                iin_values = extraction_result["iin_values"]
+                if upload_id:
+                    self.save_upload_iins(upload_id, iin_column, iin_values)
             
-            original_iins = extraction_result["iins"]
+            original_iins = self.format_iins(iin_values)
             
             # If no filters specified, return extracted IINs
             if not filter_config:
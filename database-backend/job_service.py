@@ -0,0 +1,373 @@
+"""
+Background Job Service for DataQuery Pro
+
+Runs long operations (stratification + theory creation + SC_local inserts) outside
+the HTTP request. Jobs are executed by a bounded worker pool and persisted in a
+local SQLite store so their status, progress and result survive worker restarts.
+"""
+
+import os
+import json
+import uuid
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "state/jobs.sqlite3")
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "2"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+
+class JobProgress:
+    """Progress handle passed to job handlers; every update is persisted"""
+
+    def __init__(self, service: "JobService", job_id: str):
+        self._service = service
+        self.job_id = job_id
+
+    def update(self, stage: Optional[str] = None, rows_processed: Optional[int] = None,
+               rows_total: Optional[int] = None):
+        """Record the current stage and/or row counters of the job"""
+        fields = {}
+        if stage is not None:
+            fields["stage"] = stage
+        if rows_processed is not None:
+            fields["rows_processed"] = int(rows_processed)
+        if rows_total is not None:
+            fields["rows_total"] = int(rows_total)
+        if fields:
+            self._service._update(self.job_id, **fields)
+
+
+class JobService:
+    """Persistent job queue executed by a bounded thread pool"""
+
+    def __init__(self, db_path: str = JOB_STORE_PATH, max_workers: int = JOB_MAX_WORKERS):
+        self.db_path = Path(db_path)
+        self.max_workers = max(1, max_workers)
+        self._handlers: Dict[str, Dict[str, Any]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # job_type -> dedicated pool for job types registered with their own max_workers
+        self._type_executors: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+        # Makes the duplicate check and the insert of submit(dedupe_key=...) atomic
+        self._submit_lock = threading.Lock()
+        self._initialized = False
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_schema(self):
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._connect()
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id TEXT PRIMARY KEY,
+                        job_type TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        stage TEXT,
+                        rows_processed INTEGER NOT NULL DEFAULT 0,
+                        rows_total INTEGER,
+                        created_by TEXT,
+                        payload TEXT,
+                        result TEXT,
+                        error TEXT,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        created_at TEXT NOT NULL,
+                        started_at TEXT,
+                        updated_at TEXT NOT NULL,
+                        finished_at TEXT,
+                        dedupe_key TEXT
+                    )
+                """)
+                # Stores created before dedupe_key existed
+                columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+                if "dedupe_key" not in columns:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN dedupe_key TEXT")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedupe_key ON jobs(dedupe_key)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created_by ON jobs(created_by, created_at)")
+                conn.commit()
+            finally:
+                conn.close()
+            self._initialized = True
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _row_to_dict(self, row: sqlite3.Row, include_result: bool = False) -> Dict[str, Any]:
+        job = {
+            "job_id": row["id"],
+            "job_type": row["job_type"],
+            "status": row["status"],
+            "stage": row["stage"],
+            "rows_processed": row["rows_processed"],
+            "rows_total": row["rows_total"],
+            "created_by": row["created_by"],
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "updated_at": row["updated_at"],
+            "finished_at": row["finished_at"],
+            "eta_seconds": None,
+        }
+
+        # Linear ETA from the throughput observed so far
+        if (row["status"] == STATUS_RUNNING and row["started_at"] and row["rows_total"]
+                and row["rows_processed"]):
+            elapsed = (datetime.now() - datetime.fromisoformat(row["started_at"])).total_seconds()
+            remaining = max(row["rows_total"] - row["rows_processed"], 0)
+            job["eta_seconds"] = round(elapsed / row["rows_processed"] * remaining, 1)
+
+        if include_result:
+            job["result"] = json.loads(row["result"]) if row["result"] else None
+        return job
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def register_handler(self, job_type: str, handler: Callable[[Dict[str, Any], JobProgress], Any],
+                         restartable_stages: Iterable[str] = (), max_workers: Optional[int] = None):
+        """
+        Register the function that executes jobs of ``job_type``.
+
+        The handler receives the job payload and a JobProgress and returns a JSON
+        serialisable result. Jobs interrupted by a restart while in one of
+        ``restartable_stages`` (stages with no side effects yet) are re-queued;
+        jobs interrupted in any other stage are marked as failed. With
+        ``max_workers`` the jobs run on their own pool of that size instead of
+        the shared one, so they cannot hold up other job types.
+        """
+        self._handlers[job_type] = {
+            "handler": handler,
+            "restartable_stages": set(restartable_stages),
+            "max_workers": max(1, max_workers) if max_workers else None,
+        }
+
+    def _executor_for(self, job_type: str) -> ThreadPoolExecutor:
+        handler = self._handlers.get(job_type)
+        if not handler or not handler["max_workers"]:
+            return self._executor
+        with self._lock:
+            executor = self._type_executors.get(job_type)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=handler["max_workers"],
+                                              thread_name_prefix=f"job-{job_type}")
+                self._type_executors[job_type] = executor
+            return executor
+
+    def start(self):
+        """Start the worker pool and resume jobs left over from a previous run"""
+        self._ensure_schema()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job-worker")
+
+        self.cleanup_old_jobs()
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, job_type, status, stage FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (STATUS_QUEUED, STATUS_RUNNING)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        resumed = 0
+        for row in rows:
+            handler = self._handlers.get(row["job_type"])
+            if row["status"] == STATUS_RUNNING:
+                if not handler or row["stage"] not in handler["restartable_stages"]:
+                    self._update(
+                        row["id"],
+                        status=STATUS_FAILED,
+                        error="Задача прервана перезапуском сервера",
+                        finished_at=datetime.now().isoformat()
+                    )
+                    logger.warning(f"Job {row['id']} was interrupted in stage '{row['stage']}', marked as failed")
+                    continue
+                self._update(row["id"], status=STATUS_QUEUED, stage="queued", rows_processed=0)
+            self._executor_for(row["job_type"]).submit(self._run, row["id"])
+            resumed += 1
+
+        logger.info(f"Job service started with {self.max_workers} workers, {resumed} jobs resumed")
+
+    def shutdown(self):
+        """Stop accepting work; queued jobs stay persisted and resume on next start"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            for executor in self._type_executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+            self._type_executors.clear()
+        logger.info("Job service stopped")
+
+    def submit(self, job_type: str, payload: Dict[str, Any], created_by: Optional[str] = None,
+               dedupe_key: Optional[str] = None) -> str:
+        """
+        Persist a new job and schedule it; returns the job ID.
+        With ``dedupe_key``, a queued or running job of the same type and key is returned instead.
+        """
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if self._executor is None:
+            self.start()
+
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        self._ensure_schema()
+        with self._submit_lock:
+            conn = self._connect()
+            try:
+                if dedupe_key is not None:
+                    existing = conn.execute(
+                        "SELECT id FROM jobs WHERE job_type = ? AND dedupe_key = ? AND status IN (?, ?) "
+                        "ORDER BY created_at LIMIT 1",
+                        (job_type, dedupe_key, STATUS_QUEUED, STATUS_RUNNING)
+                    ).fetchone()
+                    if existing:
+                        logger.info(f"Job {existing['id']} ({job_type}) is already queued or running, not resubmitted")
+                        return existing["id"]
+                conn.execute(
+                    "INSERT INTO jobs (id, job_type, status, stage, created_by, payload, created_at, updated_at, "
+                    "dedupe_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, job_type, STATUS_QUEUED, "queued", created_by, json.dumps(payload, default=str),
+                     now, now, dedupe_key)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+        self._executor_for(job_type).submit(self._run, job_id)
+        logger.info(f"Job {job_id} ({job_type}) submitted by {created_by}")
+        return job_id
+
+    def get_job(self, job_id: str, include_result: bool = False) -> Optional[Dict[str, Any]]:
+        """Return job status (and optionally its result) or None"""
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_dict(row, include_result) if row else None
+
+    def count_active_jobs(self, job_type: str, created_by: Optional[str] = None) -> int:
+        """Number of queued or running jobs of ``job_type``, optionally only those of one user"""
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            sql = "SELECT COUNT(*) FROM jobs WHERE job_type = ? AND status IN (?, ?)"
+            params = [job_type, STATUS_QUEUED, STATUS_RUNNING]
+            if created_by is not None:
+                sql += " AND created_by = ?"
+                params.append(created_by)
+            return conn.execute(sql, params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def list_jobs(self, created_by: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """List most recent jobs, optionally only those of one user"""
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            if created_by:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE created_by = ? ORDER BY created_at DESC LIMIT ?",
+                    (created_by, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        finally:
+            conn.close()
+        return [self._row_to_dict(row) for row in rows]
+
+    def cleanup_old_jobs(self, days: int = JOB_RETENTION_DAYS) -> int:
+        """Delete finished jobs older than ``days``"""
+        self._ensure_schema()
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (*FINISHED_STATUSES, cutoff)
+            )
+            conn.commit()
+            deleted = cursor.rowcount
+        finally:
+            conn.close()
+        if deleted:
+            logger.info(f"Cleaned up {deleted} old jobs")
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+    def _run(self, job_id: str):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT job_type, status, payload, attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if not row or row["status"] != STATUS_QUEUED:
+            return
+
+        handler = self._handlers.get(row["job_type"])
+        if not handler:
+            self._update(job_id, status=STATUS_FAILED, error=f"Unknown job type: {row['job_type']}",
+                         finished_at=datetime.now().isoformat())
+            return
+
+        self._update(job_id, status=STATUS_RUNNING, stage="started", attempts=row["attempts"] + 1,
+                     started_at=datetime.now().isoformat())
+        progress = JobProgress(self, job_id)
+
+        try:
+            result = handler["handler"](json.loads(row["payload"]), progress)
+            self._update(job_id, status=STATUS_SUCCEEDED, stage="done",
+                         result=json.dumps(result, default=str), finished_at=datetime.now().isoformat())
+            logger.info(f"Job {job_id} finished successfully")
+        except Exception as e:
+            # HTTPException carries its message in .detail
+            error = getattr(e, "detail", None) or str(e)
+            self._update(job_id, status=STATUS_FAILED, error=str(error), finished_at=datetime.now().isoformat())
+            logger.error(f"Job {job_id} failed: {error}")
+
+
+# Global instance
+job_service = JobService()
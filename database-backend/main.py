@@ -1,16 +1,21 @@
 import os
 import time
-import io
-import csv
+import logging
 import math
+import json
+import itertools
+import base64
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Query, Response, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Query, Request, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 
@@ -19,7 +24,7 @@ from database import (
     get_databases, get_tables, get_table_columns, 
     test_connection, test_spss_connection, test_dssb_ocds_connection, 
     test_ed_ocds_connection, test_all_connections, execute_query,
-    get_connection_DSSB_OCDS, get_connection_SPSS
+    get_connection_DSSB_OCDS, get_connection_SPSS, iter_query_batches, fetch_rows
 )
 from query_builder import QueryBuilder
 from auth import authenticate_user, create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
@@ -29,12 +34,45 @@ from scheduler import (
     get_daily_scheduler_status, test_daily_distribution
 )
 from parquet_service import parquet_service
-from campaign_service import campaign_service
-from file_upload_service import file_upload_service
+from campaign_service import campaign_service, deploy_progress
+from audience_store import audience_store
+from file_upload_service import file_upload_service, UploadTooLargeError
+from job_service import job_service
+from query_cache import query_cache
+from query_history_store import query_history_store
+from query_plan import query_plan_service
+from query_control import query_control, QueryLimitExceeded
+from count_estimate import normalize_sample_percent, estimate_count, estimate_distinct
+from export_service import export_service, EXPORT_FETCH_SIZE
+from response_formats import FastJSONResponse, tabular_response
+from source_fanout import source_fanout
+from response_cache import response_cache
+from metrics import MetricsMiddleware, metrics_registry, PROMETHEUS_CONTENT_TYPE
+from rollup_service import (
+    rollup_service, base_campaign_id, SOURCES as ROLLUP_SOURCES,
+    SOURCE_CONTROL, SOURCE_TARGET, SOURCE_SPSS
+)
+
+STRATIFY_JOB_TYPE = "stratify_and_create"
+EXACT_COUNT_JOB_TYPE = "exact_count"
+# Rows of a loaded campaign audience returned to the client; the full audience stays in audience_store
+RB_AUTOMATIC_PREVIEW_ROWS = 1000
+# Alias of the ROWIDTOCHAR column used to build keyset pagination cursors for /data
+DATA_CURSOR_ROWID_COLUMN = "cursor_rowid"
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Optional ?format=columnar for data-heavy endpoints (Arrow IPC is negotiated via the Accept header)
+RESPONSE_FORMAT_QUERY = Query(None, pattern="^(rows|columnar)$", description="Формат ответа: rows (по умолчанию) или columnar")
+
+# Exact counts behind /query/count/estimate (run_exact) run on their own worker pool, so they
+# never hold up stratify-and-create jobs, and each user may have only a few queued or running
+EXACT_COUNT_JOB_WORKERS = int(os.getenv("EXACT_COUNT_JOB_WORKERS", "1"))
+EXACT_COUNT_MAX_JOBS_PER_USER = int(os.getenv("EXACT_COUNT_MAX_JOBS_PER_USER", "2"))
+
 # Initialize FastAPI app
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -46,11 +84,23 @@ async def lifespan(app: FastAPI):
         print("✅ Daily distribution scheduler started successfully")
     except Exception as e:
         print(f"⚠️ Warning: Failed to start daily scheduler: {e}")
+
+    try:
+        # Start background job workers and resume jobs persisted before restart
+        job_service.start()
+        print("✅ Background job service started successfully")
+    except Exception as e:
+        print(f"⚠️ Warning: Failed to start background job service: {e}")
+
+    # Reconcile monitoring rollups with Oracle; endpoints use live queries until the first build
+    rollup_service.refresh_in_background()
     
     yield
     
     # Shutdown
     print("🛑 Shutting down SoftCollection API server...")
+    job_service.shutdown()
+    source_fanout.shutdown()
     try:
         await stop_daily_scheduler()
         print("✅ Daily distribution scheduler stopped successfully")
@@ -62,7 +112,8 @@ app = FastAPI(
     title="DataQuery Pro API",
     description="Корпоративный API интерфейс для работы с Oracle базой данных",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -73,16 +124,78 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cache freshness headers of /monitoring/* and /stats are read by the UI
+    expose_headers=["Age", "X-Cache", "Server-Timing"],
 )
 
+# Per-request latency and Oracle/parquet instrumentation, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Security
 security = HTTPBearer()
 
 # Initialize query builder
 query_builder = QueryBuilder()
 
-# In-memory storage for demo purposes
-query_history = []
+# Tables written by stratification; their cached query results are dropped after inserts
+STRATIFICATION_TABLES = (
+    "DSSB_APP.SoftCollection_theories",
+    "DSSB_APP.SC_local_control",
+    "DSSB_APP.SC_local_target",
+)
+
+def execute_cached_query(sql: str, database_id: str, table: str, params: Optional[Dict] = None,
+                         bypass_cache: bool = False, call_timeout_ms: Optional[int] = None, on_connect=None):
+    """Execute a QueryBuilder query through the result cache; returns (result, cache_hit)"""
+    cache_key = query_cache.make_key(sql, params, database_id)
+    if not bypass_cache:
+        cached = query_cache.get(cache_key)
+        if cached is not None:
+            return cached, True
+
+    result = execute_query(sql, params, call_timeout_ms=call_timeout_ms, on_connect=on_connect)
+    if result["success"]:
+        query_cache.set(cache_key, result, table=table)
+    return result, False
+
+async def execute_controlled_query(http_request: Request, current_user: dict, request: QueryRequest,
+                                   sql: str, params: Optional[Dict] = None):
+    """
+    Run a QueryBuilder query off the event loop with a call timeout, registered under the
+    client's X-Request-ID so it can be cancelled (also when the client disconnects).
+    Returns (result, cache_hit, request_id).
+    """
+    request_id = query_control.new_request_id(http_request.headers.get("X-Request-ID"))
+    try:
+        (result, cache_hit), active_query = await query_control.run(
+            request_id, current_user["username"], sql,
+            lambda on_connect, call_timeout_ms: execute_cached_query(
+                sql, request.database_id, request.table, params, bypass_cache=request.bypass_cache,
+                call_timeout_ms=call_timeout_ms, on_connect=on_connect
+            ),
+            http_request=http_request, timeout_seconds=request.timeout_seconds
+        )
+    except QueryLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if not result["success"]:
+        message = query_control.failure_message(active_query, result)
+        if message:
+            result = {**result, "message": message}
+    return result, cache_hit, request_id
+
+def extract_count_value(result: Dict[str, Any]) -> int:
+    """Extract the COUNT(*) value from a count query result"""
+    if result.get("data"):
+        # Handle different possible column names for count
+        for key, value in result["data"][0].items():
+            if isinstance(value, (int, float)):
+                return int(value)
+    return 0
+
+# In-memory storage for demo purposes (query history is persisted by query_history_store)
 saved_queries = []
 app_settings = {
     "database": {
@@ -130,6 +243,11 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Request latency and Oracle/parquet counters in Prometheus text format"""
+    return Response(content=metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # Authentication endpoints
 @app.post("/auth/login", response_model=LoginResponse)
 async def login(request: LoginRequest):
@@ -274,105 +392,134 @@ async def test_all_db_connections(current_user: dict = Depends(get_current_user_
 
 # Protected Query endpoints
 @app.post("/query/execute", response_model=QueryResultResponse)
-async def execute_database_query(request: QueryRequest, current_user: dict = Depends(get_current_user_dependency)):
+async def execute_database_query(
+    request: QueryRequest,
+    http_request: Request,
+    format: Optional[str] = RESPONSE_FORMAT_QUERY,
+    current_user: dict = Depends(get_current_user_dependency)
+):
     """Выполнение запроса к базе данных"""
     try:
         start_time = time.time()
         
         # Build safe SQL query
         request_data = request.dict()
-        sql_query = query_builder.build_query(request_data)
+        sql_query, query_params = query_builder.build_query(request_data)
         
-        # Execute query
-        result = execute_query(sql_query)
+        # Optional optimizer preview: expensive plans are refused (QUERY_PLAN_MODE=refuse) or reported
+        plan_warnings = None
+        if request.check_plan:
+            try:
+                assessment = await run_in_threadpool(query_plan_service.check, sql_query)
+            except Exception as e:
+                logger.warning(f"EXPLAIN PLAN failed, executing without plan check: {e}")
+            else:
+                if assessment["blocked"]:
+                    raise HTTPException(
+                        status_code=422,
+                        detail="Запрос слишком дорогой, уточните фильтры: " + "; ".join(assessment["warnings"])
+                    )
+                plan_warnings = assessment["warnings"] or None
+        
+        # Execute query (served from the result cache when the same filter set was run recently)
+        result, cache_hit, request_id = await execute_controlled_query(
+            http_request, current_user, request, sql_query, query_params
+        )
         
-        execution_time = f"{(time.time() - start_time):.3f}s"
+        # A data result shorter than the limit is the complete result set, so its size
+        # is also the answer to the matching count query
+        if result["success"] and not cache_hit and request.limit and result["row_count"] < request.limit:
+            count_query, count_params = query_builder.build_count_query(request_data)
+            query_cache.set(
+                query_cache.make_key(count_query, count_params, request.database_id),
+                {"success": True, "columns": ["total_count"], "data": [{"total_count": result["row_count"]}],
+                 "row_count": 1, "message": "Count derived from complete data result"},
+                table=request.table
+            )
+        
+        execution_seconds = time.time() - start_time
+        execution_time = f"{execution_seconds:.3f}s"
+        
+        # Add to query history with user info
+        query_history_store.record(
+            sql=sql_query,
+            database_id=request.database_id,
+            table=request.table,
+            execution_seconds=execution_seconds,
+            status="success" if result["success"] else "error",
+            row_count=result["row_count"] if result["success"] else 0,
+            user=current_user["username"]
+        )
         
         if result["success"]:
-            # Add to query history with user info
-            # Get next ID (max existing ID + 1)
-            next_id = max([q.get("id", 0) for q in query_history], default=0) + 1
-            
-            query_history.append({
-                "id": next_id,
-                "sql": sql_query,
-                "database_id": request.database_id,
-                "table": request.table,
-                "execution_time": execution_time,
-                "status": "success",
-                "created_at": datetime.now(),
+            return tabular_response(http_request, {
+                "success": True,
+                "columns": result["columns"],
+                "data": result["data"],
                 "row_count": result["row_count"],
-                "user": current_user["username"]
-            })
-            
-            return QueryResultResponse(
-                success=True,
-                columns=result["columns"],
-                data=result["data"],
-                row_count=result["row_count"],
-                message=result["message"],
-                execution_time=execution_time
-            )
-        else:
-            # Add failed query to history
-            # Get next ID (max existing ID + 1)
-            next_id = max([q.get("id", 0) for q in query_history], default=0) + 1
-            
-            query_history.append({
-                "id": next_id,
-                "sql": sql_query,
-                "database_id": request.database_id,
-                "table": request.table,
+                "message": result["message"],
                 "execution_time": execution_time,
-                "status": "error",
-                "created_at": datetime.now(),
-                "row_count": 0,
-                "user": current_user["username"]
-            })
-            
+                "cached": cache_hit,
+                "plan_warnings": plan_warnings,
+                "request_id": request_id
+            }, columns=result["columns"], response_format=format)
+        else:
             return QueryResultResponse(
                 success=False,
                 message=result["message"],
                 error=result["error"],
-                execution_time=execution_time
+                execution_time=execution_time,
+                request_id=request_id
             )
             
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка выполнения запроса: {str(e)}")
 
+@app.post("/query/explain", response_model=QueryPlanResponse)
+async def explain_database_query(request: QueryRequest, current_user: dict = Depends(get_current_user_dependency)):
+    """План выполнения запроса: оценка стоимости, строк и полных сканирований"""
+    try:
+        sql_query, _query_params = query_builder.build_query(request.dict())
+        assessment = await run_in_threadpool(query_plan_service.check, sql_query)
+        return QueryPlanResponse(success=True, sql=sql_query, **assessment)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка получения плана запроса: {str(e)}")
+
 @app.post("/query/count")
-async def get_query_count(request: QueryRequest, current_user: dict = Depends(get_current_user_dependency)):
+async def get_query_count(
+    request: QueryRequest,
+    http_request: Request,
+    current_user: dict = Depends(get_current_user_dependency)
+):
     """Получить количество строк для запроса с фильтрами"""
     try:
         start_time = time.time()
         
         # Build count SQL query
         request_data = request.dict()
-        count_query = query_builder.build_count_query(request_data)
+        count_query, count_params = query_builder.build_count_query(request_data)
         
         # Execute count query
-        result = execute_query(count_query)
+        result, cache_hit, request_id = await execute_controlled_query(
+            http_request, current_user, request, count_query, count_params
+        )
         
         execution_time = f"{(time.time() - start_time):.3f}s"
         
         if result["success"] and result["data"]:
-            # Extract count from result
-            count = 0
-            if result["data"]:
-                # Handle different possible column names for count
-                first_row = result["data"][0]
-                for key, value in first_row.items():
-                    if isinstance(value, (int, float)):
-                        count = int(value)
-                        break
-            
             return {
                 "success": True,
-                "count": count,
+                "count": extract_count_value(result),
                 "execution_time": execution_time,
-                "query": count_query
+                "query": count_query,
+                "cached": cache_hit,
+                "request_id": request_id
             }
         else:
             return {
@@ -380,14 +527,155 @@ async def get_query_count(request: QueryRequest, current_user: dict = Depends(ge
                 "count": 0,
                 "message": result.get("message", "Ошибка выполнения запроса подсчета"),
                 "error": result.get("error", ""),
-                "execution_time": execution_time
+                "execution_time": execution_time,
+                "request_id": request_id
             }
             
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения количества строк: {str(e)}")
 
+@app.post("/query/count/estimate", response_model=CountEstimateResponse)
+async def estimate_query_count(
+    request: CountEstimateRequest,
+    http_request: Request,
+    current_user: dict = Depends(get_current_user_dependency)
+):
+    """Быстрая оценка количества строк и уникальных значений с доверительными границами"""
+    try:
+        start_time = time.time()
+        request_data = request.dict()
+        sample_percent = normalize_sample_percent(request.sample_percent)
+        request_id = None
+        
+        def failure(result: Dict[str, Any]) -> CountEstimateResponse:
+            return CountEstimateResponse(
+                success=False,
+                message=result.get("message", "Ошибка оценки количества строк"),
+                error=result.get("error", ""),
+                execution_time=f"{(time.time() - start_time):.3f}s",
+                request_id=request_id
+            )
+        
+        # An exact count from the result cache beats any estimate
+        count_query, count_params = query_builder.build_count_query(request_data)
+        cached = None
+        if not request.bypass_cache:
+            cached = query_cache.get(query_cache.make_key(count_query, count_params, request.database_id))
+        
+        if cached is not None:
+            count = estimate_count(extract_count_value(cached), 100)
+        else:
+            sample_query, sample_params = query_builder.build_sample_count_query(request_data, sample_percent)
+            result, _, request_id = await execute_controlled_query(
+                http_request, current_user, request, sample_query, sample_params
+            )
+            if not result["success"]:
+                return failure(result)
+            count = estimate_count(extract_count_value(result), sample_percent)
+        
+        distinct = None
+        if request.distinct_column:
+            distinct_query, distinct_params = query_builder.build_distinct_count_query(
+                request_data, request.distinct_column
+            )
+            result, _, request_id = await execute_controlled_query(
+                http_request, current_user, request, distinct_query, distinct_params
+            )
+            if not result["success"]:
+                return failure(result)
+            distinct = estimate_distinct(extract_count_value(result))
+        
+        # On request the exact count keeps running in the background and fills the result cache for
+        # /query/count. Repeated estimates of the same query share one job instead of queueing another
+        # full scan, and a user over EXACT_COUNT_MAX_JOBS_PER_USER gets the estimate only.
+        exact_job_id = None
+        if (request.run_exact and (cached is None or request.distinct_column)
+                and job_service.count_active_jobs(EXACT_COUNT_JOB_TYPE, current_user["username"])
+                < EXACT_COUNT_MAX_JOBS_PER_USER):
+            dedupe_key = (f"{query_cache.make_key(count_query, count_params, request.database_id)}"
+                          f":{request.distinct_column or ''}")
+            exact_job = job_service.get_job(job_service.submit(
+                EXACT_COUNT_JOB_TYPE,
+                {"request": request_data, "distinct_column": request.distinct_column},
+                created_by=current_user["username"],
+                dedupe_key=dedupe_key
+            ))
+            # Another user's job fills the same cache entry but is not theirs to poll
+            if exact_job and exact_job["created_by"] == current_user["username"]:
+                exact_job_id = exact_job["job_id"]
+        
+        return CountEstimateResponse(
+            success=True,
+            exact=cached is not None and not request.distinct_column,
+            count=count,
+            distinct=distinct,
+            message="Оценка получена по выборке" if cached is None else "Точное количество из кэша",
+            execution_time=f"{(time.time() - start_time):.3f}s",
+            request_id=request_id,
+            exact_job_id=exact_job_id,
+            exact_status_url=f"/jobs/{exact_job_id}" if exact_job_id else None
+        )
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка оценки количества строк: {str(e)}")
+
+def _exact_count_job_handler(payload: Dict[str, Any], progress) -> Dict[str, Any]:
+    """Background job entry point for the exact counts behind /query/count/estimate"""
+    request_data = payload["request"]
+    database_id, table = request_data["database_id"], request_data["table"]
+    
+    # Same Oracle call timeout as the interactive QueryBuilder queries
+    call_timeout_ms = query_control.call_timeout_seconds * 1000
+    
+    progress.update(stage="count")
+    count_query, count_params = query_builder.build_count_query(request_data)
+    result, _ = execute_cached_query(count_query, database_id, table, count_params, call_timeout_ms=call_timeout_ms)
+    if not result["success"]:
+        raise RuntimeError(result.get("error") or result["message"])
+    exact = {"count": extract_count_value(result)}
+    
+    if payload.get("distinct_column"):
+        progress.update(stage="distinct_count")
+        distinct_query, distinct_params = query_builder.build_distinct_count_query(
+            request_data, payload["distinct_column"], approximate=False
+        )
+        result, _ = execute_cached_query(distinct_query, database_id, table, distinct_params,
+                                         call_timeout_ms=call_timeout_ms)
+        if not result["success"]:
+            raise RuntimeError(result.get("error") or result["message"])
+        exact["distinct_count"] = extract_count_value(result)
+    
+    return exact
+
+# Counting has no side effects, so interrupted jobs are simply re-run
+job_service.register_handler(
+    EXACT_COUNT_JOB_TYPE, _exact_count_job_handler,
+    restartable_stages=("queued", "started", "count", "distinct_count"),
+    max_workers=EXACT_COUNT_JOB_WORKERS
+)
+
+@app.post("/query/cancel/{request_id}")
+async def cancel_query(request_id: str, current_user: dict = Depends(get_current_user_dependency)):
+    """Отменить выполняющийся запрос (свой; администратор может отменить любой)"""
+    owner = None if 'admin' in current_user.get('permissions', []) else current_user["username"]
+    if not query_control.cancel(request_id, username=owner):
+        raise HTTPException(status_code=404, detail="Выполняющийся запрос не найден")
+    return {"success": True, "request_id": request_id, "message": "Запрос отменен"}
+
+@app.get("/query/active")
+async def get_active_queries(current_user: dict = Depends(get_current_user_dependency)):
+    """Выполняющиеся запросы пользователя (администратор видит все)"""
+    owner = None if 'admin' in current_user.get('permissions', []) else current_user["username"]
+    return {"success": True, "queries": query_control.list_active(owner)}
+
 # Theory Management endpoints
 @app.post("/theories/create", response_model=TheoryCreateResponse)
 async def create_theory_endpoint(request: CreateTheoryRequest, current_user: dict = Depends(get_current_user_dependency)):
@@ -411,6 +699,9 @@ async def create_theory_endpoint(request: CreateTheoryRequest, current_user: dic
             current_user["username"]
         )
         
+        if result.get("success"):
+            query_cache.invalidate_table("DSSB_APP.SoftCollection_theories")
+        
         return TheoryCreateResponse(**result)
         
     except Exception as e:
@@ -504,26 +795,31 @@ async def detect_iins_in_results(data: Dict[str, Any], current_user: dict = Depe
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Ошибка анализа результатов: {str(e)}")
 
-@app.post("/theories/stratify-and-create")
-async def stratify_and_create_theories(data: Dict[str, Any], current_user: dict = Depends(get_current_user_dependency)):
-    """Стратификация данных и создание нескольких теорий"""
+def _report_progress(progress, **fields):
+    """Forward progress to a background job handle, if the call runs as a job"""
+    if progress is not None:
+        progress.update(**fields)
+
+def run_stratify_and_create(data: Dict[str, Any], username: str, progress=None) -> Dict[str, Any]:
+    """Стратификация данных и создание нескольких теорий (используется синхронным эндпоинтом и фоновыми задачами)"""
     try:
         query_data = data.get("queryData")
         stratification_config = data.get("stratificationConfig")
-        
+
         if not query_data or not stratification_config:
             raise HTTPException(status_code=400, detail="Отсутствуют данные запроса или конфигурация стратификации")
 
         # First execute the query to get the data
         start_time = time.time()
-        
+        _report_progress(progress, stage="query")
+
         try:
-            sql_query = query_builder.build_query(query_data)
+            sql_query, query_params = query_builder.build_query(query_data)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Ошибка построения SQL запроса: {str(e)}")
         
         try:
-            result = execute_query(sql_query)
+            result = execute_query(sql_query, query_params)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Ошибка выполнения запроса: {str(e)}")
         
@@ -585,6 +881,7 @@ async def stratify_and_create_theories(data: Dict[str, Any], current_user: dict
                     break
 
         # Call local stratification function
+        _report_progress(progress, stage="stratification", rows_total=len(result["data"]))
         try:
             from stratification import stratify_data
             stratification_result = stratify_data(stratification_request)
@@ -607,9 +904,17 @@ async def stratify_and_create_theories(data: Dict[str, Any], current_user: dict
         except ImportError as e:
             raise HTTPException(status_code=500, detail=f"Ошибка импорта функций создания теории: {str(e)}")
         
+        # From here on rows are written to Oracle, so the job is no longer safe to restart
+        stratified_groups = stratification_result.get("stratified_groups", [])
+        rows_processed = 0
+        _report_progress(
+            progress, stage="theory_creation", rows_processed=0,
+            rows_total=sum(group.get("num_rows", 0) for group in stratified_groups)
+        )
+
         # Get base campaign ID for this stratification (SC00000001, SC00000002, etc.)
         base_campaign_id = get_next_sc_campaign_id()
-        
+
         created_theories = []
         control_group_inserted = False
         
@@ -620,8 +925,10 @@ async def stratify_and_create_theories(data: Dict[str, Any], current_user: dict
             group_data = group_fields.get(str(group_index + 1), {})  # Frontend uses 1-based indexing
             return group_data.get(field_name, None) or None
         
-        for i, group in enumerate(stratification_result.get("stratified_groups", [])):
+        for i, group in enumerate(stratified_groups):
             group_letter = chr(65 + i)  # A, B, C, D, E
+            _report_progress(progress, rows_processed=rows_processed)
+            rows_processed += group.get("num_rows", 0)
             
             # Extract IIN values from the group data
             iin_column = stratification_config.get("iinColumn")
@@ -637,7 +944,7 @@ async def stratify_and_create_theories(data: Dict[str, Any], current_user: dict
             theory_description = f"{stratification_config.get('theoryDescription', 'Кампания создана через стратификацию данных')} (Группа {group_letter} - {group.get('num_rows', 0)} записей, пропорция: {group.get('proportion', 0):.3f})"
             theory_start_date = stratification_config.get("theoryStartDate")
             theory_end_date = stratification_config.get("theoryEndDate")
-            created_by = current_user["username"]
+            created_by = username
             
             # Create sub-ID for this group (e.g., SC00000001.1, SC00000001.2, SC00000001.3)
             sub_theory_id = f"{base_campaign_id}.{i + 1}"
@@ -706,7 +1013,14 @@ async def stratify_and_create_theories(data: Dict[str, Any], current_user: dict
                 print(f"Error creating theory for group {group_letter}: {e}")
                 # Continue with other groups even if one fails
                 continue
-        
+
+        _report_progress(progress, stage="notification", rows_processed=rows_processed)
+
+        # New theories and SC_local rows make cached results for these tables stale
+        for table_name in STRATIFICATION_TABLES:
+            query_cache.invalidate_table(table_name)
+        response_cache.invalidate("monitoring/")
+
         if not created_theories:
             raise HTTPException(status_code=500, detail="Не удалось создать ни одной теории")
         
@@ -726,7 +1040,7 @@ async def stratify_and_create_theories(data: Dict[str, Any], current_user: dict
         # Send success email notification
         try:
             from email_sender import send_campaign_success_notification
-            email_sent = send_campaign_success_notification(response_data, current_user["username"])
+            email_sent = send_campaign_success_notification(response_data, username)
             if email_sent:
                 print(f"Success notification email sent for campaign {base_campaign_id}")
             else:
@@ -746,7 +1060,7 @@ async def stratify_and_create_theories(data: Dict[str, Any], current_user: dict
                 "operation": "Campaign Stratification",
                 "status_code": he.status_code
             }
-            send_campaign_error_notification(error_details, current_user["username"])
+            send_campaign_error_notification(error_details, username)
         except Exception as email_error:
             print(f"Error sending failure notification email: {str(email_error)}")
         
@@ -760,28 +1074,101 @@ async def stratify_and_create_theories(data: Dict[str, Any], current_user: dict
                 "error": f"Неожиданная ошибка стратификации: {str(e)}",
                 "operation": "Campaign Stratification"
             }
-            send_campaign_error_notification(error_details, current_user["username"])
+            send_campaign_error_notification(error_details, username)
         except Exception as email_error:
             print(f"Error sending failure notification email: {str(email_error)}")
         
         raise HTTPException(status_code=500, detail=f"Неожиданная ошибка стратификации: {str(e)}")
 
+def _stratify_job_handler(payload: Dict[str, Any], progress) -> Dict[str, Any]:
+    """Background job entry point for stratification"""
+    result = run_stratify_and_create(payload["data"], payload["username"], progress)
+    return jsonable_encoder(result)
+
+# Jobs interrupted before any rows were written can safely be re-run after a restart
+job_service.register_handler(
+    STRATIFY_JOB_TYPE, _stratify_job_handler,
+    restartable_stages=("queued", "started", "query", "stratification")
+)
+
+@app.post("/theories/stratify-and-create")
+async def stratify_and_create_theories(data: Dict[str, Any], current_user: dict = Depends(get_current_user_dependency)):
+    """Стратификация данных и создание нескольких теорий (синхронно)"""
+    return run_stratify_and_create(data, current_user["username"])
+
+@app.post("/theories/stratify-and-create/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_stratify_and_create_job(data: Dict[str, Any], current_user: dict = Depends(get_current_user_dependency)):
+    """Поставить стратификацию и создание теорий в очередь фоновых задач"""
+    query_data = data.get("queryData")
+    stratification_config = data.get("stratificationConfig")
+
+    if not query_data or not stratification_config:
+        raise HTTPException(status_code=400, detail="Отсутствуют данные запроса или конфигурация стратификации")
+
+    num_groups = stratification_config.get("numGroups", 2)
+    if num_groups < 3 or num_groups > 5:
+        raise HTTPException(status_code=400, detail="Количество групп для стратификации должно быть от 3 до 5")
+
+    try:
+        job_id = job_service.submit(
+            STRATIFY_JOB_TYPE,
+            {"data": data, "username": current_user["username"]},
+            created_by=current_user["username"]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка постановки задачи в очередь: {str(e)}")
+
+    return JobSubmitResponse(
+        job_id=job_id,
+        status="queued",
+        status_url=f"/jobs/{job_id}",
+        result_url=f"/jobs/{job_id}/result"
+    )
+
+def _get_job_for_user(job_id: str, current_user: dict, include_result: bool = False) -> Dict[str, Any]:
+    """Load a job and check that the current user may see it"""
+    job = job_service.get_job(job_id, include_result=include_result)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    if job["created_by"] != current_user["username"] and 'admin' not in current_user.get('permissions', []):
+        raise HTTPException(status_code=403, detail="Нет доступа к задаче")
+    return job
+
+@app.get("/jobs", response_model=List[JobStatusResponse])
+async def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user_dependency)
+):
+    """Список фоновых задач текущего пользователя"""
+    return job_service.list_jobs(created_by=current_user["username"], limit=limit)
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str, current_user: dict = Depends(get_current_user_dependency)):
+    """Статус и прогресс фоновой задачи"""
+    return _get_job_for_user(job_id, current_user)
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, current_user: dict = Depends(get_current_user_dependency)):
+    """Результат завершённой фоновой задачи"""
+    job = _get_job_for_user(job_id, current_user, include_result=True)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"] or "Задача завершилась с ошибкой")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Задача ещё выполняется (статус: {job['status']})")
+    return job["result"]
+
 # Remaining endpoints with authentication protection...
 @app.get("/query/history", response_model=List[QueryHistoryResponse])
 async def get_query_history(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
+    user: Optional[str] = Query(None, description="Фильтр по пользователю"),
+    table: Optional[str] = Query(None, description="Фильтр по таблице"),
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """Получить историю запросов"""
-    start_idx = (page - 1) * limit
-    end_idx = start_idx + limit
-    
-    # Sort by most recent first
-    sorted_history = sorted(query_history, key=lambda x: x["created_at"], reverse=True)
-    paginated_history = sorted_history[start_idx:end_idx]
-    
-    return paginated_history
+    # Most recent first
+    return query_history_store.list(page=page, limit=limit, user=user, table=table)
 
 @app.post("/query/save", response_model=SavedQueryResponse)
 async def save_query(request: SaveQueryRequest, current_user: dict = Depends(get_current_user_dependency)):
@@ -814,8 +1201,120 @@ async def delete_saved_query(query_id: int, current_user: dict = Depends(get_cur
     return {"message": "Запрос удален"}
 
 # Protected Data endpoints
+def encode_data_cursor(sort_by: Optional[str], sort_order: str, last_row: Dict[str, Any]) -> str:
+    """Build an opaque keyset cursor from the last row of a page (sort value + ROWID)"""
+    payload = {
+        "s": sort_by.lower() if sort_by else None,
+        "o": sort_order,
+        "v": last_row.get(sort_by.lower()) if sort_by else None,
+        "r": last_row[DATA_CURSOR_ROWID_COLUMN],
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, default=str).encode("utf-8")).decode("ascii")
+
+def decode_data_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a keyset cursor produced by encode_data_cursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        if not isinstance(payload, dict) or not payload.get("r"):
+            raise ValueError("missing ROWID")
+        return payload
+    except Exception:
+        raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+
+def build_keyset_condition(sort_column: Optional[str], sort_direction: str, cursor_data: Dict[str, Any],
+                           sort_value: Any, query_params: Dict[str, Any]) -> str:
+    """
+    Seek predicate for rows after the cursor. Ordering is (sort column, ROWID) with Oracle's
+    default NULL placement: NULLS LAST for ASC, NULLS FIRST for DESC.
+    """
+    query_params["after_rowid"] = cursor_data["r"]
+    rowid_cmp = ">" if sort_direction == "ASC" else "<"
+    rowid_after = f"t.ROWID {rowid_cmp} CHARTOROWID(:after_rowid)"
+
+    if not sort_column:
+        return rowid_after
+
+    if sort_value is None:
+        if sort_direction == "ASC":
+            # Cursor is inside the trailing NULL block
+            return f"({sort_column} IS NULL AND {rowid_after})"
+        # Leading NULL block: the rest of the NULLs, then every non-NULL value
+        return f"(({sort_column} IS NULL AND {rowid_after}) OR {sort_column} IS NOT NULL)"
+
+    query_params["after_value"] = sort_value
+    value_cmp = ">" if sort_direction == "ASC" else "<"
+    condition = (f"({sort_column} {value_cmp} :after_value"
+                 f" OR ({sort_column} = :after_value AND {rowid_after})")
+    if sort_direction == "ASC":
+        condition += f" OR {sort_column} IS NULL"
+    return condition + ")"
+
+def get_approximate_row_count(table_name: str) -> Optional[int]:
+    """Row count from optimizer statistics (ALL_TABLES.NUM_ROWS); None if stats are missing"""
+    if "." in table_name:
+        owner, name = table_name.upper().split(".", 1)
+    else:
+        owner, name = None, table_name.upper()
+
+    stats_query = "SELECT NUM_ROWS FROM ALL_TABLES WHERE TABLE_NAME = :table_name"
+    stats_params = {"table_name": name}
+    if owner:
+        stats_query += " AND OWNER = :owner"
+        stats_params["owner"] = owner
+
+    result, _ = execute_cached_query(stats_query, "DSSB_APP", table_name, stats_params)
+    if result["success"] and result["data"] and result["data"][0].get("num_rows") is not None:
+        return int(result["data"][0]["num_rows"])
+    return None
+
+def build_data_filters(database_id: str, table: str, search: Optional[str], sort_by: Optional[str],
+                       sort_order: str):
+    """
+    Validate table/sort column against the metadata index and build the search filter used by
+    /data and /data/export. Returns (table_name, where_conditions, query_params,
+    sort_column, sort_column_info, sort_direction).
+    """
+    from database import get_table_metadata, get_column_metadata
+    
+    table_info = get_table_metadata(database_id, table)
+    if not table_info:
+        raise HTTPException(status_code=403, detail=f"Доступ к таблице запрещен: {table}")
+    table_name = query_builder.sanitize_identifier(table_info["name"])
+    
+    # Build WHERE clause for search
+    where_conditions = []
+    query_params = {}
+    
+    if search:
+        # Get actual table columns for search
+        text_columns = [col['name'] for col in table_info["columns"]
+                      if col['type'].upper() in ['VARCHAR2', 'CHAR', 'CLOB']]
+        
+        # Create search conditions for text columns (limit to first 3 to avoid overly complex queries)
+        search_conditions = []
+        for i, col in enumerate(text_columns[:3]):
+            param_name = f"search_param_{i}"
+            search_conditions.append(f"UPPER({col}) LIKE UPPER(:{param_name})")
+            query_params[param_name] = f"%{search}%"
+        
+        if search_conditions:
+            where_conditions.append(f"({' OR '.join(search_conditions)})")
+    
+    # Validate sort column against table metadata
+    sort_column = None
+    sort_column_info = None
+    sort_direction = "DESC" if sort_order.upper() == "DESC" else "ASC"
+    if sort_by:
+        sort_column_info = get_column_metadata(database_id, table, sort_by)
+        if not sort_column_info:
+            raise HTTPException(status_code=400, detail=f"Неизвестная колонка сортировки: {sort_by}")
+        sort_column = query_builder.sanitize_identifier(sort_column_info["name"])
+    
+    return table_name, where_conditions, query_params, sort_column, sort_column_info, sort_direction
+
 @app.get("/data", response_model=DataResponse)
 async def get_data(
+    http_request: Request,
     database_id: str = Query(..., description="Database ID"),
     table: str = Query(..., description="Table name"),
     page: int = Query(1, ge=1),
@@ -823,143 +1322,182 @@ async def get_data(
     search: Optional[str] = Query(None),
     sort_by: Optional[str] = Query(None),
     sort_order: str = Query("asc"),
+    pagination: str = Query("offset", pattern="^(offset|keyset)$", description="offset: по номеру страницы, keyset: по курсору"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (для pagination=keyset)"),
+    count_mode: str = Query("approximate", pattern="^(approximate|exact|none)$", description="Режим подсчета строк"),
+    format: Optional[str] = RESPONSE_FORMAT_QUERY,
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """Получить данные с фильтрами и пагинацией - оптимизированная версия для больших датасетов"""
     try:
-        from database import get_table_columns
-        
-        # Build WHERE clause for search
-        where_conditions = []
-        query_params = {}
-        
-        if search:
-            # Get actual table columns for search
-            table_columns = get_table_columns(database_id.upper(), table)
-            text_columns = [col['name'] for col in table_columns 
-                          if col['type'].upper() in ['VARCHAR2', 'CHAR', 'CLOB']]
-            
-            # Create search conditions for text columns (limit to first 3 to avoid overly complex queries)
-            search_conditions = []
-            for i, col in enumerate(text_columns[:3]):
-                param_name = f"search_param_{i}"
-                search_conditions.append(f"UPPER({col}) LIKE UPPER(:{param_name})")
-                query_params[param_name] = f"%{search}%"
-            
-            if search_conditions:
-                where_conditions.append(f"({' OR '.join(search_conditions)})")
-        
-        # Build WHERE clause
-        where_clause = ""
-        if where_conditions:
-            where_clause = f"WHERE {' AND '.join(where_conditions)}"
-        
-        # Build ORDER BY clause
-        order_clause = ""
-        if sort_by:
-            sort_direction = "DESC" if sort_order.upper() == "DESC" else "ASC"
-            order_clause = f"ORDER BY {sort_by} {sort_direction}"
-        
-        # Step 1: Get total count efficiently
-        count_query = f"SELECT COUNT(*) as total_count FROM {table.upper()} {where_clause}"
-        count_result = execute_query(count_query, query_params)
-        
-        total_count = 0
-        if count_result["success"] and count_result["data"]:
-            total_count = count_result["data"][0].get("total_count", 0)
-        
-        # Step 2: Get paginated data using Oracle ROWNUM pagination
-        offset = (page - 1) * limit
-        
-        # Oracle pagination query using ROWNUM
-        paginated_query = f"""
-        SELECT * FROM (
-            SELECT a.*, ROWNUM rnum FROM (
-                SELECT * FROM {table.upper()} 
+        (table_name, where_conditions, query_params,
+         sort_column, sort_column_info, sort_direction) = build_data_filters(database_id, table, search, sort_by, sort_order)
+        
+        # Step 1: Total count - filters are only in search, so count is cached per search term
+        filter_params = dict(query_params)
+        filter_where_clause = f"WHERE {' AND '.join(where_conditions)}" if where_conditions else ""
+        total_count = None
+        count_is_approximate = False
+        
+        if count_mode == "approximate" and not where_conditions:
+            total_count = get_approximate_row_count(table_name)
+            count_is_approximate = total_count is not None
+        
+        if count_mode == "exact" or (count_mode == "approximate" and total_count is None):
+            count_query = f"SELECT COUNT(*) as total_count FROM {table_name} {filter_where_clause}"
+            count_result, _ = execute_cached_query(count_query, database_id, table_name, filter_params)
+            if count_result["success"] and count_result["data"]:
+                total_count = count_result["data"][0].get("total_count", 0)
+        
+        # Step 2: Page of data
+        next_cursor = None
+        has_more = False
+        
+        if pagination == "keyset":
+            # Seek past the last row of the previous page: page N costs the same as page 1
+            if cursor:
+                cursor_data = decode_data_cursor(cursor)
+                if cursor_data.get("s") != (sort_by.lower() if sort_by else None) or cursor_data.get("o") != sort_direction:
+                    raise HTTPException(status_code=400, detail="Курсор не соответствует текущей сортировке")
+                sort_value = cursor_data.get("v")
+                if sort_column_info and sort_value is not None:
+                    sort_value = query_builder.coerce_value(sort_value, sort_column_info["type"], sort_column)
+                where_conditions.append(
+                    build_keyset_condition(sort_column, sort_direction, cursor_data, sort_value, query_params)
+                )
+            
+            where_clause = f"WHERE {' AND '.join(where_conditions)}" if where_conditions else ""
+            order_items = [f"{sort_column} {sort_direction}"] if sort_column else []
+            order_items.append(f"t.ROWID {sort_direction}")
+            query_params["fetch_limit"] = limit + 1
+            
+            keyset_query = f"""
+            SELECT * FROM (
+                SELECT t.*, ROWIDTOCHAR(t.ROWID) AS {DATA_CURSOR_ROWID_COLUMN}
+                FROM {table_name} t
                 {where_clause}
-                {order_clause}
-            ) a 
-            WHERE ROWNUM <= {offset + limit}
-        ) 
-        WHERE rnum > {offset}
-        """
-        
-        data_result = execute_query(paginated_query, query_params)
+                ORDER BY {', '.join(order_items)}
+            )
+            WHERE ROWNUM <= :fetch_limit
+            """
+            data_result = execute_query(keyset_query, query_params)
+            
+            if data_result["success"]:
+                rows = data_result["data"]
+                has_more = len(rows) > limit
+                rows = rows[:limit]
+                if has_more:
+                    next_cursor = encode_data_cursor(sort_by, sort_direction, rows[-1])
+                cleaned_data = [
+                    {k: v for k, v in row.items() if k != DATA_CURSOR_ROWID_COLUMN} for row in rows
+                ]
+        else:
+            # Oracle pagination query using ROWNUM
+            offset = (page - 1) * limit
+            where_clause = filter_where_clause
+            order_clause = f"ORDER BY {sort_column} {sort_direction}" if sort_column else ""
+            query_params["offset_end"] = offset + limit
+            query_params["offset_start"] = offset
+            
+            paginated_query = f"""
+            SELECT * FROM (
+                SELECT a.*, ROWNUM rnum FROM (
+                    SELECT * FROM {table_name} 
+                    {where_clause}
+                    {order_clause}
+                ) a 
+                WHERE ROWNUM <= :offset_end
+            ) 
+            WHERE rnum > :offset_start
+            """
+            
+            data_result = execute_query(paginated_query, query_params)
+            
+            if data_result["success"]:
+                # Remove the 'rnum' column from results
+                cleaned_data = []
+                for row in data_result["data"]:
+                    cleaned_row = {k: v for k, v in row.items() if k.lower() != 'rnum'}
+                    cleaned_data.append(cleaned_row)
+                has_more = total_count is not None and offset + len(cleaned_data) < total_count
         
         if data_result["success"]:
-            # Remove the 'rnum' column from results
-            cleaned_data = []
-            for row in data_result["data"]:
-                cleaned_row = {k: v for k, v in row.items() if k.lower() != 'rnum'}
-                cleaned_data.append(cleaned_row)
-            
-            total_pages = math.ceil(total_count / limit) if total_count > 0 else 1
-            
-            return DataResponse(
-                data=cleaned_data,
-                total_count=total_count,
-                page=page,
-                limit=limit,
-                total_pages=total_pages
-            )
+            total_pages = math.ceil(total_count / limit) if total_count else 1
+            
+            return tabular_response(http_request, {
+                "data": cleaned_data,
+                "total_count": total_count,
+                "page": page,
+                "limit": limit,
+                "total_pages": total_pages,
+                "count_is_approximate": count_is_approximate,
+                "next_cursor": next_cursor,
+                "has_more": has_more
+            }, response_format=format)
         else:
             raise HTTPException(status_code=500, detail=data_result["message"])
             
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения данных: {str(e)}")
 
+def close_export_stream(*generators):
+    """Close export generators so an aborted download releases its cursor and connection"""
+    for generator in generators:
+        try:
+            generator.close()
+        except ValueError:
+            # Still inside a fetch on a worker thread; it is closed once that fetch returns
+            # and the generator is released
+            logger.warning("Export stream closed while a fetch was in progress")
+
 @app.get("/data/export")
 async def export_data(
     database_id: str = Query(..., description="Database ID"),
     table: str = Query(..., description="Table name"),
-    format: str = Query("csv", description="Export format"),
+    format: str = Query("csv", description="Export format: csv, parquet, xlsx"),
+    search: Optional[str] = Query(None),
+    sort_by: Optional[str] = Query(None),
+    sort_order: str = Query("asc"),
+    gzip: bool = Query(False, description="Сжать файл gzip"),
     current_user: dict = Depends(get_current_user_dependency)
 ):
-    """Экспорт данных"""
+    """Экспорт данных (потоковая выгрузка без ограничения на число строк)"""
+    export_format = format.lower()
+    if not export_service.is_supported_format(export_format):
+        raise HTTPException(status_code=400, detail="Неподдерживаемый формат экспорта")
+    
     try:
-        request_data = {
-            "database_id": database_id.upper(),
-            "table": table,
-            "limit": 10000  # Max export limit
-        }
-        
-        sql_query = query_builder.build_query(request_data)
-        result = execute_query(sql_query)
-        
-        if not result["success"]:
-            raise HTTPException(status_code=500, detail=result["message"])
+        (table_name, where_conditions, query_params,
+         sort_column, _sort_column_info, sort_direction) = build_data_filters(database_id, table, search, sort_by, sort_order)
         
-        if format.lower() == "csv":
-            # Generate CSV
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Write headers
-            if result["columns"]:
-                writer.writerow(result["columns"])
-            
-            # Write data
-            for row in result["data"]:
-                if result["columns"]:
-                    row_values = [row.get(col, "") for col in result["columns"]]
-                    writer.writerow(row_values)
-            
-            # Prepare response
-            csv_content = output.getvalue()
-            output.close()
-            
-            response = Response(
-                content=csv_content,
-                media_type="text/csv",
-                headers={"Content-Disposition": f"attachment; filename={table}_export.csv"}
-            )
-            return response
+        where_clause = f"WHERE {' AND '.join(where_conditions)}" if where_conditions else ""
+        order_clause = f"ORDER BY {sort_column} {sort_direction}" if sort_column else ""
+        sql_query = f"SELECT * FROM {table_name} {where_clause} {order_clause}"
         
-        else:
-            raise HTTPException(status_code=400, detail="Неподдерживаемый формат экспорта")
-            
+        # Fetch the first batch before responding so query errors still produce a proper HTTP error
+        batches = iter_query_batches(sql_query, query_params, batch_size=EXPORT_FETCH_SIZE)
+        first_batch = await run_in_threadpool(next, batches)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка экспорта: {str(e)}")
+    
+    filename = f"{table}_export.{export_format}" + (".gz" if gzip else "")
+    content = export_service.stream(
+        itertools.chain([first_batch], batches), export_format, use_gzip=gzip,
+        label=f"{table_name} by {current_user['username']}"
+    )
+    # The background task also runs when the client disconnects mid-stream, releasing the connection
+    return StreamingResponse(
+        content,
+        media_type="application/gzip" if gzip else export_service.media_types[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+        background=BackgroundTask(close_export_stream, content, batches)
+    )
 
 @app.get("/data/stats/{table_name}")
 async def get_data_stats(table_name: str, database_id: str = Query("DSSB_APP"), current_user: dict = Depends(get_current_user_dependency)):
@@ -1004,35 +1542,15 @@ async def update_settings(settings: SettingsResponse, current_user: dict = Depen
 
 # Dashboard stats endpoint
 @app.get("/stats", response_model=StatsResponse)
-async def get_dashboard_stats(current_user: dict = Depends(get_current_user_dependency)):
+async def get_dashboard_stats(response: Response, current_user: dict = Depends(get_current_user_dependency)):
     """Получить статистику для панели управления"""
-    # Calculate real statistics
-    total_queries = len(query_history)
-    
-    # Get unique users count from query history
-    unique_users = set()
-    total_execution_time = 0
-    successful_queries = 0
-    
-    for query in query_history:
-        if query.get("user"):
-            unique_users.add(query["user"])
-        
-        # Calculate average response time from successful queries
-        if query.get("status") == "success" and query.get("execution_time"):
-            try:
-                exec_time = float(query["execution_time"].replace("s", ""))
-                total_execution_time += exec_time
-                successful_queries += 1
-            except (ValueError, AttributeError):
-                pass
-    
-    # Calculate average response time
-    if successful_queries > 0:
-        avg_time = total_execution_time / successful_queries
-        avg_response_time = f"{avg_time:.2f}s"
-    else:
-        avg_response_time = "0.00s"
+    return await response_cache.serve(response, "stats", build_dashboard_stats)
+
+async def build_dashboard_stats() -> StatsResponse:
+    """Build the /stats payload"""
+    # Pre-aggregated counters, independent of the history size
+    history_stats = query_history_store.get_stats()
+    avg_response_time = f"{history_stats['avg_response_seconds']:.2f}s"
     
     # Get active databases count
     try:
@@ -1042,16 +1560,28 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user_depe
         active_databases = 1  # Default fallback
     
     return StatsResponse(
-        total_queries=total_queries,
+        total_queries=history_stats["total_queries"],
         active_databases=active_databases,
-        total_users=len(unique_users),
-        avg_response_time=avg_response_time
+        total_users=history_stats["total_users"],
+        avg_response_time=avg_response_time,
+        query_cache=query_cache.get_stats()
     )
 
+@app.delete("/query/cache")
+async def clear_query_cache(current_user: dict = Depends(get_current_user_dependency)):
+    """Очистить кэш результатов запросов"""
+    if 'admin' not in current_user.get('permissions', []):
+        raise HTTPException(status_code=403, detail="Only admin users can clear the query cache")
+
+    query_cache.clear()
+    return {"success": True, "message": "Кэш запросов очищен"}
+
 # SC Local Tables Data Endpoints
 @app.get("/sc-local/control")
 async def get_control_group_data(
+    http_request: Request,
     theory_id: Optional[str] = Query(None, description="Filter by theory ID"),
+    format: Optional[str] = RESPONSE_FORMAT_QUERY,
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """Получить данные контрольной группы из SC_local_control"""
@@ -1061,12 +1591,12 @@ async def get_control_group_data(
         result = get_sc_local_data("SC_local_control", theory_id)
         
         if result["success"]:
-            return {
+            return tabular_response(http_request, {
                 "success": True,
                 "data": result["data"],
                 "total_count": len(result["data"]),
                 "message": result["message"]
-            }
+            }, response_format=format)
         else:
             raise HTTPException(status_code=500, detail=result["message"])
             
@@ -1075,7 +1605,9 @@ async def get_control_group_data(
 
 @app.get("/sc-local/target")
 async def get_target_groups_data(
+    http_request: Request,
     theory_id: Optional[str] = Query(None, description="Filter by theory ID"),
+    format: Optional[str] = RESPONSE_FORMAT_QUERY,
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """Получить данные целевых групп из SC_local_target"""
@@ -1085,12 +1617,12 @@ async def get_target_groups_data(
         result = get_sc_local_data("SC_local_target", theory_id)
         
         if result["success"]:
-            return {
+            return tabular_response(http_request, {
                 "success": True,
                 "data": result["data"],
                 "total_count": len(result["data"]),
                 "message": result["message"]
-            }
+            }, response_format=format)
         else:
             raise HTTPException(status_code=500, detail=result["message"])
             
@@ -1304,9 +1836,9 @@ async def load_parquet_dataset(dataset_name: str, use_cache: bool = True, curren
 # Campaign Management endpoints
 @app.get("/campaigns/codes/next-rb1", response_model=CampaignCodeResponse)
 async def get_next_rb1_code(current_user: dict = Depends(get_current_user_dependency)):
-    """Generate next available RB1 campaign code"""
+    """Preview the next RB1 campaign code (the code is allocated when the campaign is created)"""
     try:
-        campaign_code = await campaign_service.code_service.generate_next_rb1_code()
+        campaign_code = await campaign_service.code_service.preview_next_rb1_code()
         return CampaignCodeResponse(
             campaign_code=campaign_code,
             campaign_type="RB1",
@@ -1317,10 +1849,10 @@ async def get_next_rb1_code(current_user: dict = Depends(get_current_user_depend
 
 @app.get("/campaigns/codes/next-rb3", response_model=CampaignCodeResponse)
 async def get_next_rb3_codes(current_user: dict = Depends(get_current_user_dependency)):
-    """Generate next available RB3 campaign and XLS codes"""
+    """Preview the next RB3 campaign and XLS codes (allocated when the campaign is created)"""
     try:
-        campaign_code = await campaign_service.code_service.generate_next_rb1_code()
-        xls_code = await campaign_service.code_service.generate_next_rb3_xls_code()
+        campaign_code = await campaign_service.code_service.preview_next_rb1_code()
+        xls_code = await campaign_service.code_service.preview_next_rb3_xls_code()
         
         return CampaignCodeResponse(
             campaign_code=campaign_code,
@@ -1334,6 +1866,8 @@ async def get_next_rb3_codes(current_user: dict = Depends(get_current_user_depen
 @app.post("/campaigns/load-rb-automatic")
 async def load_rb_automatic_launch_data(
     filter_config: CampaignFilterConfig, 
+    http_request: Request,
+    format: Optional[str] = RESPONSE_FORMAT_QUERY,
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """
@@ -1346,19 +1880,27 @@ async def load_rb_automatic_launch_data(
         # Convert filter config to dict
         filter_dict = filter_config.dict()
         
-        # Load and process the data
-        processed_data, stats = campaign_service.load_rb_automatic_launch_data(filter_dict)
+        # Load and process the data, then keep the whole audience server-side for /campaigns/create
+        def load_and_store():
+            data, load_stats = campaign_service.load_rb_automatic_launch_data(filter_dict)
+            stored_id = audience_store.save(
+                data, created_by=current_user["username"], stats=load_stats, workflow="rb_automatic_launch"
+            )
+            return data, load_stats, stored_id
+        
+        processed_data, stats, audience_id = await run_in_threadpool(load_and_store)
         
-        # Convert processed data to list of dicts for JSON response
-        user_data = processed_data.to_dict('records') if not processed_data.empty else []
+        # Only a preview of the audience is sent to the client
+        user_data = processed_data.head(RB_AUTOMATIC_PREVIEW_ROWS).to_dict('records') if not processed_data.empty else []
         
         # Format response
         response = {
             "success": True,
-            "message": f"Successfully loaded {len(user_data)} records",
+            "message": f"Successfully loaded {len(processed_data)} records",
             "stats": stats,
-            "user_data": user_data[:1000],  # Limit to first 1000 for performance
-            "total_count": len(user_data),
+            "user_data": user_data,
+            "total_count": len(processed_data),
+            "audience_id": audience_id,
             "columns": list(processed_data.columns) if not processed_data.empty else [],
             "workflow": "rb_automatic_launch"
         }
@@ -1372,8 +1914,9 @@ async def load_rb_automatic_launch_data(
                 "median": float(processed_data['Column_sum'].median())
             }
         
-        logger.info(f"RB automatic launch completed: {len(user_data)} records, {len(stats)} filter stats")
-        return response
+        logger.info(f"RB automatic launch completed: {len(processed_data)} records stored as audience {audience_id}")
+        return tabular_response(http_request, response, rows_key="user_data",
+                                columns=response["columns"], response_format=format)
         
     except FileNotFoundError as e:
         logger.error(f"File not found in RB automatic launch: {e}")
@@ -1396,17 +1939,41 @@ async def create_campaign(request: CampaignCreateRequest, current_user: dict = D
         if request.campaign_type not in ["RB1", "RB3"]:
             raise HTTPException(status_code=400, detail="Campaign type must be 'RB1' or 'RB3'")
         
-        # Convert user IINs to DataFrame
-        if not request.user_iins:
-            raise HTTPException(status_code=400, detail="User IINs list cannot be empty")
-        
-        user_data = pd.DataFrame({'IIN': request.user_iins})
-        
         # Convert filter config to dict if provided
         filter_config = None
         if request.filter_config:
             filter_config = request.filter_config.dict(exclude_none=True)
         
+        filter_stats = None
+        if request.audience_id:
+            # Audience stored by /campaigns/load-rb-automatic, already filtered there
+            if filter_config:
+                raise HTTPException(
+                    status_code=400,
+                    detail="filter_config cannot be combined with audience_id, the audience is already filtered; "
+                           "load the audience again with the new filters"
+                )
+            audience = audience_store.get_meta(request.audience_id)
+            is_admin = 'admin' in current_user.get('permissions', [])
+            if audience is None or (not is_admin and audience["created_by"] != current_user["username"]):
+                raise HTTPException(
+                    status_code=404,
+                    detail="Audience not found or expired, load the audience again"
+                )
+            user_data = await run_in_threadpool(audience_store.load, request.audience_id, ["IIN", "P_SID"])
+            if user_data.empty:
+                raise HTTPException(status_code=400, detail="Audience is empty")
+            filter_stats = dict(audience["stats"])
+            filter_stats.setdefault("initial_count", len(user_data))
+            filter_stats["final_count"] = len(user_data)
+            filter_stats.setdefault("total_removed", filter_stats["initial_count"] - len(user_data))
+        else:
+            # Convert user IINs to DataFrame
+            if not request.user_iins:
+                raise HTTPException(status_code=400, detail="User IINs list cannot be empty")
+            
+            user_data = pd.DataFrame({'IIN': request.user_iins})
+        
         # Convert deploy options to dict if provided
         deploy_options = None
         if request.deploy_options:
@@ -1422,7 +1989,8 @@ async def create_campaign(request: CampaignCreateRequest, current_user: dict = D
                 raise HTTPException(status_code=400, detail=f"Invalid RB1 metadata: {str(e)}")
             
             result = await campaign_service.create_rb1_campaign(
-                metadata_dict, user_data, filter_config, deploy_options
+                metadata_dict, user_data, filter_config, deploy_options,
+                created_by=current_user["username"], filter_stats=filter_stats
             )
         else:  # RB3
             # Validate RB3 metadata
@@ -1433,12 +2001,15 @@ async def create_campaign(request: CampaignCreateRequest, current_user: dict = D
                 raise HTTPException(status_code=400, detail=f"Invalid RB3 metadata: {str(e)}")
             
             result = await campaign_service.create_rb3_campaign(
-                metadata_dict, user_data, filter_config, deploy_options
+                metadata_dict, user_data, filter_config, deploy_options,
+                created_by=current_user["username"], filter_stats=filter_stats
             )
         
         # Format response
         if result["success"]:
             message = f"Successfully created {result['campaign_type']} campaign {result['campaign_code']}"
+        elif result["deployment_result"].get("rolled_back"):
+            message = f"Campaign {result['campaign_code']} was not deployed, all tables were rolled back"
         else:
             message = f"Campaign creation completed with errors for {result['campaign_code']}"
         
@@ -1457,6 +2028,21 @@ async def create_campaign(request: CampaignCreateRequest, current_user: dict = D
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating campaign: {str(e)}")
 
+@app.get("/campaigns/deploy-progress")
+async def list_deploy_progress(current_user: dict = Depends(get_current_user_dependency)):
+    """Выполняющиеся и недавние развертывания кампаний пользователя (администратор видит все)"""
+    owner = None if 'admin' in current_user.get('permissions', []) else current_user["username"]
+    return {"success": True, "deployments": deploy_progress.list(owner)}
+
+@app.get("/campaigns/deploy-progress/{campaign_code}")
+async def get_deploy_progress(campaign_code: str, current_user: dict = Depends(get_current_user_dependency)):
+    """Прогресс развертывания кампании по таблицам"""
+    progress = deploy_progress.get(campaign_code)
+    is_admin = 'admin' in current_user.get('permissions', [])
+    if progress is None or (not is_admin and progress["created_by"] != current_user["username"]):
+        raise HTTPException(status_code=404, detail=f"Развертывание кампании {campaign_code} не найдено")
+    return {"success": True, "deployment": progress}
+
 @app.get("/campaigns/list", response_model=CampaignListResponse)
 async def list_campaigns(
     limit: int = 50, 
@@ -1920,6 +2506,9 @@ async def cleanup_spss_control_groups(current_user: dict = Depends(get_current_u
                 spss_cursor.execute(delete_query)
                 cleanup_results["deleted_records"] = spss_cursor.rowcount
                 spss_conn.commit()
+                rollup_service.record_delete(
+                    SOURCE_SPSS, [group["theory_id"] for group in cleanup_results["found_control_groups"]]
+                )
                 
                 print(f"Cleaned up {cleanup_results['deleted_records']} control group records from SPSS")
             
@@ -2086,9 +2675,51 @@ async def preview_daily_distribution(current_user: dict = Depends(get_current_us
             "timestamp": datetime.now().isoformat()
         }
 
+TABLE_STATS_SQL = """
+SELECT 
+    COUNT(*) as total_users,
+    COUNT(DISTINCT THEORY_ID) as unique_campaigns,
+    MIN(insert_datetime) as earliest_upload,
+    MAX(insert_datetime) as latest_upload
+FROM {table}
+"""
+
+DAILY_STATS_SQL = """
+SELECT 
+    TO_CHAR(insert_datetime, 'YYYY-MM-DD') as upload_date,
+    COUNT(*) as users_uploaded,
+    COUNT(DISTINCT THEORY_ID) as campaigns_affected,
+    COUNT(DISTINCT IIN) as unique_users
+FROM {table}
+WHERE insert_datetime >= SYSDATE - :days_back
+GROUP BY TO_CHAR(insert_datetime, 'YYYY-MM-DD')
+ORDER BY upload_date DESC
+"""
+
+CAMPAIGN_STATS_SQL = """
+SELECT 
+    COUNT(*) as total_campaigns,
+    COUNT(CASE WHEN SYSDATE BETWEEN theory_start_date AND theory_end_date THEN 1 END) as active_campaigns,
+    SUM(user_count) as total_planned_users,
+    MIN(load_date) as earliest_campaign,
+    MAX(load_date) as latest_campaign
+FROM SoftCollection_theories
+"""
+
+def monitoring_query_task(source: str, sql: str, params: Optional[Dict] = None):
+    """Fan-out task running ``sql`` (with {table} filled in) against the database of a monitoring source"""
+    database_id, table = ROLLUP_SOURCES[source]
+    return database_id, lambda call_timeout_ms: fetch_rows(
+        database_id, sql.format(table=table), params, call_timeout_ms=call_timeout_ms
+    )
+
 @app.get("/monitoring/overview")
-async def get_monitoring_overview(current_user: dict = Depends(get_current_user_dependency)):
+async def get_monitoring_overview(response: Response, current_user: dict = Depends(get_current_user_dependency)):
     """Get high-level monitoring overview of all tables and activities"""
+    return await response_cache.serve(response, "monitoring/overview", build_monitoring_overview)
+
+async def build_monitoring_overview():
+    """Build the /monitoring/overview payload"""
     try:
         overview = {
             "timestamp": datetime.now().isoformat(),
@@ -2098,70 +2729,36 @@ async def get_monitoring_overview(current_user: dict = Depends(get_current_user_
             "recent_uploads": []
         }
         
-        # Get SC_local_control statistics
-        control_stats_query = """
-        SELECT 
-            COUNT(*) as total_users,
-            COUNT(DISTINCT THEORY_ID) as unique_campaigns,
-            MIN(insert_datetime) as earliest_upload,
-            MAX(insert_datetime) as latest_upload
-        FROM SC_local_control
-        """
-        control_result = execute_query(control_stats_query)
-        if control_result["success"] and control_result["data"]:
-            overview["tables"]["sc_local_control"] = control_result["data"][0]
-        
-        # Get SC_local_target statistics
-        target_stats_query = """
-        SELECT 
-            COUNT(*) as total_users,
-            COUNT(DISTINCT THEORY_ID) as unique_campaigns,
-            MIN(insert_datetime) as earliest_upload,
-            MAX(insert_datetime) as latest_upload
-        FROM SC_local_target
-        """
-        target_result = execute_query(target_stats_query)
-        if target_result["success"] and target_result["data"]:
-            overview["tables"]["sc_local_target"] = target_result["data"][0]
-        
-        # Get SPSS statistics
-        try:
-            spss_conn = get_connection_SPSS()
-            spss_cursor = spss_conn.cursor()
-            
-            spss_stats_query = """
-            SELECT 
-                COUNT(*) as total_users,
-                COUNT(DISTINCT THEORY_ID) as unique_campaigns,
-                MIN(insert_datetime) as earliest_upload,
-                MAX(insert_datetime) as latest_upload
-            FROM SC_theory_users
-            """
-            spss_cursor.execute(spss_stats_query)
-            columns = [desc[0].lower() for desc in spss_cursor.description]
-            row = spss_cursor.fetchone()
-            if row:
-                overview["tables"]["spss_sc_theory_users"] = dict(zip(columns, row))
-            
-            spss_cursor.close()
-            spss_conn.close()
-            
-        except Exception as spss_error:
-            overview["tables"]["spss_sc_theory_users"] = {"error": str(spss_error)}
+        # Independent queries run concurrently; each source fails or times out on its own
+        tasks = {
+            "campaigns": ("DSSB_APP", lambda call_timeout_ms: fetch_rows(
+                "DSSB_APP", CAMPAIGN_STATS_SQL, call_timeout_ms=call_timeout_ms
+            ))
+        }
         
-        # Get campaign registry statistics
-        campaign_stats_query = """
-        SELECT 
-            COUNT(*) as total_campaigns,
-            COUNT(CASE WHEN SYSDATE BETWEEN theory_start_date AND theory_end_date THEN 1 END) as active_campaigns,
-            SUM(user_count) as total_planned_users,
-            MIN(load_date) as earliest_campaign,
-            MAX(load_date) as latest_campaign
-        FROM SoftCollection_theories
-        """
-        campaign_result = execute_query(campaign_stats_query)
-        if campaign_result["success"] and campaign_result["data"]:
-            overview["campaigns"] = campaign_result["data"][0]
+        # Table statistics come from the rollups once they have been built, live queries otherwise
+        if rollup_service.is_ready():
+            for source in ROLLUP_SOURCES:
+                overview["tables"][source] = rollup_service.get_table_summary(source)
+            overview["data_source"] = "rollup"
+        else:
+            overview["data_source"] = "live"
+            for source in ROLLUP_SOURCES:
+                tasks[source] = monitoring_query_task(source, TABLE_STATS_SQL)
+        
+        results = await source_fanout.gather(tasks)
+        for name, result in results.items():
+            if name == "campaigns":
+                if result["success"] and result["data"]:
+                    overview["campaigns"] = result["data"][0]
+                elif not result["success"]:
+                    overview["campaigns"] = {"error": result["error"]}
+            elif result["success"]:
+                if result["data"]:
+                    overview["tables"][name] = result["data"][0]
+            else:
+                overview["tables"][name] = {"error": result["error"]}
+        overview["sources"] = source_fanout.timings(results)
         
         return {
             "success": True,
@@ -2177,10 +2774,17 @@ async def get_monitoring_overview(current_user: dict = Depends(get_current_user_
 
 @app.get("/monitoring/daily-statistics")
 async def get_daily_statistics(
+    response: Response,
     days_back: int = Query(7, ge=1, le=30, description="Number of days to look back"),
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """Get daily upload statistics for the last N days"""
+    return await response_cache.serve(
+        response, "monitoring/daily-statistics", lambda: build_daily_statistics(days_back), params=(days_back,)
+    )
+
+async def build_daily_statistics(days_back: int):
+    """Build the /monitoring/daily-statistics payload"""
     try:
         daily_stats = {
             "period": f"Last {days_back} days",
@@ -2191,72 +2795,27 @@ async def get_daily_statistics(
             "summary": {}
         }
         
-        # SC_local_control daily statistics
-        control_daily_query = f"""
-        SELECT 
-            TO_CHAR(insert_datetime, 'YYYY-MM-DD') as upload_date,
-            COUNT(*) as users_uploaded,
-            COUNT(DISTINCT THEORY_ID) as campaigns_affected,
-            COUNT(DISTINCT IIN) as unique_users
-        FROM SC_local_control
-        WHERE insert_datetime >= SYSDATE - {days_back}
-        GROUP BY TO_CHAR(insert_datetime, 'YYYY-MM-DD')
-        ORDER BY upload_date DESC
-        """
-        control_result = execute_query(control_daily_query)
-        if control_result["success"]:
-            daily_stats["sc_local_control"] = control_result["data"]
-        
-        # SC_local_target daily statistics
-        target_daily_query = f"""
-        SELECT 
-            TO_CHAR(insert_datetime, 'YYYY-MM-DD') as upload_date,
-            COUNT(*) as users_uploaded,
-            COUNT(DISTINCT THEORY_ID) as campaigns_affected,
-            COUNT(DISTINCT IIN) as unique_users
-        FROM SC_local_target
-        WHERE insert_datetime >= SYSDATE - {days_back}
-        GROUP BY TO_CHAR(insert_datetime, 'YYYY-MM-DD')
-        ORDER BY upload_date DESC
-        """
-        target_result = execute_query(target_daily_query)
-        if target_result["success"]:
-            daily_stats["sc_local_target"] = target_result["data"]
-        
-        # SPSS daily statistics
-        try:
-            spss_conn = get_connection_SPSS()
-            spss_cursor = spss_conn.cursor()
-            
-            spss_daily_query = f"""
-            SELECT 
-                TO_CHAR(insert_datetime, 'YYYY-MM-DD') as upload_date,
-                COUNT(*) as users_uploaded,
-                COUNT(DISTINCT THEORY_ID) as campaigns_affected,
-                COUNT(DISTINCT IIN) as unique_users
-            FROM SC_theory_users
-            WHERE insert_datetime >= SYSDATE - {days_back}
-            GROUP BY TO_CHAR(insert_datetime, 'YYYY-MM-DD')
-            ORDER BY upload_date DESC
-            """
-            spss_cursor.execute(spss_daily_query)
-            columns = [desc[0].lower() for desc in spss_cursor.description]
-            
-            spss_daily_data = []
-            for row in spss_cursor.fetchall():
-                spss_daily_data.append(dict(zip(columns, row)))
-            daily_stats["spss_sc_theory_users"] = spss_daily_data
-            
-            spss_cursor.close()
-            spss_conn.close()
-            
-        except Exception as spss_error:
-            daily_stats["spss_sc_theory_users"] = [{"error": str(spss_error)}]
+        if rollup_service.is_ready():
+            for source in ROLLUP_SOURCES:
+                daily_stats[source] = rollup_service.get_daily_statistics(source, days_back)
+            daily_stats["data_source"] = "rollup"
+        else:
+            daily_stats["data_source"] = "live"
+            results = await source_fanout.gather({
+                source: monitoring_query_task(source, DAILY_STATS_SQL, {"days_back": days_back})
+                for source in ROLLUP_SOURCES
+            })
+            for source, result in results.items():
+                daily_stats[source] = result["data"] if result["success"] else [{"error": result["error"]}]
+            daily_stats["sources"] = source_fanout.timings(results)
         
         # Calculate summary statistics
-        total_control = sum(day.get("users_uploaded", 0) for day in daily_stats["sc_local_control"])
-        total_target = sum(day.get("users_uploaded", 0) for day in daily_stats["sc_local_target"])
-        total_spss = sum(day.get("users_uploaded", 0) for day in daily_stats["spss_sc_theory_users"] if "error" not in day)
+        def total_uploads(days):
+            return sum(day.get("users_uploaded", 0) for day in days if "error" not in day)
+        
+        total_control = total_uploads(daily_stats["sc_local_control"])
+        total_target = total_uploads(daily_stats["sc_local_target"])
+        total_spss = total_uploads(daily_stats["spss_sc_theory_users"])
         
         daily_stats["summary"] = {
             "total_control_uploads": total_control,
@@ -2278,8 +2837,12 @@ async def get_daily_statistics(
         }
 
 @app.get("/monitoring/campaign-distribution")
-async def get_campaign_distribution(current_user: dict = Depends(get_current_user_dependency)):
+async def get_campaign_distribution(response: Response, current_user: dict = Depends(get_current_user_dependency)):
     """Get user distribution by campaigns across all tables"""
+    return await response_cache.serve(response, "monitoring/campaign-distribution", build_campaign_distribution)
+
+async def build_campaign_distribution():
+    """Build the /monitoring/campaign-distribution payload"""
     try:
         distribution = {
             "timestamp": datetime.now().isoformat(),
@@ -2287,120 +2850,148 @@ async def get_campaign_distribution(current_user: dict = Depends(get_current_use
             "totals": {}
         }
         
-        # Get campaign distribution from all tables
-        campaign_dist_query = r"""
-        WITH campaign_summary AS (
-            SELECT 
-                st.theory_id,
-                st.theory_name,
-                TO_CHAR(st.theory_start_date, 'YYYY-MM-DD') as theory_start_date,
-                TO_CHAR(st.theory_end_date, 'YYYY-MM-DD') as theory_end_date,
-                st.user_count as planned_users,
-                CASE WHEN SYSDATE BETWEEN st.theory_start_date AND st.theory_end_date THEN 'Active' ELSE 'Inactive' END as status
-            FROM SoftCollection_theories st
-        ),
-        control_counts AS (
+        if rollup_service.is_ready():
+            # Only the small campaign registry is read from Oracle, group sizes come from the rollups
+            registry_query = """
             SELECT 
-                CASE 
+                theory_id,
+                theory_name,
+                TO_CHAR(theory_start_date, 'YYYY-MM-DD') as theory_start_date,
+                TO_CHAR(theory_end_date, 'YYYY-MM-DD') as theory_end_date,
+                user_count as planned_users,
+                CASE WHEN SYSDATE BETWEEN theory_start_date AND theory_end_date THEN 'Active' ELSE 'Inactive' END as status
+            FROM SoftCollection_theories
+            ORDER BY theory_start_date DESC, theory_id DESC
+            """
+            registry_result = execute_query(registry_query)
+            if registry_result["success"]:
+                control_counts = rollup_service.get_base_campaign_counts(SOURCE_CONTROL)
+                target_counts = rollup_service.get_base_campaign_counts(SOURCE_TARGET)
+                spss_counts = rollup_service.get_base_campaign_counts(SOURCE_SPSS)
+                for campaign in registry_result["data"]:
+                    base_id = base_campaign_id(campaign["theory_id"])
+                    campaign["control_users"] = control_counts.get(base_id, 0)
+                    campaign["target_users"] = target_counts.get(base_id, 0)
+                    campaign["total_actual_users"] = campaign["control_users"] + campaign["target_users"]
+                    campaign["spss_users"] = spss_counts.get(base_id, 0)
+                distribution["campaigns"] = registry_result["data"]
+            distribution["data_source"] = "rollup"
+        else:
+            distribution["data_source"] = "live"
+            # Get campaign distribution from all tables
+            campaign_dist_query = r"""
+            WITH campaign_summary AS (
+                SELECT 
+                    st.theory_id,
+                    st.theory_name,
+                    TO_CHAR(st.theory_start_date, 'YYYY-MM-DD') as theory_start_date,
+                    TO_CHAR(st.theory_end_date, 'YYYY-MM-DD') as theory_end_date,
+                    st.user_count as planned_users,
+                    CASE WHEN SYSDATE BETWEEN st.theory_start_date AND st.theory_end_date THEN 'Active' ELSE 'Inactive' END as status
+                FROM SoftCollection_theories st
+            ),
+            control_counts AS (
+                SELECT 
+                    CASE 
+                        WHEN REGEXP_LIKE(theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
+                            SUBSTR(theory_id, 1, INSTR(theory_id, '.') - 1)
+                        ELSE theory_id
+                    END as base_campaign_id,
+                    COUNT(*) as control_users
+                FROM SC_local_control
+                GROUP BY CASE 
                     WHEN REGEXP_LIKE(theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
                         SUBSTR(theory_id, 1, INSTR(theory_id, '.') - 1)
                     ELSE theory_id
-                END as base_campaign_id,
-                COUNT(*) as control_users
-            FROM SC_local_control
-            GROUP BY CASE 
-                WHEN REGEXP_LIKE(theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
-                    SUBSTR(theory_id, 1, INSTR(theory_id, '.') - 1)
-                ELSE theory_id
-            END
-        ),
-        target_counts AS (
-            SELECT 
-                CASE 
+                END
+            ),
+            target_counts AS (
+                SELECT 
+                    CASE 
+                        WHEN REGEXP_LIKE(theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
+                            SUBSTR(theory_id, 1, INSTR(theory_id, '.') - 1)
+                        ELSE theory_id
+                    END as base_campaign_id,
+                    COUNT(*) as target_users
+                FROM SC_local_target
+                GROUP BY CASE 
                     WHEN REGEXP_LIKE(theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
                         SUBSTR(theory_id, 1, INSTR(theory_id, '.') - 1)
                     ELSE theory_id
-                END as base_campaign_id,
-                COUNT(*) as target_users
-            FROM SC_local_target
-            GROUP BY CASE 
-                WHEN REGEXP_LIKE(theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
-                    SUBSTR(theory_id, 1, INSTR(theory_id, '.') - 1)
-                ELSE theory_id
-            END
-        )
-        SELECT 
-            cs.theory_id,
-            cs.theory_name,
-            cs.theory_start_date,
-            cs.theory_end_date,
-            cs.planned_users,
-            cs.status,
-            NVL(cc.control_users, 0) as control_users,
-            NVL(tc.target_users, 0) as target_users,
-            (NVL(cc.control_users, 0) + NVL(tc.target_users, 0)) as total_actual_users
-        FROM campaign_summary cs
-        LEFT JOIN control_counts cc ON (
-            CASE 
-                WHEN REGEXP_LIKE(cs.theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
-                    SUBSTR(cs.theory_id, 1, INSTR(cs.theory_id, '.') - 1)
-                ELSE cs.theory_id
-            END = cc.base_campaign_id
-        )
-        LEFT JOIN target_counts tc ON (
-            CASE 
-                WHEN REGEXP_LIKE(cs.theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
-                    SUBSTR(cs.theory_id, 1, INSTR(cs.theory_id, '.') - 1)
-                ELSE cs.theory_id
-            END = tc.base_campaign_id
-        )
-        ORDER BY cs.theory_start_date DESC, cs.theory_id DESC
-        """
-        
-        campaign_result = execute_query(campaign_dist_query)
-        if campaign_result["success"]:
-            distribution["campaigns"] = campaign_result["data"]
-        
-        # Get SPSS counts for each campaign
-        try:
-            spss_conn = get_connection_SPSS()
-            spss_cursor = spss_conn.cursor()
-            
-            spss_dist_query = r"""
+                END
+            )
             SELECT 
+                cs.theory_id,
+                cs.theory_name,
+                cs.theory_start_date,
+                cs.theory_end_date,
+                cs.planned_users,
+                cs.status,
+                NVL(cc.control_users, 0) as control_users,
+                NVL(tc.target_users, 0) as target_users,
+                (NVL(cc.control_users, 0) + NVL(tc.target_users, 0)) as total_actual_users
+            FROM campaign_summary cs
+            LEFT JOIN control_counts cc ON (
+                CASE 
+                    WHEN REGEXP_LIKE(cs.theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
+                        SUBSTR(cs.theory_id, 1, INSTR(cs.theory_id, '.') - 1)
+                    ELSE cs.theory_id
+                END = cc.base_campaign_id
+            )
+            LEFT JOIN target_counts tc ON (
                 CASE 
+                    WHEN REGEXP_LIKE(cs.theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
+                        SUBSTR(cs.theory_id, 1, INSTR(cs.theory_id, '.') - 1)
+                    ELSE cs.theory_id
+                END = tc.base_campaign_id
+            )
+            ORDER BY cs.theory_start_date DESC, cs.theory_id DESC
+            """
+        
+            campaign_result = execute_query(campaign_dist_query)
+            if campaign_result["success"]:
+                distribution["campaigns"] = campaign_result["data"]
+        
+            # Get SPSS counts for each campaign
+            try:
+                spss_conn = get_connection_SPSS()
+                spss_cursor = spss_conn.cursor()
+            
+                spss_dist_query = r"""
+                SELECT 
+                    CASE 
+                        WHEN REGEXP_LIKE(theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
+                            SUBSTR(theory_id, 1, INSTR(theory_id, '.') - 1)
+                        ELSE theory_id
+                    END as base_campaign_id,
+                    COUNT(*) as spss_users
+                FROM SC_theory_users
+                GROUP BY CASE 
                     WHEN REGEXP_LIKE(theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
                         SUBSTR(theory_id, 1, INSTR(theory_id, '.') - 1)
                     ELSE theory_id
-                END as base_campaign_id,
-                COUNT(*) as spss_users
-            FROM SC_theory_users
-            GROUP BY CASE 
-                WHEN REGEXP_LIKE(theory_id, '^SC[0-9]{8}\.[0-9]+$') THEN
-                    SUBSTR(theory_id, 1, INSTR(theory_id, '.') - 1)
-                ELSE theory_id
-            END
-            """
-            spss_cursor.execute(spss_dist_query)
+                END
+                """
+                spss_cursor.execute(spss_dist_query)
             
-            spss_counts = {}
-            for row in spss_cursor.fetchall():
-                base_id, count = row
-                spss_counts[base_id] = count
+                spss_counts = {}
+                for row in spss_cursor.fetchall():
+                    base_id, count = row
+                    spss_counts[base_id] = count
             
-            # Add SPSS counts to campaigns
-            for campaign in distribution["campaigns"]:
-                base_id = campaign["theory_id"]
-                if "." in base_id:
-                    base_id = base_id.split(".")[0]
-                campaign["spss_users"] = spss_counts.get(base_id, 0)
+                # Add SPSS counts to campaigns
+                for campaign in distribution["campaigns"]:
+                    base_id = campaign["theory_id"]
+                    if "." in base_id:
+                        base_id = base_id.split(".")[0]
+                    campaign["spss_users"] = spss_counts.get(base_id, 0)
             
-            spss_cursor.close()
-            spss_conn.close()
+                spss_cursor.close()
+                spss_conn.close()
             
-        except Exception as spss_error:
-            for campaign in distribution["campaigns"]:
-                campaign["spss_users"] = f"Error: {spss_error}"
+            except Exception as spss_error:
+                for campaign in distribution["campaigns"]:
+                    campaign["spss_users"] = f"Error: {spss_error}"
         
         # Calculate totals
         distribution["totals"] = {
@@ -2426,10 +3017,17 @@ async def get_campaign_distribution(current_user: dict = Depends(get_current_use
 
 @app.get("/monitoring/recent-activity")
 async def get_recent_activity(
+    response: Response,
     limit: int = Query(50, ge=10, le=200, description="Number of recent records to fetch"),
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """Get recent upload activity across all tables"""
+    return await response_cache.serve(
+        response, "monitoring/recent-activity", lambda: build_recent_activity(limit), params=(limit,)
+    )
+
+async def build_recent_activity(limit: int):
+    """Build the /monitoring/recent-activity payload"""
     try:
         recent_activity = {
             "timestamp": datetime.now().isoformat(),
@@ -2438,86 +3036,101 @@ async def get_recent_activity(
             "debug_info": {}
         }
         
-        # Simplified query - get most recent uploads without grouping by tab fields
-        # This should capture today's data if it was loaded
-        control_activity_query = f"""
-        SELECT 
-            'Control Group' as activity_type,
-            THEORY_ID,
-            COUNT(*) as users_count,
-            TO_CHAR(MAX(insert_datetime), 'YYYY-MM-DD HH24:MI:SS') as upload_time,
-            MAX(tab1) as tab1, 
-            MAX(tab2) as tab2
-        FROM SC_local_control
-        WHERE insert_datetime >= SYSDATE - 30
-        GROUP BY THEORY_ID
-        ORDER BY MAX(insert_datetime) DESC
-        FETCH FIRST {limit//2} ROWS ONLY
-        """
-        control_result = execute_query(control_activity_query)
-        if control_result["success"]:
-            recent_activity["activities"].extend(control_result["data"])
-            recent_activity["debug_info"]["control_count"] = len(control_result["data"])
-        else:
-            recent_activity["debug_info"]["control_error"] = control_result.get("error", "Unknown error")
-        
-        # Get recent activities from SC_local_target
-        target_activity_query = f"""
-        SELECT 
-            'Target Group' as activity_type,
-            THEORY_ID,
-            COUNT(*) as users_count,
-            TO_CHAR(MAX(insert_datetime), 'YYYY-MM-DD HH24:MI:SS') as upload_time,
-            MAX(tab1) as tab1, 
-            MAX(tab2) as tab2
-        FROM SC_local_target
-        WHERE insert_datetime >= SYSDATE - 30
-        GROUP BY THEORY_ID
-        ORDER BY MAX(insert_datetime) DESC
-        FETCH FIRST {limit//2} ROWS ONLY
-        """
-        target_result = execute_query(target_activity_query)
-        if target_result["success"]:
-            recent_activity["activities"].extend(target_result["data"])
-            recent_activity["debug_info"]["target_count"] = len(target_result["data"])
+        if rollup_service.is_ready():
+            activity_types = {
+                SOURCE_CONTROL: ("Control Group", "control_count"),
+                SOURCE_TARGET: ("Target Group", "target_count"),
+                SOURCE_SPSS: ("SPSS Target", "spss_count"),
+            }
+            for source, (activity_type, debug_key) in activity_types.items():
+                rows = rollup_service.get_recent_activity(source, limit // 2)
+                for row in rows:
+                    row["activity_type"] = activity_type
+                recent_activity["activities"].extend(rows)
+                recent_activity["debug_info"][debug_key] = len(rows)
+            recent_activity["data_source"] = "rollup"
         else:
-            recent_activity["debug_info"]["target_error"] = target_result.get("error", "Unknown error")
+            recent_activity["data_source"] = "live"
+            # Simplified query - get most recent uploads without grouping by tab fields
+            # This should capture today's data if it was loaded
+            control_activity_query = f"""
+            SELECT 
+                'Control Group' as activity_type,
+                THEORY_ID,
+                COUNT(*) as users_count,
+                TO_CHAR(MAX(insert_datetime), 'YYYY-MM-DD HH24:MI:SS') as upload_time,
+                MAX(tab1) as tab1, 
+                MAX(tab2) as tab2
+            FROM SC_local_control
+            WHERE insert_datetime >= SYSDATE - 30
+            GROUP BY THEORY_ID
+            ORDER BY MAX(insert_datetime) DESC
+            FETCH FIRST {limit//2} ROWS ONLY
+            """
+            control_result = execute_query(control_activity_query)
+            if control_result["success"]:
+                recent_activity["activities"].extend(control_result["data"])
+                recent_activity["debug_info"]["control_count"] = len(control_result["data"])
+            else:
+                recent_activity["debug_info"]["control_error"] = control_result.get("error", "Unknown error")
         
-        # Get recent activities from SPSS
-        try:
-            spss_conn = get_connection_SPSS()
-            spss_cursor = spss_conn.cursor()
-            
-            spss_activity_query = f"""
+            # Get recent activities from SC_local_target
+            target_activity_query = f"""
             SELECT 
-                'SPSS Target' as activity_type,
+                'Target Group' as activity_type,
                 THEORY_ID,
                 COUNT(*) as users_count,
                 TO_CHAR(MAX(insert_datetime), 'YYYY-MM-DD HH24:MI:SS') as upload_time,
                 MAX(tab1) as tab1, 
                 MAX(tab2) as tab2
-            FROM SC_theory_users
+            FROM SC_local_target
             WHERE insert_datetime >= SYSDATE - 30
             GROUP BY THEORY_ID
             ORDER BY MAX(insert_datetime) DESC
             FETCH FIRST {limit//2} ROWS ONLY
             """
-            spss_cursor.execute(spss_activity_query)
-            columns = [desc[0].lower() for desc in spss_cursor.description]
+            target_result = execute_query(target_activity_query)
+            if target_result["success"]:
+                recent_activity["activities"].extend(target_result["data"])
+                recent_activity["debug_info"]["target_count"] = len(target_result["data"])
+            else:
+                recent_activity["debug_info"]["target_error"] = target_result.get("error", "Unknown error")
+        
+            # Get recent activities from SPSS
+            try:
+                spss_conn = get_connection_SPSS()
+                spss_cursor = spss_conn.cursor()
+            
+                spss_activity_query = f"""
+                SELECT 
+                    'SPSS Target' as activity_type,
+                    THEORY_ID,
+                    COUNT(*) as users_count,
+                    TO_CHAR(MAX(insert_datetime), 'YYYY-MM-DD HH24:MI:SS') as upload_time,
+                    MAX(tab1) as tab1, 
+                    MAX(tab2) as tab2
+                FROM SC_theory_users
+                WHERE insert_datetime >= SYSDATE - 30
+                GROUP BY THEORY_ID
+                ORDER BY MAX(insert_datetime) DESC
+                FETCH FIRST {limit//2} ROWS ONLY
+                """
+                spss_cursor.execute(spss_activity_query)
+                columns = [desc[0].lower() for desc in spss_cursor.description]
             
-            spss_data = []
-            for row in spss_cursor.fetchall():
-                spss_data.append(dict(zip(columns, row)))
+                spss_data = []
+                for row in spss_cursor.fetchall():
+                    spss_data.append(dict(zip(columns, row)))
             
-            recent_activity["activities"].extend(spss_data)
-            recent_activity["debug_info"]["spss_count"] = len(spss_data)
+                recent_activity["activities"].extend(spss_data)
+                recent_activity["debug_info"]["spss_count"] = len(spss_data)
             
-            spss_cursor.close()
-            spss_conn.close()
+                spss_cursor.close()
+                spss_conn.close()
             
-        except Exception as spss_error:
-            print(f"SPSS error in recent activity: {spss_error}")
-            recent_activity["debug_info"]["spss_error"] = str(spss_error)
+            except Exception as spss_error:
+                print(f"SPSS error in recent activity: {spss_error}")
+                recent_activity["debug_info"]["spss_error"] = str(spss_error)
         
         # Sort all activities by upload_time
         valid_activities = [a for a in recent_activity["activities"] if "upload_time" in a]
@@ -2544,6 +3157,28 @@ async def get_recent_activity(
             "timestamp": datetime.now().isoformat()
         }
 
+@app.get("/monitoring/rollups")
+async def get_monitoring_rollups_status(current_user: dict = Depends(get_current_user_dependency)):
+    """Состояние агрегатов мониторинга"""
+    return {
+        "success": True,
+        "ready": rollup_service.is_ready(),
+        "status": rollup_service.get_status()
+    }
+
+@app.post("/monitoring/rollups/refresh", status_code=202)
+async def refresh_monitoring_rollups(current_user: dict = Depends(get_current_user_dependency)):
+    """Пересобрать агрегаты мониторинга из Oracle"""
+    if 'admin' not in current_user.get('permissions', []):
+        raise HTTPException(status_code=403, detail="Only admin users can rebuild monitoring rollups")
+
+    started = rollup_service.refresh_in_background()
+    return {
+        "success": True,
+        "started": started,
+        "message": "Пересборка агрегатов запущена" if started else "Пересборка агрегатов уже выполняется"
+    }
+
 @app.get("/debug/recent-activity-raw")
 async def debug_recent_activity_raw(current_user: dict = Depends(get_current_user_dependency)):
     """Debug endpoint to check raw recent activity data"""
@@ -2627,47 +3262,48 @@ async def debug_recent_activity_raw(current_user: dict = Depends(get_current_use
 # File Upload Endpoints
 @app.post("/files/upload", response_model=FileUploadResponse)
 async def upload_file(
-    file: UploadFile = File(...),
+    http_request: Request,
     current_user: dict = Depends(get_current_user_dependency)
 ):
-    """Upload and validate file (Excel, CSV, Parquet)"""
+    """Upload and validate file (Excel, CSV, Parquet); the multipart field "file" is streamed to disk"""
     
     try:
-        # Validate file type
-        allowed_types = {
-            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',  # .xlsx
-            'application/vnd.ms-excel',  # .xls
-            'text/csv',  # .csv
-            'application/octet-stream',  # .parquet (sometimes)
-            'application/x-parquet'  # .parquet
-        }
-        
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        
-        # Read file content
-        file_content = await file.read()
+        # Stream to disk with incremental sha256; oversized uploads are aborted mid-stream
+        try:
+            upload = await file_upload_service.receive_upload(http_request)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Validate file
-        temp_path = file_upload_service.save_uploaded_file(file_content, file.filename)
-        validation_result = file_upload_service.validate_file(temp_path, file.filename)
+        file_path = upload["path"]
+        upload_id = file_upload_service.upload_id_for(upload["sha256"])
+        file_extension = os.path.splitext(upload["filename"])[1].lower()
         
+        validation_result = file_upload_service.validate_file(file_path, upload["filename"])
         if not validation_result["valid"]:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            if not upload["duplicate"] and os.path.exists(file_path):
+                os.remove(file_path)
             raise HTTPException(status_code=400, detail="; ".join(validation_result["errors"]))
         
-        # Extract IINs from file
-        extraction_result = file_upload_service.extract_iins_from_file(
-            temp_path, 
-            file_extension
-        )
-        
-        if not extraction_result["success"]:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise HTTPException(status_code=400, detail=extraction_result["message"])
+        # Same content uploaded before: reuse its extraction summary instead of parsing again
+        extraction_result = file_upload_service.load_upload_summary(upload["sha256"]) if upload["duplicate"] else None
+        if extraction_result is None:
+            extraction_result = await run_in_threadpool(
+                file_upload_service.extract_iins_from_file, file_path, file_extension
+            )
+            
+            if not extraction_result["success"]:
+                # Clean up the stored file, unless it belongs to an earlier upload of the same content
+                if not upload["duplicate"] and os.path.exists(file_path):
+                    os.remove(file_path)
+                raise HTTPException(status_code=400, detail=extraction_result["message"])
+            
+            file_upload_service.save_upload_summary(upload["sha256"], extraction_result)
+            # /files/process reads these IINs instead of parsing the file again
+            file_upload_service.save_upload_iins(
+                upload_id, extraction_result["iin_column"], extraction_result["iin_values"]
+            )
         
         return FileUploadResponse(
             success=True,
@@ -2679,7 +3315,12 @@ async def upload_file(
             iin_column=extraction_result.get("iin_column"),
             iins_extracted=extraction_result["iins_extracted"],
             sample_data=extraction_result["sample_data"],
-            validation_errors=extraction_result.get("validation_errors", [])
+            validation_errors=extraction_result.get("validation_errors", []),
+            invalid_count=extraction_result.get("invalid_count", 0),
+            upload_id=upload_id,
+            sha256=upload["sha256"],
+            file_size=upload["size"],
+            duplicate=upload["duplicate"]
         )
         
     except HTTPException:
@@ -2696,20 +3337,29 @@ async def process_uploaded_file(
     """Process uploaded file with filters"""
     
     try:
-        # Find the uploaded file
-        file_path = None
-        for uploaded_file in file_upload_service.upload_dir.glob(f"*_{request.filename}"):
-            file_path = str(uploaded_file)
-            break
+        # Find the upload: IINs extracted at upload time are read from its sidecar
+        if request.upload_id:
+            if not file_upload_service.is_valid_upload_id(request.upload_id):
+                raise HTTPException(status_code=400, detail="Некорректный идентификатор загрузки")
+            upload_id = request.upload_id
+            uploaded_file = file_upload_service.find_upload(upload_id)
+        elif request.filename:
+            uploaded_file = file_upload_service.resolve_upload(request.filename)
+            upload_id = file_upload_service.upload_id_from_path(str(uploaded_file)) if uploaded_file else None
+        else:
+            raise HTTPException(status_code=400, detail="Укажите upload_id или имя файла")
         
-        if not file_path or not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail=f"Файл {request.filename} не найден")
+        file_path = str(uploaded_file) if uploaded_file else None
+        if not file_upload_service.has_upload_iins(upload_id, request.iin_column) and (not file_path or not os.path.exists(file_path)):
+            raise HTTPException(status_code=404, detail=f"Файл {request.upload_id or request.filename} не найден")
         
         # Process file with filters
-        result = file_upload_service.process_file_with_filters(
+        result = await run_in_threadpool(
+            file_upload_service.process_file_with_filters,
             file_path,
             request.iin_column,
-            request.filter_config.dict() if request.filter_config else None
+            request.filter_config.dict() if request.filter_config else None,
+            upload_id
         )
         
         if not result["success"]:
@@ -2750,28 +3400,34 @@ async def cleanup_uploaded_files(
 async def get_supported_file_formats():
     """Get list of supported file formats"""
     
+    supported_formats = [
+        {
+            "extension": ".xlsx",
+            "description": "Excel 2007+ файлы",
+            "mime_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        },
+        {
+            "extension": ".xls", 
+            "description": "Excel 97-2003 файлы",
+            "mime_type": "application/vnd.ms-excel"
+        },
+        {
+            "extension": ".csv",
+            "description": "Comma-separated values файлы",
+            "mime_type": "text/csv"
+        },
+        {
+            "extension": ".parquet",
+            "description": "Apache Parquet файлы",
+            "mime_type": "application/x-parquet"
+        }
+    ]
+    
     return {
+        # .xls is listed only when the optional xlrd package is installed
         "supported_formats": [
-            {
-                "extension": ".xlsx",
-                "description": "Excel 2007+ файлы",
-                "mime_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            },
-            {
-                "extension": ".xls", 
-                "description": "Excel 97-2003 файлы",
-                "mime_type": "application/vnd.ms-excel"
-            },
-            {
-                "extension": ".csv",
-                "description": "Comma-separated values файлы",
-                "mime_type": "text/csv"
-            },
-            {
-                "extension": ".parquet",
-                "description": "Apache Parquet файлы",
-                "mime_type": "application/x-parquet"
-            }
+            file_format for file_format in supported_formats
+            if file_format["extension"] in file_upload_service.supported_extensions
         ],
         "max_file_size": "50MB",
         "required_columns": "IIN колонка (12-цифровые номера)"
@@ -0,0 +1,206 @@
+"""
+Request Metrics for DataQuery Pro
+
+Per-request instrumentation exposed in Prometheus text format on /metrics:
+- request latency histograms per route, method and status
+- Oracle calls (executes / fetches, an estimate of client round-trips), rows
+  fetched, time spent in calls and connection acquisition per route
+- parquet dataset cache hits and misses per route
+
+Counters for the current request are collected in a context variable that the
+database layer and the parquet service update; Starlette's threadpool copies
+the context, so synchronous endpoints are measured as well. With
+METRICS_SERVER_TIMING=true the same numbers are sent in a Server-Timing header.
+"""
+
+import os
+import math
+import time
+import threading
+import contextvars
+from typing import Dict, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").lower() == "true"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Per-request counters, by field name: (metric name, help text)
+REQUEST_COUNTERS = {
+    "oracle_round_trips": ("oracle_round_trips_total", "Oracle client round-trips (executes and fetch batches)"),
+    "oracle_rows_fetched": ("oracle_rows_fetched_total", "Rows fetched from Oracle"),
+    "oracle_call_seconds": ("oracle_call_seconds_total", "Time spent in Oracle execute/fetch calls"),
+    "oracle_connect_seconds": ("oracle_connection_acquire_seconds_total", "Time spent opening or acquiring Oracle connections"),
+    "oracle_connections": ("oracle_connections_acquired_total", "Oracle connections opened or acquired from a pool"),
+    "parquet_cache_hits": ("parquet_cache_hits_total", "Parquet dataset loads served from the in-memory cache"),
+    "parquet_cache_misses": ("parquet_cache_misses_total", "Parquet dataset loads read from disk"),
+}
+
+
+class RequestMetrics:
+    """Counters of a single request; updated from the event loop and worker threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values: Dict[str, float] = {name: 0 for name in REQUEST_COUNTERS}
+
+    def add(self, **increments: float):
+        with self._lock:
+            for name, value in increments.items():
+                self.values[name] += value
+
+
+_current_request: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    "dataquery_request_metrics", default=None
+)
+
+
+def current_request_metrics() -> Optional[RequestMetrics]:
+    return _current_request.get()
+
+
+def record_oracle_call(seconds: float, rows: int = 0, round_trips: int = 1):
+    metrics = _current_request.get()
+    if metrics is not None:
+        metrics.add(oracle_round_trips=round_trips, oracle_rows_fetched=rows, oracle_call_seconds=seconds)
+
+
+def record_connection_acquire(seconds: float):
+    metrics = _current_request.get()
+    if metrics is not None:
+        metrics.add(oracle_connect_seconds=seconds, oracle_connections=1)
+
+
+def record_parquet_cache(hit: bool):
+    metrics = _current_request.get()
+    if metrics is not None:
+        metrics.add(**{"parquet_cache_hits" if hit else "parquet_cache_misses": 1})
+
+
+class MetricsRegistry:
+    """Process-wide aggregates rendered in Prometheus text exposition format"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # (method, route, status) -> [bucket counts..., +Inf count], sum
+        self._latency: Dict[Tuple[str, str, str], List[float]] = {}
+        self._latency_sum: Dict[Tuple[str, str, str], float] = {}
+        # route -> counter values
+        self._counters: Dict[str, Dict[str, float]] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, request_metrics: RequestMetrics):
+        key = (method, route, str(status))
+        with self._lock:
+            counts = self._latency.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._latency_sum[key] = self._latency_sum.get(key, 0.0) + seconds
+
+            totals = self._counters.setdefault(route, {name: 0 for name in REQUEST_COUNTERS})
+            for name, value in request_metrics.values.items():
+                totals[name] += value
+
+    @staticmethod
+    def _labels(**labels: str) -> str:
+        def escape(value) -> str:
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+    @staticmethod
+    def _number(value: float) -> str:
+        if isinstance(value, float) and not value.is_integer():
+            return repr(value)
+        return str(int(value))
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_request_duration_seconds HTTP request latency",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (method, route, status), counts in sorted(self._latency.items()):
+                for bound, count in zip(self.buckets, counts):
+                    labels = self._labels(method=method, route=route, status=status, le=repr(bound))
+                    lines.append(f"http_request_duration_seconds_bucket{labels} {count}")
+                labels = self._labels(method=method, route=route, status=status, le="+Inf")
+                lines.append(f"http_request_duration_seconds_bucket{labels} {counts[-1]}")
+                labels = self._labels(method=method, route=route, status=status)
+                lines.append(f"http_request_duration_seconds_sum{labels} {self._number(self._latency_sum[(method, route, status)])}")
+                lines.append(f"http_request_duration_seconds_count{labels} {counts[-1]}")
+
+            for field, (metric, help_text) in REQUEST_COUNTERS.items():
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for route, totals in sorted(self._counters.items()):
+                    lines.append(f"{metric}{self._labels(route=route)} {self._number(totals[field])}")
+        return "\n".join(lines) + "\n"
+
+
+def server_timing_header(total_seconds: float, request_metrics: RequestMetrics) -> str:
+    values = request_metrics.values
+    parts = [
+        f"app;dur={total_seconds * 1000:.1f}",
+        f'db;dur={values["oracle_call_seconds"] * 1000:.1f};desc="{int(values["oracle_round_trips"])} round-trips, '
+        f'{int(values["oracle_rows_fetched"])} rows"',
+        f'conn;dur={values["oracle_connect_seconds"] * 1000:.1f};desc="{int(values["oracle_connections"])} connections"',
+    ]
+    if values["parquet_cache_hits"] or values["parquet_cache_misses"]:
+        parts.append(
+            f'parquet;desc="{int(values["parquet_cache_hits"])} cache hits, {int(values["parquet_cache_misses"])} misses"'
+        )
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request and collecting its per-request counters"""
+
+    def __init__(self, app, registry: "MetricsRegistry" = None, server_timing: bool = METRICS_SERVER_TIMING):
+        self.app = app
+        self.registry = registry or metrics_registry
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        request_metrics = RequestMetrics()
+        token = _current_request.set(request_metrics)
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((
+                        b"server-timing",
+                        server_timing_header(time.perf_counter() - started, request_metrics).encode("latin-1")
+                    ))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            self.registry.observe(
+                scope.get("method", ""), route_path, status["code"], time.perf_counter() - started, request_metrics
+            )
+
+
+def estimate_fetch_round_trips(rows: int, arraysize: int) -> int:
+    """fetchall() transfers rows in batches of cursor.arraysize; the last empty batch ends the fetch"""
+    return max(1, math.ceil(rows / max(1, arraysize)))
+
+
+# Global instance
+metrics_registry = MetricsRegistry()
@@ -11,6 +11,15 @@ class QueryRequest(BaseModel):
     sort_by: Optional[str] = None
     sort_order: Optional[str] = "ASC"
     limit: Optional[int] = 100
+    bypass_cache: Optional[bool] = False
+    check_plan: Optional[bool] = False
+    timeout_seconds: Optional[int] = None
+
+class CountEstimateRequest(QueryRequest):
+    """Fast audience sizing: sampled COUNT(*) and APPROX_COUNT_DISTINCT of one column"""
+    sample_percent: Optional[float] = None
+    distinct_column: Optional[str] = None
+    run_exact: Optional[bool] = False
 
 class ConnectionTestRequest(BaseModel):
     host: Optional[str] = None
@@ -78,6 +87,44 @@ class QueryResultResponse(BaseModel):
     message: Optional[str] = None
     error: Optional[str] = None
     execution_time: Optional[str] = None
+    cached: Optional[bool] = None
+    plan_warnings: Optional[List[str]] = None
+    request_id: Optional[str] = None
+
+class CountEstimate(BaseModel):
+    estimate: int
+    lower_bound: int
+    upper_bound: int
+    relative_error: Optional[float] = None
+    method: str
+    confidence: float
+    sample_percent: Optional[float] = None
+    sample_rows: Optional[int] = None
+
+class CountEstimateResponse(BaseModel):
+    success: bool
+    exact: bool = False
+    count: Optional[CountEstimate] = None
+    distinct: Optional[CountEstimate] = None
+    message: Optional[str] = None
+    error: Optional[str] = None
+    execution_time: Optional[str] = None
+    request_id: Optional[str] = None
+    exact_job_id: Optional[str] = None
+    exact_status_url: Optional[str] = None
+
+class QueryPlanResponse(BaseModel):
+    success: bool
+    sql: str
+    estimated_cost: Optional[int] = None
+    estimated_rows: Optional[int] = None
+    scanned_rows: Optional[int] = None
+    full_table_scans: List[Dict[str, Any]] = []
+    warnings: List[str] = []
+    exceeds_threshold: bool = False
+    blocked: bool = False
+    thresholds: Optional[Dict[str, Any]] = None
+    plan: List[Dict[str, Any]] = []
 
 class QueryHistoryResponse(BaseModel):
     id: int
@@ -125,16 +172,20 @@ class AllConnectionsTestResponse(BaseModel):
 
 class DataResponse(BaseModel):
     data: List[Dict[str, Any]]
-    total_count: int
+    total_count: Optional[int] = None
     page: int
     limit: int
     total_pages: int
+    count_is_approximate: bool = False
+    next_cursor: Optional[str] = None
+    has_more: bool = False
 
 class StatsResponse(BaseModel):
     total_queries: int
     active_databases: int
     total_users: int
     avg_response_time: str
+    query_cache: Optional[Dict[str, Any]] = None
 
 # Settings Models
 class DatabaseSettings(BaseModel):
@@ -268,6 +319,8 @@ class CampaignDeployOptions(BaseModel):
     deploy_targeting: bool = True
     deploy_users: bool = True
     deploy_offlimit: bool = True
+    batch_size: Optional[int] = None  # Rows per executemany, CAMPAIGN_DEPLOY_BATCH_SIZE by default
+    skip_bad_records: bool = False  # Keep loading when Oracle rejects individual rows
 
 class RB1CampaignMetadata(BaseModel):
     """RB1 Campaign metadata"""
@@ -297,7 +350,8 @@ class CampaignCreateRequest(BaseModel):
     """Request to create a campaign"""
     campaign_type: str  # 'RB1' or 'RB3'
     metadata: Dict[str, Any]  # Will be validated as RB1 or RB3 metadata
-    user_iins: List[str]  # List of user IINs for the campaign
+    user_iins: List[str] = []  # List of user IINs for the campaign
+    audience_id: Optional[str] = None  # Audience stored by /campaigns/load-rb-automatic, replaces user_iins
     filter_config: Optional[CampaignFilterConfig] = None
     deploy_options: Optional[CampaignDeployOptions] = None
 
@@ -320,6 +374,12 @@ class CampaignDeploymentResult(BaseModel):
     total_users: int
     errors: List[str]
     success: bool
+    rows_inserted: Dict[str, int] = {}
+    skipped_records: int = 0
+    failed_records: List[Dict[str, Any]] = []
+    table_durations: Dict[str, float] = {}  # Seconds spent loading each table
+    rolled_back: bool = False  # Nothing was committed because a table failed
+    compensated_tables: List[str] = []  # Committed tables cleaned up after a later failure
 
 class CampaignCreateResponse(BaseModel):
     """Response from campaign creation"""
@@ -371,10 +431,16 @@ class FileUploadResponse(BaseModel):
     iins_extracted: int
     sample_data: List[Dict[str, Any]]
     validation_errors: List[str] = []
+    invalid_count: int = 0
+    upload_id: Optional[str] = None
+    sha256: Optional[str] = None
+    file_size: Optional[int] = None
+    duplicate: bool = False
 
 class FileProcessRequest(BaseModel):
-    """Request for processing uploaded file"""
-    filename: str
+    """Request for processing uploaded file (by upload_id from /files/upload, or by filename)"""
+    filename: Optional[str] = None
+    upload_id: Optional[str] = None
     iin_column: str
     filter_config: Optional[CampaignFilterConfig] = None
     
@@ -386,4 +452,29 @@ class FileProcessResponse(BaseModel):
     processed_count: int
     filtered_count: int
     iins: List[str]
-    filter_stats: Dict[str, Any] 
\ No newline at end of file
+    filter_stats: Dict[str, Any] 
+
+# Background Job Models
+class JobSubmitResponse(BaseModel):
+    """Response for a job put into the background queue"""
+    job_id: str
+    status: str
+    status_url: str
+    result_url: str
+
+class JobStatusResponse(BaseModel):
+    """Status and progress of a background job"""
+    job_id: str
+    job_type: str
+    status: str
+    stage: Optional[str] = None
+    rows_processed: int = 0
+    rows_total: Optional[int] = None
+    eta_seconds: Optional[float] = None
+    created_by: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
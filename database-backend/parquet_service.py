@@ -15,6 +15,8 @@ from functools import lru_cache
 import json
 from pathlib import Path
 
+from metrics import record_parquet_cache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -196,7 +198,9 @@ class ParquetDataService:
         # Check cache first
         if use_cache and dataset_name in self._cache and self._is_cache_valid(dataset_name):
             logger.info(f"Loading {dataset_name} from cache")
+            record_parquet_cache(hit=True)
             return self._cache[dataset_name]
+        record_parquet_cache(hit=False)
         
         # Get file path
         try:
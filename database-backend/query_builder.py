@@ -1,6 +1,7 @@
 import re
-from typing import Dict, List, Any, Optional
-from database import is_table_allowed, get_table_columns, is_table_allowed_case_insensitive, get_table_columns_case_insensitive
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+from database import get_table_metadata, get_column_metadata
 
 class QueryBuilder:
     """Build safe SQL queries from frontend requests"""
@@ -20,23 +21,44 @@ class QueryBuilder:
             'in': 'IN',
             'not_in': 'NOT IN'
         }
+        # Oracle limit on the number of expressions in an IN list
+        self.max_in_list_size = 1000
     
     def validate_table_access(self, database_id: str, table_name: str) -> bool:
         """Validate that the table is allowed for access"""
-        return is_table_allowed_case_insensitive(database_id, table_name)
+        return get_table_metadata(database_id, table_name) is not None
     
     def validate_columns(self, database_id: str, table_name: str, columns: List[str]) -> bool:
         """Validate that all requested columns exist in the table"""
         if not columns:
             return True
         
-        allowed_columns = get_table_columns_case_insensitive(database_id, table_name)
-        allowed_column_names = [col['name'].lower() for col in allowed_columns]
+        return all(get_column_metadata(database_id, table_name, column) for column in columns)
+    
+    def coerce_value(self, value: Any, column_type: Optional[str], column: str) -> Any:
+        """Convert a filter value to the Python type matching the column, so Oracle binds it natively"""
+        if not isinstance(value, str) or not column_type:
+            return value
         
-        for column in columns:
-            if column.lower() not in allowed_column_names:
-                return False
-        return True
+        text = value.strip()
+        if column_type == 'NUMBER':
+            try:
+                return int(text) if re.fullmatch(r'[+-]?\d+', text) else float(text)
+            except ValueError:
+                raise ValueError(f"Invalid numeric value for column {column}: {value}")
+        
+        if column_type == 'DATE':
+            for date_format in ('%d.%m.%Y', '%d.%m.%Y %H:%M:%S'):
+                try:
+                    return datetime.strptime(text, date_format)
+                except ValueError:
+                    pass
+            try:
+                return datetime.fromisoformat(text)
+            except ValueError:
+                raise ValueError(f"Invalid date value for column {column}: {value}")
+        
+        return value
     
     def sanitize_identifier(self, identifier: str) -> str:
         """Sanitize SQL identifiers (table/column names)"""
@@ -61,47 +83,62 @@ class QueryBuilder:
                 raise ValueError(f"Invalid identifier: {identifier}")
             return identifier.upper()
     
-    def sanitize_value(self, value: Any, operator: str) -> str:
-        """Sanitize values for SQL queries"""
-        if value is None:
-            return 'NULL'
-        
-        if operator in ['IS NULL', 'IS NOT NULL']:
-            return ''
-        
-        if isinstance(value, (int, float)):
-            return str(value)
-        
-        if isinstance(value, str):
-            # Escape single quotes
-            escaped = value.replace("'", "''")
-            if operator in ['LIKE', 'NOT LIKE']:
-                return f"'%{escaped}%'"
-            return f"'{escaped}'"
-        
-        if isinstance(value, list) and operator in ['IN', 'NOT IN']:
-            sanitized_values = []
-            for v in value:
-                if isinstance(v, (int, float)):
-                    sanitized_values.append(str(v))
-                else:
-                    escaped_v = str(v).replace("'", "''")
-                    sanitized_values.append(f"'{escaped_v}'")
-            return f"({', '.join(sanitized_values)})"
-        
-        # Default case for other types
-        escaped_value = str(value).replace("'", "''")
-        return f"'{escaped_value}'"
+    def bind_param(self, params: Dict[str, Any], value: Any) -> str:
+        """Register a bind value and return its placeholder (:b0, :b1, ...)"""
+        name = f"b{len(params)}"
+        params[name] = value
+        return f":{name}"
+    
+    def in_list_bucket_size(self, count: int) -> int:
+        """Round an IN list length up to a fixed bucket so statements are shared between list sizes"""
+        size = 1
+        while size < count:
+            size *= 2
+        return min(size, self.max_in_list_size)
     
-    def build_where_clause(self, database_id: str, table_name: str, filters: List[Dict[str, Any]]) -> str:
-        """Build WHERE clause from filters"""
+    def bind_value(self, value: Any, operator: str, params: Dict[str, Any], column: str,
+                   column_type: Optional[str] = None) -> Optional[str]:
+        """Bind a filter value and return the condition for it, or None if the value is empty"""
+        if operator in ['IN', 'NOT IN']:
+            if isinstance(value, str):
+                # Frontend sends IN lists as comma separated text
+                values = [v.strip() for v in value.split(',') if v.strip()]
+            elif isinstance(value, (list, tuple, set)):
+                values = [v for v in value if v is not None and v != '']
+            else:
+                values = [value] if value is not None and value != '' else []
+            if not values:
+                return None
+            values = [self.coerce_value(v, column_type, column) for v in values]
+            
+            # Oracle allows at most 1000 expressions per IN list; longer lists are split
+            chunks = []
+            for start in range(0, len(values), self.max_in_list_size):
+                chunk = values[start:start + self.max_in_list_size]
+                # Pad with the last value up to the bucket size: duplicates don't change the result
+                chunk = chunk + [chunk[-1]] * (self.in_list_bucket_size(len(chunk)) - len(chunk))
+                placeholders = ', '.join(self.bind_param(params, v) for v in chunk)
+                chunks.append(f"{column} {operator} ({placeholders})")
+            
+            if len(chunks) == 1:
+                return chunks[0]
+            joiner = ' OR ' if operator == 'IN' else ' AND '
+            return f"({joiner.join(chunks)})"
+        
+        if value is None or value == '' or isinstance(value, (list, dict)):
+            return None
+        
+        if operator in ['LIKE', 'NOT LIKE']:
+            return f"{column} {operator} {self.bind_param(params, f'%{value}%')}"
+        
+        return f"{column} {operator} {self.bind_param(params, self.coerce_value(value, column_type, column))}"
+    
+    def build_where_clause(self, database_id: str, table_name: str, filters: List[Dict[str, Any]],
+                           params: Dict[str, Any]) -> str:
+        """Build WHERE clause from filters; filter values are added to params as bind variables"""
         if not filters:
             return ""
         
-        # Get allowed columns for validation
-        allowed_columns = get_table_columns_case_insensitive(database_id, table_name)
-        allowed_column_names = [col['name'].lower() for col in allowed_columns]
-        
         conditions = []
         search_conditions = []
         
@@ -111,7 +148,8 @@ class QueryBuilder:
             value = filter_item.get('value')
             
             # Validate column
-            if column not in allowed_column_names:
+            column_info = get_column_metadata(database_id, table_name, column)
+            if not column_info:
                 continue
             
             # Validate operator
@@ -124,10 +162,8 @@ class QueryBuilder:
             if operator in ['is_null', 'is_not_null']:
                 condition = f"{sanitized_column} {sql_operator}"
             else:
-                sanitized_value = self.sanitize_value(value, sql_operator)
-                if sanitized_value:  # Skip if value is empty for non-null operators
-                    condition = f"{sanitized_column} {sql_operator} {sanitized_value}"
-                else:
+                condition = self.bind_value(value, sql_operator, params, sanitized_column, column_info['type'])
+                if not condition:  # Skip if value is empty for non-null operators
                     continue
             
             # If this is a search filter (contains operator), group them with OR
@@ -152,10 +188,7 @@ class QueryBuilder:
             return ""
         
         # Validate column exists
-        allowed_columns = get_table_columns_case_insensitive(database_id, table_name)
-        allowed_column_names = [col['name'].lower() for col in allowed_columns]
-        
-        if sort_by.lower() not in allowed_column_names:
+        if not get_column_metadata(database_id, table_name, sort_by):
             return ""
         
         # Validate sort order
@@ -181,8 +214,8 @@ class QueryBuilder:
         
         return f"SELECT {', '.join(sanitized_columns)}"
     
-    def build_query(self, request_data: Dict[str, Any]) -> str:
-        """Build complete SQL query from request data"""
+    def build_query(self, request_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Build complete SQL query from request data; returns (sql, bind params)"""
         database_id = request_data.get('database_id', '').upper()
         table_name = request_data.get('table', '')
         columns = request_data.get('columns')
@@ -195,10 +228,12 @@ class QueryBuilder:
         if not self.validate_table_access(database_id, table_name):
             raise ValueError(f"Access denied to table: {table_name}")
         
+        params: Dict[str, Any] = {}
+        
         # Build query components
         select_clause = self.build_select_clause(database_id, table_name, columns)
         table_clause = f" FROM {self.sanitize_identifier(table_name)}"
-        where_clause = self.build_where_clause(database_id, table_name, filters)
+        where_clause = self.build_where_clause(database_id, table_name, filters, params)
         order_clause = self.build_order_clause(database_id, table_name, sort_by, sort_order)
         
         # Build complete query
@@ -206,12 +241,12 @@ class QueryBuilder:
         
         # Add limit using Oracle ROWNUM
         if limit and limit > 0:
-            query = f"SELECT * FROM ({query}) WHERE ROWNUM <= {int(limit)}"
+            query = f"SELECT * FROM ({query}) WHERE ROWNUM <= {self.bind_param(params, int(limit))}"
         
-        return query
+        return query, params
     
-    def build_count_query(self, request_data: Dict[str, Any]) -> str:
-        """Build count query for pagination"""
+    def build_count_query(self, request_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Build count query for pagination; returns (sql, bind params)"""
         database_id = request_data.get('database_id', '').upper()
         table_name = request_data.get('table', '')
         filters = request_data.get('filters', [])
@@ -220,7 +255,46 @@ class QueryBuilder:
         if not self.validate_table_access(database_id, table_name):
             raise ValueError(f"Access denied to table: {table_name}")
         
+        params: Dict[str, Any] = {}
+        table_clause = f" FROM {self.sanitize_identifier(table_name)}"
+        where_clause = self.build_where_clause(database_id, table_name, filters, params)
+        
+        return f"SELECT COUNT(*){table_clause}{where_clause}", params
+    
+    def build_sample_count_query(self, request_data: Dict[str, Any], sample_percent: float) -> Tuple[str, Dict[str, Any]]:
+        """Build COUNT(*) over a block sample of the table; returns (sql, bind params)"""
+        database_id = request_data.get('database_id', '').upper()
+        table_name = request_data.get('table', '')
+        filters = request_data.get('filters', [])
+        
+        if not self.validate_table_access(database_id, table_name):
+            raise ValueError(f"Access denied to table: {table_name}")
+        
+        params: Dict[str, Any] = {}
+        # The sample size cannot be a bind variable; it is validated as a float by the caller
+        sample_literal = f"{float(sample_percent):.6f}".rstrip('0').rstrip('.')
+        sample_clause = f" SAMPLE BLOCK ({sample_literal})" if sample_percent < 100 else ""
+        table_clause = f" FROM {self.sanitize_identifier(table_name)}{sample_clause}"
+        where_clause = self.build_where_clause(database_id, table_name, filters, params)
+        
+        return f"SELECT COUNT(*) AS sample_rows{table_clause}{where_clause}", params
+    
+    def build_distinct_count_query(self, request_data: Dict[str, Any], column: str,
+                                   approximate: bool = True) -> Tuple[str, Dict[str, Any]]:
+        """Build APPROX_COUNT_DISTINCT (or exact COUNT(DISTINCT)) of a column; returns (sql, bind params)"""
+        database_id = request_data.get('database_id', '').upper()
+        table_name = request_data.get('table', '')
+        filters = request_data.get('filters', [])
+        
+        if not self.validate_table_access(database_id, table_name):
+            raise ValueError(f"Access denied to table: {table_name}")
+        if not self.validate_columns(database_id, table_name, [column]):
+            raise ValueError(f"Invalid column: {column}")
+        
+        params: Dict[str, Any] = {}
+        column_sql = self.sanitize_identifier(column)
+        aggregate = f"APPROX_COUNT_DISTINCT({column_sql})" if approximate else f"COUNT(DISTINCT {column_sql})"
         table_clause = f" FROM {self.sanitize_identifier(table_name)}"
-        where_clause = self.build_where_clause(database_id, table_name, filters)
+        where_clause = self.build_where_clause(database_id, table_name, filters, params)
         
-        return f"SELECT COUNT(*){table_clause}{where_clause}" 
\ No newline at end of file
+        return f"SELECT {aggregate} AS distinct_count{table_clause}{where_clause}", params
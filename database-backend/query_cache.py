@@ -0,0 +1,159 @@
+"""
+Query Result Cache for DataQuery Pro
+
+In-process LRU cache for results of QueryBuilder-generated SQL. Entries are keyed on
+the normalized SQL text + bind values + database_id, expire after a per-table TTL
+and are evicted least-recently-used once the cache exceeds its byte budget.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "300"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+QUERY_CACHE_MAX_ENTRY_BYTES = int(os.getenv("QUERY_CACHE_MAX_ENTRY_BYTES", str(8 * 1024 * 1024)))
+
+# Tables written by the application itself change often, reference tables rarely.
+# Override with QUERY_CACHE_TABLE_TTLS="SCHEMA.TABLE=seconds,..."
+DEFAULT_TABLE_TTLS = {
+    "DSSB_APP.SOFTCOLLECTION_THEORIES": 60,
+    "DSSB_APP.SC_LOCAL_CONTROL": 60,
+    "DSSB_APP.SC_LOCAL_TARGET": 60,
+    "DSSB_DM.RB_CLIENTS": 900,
+}
+
+
+def _parse_table_ttls(value: str) -> Dict[str, int]:
+    ttls = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        table, seconds = item.split("=", 1)
+        try:
+            ttls[table.strip().upper()] = int(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring invalid cache TTL entry: {item}")
+    return ttls
+
+
+class QueryResultCache:
+    """Thread-safe LRU cache of query results with per-table TTL and byte budget"""
+
+    def __init__(self, default_ttl: int = QUERY_CACHE_TTL, max_bytes: int = QUERY_CACHE_MAX_BYTES,
+                 max_entry_bytes: int = QUERY_CACHE_MAX_ENTRY_BYTES, enabled: bool = QUERY_CACHE_ENABLED):
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.enabled = enabled
+        self.table_ttls = dict(DEFAULT_TABLE_TTLS)
+        self.table_ttls.update(_parse_table_ttls(os.getenv("QUERY_CACHE_TABLE_TTLS", "")))
+
+        # key -> (expires_at, size_bytes, table, value)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(sql: str, params: Optional[Dict[str, Any]] = None, database_id: str = "") -> str:
+        """Build a cache key from whitespace-normalized SQL, sorted bind values and database"""
+        normalized_sql = re.sub(r"\s+", " ", sql).strip()
+        normalized_params = json.dumps(sorted((params or {}).items()), default=str)
+        raw = f"{database_id.upper()}\x00{normalized_sql}\x00{normalized_params}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def ttl_for_table(self, table: Optional[str]) -> int:
+        if not table:
+            return self.default_ttl
+        return self.table_ttls.get(table.upper(), self.default_ttl)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a cached value or None; counts hits and misses"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, _table, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, table: Optional[str] = None) -> bool:
+        """Store a value; returns False if it is too large to cache"""
+        if not self.enabled:
+            return False
+        size = len(json.dumps(value, default=str))
+        if size > self.max_entry_bytes:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.monotonic() + self.ttl_for_table(table)
+            self._entries[key] = (expires_at, size, table.upper() if table else None, value)
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes and self._entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+        return True
+
+    def invalidate_table(self, table: str) -> int:
+        """Drop all entries produced by queries on ``table``"""
+        table = table.upper()
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry[2] == table]
+            for key in keys:
+                self._remove(key)
+        if keys:
+            logger.info(f"Invalidated {len(keys)} cached results for {table}")
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _remove(self, key: str):
+        # Caller must hold the lock
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+
+# Global instance
+query_cache = QueryResultCache()
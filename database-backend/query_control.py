@@ -0,0 +1,181 @@
+"""
+Query Control for DataQuery Pro
+
+Bounds and tracks user-built (QueryBuilder) queries while they run:
+- every query gets a cx_Oracle callTimeout (QUERY_CALL_TIMEOUT_SECONDS, lowered per request)
+- running queries are registered by request id so they can be cancelled through
+  /query/cancel/{request_id}, which calls connection.cancel()
+- the HTTP client is polled while the query runs and a disconnect cancels the Oracle work
+- each user may run at most QUERY_MAX_CONCURRENT_PER_USER queries at a time
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+QUERY_CALL_TIMEOUT_SECONDS = int(os.getenv("QUERY_CALL_TIMEOUT_SECONDS", "120"))
+QUERY_MAX_CONCURRENT_PER_USER = int(os.getenv("QUERY_MAX_CONCURRENT_PER_USER", "2"))
+QUERY_DISCONNECT_POLL_SECONDS = float(os.getenv("QUERY_DISCONNECT_POLL_SECONDS", "0.5"))
+
+CANCEL_REASON_USER = "user"
+CANCEL_REASON_DISCONNECT = "client_disconnected"
+
+# Driver errors raised when callTimeout expires
+TIMEOUT_ERROR_MARKERS = ("DPI-1067", "ORA-03156")
+
+
+class QueryLimitExceeded(Exception):
+    """Raised when a user already runs the maximum number of concurrent queries"""
+
+
+class QueryCancelled(RuntimeError):
+    """Raised from the connect callback when the query was cancelled before it had a connection"""
+
+
+class ActiveQuery:
+    """A running query and the connection executing it"""
+
+    def __init__(self, request_id: str, username: str, sql: str, timeout_seconds: int):
+        self.request_id = request_id
+        self.username = username
+        self.sql = sql
+        self.timeout_seconds = timeout_seconds
+        self.started_at = datetime.now()
+        self.connection = None
+        self.cancelled = False
+        self.cancel_reason: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "user": self.username,
+            "sql": self.sql,
+            "started_at": self.started_at.isoformat(),
+            "running_seconds": round((datetime.now() - self.started_at).total_seconds(), 1),
+            "timeout_seconds": self.timeout_seconds,
+            "cancelled": self.cancelled,
+        }
+
+
+class QueryControl:
+    """Registry of running queries with timeouts, cancellation and per-user limits"""
+
+    def __init__(self, max_per_user: int = QUERY_MAX_CONCURRENT_PER_USER,
+                 call_timeout_seconds: int = QUERY_CALL_TIMEOUT_SECONDS,
+                 poll_seconds: float = QUERY_DISCONNECT_POLL_SECONDS):
+        self.max_per_user = max_per_user
+        self.call_timeout_seconds = call_timeout_seconds
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._active: Dict[str, ActiveQuery] = {}
+
+    @staticmethod
+    def new_request_id(requested: Optional[str] = None) -> str:
+        """Use the client supplied id (so it can cancel before the response arrives) or generate one"""
+        if requested and len(requested) <= 64:
+            return requested
+        return uuid.uuid4().hex
+
+    def timeout_for(self, requested_seconds: Optional[int] = None) -> int:
+        if requested_seconds and requested_seconds > 0:
+            return min(int(requested_seconds), self.call_timeout_seconds)
+        return self.call_timeout_seconds
+
+    def _start(self, request_id: str, username: str, sql: str, timeout_seconds: int) -> ActiveQuery:
+        with self._lock:
+            if request_id in self._active:
+                raise ValueError(f"Request id {request_id} is already running")
+            running = sum(1 for query in self._active.values() if query.username == username)
+            if self.max_per_user and running >= self.max_per_user:
+                raise QueryLimitExceeded(
+                    f"Слишком много одновременных запросов ({running} из {self.max_per_user}), "
+                    f"дождитесь завершения или отмените выполняющиеся"
+                )
+            query = ActiveQuery(request_id, username, sql, timeout_seconds)
+            self._active[request_id] = query
+            return query
+
+    def _attach(self, query: ActiveQuery, connection):
+        """
+        Called from the worker thread once the connection exists. connection.cancel() only
+        interrupts a running call, so a query cancelled before this point must not start at all.
+        """
+        with self._lock:
+            if query.cancelled:
+                raise QueryCancelled(f"Query {query.request_id} was cancelled before it started")
+            query.connection = connection
+
+    def _finish(self, query: ActiveQuery):
+        with self._lock:
+            self._active.pop(query.request_id, None)
+            query.connection = None
+
+    def cancel(self, request_id: str, username: Optional[str] = None, reason: str = CANCEL_REASON_USER) -> bool:
+        """Cancel a running query; ``username`` restricts cancellation to the query owner"""
+        with self._lock:
+            query = self._active.get(request_id)
+            if query is None or (username is not None and query.username != username):
+                return False
+            query.cancelled = True
+            query.cancel_reason = reason
+            connection = query.connection
+        if connection is not None:
+            try:
+                connection.cancel()
+            except Exception as e:
+                logger.warning(f"Cancelling query {request_id} failed: {e}")
+        logger.info(f"Query {request_id} of {query.username} cancelled ({reason})")
+        return True
+
+    def list_active(self, username: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                query.to_dict() for query in self._active.values()
+                if username is None or query.username == username
+            ]
+
+    async def run(self, request_id: str, username: str, sql: str,
+                  fn: Callable[[Callable[[Any], None], int], Dict[str, Any]],
+                  http_request=None, timeout_seconds: Optional[int] = None):
+        """
+        Run ``fn(on_connect, call_timeout_ms)`` in the threadpool as a tracked query.
+        Returns (result, active_query); a client disconnect cancels the database call.
+        """
+        timeout = self.timeout_for(timeout_seconds)
+        query = self._start(request_id, username, sql, timeout)
+        try:
+            task = asyncio.ensure_future(
+                run_in_threadpool(fn, lambda connection: self._attach(query, connection), timeout * 1000)
+            )
+            while True:
+                done, _pending = await asyncio.wait({task}, timeout=self.poll_seconds)
+                if done:
+                    return task.result(), query
+                if http_request is not None and not query.cancelled and await http_request.is_disconnected():
+                    self.cancel(request_id, reason=CANCEL_REASON_DISCONNECT)
+        finally:
+            self._finish(query)
+
+    @staticmethod
+    def failure_message(query: ActiveQuery, result: Dict[str, Any]) -> Optional[str]:
+        """User-facing message for cancelled or timed-out queries, None for other failures"""
+        if query.cancelled:
+            if query.cancel_reason == CANCEL_REASON_DISCONNECT:
+                return "Запрос отменен: клиент отключился"
+            return "Запрос отменен пользователем"
+        error = str(result.get("error", ""))
+        if any(marker in error for marker in TIMEOUT_ERROR_MARKERS):
+            return f"Превышено время выполнения запроса ({query.timeout_seconds} с)"
+        return None
+
+
+# Global instance
+query_control = QueryControl()
@@ -0,0 +1,219 @@
+"""
+Query History Store for DataQuery Pro
+
+Persistent history of executed QueryBuilder queries. Entries live in a local
+SQLite store with an autoincrement id and indexes on user, table and time, so
+recording a query is a single insert and history pages are index range scans.
+Dashboard statistics are read from counters updated with every insert instead
+of being recomputed from the whole history. Old entries are pruned by age and
+by row count (QUERY_HISTORY_RETENTION_DAYS / QUERY_HISTORY_MAX_ROWS); the
+counters keep their all-time values.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUERY_HISTORY_PATH = os.getenv("QUERY_HISTORY_PATH", "state/query_history.sqlite3")
+QUERY_HISTORY_RETENTION_DAYS = int(os.getenv("QUERY_HISTORY_RETENTION_DAYS", "90"))
+QUERY_HISTORY_MAX_ROWS = int(os.getenv("QUERY_HISTORY_MAX_ROWS", "100000"))
+
+# Retention runs once per this many recorded queries, keeping inserts O(1) amortized
+PRUNE_EVERY = 500
+
+
+class QueryHistoryStore:
+    """SQLite-backed query history with pre-aggregated dashboard counters"""
+
+    def __init__(self, db_path: str = QUERY_HISTORY_PATH, retention_days: int = QUERY_HISTORY_RETENTION_DAYS,
+                 max_rows: int = QUERY_HISTORY_MAX_ROWS):
+        self.db_path = Path(db_path)
+        self.retention_days = retention_days
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._inserts_since_prune = 0
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_schema(self):
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._connect()
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS query_history (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        sql TEXT NOT NULL,
+                        database_id TEXT NOT NULL,
+                        table_name TEXT NOT NULL,
+                        execution_seconds REAL NOT NULL,
+                        status TEXT NOT NULL,
+                        created_at TEXT NOT NULL,
+                        row_count INTEGER NOT NULL DEFAULT 0,
+                        username TEXT
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_history_created ON query_history(created_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_history_user ON query_history(username, created_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_history_table ON query_history(table_name, created_at)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS query_totals (
+                        id INTEGER PRIMARY KEY CHECK (id = 1),
+                        total_queries INTEGER NOT NULL DEFAULT 0,
+                        successful_queries INTEGER NOT NULL DEFAULT 0,
+                        successful_seconds REAL NOT NULL DEFAULT 0
+                    )
+                """)
+                conn.execute("INSERT OR IGNORE INTO query_totals (id) VALUES (1)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS query_users (
+                        username TEXT PRIMARY KEY,
+                        queries INTEGER NOT NULL DEFAULT 0,
+                        last_query_at TEXT
+                    )
+                """)
+                conn.commit()
+            finally:
+                conn.close()
+            self._initialized = True
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def record(self, sql: str, database_id: str, table: str, execution_seconds: float, status: str,
+               row_count: int = 0, user: Optional[str] = None, created_at: Optional[datetime] = None) -> int:
+        """Append a history entry, update the counters and return the new id"""
+        self._ensure_schema()
+        created = (created_at or datetime.now()).isoformat()
+        succeeded = status == "success"
+        conn = self._connect()
+        try:
+            cursor = conn.execute("""
+                INSERT INTO query_history (sql, database_id, table_name, execution_seconds, status, created_at, row_count, username)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (sql, database_id, table, float(execution_seconds), status, created, int(row_count or 0), user))
+            conn.execute("""
+                UPDATE query_totals SET
+                    total_queries = total_queries + 1,
+                    successful_queries = successful_queries + ?,
+                    successful_seconds = successful_seconds + ?
+                WHERE id = 1
+            """, (1 if succeeded else 0, float(execution_seconds) if succeeded else 0.0))
+            if user:
+                conn.execute("""
+                    INSERT INTO query_users (username, queries, last_query_at) VALUES (?, 1, ?)
+                    ON CONFLICT (username) DO UPDATE SET queries = queries + 1, last_query_at = excluded.last_query_at
+                """, (user, created))
+            conn.commit()
+            entry_id = cursor.lastrowid
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._inserts_since_prune += 1
+            prune = self._inserts_since_prune >= PRUNE_EVERY
+            if prune:
+                self._inserts_since_prune = 0
+        if prune:
+            self.prune()
+        return entry_id
+
+    def prune(self) -> int:
+        """Apply the retention policy; returns the number of deleted entries"""
+        self._ensure_schema()
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        conn = self._connect()
+        try:
+            deleted = conn.execute("DELETE FROM query_history WHERE created_at < ?", (cutoff,)).rowcount
+            # Ids grow with time, so everything below the max_rows-th newest id is the oldest overflow
+            row = conn.execute(
+                "SELECT id FROM query_history ORDER BY id DESC LIMIT 1 OFFSET ?", (self.max_rows,)
+            ).fetchone()
+            if row:
+                deleted += conn.execute("DELETE FROM query_history WHERE id <= ?", (row["id"],)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        if deleted:
+            logger.info(f"Pruned {deleted} query history entries")
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def list(self, page: int = 1, limit: int = 10, user: Optional[str] = None,
+             table: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Newest entries first, optionally filtered by user and/or table"""
+        self._ensure_schema()
+        conditions, params = [], []
+        if user:
+            conditions.append("username = ?")
+            params.append(user)
+        if table:
+            conditions.append("table_name = ?")
+            params.append(table)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT * FROM query_history {where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                (*params, limit, (page - 1) * limit)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        return [
+            {
+                "id": row["id"],
+                "sql": row["sql"],
+                "database_id": row["database_id"],
+                "table": row["table_name"],
+                "execution_time": f"{row['execution_seconds']:.3f}s",
+                "status": row["status"],
+                "created_at": datetime.fromisoformat(row["created_at"]),
+                "row_count": row["row_count"],
+                "user": row["username"],
+            }
+            for row in rows
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """All-time totals for the dashboard, read from the counters"""
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            totals = conn.execute("SELECT * FROM query_totals WHERE id = 1").fetchone()
+            total_users = conn.execute("SELECT COUNT(*) FROM query_users").fetchone()[0]
+        finally:
+            conn.close()
+
+        successful = totals["successful_queries"]
+        return {
+            "total_queries": totals["total_queries"],
+            "successful_queries": successful,
+            "total_users": total_users,
+            "avg_response_seconds": totals["successful_seconds"] / successful if successful else 0.0,
+        }
+
+
+# Global instance
+query_history_store = QueryHistoryStore()
@@ -0,0 +1,127 @@
+"""
+Query Plan Service for DataQuery Pro
+
+Runs EXPLAIN PLAN for SQL generated by QueryBuilder and summarizes the optimizer
+estimates (cost, cardinality, rows scanned, full table scans) so expensive
+queries can be flagged or refused before they are executed.
+
+Thresholds:
+- QUERY_PLAN_MAX_ROWS: estimated rows read by the plan (largest row source)
+- QUERY_PLAN_MAX_COST: optimizer cost of the statement (0 disables the check)
+- QUERY_PLAN_MODE: "warn" returns warnings, "refuse" blocks the query
+"""
+
+import os
+import uuid
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+QUERY_PLAN_MAX_ROWS = int(os.getenv("QUERY_PLAN_MAX_ROWS", "5000000"))
+QUERY_PLAN_MAX_COST = int(os.getenv("QUERY_PLAN_MAX_COST", "0"))
+QUERY_PLAN_MODE = os.getenv("QUERY_PLAN_MODE", "warn").lower()
+
+PLAN_COLUMNS = [
+    "id", "parent_id", "depth", "operation", "options", "object_owner",
+    "object_name", "cost", "cardinality", "bytes", "access_predicates", "filter_predicates"
+]
+
+# Row sources that read a whole segment
+FULL_SCAN_OPERATIONS = {
+    ("TABLE ACCESS", "FULL"),
+    ("TABLE ACCESS", "STORAGE FULL"),
+    ("INDEX", "FAST FULL SCAN"),
+    ("INDEX", "FULL SCAN"),
+}
+
+
+class QueryPlanService:
+    """EXPLAIN PLAN wrapper with threshold checks"""
+
+    def __init__(self, max_rows: int = QUERY_PLAN_MAX_ROWS, max_cost: int = QUERY_PLAN_MAX_COST,
+                 mode: str = QUERY_PLAN_MODE):
+        self.max_rows = max_rows
+        self.max_cost = max_cost
+        self.mode = mode if mode in ("warn", "refuse") else "warn"
+
+    def explain(self, sql: str) -> List[Dict[str, Any]]:
+        """
+        Return the PLAN_TABLE rows of ``sql``. The statement is explained without bind values:
+        EXPLAIN PLAN never peeks binds, and passing them fails with ORA-01036.
+        """
+        from database import get_connection_DSSB_APP
+
+        statement_id = f"dq_{uuid.uuid4().hex[:24]}"
+        conn = get_connection_DSSB_APP()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {sql}")
+            cursor.execute(f"""
+                SELECT {', '.join(PLAN_COLUMNS)}
+                FROM PLAN_TABLE
+                WHERE statement_id = :statement_id
+                ORDER BY id
+            """, {"statement_id": statement_id})
+            rows = [dict(zip(PLAN_COLUMNS, row)) for row in cursor.fetchall()]
+            cursor.execute("DELETE FROM PLAN_TABLE WHERE statement_id = :statement_id", {"statement_id": statement_id})
+            conn.commit()
+            cursor.close()
+            return rows
+        finally:
+            conn.close()
+
+    def assess(self, plan: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Summarize plan rows and compare them against the thresholds"""
+        root = plan[0] if plan else {}
+        scans = []
+        scanned_rows = 0
+        for step in plan:
+            operation = (step.get("operation") or "").upper()
+            options = (step.get("options") or "").upper()
+            if operation in ("TABLE ACCESS", "INDEX"):
+                scanned_rows = max(scanned_rows, step.get("cardinality") or 0)
+            if (operation, options) in FULL_SCAN_OPERATIONS:
+                scans.append({
+                    "operation": f"{operation} {options}",
+                    "object": ".".join(part for part in (step.get("object_owner"), step.get("object_name")) if part),
+                    "estimated_rows": step.get("cardinality"),
+                    "cost": step.get("cost"),
+                })
+
+        estimated_cost = root.get("cost")
+        warnings = []
+        for scan in scans:
+            if scan["operation"].startswith("TABLE ACCESS"):
+                warnings.append(
+                    f"Полное сканирование таблицы {scan['object']} (~{scan['estimated_rows'] or 0:,} строк)"
+                )
+        exceeds = False
+        if self.max_rows and scanned_rows > self.max_rows:
+            exceeds = True
+            warnings.append(f"Оценка читаемых строк {scanned_rows:,} превышает порог {self.max_rows:,}")
+        if self.max_cost and estimated_cost and estimated_cost > self.max_cost:
+            exceeds = True
+            warnings.append(f"Оценка стоимости {estimated_cost:,} превышает порог {self.max_cost:,}")
+
+        return {
+            "estimated_cost": estimated_cost,
+            "estimated_rows": root.get("cardinality"),
+            "scanned_rows": scanned_rows,
+            "full_table_scans": scans,
+            "warnings": warnings,
+            "exceeds_threshold": exceeds,
+            "blocked": exceeds and self.mode == "refuse",
+            "thresholds": {"max_rows": self.max_rows, "max_cost": self.max_cost, "mode": self.mode},
+        }
+
+    def check(self, sql: str) -> Dict[str, Any]:
+        """EXPLAIN + assess; the plan steps are included for display"""
+        plan = self.explain(sql)
+        assessment = self.assess(plan)
+        assessment["plan"] = plan
+        return assessment
+
+
+# Global instance
+query_plan_service = QueryPlanService()
@@ -0,0 +1,174 @@
+"""
+Response Cache for DataQuery Pro
+
+Shared in-process cache for polled GET endpoints (/monitoring/*, /stats):
+- per-endpoint TTLs (RESPONSE_CACHE_TTLS overrides DEFAULT_ENDPOINT_TTLS)
+- request coalescing: concurrent misses for the same key await one computation
+- stale-while-revalidate: within RESPONSE_CACHE_STALE_SECONDS after expiry the
+  stale value is served immediately and refreshed in the background
+- Age / X-Cache response headers so the UI can show how fresh the data is
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Response
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_DEFAULT_TTL = float(os.getenv("RESPONSE_CACHE_DEFAULT_TTL", "30"))
+RESPONSE_CACHE_STALE_SECONDS = float(os.getenv("RESPONSE_CACHE_STALE_SECONDS", "300"))
+
+DEFAULT_ENDPOINT_TTLS = {
+    "stats": 15,
+    "monitoring/overview": 30,
+    "monitoring/daily-statistics": 60,
+    "monitoring/campaign-distribution": 60,
+    "monitoring/recent-activity": 30,
+}
+
+CACHE_STATUS_HIT = "HIT"
+CACHE_STATUS_STALE = "STALE"
+CACHE_STATUS_MISS = "MISS"
+
+
+def _parse_endpoint_ttls(raw: str) -> Dict[str, float]:
+    """Parse "monitoring/overview=10,stats=5" into {"monitoring/overview": 10.0, "stats": 5.0}"""
+    ttls = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        endpoint, seconds = item.rsplit("=", 1)
+        try:
+            ttls[endpoint.strip().strip("/")] = float(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring invalid RESPONSE_CACHE_TTLS entry: {item}")
+    return ttls
+
+
+def _is_cacheable(value: Any) -> bool:
+    """Endpoints report failures as {"success": False, ...}; those are never cached"""
+    return not (isinstance(value, dict) and value.get("success") is False)
+
+
+class ResponseCache:
+    """TTL cache with request coalescing and stale-while-revalidate"""
+
+    def __init__(self, enabled: bool = RESPONSE_CACHE_ENABLED, stale_seconds: float = RESPONSE_CACHE_STALE_SECONDS,
+                 endpoint_ttls: Optional[Dict[str, float]] = None):
+        self.enabled = enabled
+        self.stale_seconds = stale_seconds
+        self.endpoint_ttls = dict(DEFAULT_ENDPOINT_TTLS)
+        self.endpoint_ttls.update(
+            endpoint_ttls if endpoint_ttls is not None else _parse_endpoint_ttls(os.getenv("RESPONSE_CACHE_TTLS", ""))
+        )
+        # key -> (value, stored_at monotonic)
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        # invalidate() is also called from worker threads (background jobs, sync endpoints)
+        self._lock = threading.Lock()
+        # Bumped by invalidate() so a computation started before it does not store its result
+        self._generation = 0
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._background = set()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refresh_errors": 0}
+
+    def ttl_for(self, endpoint: str) -> float:
+        return self.endpoint_ttls.get(endpoint, RESPONSE_CACHE_DEFAULT_TTL)
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``compute`` once per key; concurrent callers share the same future"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            value = await compute()
+            if _is_cacheable(value):
+                with self._lock:
+                    if generation == self._generation:
+                        self._entries[key] = (value, time.monotonic())
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieve the exception so an unawaited future does not log "never retrieved"
+            future.exception()
+            raise
+        finally:
+            # A cancelled leader (CancelledError is not an Exception) must not leave the
+            # coalesced callers waiting forever; they fail like a failed computation
+            if not future.done():
+                future.set_exception(RuntimeError(f"Computation of {key} was cancelled"))
+                future.exception()
+            self._inflight.pop(key, None)
+
+    async def _revalidate(self, key: Hashable, compute: Callable[[], Awaitable[Any]]):
+        try:
+            await self._compute(key, compute)
+        except Exception as e:
+            self._stats["refresh_errors"] += 1
+            logger.warning(f"Background refresh of {key} failed: {e}")
+
+    async def get_or_compute(self, endpoint: str, params: Tuple = (),
+                             compute: Callable[[], Awaitable[Any]] = None) -> Tuple[Any, str, int]:
+        """Return (value, cache status, age in seconds) for an endpoint and its parameters"""
+        if not self.enabled:
+            return await compute(), CACHE_STATUS_MISS, 0
+
+        key = (endpoint, params)
+        ttl = self.ttl_for(endpoint)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < ttl:
+                self._stats["hits"] += 1
+                return value, CACHE_STATUS_HIT, int(age)
+            if age < ttl + self.stale_seconds:
+                self._stats["stale_hits"] += 1
+                if key not in self._inflight:
+                    task = asyncio.create_task(self._revalidate(key, compute))
+                    self._background.add(task)
+                    task.add_done_callback(self._background.discard)
+                return value, CACHE_STATUS_STALE, int(age)
+
+        self._stats["misses"] += 1
+        return await self._compute(key, compute), CACHE_STATUS_MISS, 0
+
+    async def serve(self, response: Response, endpoint: str, compute: Callable[[], Awaitable[Any]],
+                    params: Tuple = ()) -> Any:
+        """Cached endpoint body; sets the Age and X-Cache headers on ``response``"""
+        value, status, age = await self.get_or_compute(endpoint, params, compute)
+        response.headers["X-Cache"] = status
+        response.headers["Age"] = str(age)
+        return value
+
+    def invalidate(self, prefix: str = ""):
+        """Drop cached responses of endpoints starting with ``prefix`` (all by default); thread-safe"""
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if key[0].startswith(prefix)]:
+                self._entries.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["stale_hits"] + self._stats["misses"]
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            **self._stats,
+            "hit_rate": round((self._stats["hits"] + self._stats["stale_hits"]) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global instance
+response_cache = ResponseCache()
@@ -0,0 +1,123 @@
+"""
+Response Formats for DataQuery Pro
+
+Content negotiation for data-heavy endpoints:
+- default: row-oriented JSON encoded with orjson (falls back to the standard encoder)
+- format=columnar: column-oriented JSON, column names are sent once
+- Accept: application/vnd.apache.arrow.stream: Arrow IPC stream
+"""
+
+import json
+import math
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNAR_FORMAT = "columnar"
+
+
+def _default(value: Any) -> Any:
+    """Fallback for values neither encoder knows (Decimal, LOB text wrappers, etc.)"""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):  # numpy scalars
+        return _finite_or_none(value.item())
+    return str(value)
+
+
+def _finite_or_none(value: Any) -> Any:
+    """Replace NaN/Infinity with None the way orjson does (the standard encoder writes bare NaN)"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite_or_none(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite_or_none(item) for item in value]
+    return value
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        # NaN/Infinity are written as null, which keeps pandas-derived payloads valid JSON
+        if orjson is None:
+            return json.dumps(_finite_or_none(content), ensure_ascii=False, default=_default,
+                              separators=(",", ":")).encode("utf-8")
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def wants_arrow(request: Request) -> bool:
+    return ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _column_names(records: List[Dict[str, Any]], columns: Optional[List[str]]) -> List[str]:
+    if columns:
+        return list(columns)
+    return list(records[0].keys()) if records else []
+
+
+def records_to_columnar(records: List[Dict[str, Any]], columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Convert a list of row dicts to {"columns": [...], "values": [[col0...], [col1...]]}"""
+    names = _column_names(records, columns)
+    return {
+        "columns": names,
+        "values": [[record.get(name) for record in records] for name in names],
+    }
+
+
+def records_to_arrow_ipc(records: List[Dict[str, Any]], columns: Optional[List[str]] = None,
+                         metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """Encode row dicts as an Arrow IPC stream; non-row fields travel as schema metadata"""
+    import pyarrow as pa
+
+    names = _column_names(records, columns)
+    arrays = []
+    for name in names:
+        values = [record.get(name) for record in records]
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type column: send as text rather than failing the whole response
+            arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+
+    schema_metadata = {"metadata": json.dumps(metadata or {}, default=_default, ensure_ascii=False)}
+    table = pa.Table.from_arrays(arrays, names=names).replace_schema_metadata(schema_metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def tabular_response(request: Request, payload: Dict[str, Any], rows_key: str = "data",
+                     columns: Optional[List[str]] = None, response_format: Optional[str] = None) -> Response:
+    """
+    Build the response for an endpoint whose payload carries a list of row dicts under ``rows_key``.
+    Arrow is chosen by the Accept header, columnar JSON by ``response_format``.
+    """
+    records = payload.get(rows_key) or []
+
+    if wants_arrow(request):
+        metadata = {key: value for key, value in payload.items() if key != rows_key}
+        return Response(
+            content=records_to_arrow_ipc(records, columns, metadata),
+            media_type=ARROW_STREAM_MEDIA_TYPE
+        )
+
+    if response_format == COLUMNAR_FORMAT:
+        payload = dict(payload)
+        payload[rows_key] = records_to_columnar(records, columns)
+        payload["format"] = COLUMNAR_FORMAT
+
+    return FastJSONResponse(content=payload)
@@ -0,0 +1,432 @@
+"""
+Monitoring Rollup Service for DataQuery Pro
+
+Keeps per-day / per-THEORY_ID aggregates of SC_local_control, SC_local_target and
+SPSS SC_theory_users in a local SQLite store so the monitoring endpoints do not scan
+the full Oracle tables on every dashboard refresh.
+
+- refresh(): rebuilds a source from one GROUP BY over the Oracle table (startup,
+  schedule, after the daily distribution run, or on demand)
+- record_insert(): applies an insert batch incrementally right after it is committed,
+  bucketed by the Oracle SYSDATE the rows were stamped with (the clock refresh() uses)
+- record_delete(): drops THEORY_IDs whose rows were deleted from the Oracle table;
+  their IINs leave the daily distinct counts at the next rebuild
+- distinct IINs are kept per day only for the last ROLLUP_IIN_DAYS days, which is
+  all the daily statistics endpoint can ask for
+"""
+
+import os
+import re
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_STORE_PATH = os.getenv("ROLLUP_STORE_PATH", "state/rollups.sqlite3")
+ROLLUP_IIN_DAYS = int(os.getenv("ROLLUP_IIN_DAYS", "31"))
+ROLLUP_REFRESH_MINUTES = int(os.getenv("ROLLUP_REFRESH_MINUTES", "60"))
+ROLLUP_FETCH_SIZE = 10000
+
+SOURCE_CONTROL = "sc_local_control"
+SOURCE_TARGET = "sc_local_target"
+SOURCE_SPSS = "spss_sc_theory_users"
+
+# source -> (database, table)
+SOURCES = {
+    SOURCE_CONTROL: ("DSSB_APP", "SC_local_control"),
+    SOURCE_TARGET: ("DSSB_APP", "SC_local_target"),
+    SOURCE_SPSS: ("SPSS", "SC_theory_users"),
+}
+
+# Same rule as the monitoring SQL: SC12345678.1 -> SC12345678
+_SUB_THEORY_PATTERN = re.compile(r"^SC[0-9]{8}\.[0-9]+$")
+
+
+def base_campaign_id(theory_id: Optional[str]) -> Optional[str]:
+    if theory_id and _SUB_THEORY_PATTERN.match(theory_id):
+        return theory_id.split(".", 1)[0]
+    return theory_id
+
+
+def _timestamp(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.replace(microsecond=0).isoformat() if isinstance(value, datetime) else value.isoformat()
+    return str(value)
+
+
+class RollupService:
+    """Local aggregate store for the monitoring dashboard"""
+
+    def __init__(self, db_path: str = ROLLUP_STORE_PATH, iin_days: int = ROLLUP_IIN_DAYS):
+        self.db_path = Path(db_path)
+        self.iin_days = iin_days
+        self._lock = threading.Lock()
+        # Serializes rollup writes so a rebuild and concurrent increments cannot interleave
+        self._write_lock = threading.Lock()
+        self._initialized = False
+        # source -> ("insert", increment) / ("delete", theory_ids) changes recorded while
+        # that source is being rebuilt, in the order they were made
+        self._pending: Dict[str, List[tuple]] = {}
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_schema(self):
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._connect()
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS theory_daily (
+                        source TEXT NOT NULL,
+                        day TEXT NOT NULL,
+                        theory_id TEXT NOT NULL,
+                        users INTEGER NOT NULL,
+                        first_insert TEXT,
+                        last_insert TEXT,
+                        tab1 TEXT,
+                        tab2 TEXT,
+                        PRIMARY KEY (source, day, theory_id)
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS daily_iins (
+                        source TEXT NOT NULL,
+                        day TEXT NOT NULL,
+                        iin TEXT NOT NULL,
+                        PRIMARY KEY (source, day, iin)
+                    ) WITHOUT ROWID
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS refresh_state (
+                        source TEXT PRIMARY KEY,
+                        refreshed_at TEXT,
+                        duration_seconds REAL,
+                        rows INTEGER,
+                        error TEXT
+                    )
+                """)
+                conn.commit()
+            finally:
+                conn.close()
+            self._initialized = True
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+    def record_insert(self, source: str, theory_id: str, iin_values: Iterable[Any],
+                      additional_fields: Optional[Dict[str, Any]] = None,
+                      inserted_at: Optional[datetime] = None):
+        """Apply a committed insert batch to the rollups; never raises into the caller"""
+        try:
+            iins = [str(iin).strip() for iin in iin_values]
+            if not iins:
+                return
+            fields = additional_fields or {}
+            increment = (
+                theory_id, iins, fields.get("tab1"), fields.get("tab2"),
+                _timestamp(inserted_at or datetime.now())
+            )
+            self._ensure_schema()
+            with self._write_lock:
+                if source in self._pending:
+                    self._pending[source].append(("insert", increment))
+                self._apply_increments(source, [increment])
+        except Exception as e:
+            logger.warning(f"Rollup update for {source}/{theory_id} failed: {e}")
+
+    def record_delete(self, source: str, theory_ids: Iterable[str]):
+        """Drop THEORY_IDs whose rows were all deleted from the source table; never raises into the caller"""
+        try:
+            theory_ids = list(theory_ids)
+            if not theory_ids:
+                return
+            self._ensure_schema()
+            with self._write_lock:
+                if source in self._pending:
+                    self._pending[source].append(("delete", theory_ids))
+                self._apply_delete(source, theory_ids)
+        except Exception as e:
+            logger.warning(f"Rollup delete for {source} failed: {e}")
+
+    def _apply_increments(self, source: str, increments: List[tuple]):
+        iin_cutoff = (datetime.now() - timedelta(days=self.iin_days)).strftime("%Y-%m-%d")
+        conn = self._connect()
+        try:
+            for theory_id, iins, tab1, tab2, inserted_at in increments:
+                day = inserted_at[:10]
+                conn.execute("""
+                    INSERT INTO theory_daily (source, day, theory_id, users, first_insert, last_insert, tab1, tab2)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (source, day, theory_id) DO UPDATE SET
+                        users = users + excluded.users,
+                        first_insert = MIN(first_insert, excluded.first_insert),
+                        last_insert = MAX(last_insert, excluded.last_insert),
+                        tab1 = COALESCE(MAX(tab1, excluded.tab1), tab1, excluded.tab1),
+                        tab2 = COALESCE(MAX(tab2, excluded.tab2), tab2, excluded.tab2)
+                """, (source, day, theory_id, len(iins), inserted_at, inserted_at,
+                      None if tab1 is None else str(tab1), None if tab2 is None else str(tab2)))
+                if day >= iin_cutoff:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO daily_iins (source, day, iin) VALUES (?, ?, ?)",
+                        ((source, day, iin) for iin in iins)
+                    )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _apply_delete(self, source: str, theory_ids: List[str]):
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "DELETE FROM theory_daily WHERE source = ? AND theory_id = ?",
+                ((source, theory_id) for theory_id in theory_ids)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Full rebuild
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _source_connection(source: str):
+        from database import get_connection_DSSB_APP, get_connection_SPSS
+
+        database_id, _table = SOURCES[source]
+        return get_connection_SPSS() if database_id == "SPSS" else get_connection_DSSB_APP()
+
+    def _fetch_source(self, source: str):
+        """
+        Read the aggregates and recent distinct IINs of a source from Oracle.
+        Returns (until, aggregates, iins): the snapshot covers rows inserted before ``until``,
+        the database's SYSDATE, which is the clock the insert functions stamp and record with.
+        """
+        _database_id, table = SOURCES[source]
+        conn = self._source_connection(source)
+        try:
+            cursor = conn.cursor()
+            cursor.arraysize = ROLLUP_FETCH_SIZE
+            cursor.execute("SELECT SYSDATE FROM dual")
+            until = cursor.fetchone()[0]
+            cursor.execute(f"""
+                SELECT
+                    TO_CHAR(insert_datetime, 'YYYY-MM-DD') AS day,
+                    THEORY_ID,
+                    COUNT(*) AS users,
+                    MIN(insert_datetime) AS first_insert,
+                    MAX(insert_datetime) AS last_insert,
+                    MAX(tab1) AS tab1,
+                    MAX(tab2) AS tab2
+                FROM {table}
+                WHERE insert_datetime IS NOT NULL AND insert_datetime < :until AND THEORY_ID IS NOT NULL
+                GROUP BY TO_CHAR(insert_datetime, 'YYYY-MM-DD'), THEORY_ID
+            """, {"until": until})
+            aggregates = [
+                (source, day, theory_id, users, _timestamp(first_insert), _timestamp(last_insert),
+                 None if tab1 is None else str(tab1), None if tab2 is None else str(tab2))
+                for day, theory_id, users, first_insert, last_insert, tab1, tab2 in cursor.fetchall()
+            ]
+
+            cursor.execute(f"""
+                SELECT DISTINCT TO_CHAR(insert_datetime, 'YYYY-MM-DD') AS day, IIN
+                FROM {table}
+                WHERE insert_datetime >= TRUNC(SYSDATE) - :days AND insert_datetime < :until AND IIN IS NOT NULL
+            """, {"days": self.iin_days, "until": until})
+            iins = []
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                iins.extend((source, day, str(iin).strip()) for day, iin in rows)
+            cursor.close()
+            return until, aggregates, iins
+        finally:
+            conn.close()
+
+    def refresh(self, sources: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Rebuild the given sources (all by default) from Oracle"""
+        self._ensure_schema()
+        results = {}
+        for source in sources or SOURCES:
+            with self._write_lock:
+                self._pending[source] = []
+            # The snapshot covers rows inserted before `until` (Oracle SYSDATE), the
+            # increments recorded from here on cover the rest
+            started = datetime.now()
+            try:
+                until, aggregates, iins = self._fetch_source(source)
+                with self._write_lock:
+                    self._replace_source(source, aggregates, iins, started, until)
+                duration = (datetime.now() - started).total_seconds()
+                results[source] = {"success": True, "groups": len(aggregates), "duration_seconds": duration}
+                logger.info(f"Rollup {source} rebuilt: {len(aggregates)} day/theory groups in {duration:.1f}s")
+            except Exception as e:
+                with self._write_lock:
+                    self._pending.pop(source, None)
+                self._record_error(source, str(e))
+                results[source] = {"success": False, "error": str(e)}
+                logger.error(f"Rollup {source} rebuild failed: {e}")
+        return results
+
+    def _replace_source(self, source: str, aggregates: List[tuple], iins: List[tuple], started: datetime,
+                        until: datetime):
+        """Swap in a rebuilt source; caller holds the write lock"""
+        conn = self._connect()
+        try:
+            # Replace the source in one transaction so readers never see a partial rebuild
+            conn.execute("DELETE FROM theory_daily WHERE source = ?", (source,))
+            conn.execute("DELETE FROM daily_iins WHERE source = ?", (source,))
+            conn.executemany("INSERT INTO theory_daily VALUES (?, ?, ?, ?, ?, ?, ?, ?)", aggregates)
+            conn.executemany("INSERT OR IGNORE INTO daily_iins VALUES (?, ?, ?)", iins)
+            conn.execute(
+                "INSERT OR REPLACE INTO refresh_state VALUES (?, ?, ?, ?, NULL)",
+                (source, datetime.now().isoformat(), (datetime.now() - started).total_seconds(), len(aggregates))
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        # Inserts made while Oracle was being read are not in the snapshot; older ones
+        # recorded late already are, replaying them would count their users twice.
+        # Deletes are replayed in order, one the snapshot already reflects changes nothing
+        for kind, change in self._pending.pop(source, []):
+            if kind == "delete":
+                self._apply_delete(source, change)
+            elif change[4] >= _timestamp(until):
+                self._apply_increments(source, [change])
+
+    def refresh_in_background(self) -> bool:
+        """Start a full rebuild in a daemon thread; False if one is already running"""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return False
+            self._refresh_thread = threading.Thread(target=self.refresh, name="rollup-refresh", daemon=True)
+            self._refresh_thread.start()
+        return True
+
+    def _record_error(self, source: str, error: str):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                INSERT INTO refresh_state (source, error) VALUES (?, ?)
+                ON CONFLICT (source) DO UPDATE SET error = excluded.error
+            """, (source, error))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def is_ready(self, *sources: str) -> bool:
+        """True when every given source has been rebuilt at least once"""
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            ready = {
+                row["source"] for row in
+                conn.execute("SELECT source FROM refresh_state WHERE refreshed_at IS NOT NULL")
+            }
+        finally:
+            conn.close()
+        return all(source in ready for source in (sources or SOURCES))
+
+    def get_status(self) -> Dict[str, Any]:
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            state = {row["source"]: dict(row) for row in conn.execute("SELECT * FROM refresh_state")}
+        finally:
+            conn.close()
+        return {
+            "refreshing": self._refresh_thread is not None and self._refresh_thread.is_alive(),
+            "sources": {source: state.get(source, {"source": source, "refreshed_at": None}) for source in SOURCES},
+        }
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def get_table_summary(self, source: str) -> Dict[str, Any]:
+        """Same fields as the COUNT / MIN / MAX overview query"""
+        return self._query("""
+            SELECT
+                COALESCE(SUM(users), 0) AS total_users,
+                COUNT(DISTINCT theory_id) AS unique_campaigns,
+                MIN(first_insert) AS earliest_upload,
+                MAX(last_insert) AS latest_upload
+            FROM theory_daily WHERE source = ?
+        """, (source,))[0]
+
+    def get_daily_statistics(self, source: str, days_back: int) -> List[Dict[str, Any]]:
+        """Per-day uploads, affected campaigns and distinct IINs, newest first"""
+        since = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
+        return self._query("""
+            SELECT
+                t.day AS upload_date,
+                SUM(t.users) AS users_uploaded,
+                COUNT(DISTINCT t.theory_id) AS campaigns_affected,
+                (SELECT COUNT(*) FROM daily_iins i WHERE i.source = t.source AND i.day = t.day) AS unique_users
+            FROM theory_daily t
+            WHERE t.source = ? AND t.day >= ?
+            GROUP BY t.source, t.day
+            ORDER BY t.day DESC
+        """, (source, since))
+
+    def get_base_campaign_counts(self, source: str) -> Dict[str, int]:
+        """Users per base campaign id (sub-theories SCxxxxxxxx.N folded into SCxxxxxxxx)"""
+        counts: Dict[str, int] = {}
+        for row in self._query(
+            "SELECT theory_id, SUM(users) AS users FROM theory_daily WHERE source = ? GROUP BY theory_id",
+            (source,)
+        ):
+            base_id = base_campaign_id(row["theory_id"])
+            counts[base_id] = counts.get(base_id, 0) + row["users"]
+        return counts
+
+    def get_recent_activity(self, source: str, limit: int, days: int = 30) -> List[Dict[str, Any]]:
+        """Per-THEORY_ID uploads of the last ``days`` days, most recently updated first"""
+        since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        rows = self._query("""
+            SELECT
+                theory_id,
+                SUM(users) AS users_count,
+                MAX(last_insert) AS upload_time,
+                MAX(tab1) AS tab1,
+                MAX(tab2) AS tab2
+            FROM theory_daily
+            WHERE source = ? AND day >= ?
+            GROUP BY theory_id
+            ORDER BY MAX(last_insert) DESC
+            LIMIT ?
+        """, (source, since, limit))
+        for row in rows:
+            if row["upload_time"]:
+                row["upload_time"] = row["upload_time"].replace("T", " ")
+        return rows
+
+
+# Global instance
+rollup_service = RollupService()
@@ -2,8 +2,10 @@ import logging
 from datetime import datetime, timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.executors.pool import ThreadPoolExecutor
 from database import process_daily_user_distribution
+from rollup_service import rollup_service, ROLLUP_REFRESH_MINUTES
 
 # Configure logging for scheduler
 logging.basicConfig(level=logging.INFO)
@@ -14,7 +16,8 @@ class DailyDistributionScheduler:
         """Initialize the scheduler with thread pool executor"""
         self.scheduler = AsyncIOScheduler(
             executors={
-                'default': ThreadPoolExecutor(max_workers=1)
+                # Second worker lets a rollup refresh run without delaying the distribution
+                'default': ThreadPoolExecutor(max_workers=2)
             },
             timezone='Asia/Almaty'  # Kazakhstan timezone
         )
@@ -34,6 +37,17 @@ class DailyDistributionScheduler:
                     max_instances=1  # Prevent overlapping executions
                 )
                 
+                # Reconcile monitoring rollups with Oracle periodically
+                if ROLLUP_REFRESH_MINUTES > 0:
+                    self.scheduler.add_job(
+                        func=self.run_rollup_refresh,
+                        trigger=IntervalTrigger(minutes=ROLLUP_REFRESH_MINUTES),
+                        id='monitoring_rollup_refresh',
+                        name='Monitoring Rollup Refresh',
+                        replace_existing=True,
+                        max_instances=1
+                    )
+                
                 self.scheduler.start()
                 self.is_running = True
                 logger.info("Daily distribution scheduler started successfully")
@@ -88,6 +102,19 @@ class DailyDistributionScheduler:
             error_msg = f"Unexpected error in daily distribution: {str(e)}"
             logger.error(error_msg)
             self._send_critical_error_notification(error_msg)
+        
+        # Inserts were applied to the rollups incrementally; rebuild to pick up anything they missed
+        self.run_rollup_refresh()
+    
+    def run_rollup_refresh(self):
+        """Rebuild the monitoring rollups from Oracle"""
+        try:
+            results = rollup_service.refresh()
+            failed = [source for source, result in results.items() if not result["success"]]
+            if failed:
+                logger.warning(f"Rollup refresh failed for: {', '.join(failed)}")
+        except Exception as e:
+            logger.error(f"Unexpected error in rollup refresh: {e}")
     
     def _send_success_notification(self, result):
         """Send email notification for successful process"""
@@ -0,0 +1,98 @@
+"""
+Source Fan-out for DataQuery Pro
+
+Runs independent per-database queries of one request concurrently on a bounded
+thread pool. Every source gets its own timeout (MONITORING_QUERY_TIMEOUT, with
+per-database overrides in MONITORING_QUERY_TIMEOUTS) and fails on its own: a slow
+or unreachable SPSS link yields an error entry for that panel while the DSSB_APP
+results are still returned.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+MONITORING_QUERY_TIMEOUT = float(os.getenv("MONITORING_QUERY_TIMEOUT", "15"))
+MONITORING_FANOUT_WORKERS = int(os.getenv("MONITORING_FANOUT_WORKERS", "8"))
+
+
+def _parse_timeouts(raw: str) -> Dict[str, float]:
+    """Parse "SPSS=5,DSSB_APP=20" into {"SPSS": 5.0, "DSSB_APP": 20.0}"""
+    timeouts = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        database_id, seconds = item.split("=", 1)
+        try:
+            timeouts[database_id.strip().upper()] = float(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring invalid MONITORING_QUERY_TIMEOUTS entry: {item}")
+    return timeouts
+
+
+# Task: (database_id, fn(call_timeout_ms) -> result)
+SourceTask = Tuple[str, Callable[[int], Any]]
+
+
+class SourceFanout:
+    """Concurrent execution of per-source queries with individual timeouts"""
+
+    def __init__(self, max_workers: int = MONITORING_FANOUT_WORKERS,
+                 default_timeout: float = MONITORING_QUERY_TIMEOUT,
+                 timeouts: Dict[str, float] = None):
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts if timeouts is not None else _parse_timeouts(os.getenv("MONITORING_QUERY_TIMEOUTS", ""))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="source-fanout")
+
+    def timeout_for(self, database_id: str) -> float:
+        return self.timeouts.get(database_id.upper(), self.default_timeout)
+
+    async def _run(self, name: str, database_id: str, fn: Callable[[int], Any]) -> Dict[str, Any]:
+        timeout = self.timeout_for(database_id)
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # The driver-level timeout aborts the round-trip; the asyncio timeout bounds pool waits as well.
+        # The task runs in a copy of the request context so its Oracle calls are counted in the request metrics.
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(self._executor, context.run, fn, int(timeout * 1000))
+        try:
+            data = await asyncio.wait_for(future, timeout=timeout)
+            return {"success": True, "data": data, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+        except asyncio.TimeoutError:
+            logger.warning(f"Source {name} ({database_id}) timed out after {timeout}s")
+            return {
+                "success": False,
+                "error": f"{database_id} did not respond within {timeout:g}s",
+                "timed_out": True,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+        except Exception as e:
+            logger.warning(f"Source {name} ({database_id}) failed: {e}")
+            return {"success": False, "error": str(e), "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    async def gather(self, tasks: Dict[str, SourceTask]) -> Dict[str, Dict[str, Any]]:
+        """Run all tasks concurrently; returns name -> {"success", "data" | "error", "elapsed_ms"}"""
+        names = list(tasks)
+        results = await asyncio.gather(*(self._run(name, *tasks[name]) for name in names))
+        return dict(zip(names, results))
+
+    @staticmethod
+    def timings(results: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Per-source status without the payload, for the response body"""
+        return {
+            name: {key: value for key, value in result.items() if key != "data"}
+            for name, result in results.items()
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+# Global instance
+source_fanout = SourceFanout()
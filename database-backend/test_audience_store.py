@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test script for the campaign audience store
+
+This script tests that audiences loaded by /campaigns/load-rb-automatic are
+kept as Parquet with their filter stats, can be read back by id (optionally
+only some columns), reject invalid ids and expire after the retention period.
+"""
+
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from audience_store import AudienceStore
+
+
+def test_save_and_load():
+    """Test storing an audience and reading it back"""
+    print("=" * 60)
+    print("Testing Audience Save and Load")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = AudienceStore(store_dir=store_dir)
+        audience = pd.DataFrame({
+            'IIN': ['900101300123', '050101300123', '880202400456'],
+            'P_SID': [1, 2, 3],
+            'Column_sum': [10.0, 20.0, 30.0],
+        })
+        stats = {"initial_count": np.int64(5), "final_count": 3, "blacklist_removed": 2}
+        audience_id = store.save(audience, created_by="analyst", stats=stats, workflow="rb_automatic_launch")
+        print(f"Audience id: {audience_id}")
+
+        meta = store.get_meta(audience_id)
+        assert meta["created_by"] == "analyst"
+        assert meta["rows"] == 3
+        assert meta["stats"] == {"initial_count": 5, "final_count": 3, "blacklist_removed": 2}
+
+        # Only the requested columns that exist are read
+        loaded = store.load(audience_id, columns=["IIN", "P_SID", "MISSING"])
+        assert list(loaded.columns) == ["IIN", "P_SID"]
+        assert loaded["IIN"].tolist() == audience["IIN"].tolist()
+
+        assert store.get_meta("../../etc/passwd") is None
+        assert store.get_meta("0" * 32) is None
+        try:
+            store.load("0" * 32)
+            raise AssertionError("Expected a missing audience to fail")
+        except FileNotFoundError:
+            pass
+
+    print("✅ Audience save and load test passed")
+
+
+def test_expiry():
+    """Test that audiences older than the retention period are removed"""
+    print("\n" + "=" * 60)
+    print("Testing Audience Expiry")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = AudienceStore(store_dir=store_dir, retention_hours=1)
+        old_id = store.save(pd.DataFrame({'IIN': ['900101300123']}))
+        two_hours_ago = time.time() - 2 * 3600
+        os.utime(os.path.join(store_dir, f"{old_id}.json"), (two_hours_ago, two_hours_ago))
+
+        # Saving a new audience prunes the expired one
+        new_id = store.save(pd.DataFrame({'IIN': ['050101300123']}))
+        assert store.get_meta(old_id) is None
+        assert store.get_meta(new_id) is not None
+        assert sorted(os.listdir(store_dir)) == sorted([f"{new_id}.json", f"{new_id}.parquet"])
+
+        # Reading an audience past the retention period does not wait for the next save
+        os.utime(os.path.join(store_dir, f"{new_id}.json"), (two_hours_ago, two_hours_ago))
+        assert store.get_meta(new_id) is None
+        assert os.listdir(store_dir) == []
+        try:
+            store.load(new_id)
+            raise AssertionError("Expected an expired audience to be unavailable")
+        except FileNotFoundError:
+            pass
+
+    print("✅ Audience expiry test passed")
+
+
+def main():
+    """Run all audience store tests"""
+    print("🚀 Starting Audience Store Tests")
+    test_save_and_load()
+    test_expiry()
+    print("\n🎉 All audience store tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ import sys
 import os
 import json
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date, timedelta
 
 # Add the current directory to Python path
@@ -504,6 +505,277 @@ def test_error_handling():
         print(f"❌ Error handling test failed: {e}")
         return False
 
+def test_deployment_bind_rows():
+    """Test that deployment rows are built column-wise with the original formatting"""
+    print("\n" + "=" * 60)
+    print("Testing Deployment Bind Rows")
+    print("=" * 60)
+    
+    from campaign_service import CampaignDeploymentService
+    
+    class FakeCursor:
+        def __init__(self):
+            self.calls = []
+        
+        def executemany(self, query, rows, batcherrors=False):
+            self.calls.append(rows)
+        
+        def getbatcherrors(self):
+            return []
+    
+    cursor = FakeCursor()
+    metadata = {'stream': 'RB1', 'date_start': date(2024, 1, 1), 'date_end': date(2024, 1, 31), 'short_desc': 'test'}
+    users = pd.DataFrame({'IIN': [900101300123, 50101300123]})
+    CampaignDeploymentService._deploy_to_mb22_local_target(cursor, 'C000000001', metadata, users)
+    CampaignDeploymentService._deploy_to_fd_rb2_campaigns_users(cursor, 'C000000001', metadata, users)
+    CampaignDeploymentService._deploy_to_off_limit_campaigns_users(
+        cursor, 'C000000001', metadata, users.assign(P_SID=[1, 2])
+    )
+    calls = cursor.calls
+    
+    mb22_rows, fd_rows, off_limit_rows = calls
+    mb22_rows, fd_rows, off_limit_rows = list(mb22_rows), list(fd_rows), list(off_limit_rows)
+    assert mb22_rows[0][:6] == ('C000000001', 900101300123, 900101300123, 'RB1', date(2024, 1, 1), date(2024, 1, 31))
+    assert mb22_rows[0][6] == mb22_rows[1][6]
+    assert fd_rows == [
+        ('C000000001', '900101300123', 900101300123, date(2024, 1, 1), 'test'),
+        ('C000000001', '050101300123', 50101300123, date(2024, 1, 1), 'test'),
+    ]
+    assert [row[2] for row in off_limit_rows] == [1, 2]
+    # Python scalars, not numpy ones, are handed to cx_Oracle
+    assert all(type(value) is int for row in mb22_rows for value in row[1:3])
+    
+    # With skip_bad_records an unparseable P_SID rejects its row, not the whole table
+    class RejectingCursor(FakeCursor):
+        def getbatcherrors(self):
+            class BatchError:
+                offset, message = 1, "ORA-12899: value too large"
+            return [BatchError()]
+    
+    cursor = RejectingCursor()
+    users = pd.DataFrame({'IIN': ['900101300123', '050101300123', '880202400456', '770303500789'],
+                          'P_SID': ['1', 'n/a', '3', '4']})
+    stats = CampaignDeploymentService._deploy_to_fd_rb2_campaigns_users(
+        cursor, 'C000000001', metadata, users, skip_bad_records=True
+    )
+    assert [row[1:3] for row in cursor.calls[0]] == [('900101300123', 1), ('880202400456', 3), ('770303500789', 4)]
+    assert stats["rows_processed"] == 4 and stats["rows_inserted"] == 2 and stats["rows_failed"] == 2
+    assert [(record["row_index"], record["iin"]) for record in stats["failed_records"]] == [
+        (1, '050101300123'), (2, '880202400456')
+    ]
+    
+    # Without it the table still fails on the bad value
+    try:
+        CampaignDeploymentService._deploy_to_fd_rb2_campaigns_users(FakeCursor(), 'C000000001', metadata, users)
+        raise AssertionError("Expected a non-numeric P_SID to fail the table")
+    except ValueError:
+        pass
+    
+    print("✅ Deployment bind rows test passed")
+    return True
+
+def test_chunked_deployment_inserts():
+    """Test chunked executemany, batcherrors capture and deploy progress"""
+    print("\n" + "=" * 60)
+    print("Testing Chunked Deployment Inserts")
+    print("=" * 60)
+    
+    from campaign_service import CampaignDeploymentService, CampaignDeployProgress
+    
+    class BatchError:
+        def __init__(self, offset):
+            self.offset = offset
+            self.message = "ORA-01722: invalid number"
+    
+    class OracleError(Exception):
+        pass
+    
+    class FakeCursor:
+        """Rejects rows whose IIN is not numeric, like a NUMBER column would"""
+        
+        def __init__(self):
+            self.batches = []
+            self.errors = []
+        
+        def executemany(self, query, rows, batcherrors=False):
+            bad = [offset for offset, row in enumerate(rows) if not str(row[1]).isdigit()]
+            if bad and not batcherrors:
+                raise OracleError(BatchError(bad[0]))
+            self.batches.append(len(rows))
+            self.errors = [BatchError(offset) for offset in bad]
+        
+        def getbatcherrors(self):
+            return self.errors
+    
+    rows = [("C000000001", iin, 1) for iin in ["900101300123"] * 4 + ["bad"] + ["900101300124"] * 5]
+    seen = []
+    
+    cursor = FakeCursor()
+    stats = CampaignDeploymentService._insert_in_batches(
+        cursor, "INSERT", iter(rows), batch_size=3, skip_bad_records=True,
+        progress=lambda processed, failed: seen.append((processed, failed))
+    )
+    assert cursor.batches == [3, 3, 3, 1]
+    assert seen == [(3, 0), (6, 1), (9, 1), (10, 1)]
+    assert stats["rows_inserted"] == 9 and stats["rows_failed"] == 1
+    assert stats["failed_records"] == [{"row_index": 4, "iin": "bad", "error": "ORA-01722: invalid number"}]
+    
+    # Without skip_bad_records the first bad row fails the table and is named in the error
+    try:
+        CampaignDeploymentService._insert_in_batches(FakeCursor(), "INSERT", rows, batch_size=3)
+        raise AssertionError("Expected the bad row to fail the insert")
+    except RuntimeError as e:
+        print(f"   Error: {e}")
+        assert "row 5 (IIN bad)" in str(e)
+    
+    tracker = CampaignDeployProgress()
+    tracker.start("C000000001", "RB1", 10, created_by="analyst")
+    tracker.update("C000000001", "spss.fd_rb2_campaigns_users", 6, 10, 1)
+    running = tracker.get("C000000001")
+    assert running["current_table"] == "spss.fd_rb2_campaigns_users"
+    assert running["tables"]["spss.fd_rb2_campaigns_users"]["rows_processed"] == 6
+    tracker.finish("C000000001", success=True)
+    assert [deploy["status"] for deploy in tracker.list("analyst")] == ["succeeded"]
+    assert tracker.list("someone_else") == []
+    
+    print("✅ Chunked deployment inserts test passed")
+    return True
+
+def test_two_phase_deployment():
+    """Test that a failed table rolls back the whole campaign across both databases"""
+    print("\n" + "=" * 60)
+    print("Testing Two-Phase Campaign Deployment")
+    print("=" * 60)
+    
+    import campaign_service as campaign_module
+    from campaign_service import CampaignDeploymentService
+    
+    class FakeCursor:
+        def __init__(self, connection):
+            self.connection = connection
+        
+        def execute(self, query, params=None):
+            self.connection.log.append((self.connection.database, " ".join(query.split()[:3])))
+        
+        def executemany(self, query, rows, batcherrors=False):
+            rows = list(rows)
+            if self.connection.database in self.connection.fail_insert:
+                raise Exception("ORA-01653: unable to extend table")
+            self.connection.log.append((self.connection.database, f"insert {len(rows)}"))
+        
+        def getbatcherrors(self):
+            return []
+    
+    class FakeConnection:
+        def __init__(self, database, log, fail_insert=(), fail_commit=()):
+            self.database = database
+            self.log = log
+            self.fail_insert = fail_insert
+            self.fail_commit = fail_commit
+        
+        def __enter__(self):
+            return self
+        
+        def __exit__(self, *args):
+            return False
+        
+        def cursor(self):
+            return FakeCursor(self)
+        
+        def commit(self):
+            if self.database in self.fail_commit:
+                raise Exception("ORA-03113: end-of-file on communication channel")
+            self.log.append((self.database, "commit"))
+        
+        def rollback(self):
+            self.log.append((self.database, "rollback"))
+        
+        def close(self):
+            pass
+    
+    metadata = {'stream': 'RB1', 'date_start': date(2024, 1, 1), 'date_end': date(2024, 1, 31), 'short_desc': 'test'}
+    users = pd.DataFrame({'IIN': ['900101300123', '050101300123']})
+    
+    def deploy(fail_insert=(), fail_commit=()):
+        log = []
+        original = (campaign_module.get_connection_DSSB_OCDS, campaign_module.get_connection_SPSS)
+        campaign_module.get_connection_DSSB_OCDS = lambda: FakeConnection("DSSB_OCDS", log, fail_insert, fail_commit)
+        campaign_module.get_connection_SPSS = lambda: FakeConnection("SPSS", log, fail_insert, fail_commit)
+        try:
+            result = CampaignDeploymentService.deploy_rb1_campaign('C000000002', metadata, users, {})
+        finally:
+            campaign_module.get_connection_DSSB_OCDS, campaign_module.get_connection_SPSS = original
+        return result, log
+    
+    # Both databases prepared, then committed
+    result, log = deploy()
+    assert result["success"]
+    assert set(result["table_durations"]) == set(result["tables_updated"]) == {
+        "dssb_ocds.mb01_camp_dict", "dssb_ocds.mb22_local_target",
+        "spss.fd_rb2_campaigns_users", "spss.off_limit_campaigns_users"
+    }
+    assert result["rows_inserted"]["spss.fd_rb2_campaigns_users"] == 2
+    assert ("DSSB_OCDS", "commit") in log and ("SPSS", "commit") in log
+    
+    # An SPSS insert failure rolls DSSB_OCDS back before anything is committed
+    result, log = deploy(fail_insert=("SPSS",))
+    print(f"   Errors: {result['errors']}")
+    assert not result["success"] and result["rolled_back"]
+    assert result["tables_updated"] == []
+    assert ("DSSB_OCDS", "rollback") in log
+    assert not any(action == "commit" for database, action in log)
+    
+    # A failed SPSS commit removes the rows DSSB_OCDS already committed
+    result, log = deploy(fail_commit=("SPSS",))
+    assert not result["success"]
+    assert result["compensated_tables"] == ["dssb_ocds.mb01_camp_dict", "dssb_ocds.mb22_local_target"]
+    assert ("DSSB_OCDS", "DELETE FROM dssb_ocds.mb22_local_target") in log
+    
+    print("✅ Two-phase deployment test passed")
+    return True
+
+def test_stored_audience_with_filters():
+    """Test that filter_config is not silently dropped for an already filtered audience"""
+    print("\n" + "=" * 60)
+    print("Testing Stored Audience With Filter Config")
+    print("=" * 60)
+    
+    from campaign_service import CampaignService
+    
+    class FakeCodeService:
+        def __init__(self):
+            self.calls = 0
+        
+        async def generate_next_rb1_code(self):
+            self.calls += 1
+            return "C000000001"
+        
+        async def generate_next_rb3_xls_code(self):
+            self.calls += 1
+            return "KKB_0001"
+    
+    service = CampaignService()
+    service.code_service = FakeCodeService()
+    audience = pd.DataFrame({'IIN': ['900101300123'], 'P_SID': [1]})
+    stats = {"initial_count": 3, "final_count": 1, "blacklist_removed": 2}
+    
+    for create in (service.create_rb1_campaign, service.create_rb3_campaign):
+        try:
+            # Own event loop on a worker thread: main() already runs inside one
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(asyncio.run, create(
+                    {}, audience, {"mau_only": True}, None, created_by="analyst", filter_stats=stats
+                )).result()
+            raise AssertionError("Expected filter_config with a stored audience to be rejected")
+        except ValueError as e:
+            print(f"   {create.__name__}: {e}")
+    
+    # Rejected before any campaign code is allocated
+    assert service.code_service.calls == 0
+    
+    print("✅ Stored audience filter test passed")
+    return True
+
 async def test_performance():
     """Test performance with larger datasets"""
     print("\n" + "=" * 60)
@@ -583,6 +855,10 @@ async def main():
         test_results.append(("API Models", test_api_request_models()))
         test_results.append(("Integration", test_integration_scenarios()))
         test_results.append(("Error Handling", test_error_handling()))
+        test_results.append(("Deployment Rows", test_deployment_bind_rows()))
+        test_results.append(("Chunked Inserts", test_chunked_deployment_inserts()))
+        test_results.append(("Two-Phase Deploy", test_two_phase_deployment()))
+        test_results.append(("Stored Audience Filters", test_stored_audience_with_filters()))
         test_results.append(("Performance", await test_performance()))
         
         # Summary
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for the campaign code allocator
+
+This script tests that codes are allocated from blocks reserved with one
+sequence NEXTVAL each, that concurrent allocators (threads and separate
+processes sharing the sequence) never hand out the same code, and that the
+code formats and ranges are respected.
+"""
+
+import sys
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from code_allocator import CodeAllocator, CodeSequence, DEFAULT_SEQUENCES, CODE_RB1, CODE_RB3_XLS, CODE_SC
+
+
+class FakeSequence:
+    """An Oracle sequence shared by every connection (and so by every allocator)"""
+
+    def __init__(self, start: int, increment_by: int):
+        self.value = start - increment_by
+        self.increment_by = increment_by
+        self.nextval_calls = 0
+        self.lock = threading.Lock()
+
+    def nextval(self) -> int:
+        with self.lock:
+            self.value += self.increment_by
+            self.nextval_calls += 1
+            return self.value
+
+
+class FakeCursor:
+    def __init__(self, sequences):
+        self.sequences = sequences
+        self.row = None
+
+    def execute(self, sql, params=None):
+        if "NEXTVAL" in sql:
+            name = sql.split()[1].split(".NEXTVAL")[0].split(".")[-1]
+            self.row = (self.sequences[name].nextval(),)
+        else:
+            self.row = (self.sequences[params["name"]].increment_by,)
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, sequences):
+        self.sequences = sequences
+
+    def cursor(self):
+        return FakeCursor(self.sequences)
+
+    def close(self):
+        pass
+
+
+def test_block_allocation():
+    """Test block reservation and code formats"""
+    print("=" * 60)
+    print("Testing Block Allocation")
+    print("=" * 60)
+
+    sequences = {
+        "CAMPAIGN_CODE_SEQ": FakeSequence(start=12346, increment_by=20),
+        "RB3_XLS_OW_ID_SEQ": FakeSequence(start=124, increment_by=1),
+        "SC_CAMPAIGN_ID_SEQ": FakeSequence(start=42, increment_by=10),
+    }
+    allocator = CodeAllocator(connect=lambda database: FakeConnection(sequences))
+
+    assert allocator.peek_code(CODE_RB1) == "C000012346"
+    codes = [allocator.next_code(CODE_RB1) for _ in range(25)]
+    assert codes[0] == "C000012346" and codes[-1] == "C000012370"
+    # 25 codes from blocks of 20 -> two NEXTVAL calls
+    assert sequences["CAMPAIGN_CODE_SEQ"].nextval_calls == 2
+
+    assert allocator.next_code(CODE_RB3_XLS) == "KKB_0124"
+    assert allocator.next_code(CODE_RB3_XLS) == "KKB_0125"
+    assert allocator.next_code(CODE_SC) == "SC00000042"
+
+    # Out-of-range numbers are refused instead of producing a longer code
+    narrow = CodeAllocator(
+        sequences={CODE_RB3_XLS: CodeSequence("DSSB_OCDS", "DSSB_OCDS", "RB3_XLS_OW_ID_SEQ", "KKB_{:04d}", 125)},
+        connect=lambda database: FakeConnection(sequences)
+    )
+    try:
+        narrow.next_code(CODE_RB3_XLS)
+        raise AssertionError("Expected the code range to be exceeded")
+    except ValueError as e:
+        print(f"Range: {e}")
+
+    print("✅ Block allocation test passed")
+
+
+def test_concurrent_allocation():
+    """Test that threads and separate allocators never share a code"""
+    print("\n" + "=" * 60)
+    print("Testing Concurrent Allocation")
+    print("=" * 60)
+
+    sequences = {"CAMPAIGN_CODE_SEQ": FakeSequence(start=1, increment_by=20)}
+    # Two allocators stand for two worker processes using the same sequence
+    allocators = [CodeAllocator(sequences=DEFAULT_SEQUENCES, connect=lambda database: FakeConnection(sequences))
+                  for _ in range(2)]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        codes = list(executor.map(lambda i: allocators[i % 2].next_code(CODE_RB1), range(1000)))
+
+    print(f"Allocated {len(codes)} codes with {sequences['CAMPAIGN_CODE_SEQ'].nextval_calls} NEXTVAL calls")
+    assert len(set(codes)) == 1000
+    assert sequences["CAMPAIGN_CODE_SEQ"].nextval_calls <= 1000 // 20 + 2
+
+    print("✅ Concurrent allocation test passed")
+
+
+def main():
+    """Run all code allocator tests"""
+    print("🚀 Starting Code Allocator Tests")
+    test_block_allocation()
+    test_concurrent_allocation()
+    print("\n🎉 All code allocator tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for fast count estimates
+
+This script tests that sampled row counts are scaled with a 95% interval that
+covers the true count, that empty samples still give an upper bound and that
+APPROX_COUNT_DISTINCT results get their documented error bounds.
+"""
+
+import sys
+import os
+import random
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from count_estimate import estimate_count, estimate_distinct, normalize_sample_percent
+
+
+def test_sampled_count_bounds():
+    """Test scaling and interval coverage of sampled counts"""
+    print("=" * 60)
+    print("Testing Sampled Count Bounds")
+    print("=" * 60)
+
+    estimate = estimate_count(1000, 1)
+    print(f"1000 rows in a 1% sample: {estimate}")
+    assert estimate["estimate"] == 100000
+    assert estimate["lower_bound"] < 100000 < estimate["upper_bound"]
+    assert 0.05 < estimate["relative_error"] < 0.07
+
+    # Simulated row sampling of 20,000 matching rows: the interval covers the truth ~95% of the time
+    rng = random.Random(7)
+    true_count, percent, covered, runs = 20000, 5, 0, 200
+    for _ in range(runs):
+        sample_rows = sum(1 for _ in range(true_count) if rng.random() < percent / 100)
+        bounds = estimate_count(sample_rows, percent)
+        covered += bounds["lower_bound"] <= true_count <= bounds["upper_bound"]
+    print(f"Coverage: {covered}/{runs}")
+    assert covered >= runs * 0.9
+
+    empty = estimate_count(0, 1)
+    assert empty["estimate"] == 0 and empty["lower_bound"] == 0 and empty["upper_bound"] == 300
+
+    full = estimate_count(42, 100)
+    assert full["method"] == "exact" and full["lower_bound"] == full["upper_bound"] == 42
+
+    print("✅ Sampled count bounds test passed")
+
+
+def test_distinct_and_validation():
+    """Test approximate distinct bounds and sample size validation"""
+    print("\n" + "=" * 60)
+    print("Testing Distinct Bounds and Validation")
+    print("=" * 60)
+
+    distinct = estimate_distinct(50000, relative_error=0.03)
+    assert (distinct["lower_bound"], distinct["upper_bound"]) == (48500, 51500)
+
+    assert normalize_sample_percent(5) == 5.0
+    for invalid in (0, -1, 150):
+        try:
+            normalize_sample_percent(invalid)
+            raise AssertionError(f"Expected ValueError for {invalid}")
+        except ValueError:
+            pass
+
+    print("✅ Distinct bounds and validation test passed")
+
+
+def main():
+    """Run all count estimate tests"""
+    print("🚀 Starting Count Estimate Tests")
+    test_sampled_count_bounds()
+    test_distinct_and_validation()
+    print("\n🎉 All count estimate tests completed!")
+
+
+if __name__ == "__main__":
+    main()
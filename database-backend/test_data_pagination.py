@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script for keyset pagination of /data
+
+This script tests the opaque page cursor (round trip and rejection of malformed
+cursors) and the seek predicates built for ascending / descending sorts, with
+the ROWID tie-breaker and NULL sort values.
+"""
+
+import sys
+import os
+import base64
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import HTTPException
+
+from main import (encode_data_cursor, decode_data_cursor, build_keyset_condition,
+                  DATA_CURSOR_ROWID_COLUMN)
+
+
+def test_cursor_round_trip():
+    """Test that a cursor decodes back to the sort, direction, value and ROWID of the last row"""
+    print("=" * 60)
+    print("Testing Cursor Round Trip")
+    print("=" * 60)
+
+    last_row = {"iin": "900101300123", "age": 42, DATA_CURSOR_ROWID_COLUMN: "AAAR3sAAEAAAACXAAA"}
+    cursor = encode_data_cursor("AGE", "DESC", last_row)
+    print(f"Cursor: {cursor}")
+
+    assert decode_data_cursor(cursor) == {"s": "age", "o": "DESC", "v": 42, "r": "AAAR3sAAEAAAACXAAA"}
+
+    # Without a sort column only the ROWID is carried
+    unsorted = decode_data_cursor(encode_data_cursor(None, "ASC", last_row))
+    assert unsorted["s"] is None and unsorted["v"] is None and unsorted["r"] == "AAAR3sAAEAAAACXAAA"
+
+    print("✅ Cursor round trip test passed")
+
+
+def test_malformed_cursor():
+    """Test that malformed cursors are rejected with HTTP 400"""
+    print("\n" + "=" * 60)
+    print("Testing Malformed Cursors")
+    print("=" * 60)
+
+    no_rowid = base64.urlsafe_b64encode(b'{"s": "age", "o": "ASC", "v": 1}').decode("ascii")
+    not_an_object = base64.urlsafe_b64encode(b'[1, 2]').decode("ascii")
+
+    for cursor in ("not-base64!", base64.urlsafe_b64encode(b"not json").decode("ascii"), no_rowid, not_an_object):
+        try:
+            decode_data_cursor(cursor)
+            raise AssertionError(f"Expected cursor {cursor!r} to be rejected")
+        except HTTPException as e:
+            assert e.status_code == 400
+
+    print("✅ Malformed cursor test passed")
+
+
+def test_keyset_conditions():
+    """Test seek predicates for ASC / DESC sorts with the ROWID tie-breaker"""
+    print("\n" + "=" * 60)
+    print("Testing Keyset Conditions")
+    print("=" * 60)
+
+    cursor_data = {"s": "age", "o": "ASC", "v": 42, "r": "AAAR3sAAEAAAACXAAA"}
+
+    params = {}
+    condition = build_keyset_condition("AGE", "ASC", cursor_data, 42, params)
+    print(f"ASC: {condition}")
+    assert condition == ("(AGE > :after_value"
+                         " OR (AGE = :after_value AND t.ROWID > CHARTOROWID(:after_rowid))"
+                         " OR AGE IS NULL)")
+    assert params == {"after_rowid": "AAAR3sAAEAAAACXAAA", "after_value": 42}
+
+    params = {}
+    condition = build_keyset_condition("AGE", "DESC", cursor_data, 42, params)
+    print(f"DESC: {condition}")
+    assert condition == ("(AGE < :after_value"
+                         " OR (AGE = :after_value AND t.ROWID < CHARTOROWID(:after_rowid)))")
+    assert params == {"after_rowid": "AAAR3sAAEAAAACXAAA", "after_value": 42}
+
+    # No sort column: ROWID order only
+    params = {}
+    assert build_keyset_condition(None, "ASC", cursor_data, None, params) == "t.ROWID > CHARTOROWID(:after_rowid)"
+    assert params == {"after_rowid": "AAAR3sAAEAAAACXAAA"}
+
+    print("✅ Keyset condition test passed")
+
+
+def test_keyset_null_sort_value():
+    """Test seek predicates when the last row of the page has a NULL sort value"""
+    print("\n" + "=" * 60)
+    print("Testing Keyset Conditions With NULL Sort Value")
+    print("=" * 60)
+
+    cursor_data = {"s": "age", "o": "ASC", "v": None, "r": "AAAR3sAAEAAAACXAAA"}
+
+    # ASC puts NULLs last: only the remaining NULL rows follow
+    params = {}
+    condition = build_keyset_condition("AGE", "ASC", cursor_data, None, params)
+    assert condition == "(AGE IS NULL AND t.ROWID > CHARTOROWID(:after_rowid))"
+    assert "after_value" not in params
+
+    # DESC puts NULLs first: the remaining NULL rows, then every non-NULL value
+    params = {}
+    condition = build_keyset_condition("AGE", "DESC", cursor_data, None, params)
+    assert condition == "((AGE IS NULL AND t.ROWID < CHARTOROWID(:after_rowid)) OR AGE IS NOT NULL)"
+    assert "after_value" not in params
+
+    print("✅ NULL sort value test passed")
+
+
+def main():
+    """Run all keyset pagination tests"""
+    print("🚀 Starting Data Pagination Tests")
+    test_cursor_round_trip()
+    test_malformed_cursor()
+    test_keyset_conditions()
+    test_keyset_null_sort_value()
+    print("\n🎉 All data pagination tests completed!")
+
+
+if __name__ == "__main__":
+    main()
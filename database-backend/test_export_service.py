@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming Data Export Service
+
+This script tests that CSV, Parquet and XLSX exports are produced from
+batched rows and that gzip output decompresses to the same content.
+"""
+
+import io
+import sys
+import os
+import gzip
+from datetime import datetime
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from export_service import export_service
+
+COLUMNS = ["iin", "amount", "snapshot_date"]
+COLUMN_TYPES = ["string", "number", "date"]
+
+
+def _batches(batch_count=3, batch_size=4):
+    """Fake database.iter_query_batches output"""
+    for b in range(batch_count):
+        rows = [
+            (f"{b * batch_size + i:012d}", float(i), datetime(2024, 1, 1 + i))
+            for i in range(batch_size)
+        ]
+        yield COLUMNS, COLUMN_TYPES, rows
+
+
+def test_csv_export():
+    """Test chunked CSV output and gzip round-trip"""
+    print("=" * 60)
+    print("Testing CSV Export")
+    print("=" * 60)
+
+    content = b"".join(export_service.stream(_batches(), "csv"))
+    lines = content.decode("utf-8").splitlines()
+    print(f"CSV lines: {len(lines)}, first: {lines[:2]}")
+    assert lines[0] == "iin,amount,snapshot_date"
+    assert len(lines) == 1 + 12
+    assert lines[1] == "000000000000,0.0,2024-01-01T00:00:00"
+
+    compressed = b"".join(export_service.stream(_batches(), "csv", use_gzip=True))
+    assert gzip.decompress(compressed) == content
+
+    print("✅ CSV export test passed")
+
+
+def test_parquet_export():
+    """Test that each batch becomes a row group of a valid Parquet file"""
+    print("\n" + "=" * 60)
+    print("Testing Parquet Export")
+    print("=" * 60)
+
+    import pyarrow.parquet as pq
+
+    chunks = list(export_service.stream(_batches(), "parquet"))
+    parquet_file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    table = parquet_file.read()
+    print(f"Chunks: {len(chunks)}, row groups: {parquet_file.num_row_groups}, rows: {table.num_rows}")
+
+    assert table.num_rows == 12
+    assert parquet_file.num_row_groups == 3
+    assert table.column_names == COLUMNS
+    assert table.column("iin")[5].as_py() == "000000000005"
+
+    # Empty result still produces a file with the schema
+    empty = b"".join(export_service.stream(iter([(COLUMNS, COLUMN_TYPES, [])]), "parquet"))
+    assert pq.read_table(io.BytesIO(empty)).num_rows == 0
+
+    # Whole numbers wider than int64 (NUMBER(p,0) with p > 18) are written exactly
+    wide = [(["account_id", "client_id"], ["decimal", "integer"], [(10 ** 25 + 1, 7), (None, None)])]
+    table = pq.read_table(io.BytesIO(b"".join(export_service.stream(iter(wide), "parquet"))))
+    assert table.column("account_id").to_pylist()[0] == 10 ** 25 + 1
+    assert table.column("client_id").to_pylist() == [7, None]
+
+    print("✅ Parquet export test passed")
+
+
+def test_xlsx_export():
+    """Test write-only XLSX output"""
+    print("\n" + "=" * 60)
+    print("Testing XLSX Export")
+    print("=" * 60)
+
+    from openpyxl import load_workbook
+
+    content = b"".join(export_service.stream(_batches(), "xlsx"))
+    sheet = load_workbook(io.BytesIO(content), read_only=True).active
+    rows = list(sheet.iter_rows(values_only=True))
+    print(f"XLSX rows: {len(rows)}")
+
+    assert rows[0] == tuple(COLUMNS)
+    assert len(rows) == 13
+
+    print("✅ XLSX export test passed")
+
+
+def main():
+    """Run all export service tests"""
+    print("🚀 Starting Export Service Tests")
+    test_csv_export()
+    test_parquet_export()
+    test_xlsx_export()
+    print("\n🎉 All export service tests completed!")
+
+
+if __name__ == "__main__":
+    main()
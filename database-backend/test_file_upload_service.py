@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming file uploads
+
+This script tests that uploads are streamed to disk with a sha256 of the
+content, that the size limit aborts oversized uploads while streaming, that
+re-uploading the same content reuses the stored file, that IINs are
+cleaned and validated column-wise (including numeric columns that lost
+leading zeros), that large CSV / Parquet files are read in batches and that
+.xlsx files are streamed read-only into a Parquet sidecar that later reads use,
+and that /files/process reads the IINs saved at upload time by upload ID.
+"""
+
+import sys
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from file_upload_service import FileUploadService, UploadTooLargeError
+
+
+def _app(service):
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        try:
+            return await service.receive_upload(request)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return app
+
+
+def _service(directory, max_file_size=1024 * 1024):
+    service = FileUploadService()
+    service.upload_dir = Path(directory)
+    service.max_file_size = max_file_size
+    return service
+
+
+def test_streaming_and_duplicates():
+    """Test hashing, stored names and duplicate detection"""
+    print("=" * 60)
+    print("Testing Streaming Upload and Duplicates")
+    print("=" * 60)
+
+    content = b"IIN,NAME\n" + b"".join(b"9001013%05d,User\n" % i for i in range(5000))
+    with tempfile.TemporaryDirectory() as directory:
+        service = _service(directory)
+        client = TestClient(_app(service))
+
+        first = client.post("/upload", files={"file": ("../clients list.csv", content, "text/csv")}).json()
+        print(f"First upload: {first}")
+        assert first["sha256"] == hashlib.sha256(content).hexdigest()
+        assert first["size"] == len(content) and not first["duplicate"]
+        stored = Path(first["path"])
+        assert stored.parent == Path(directory)
+        assert stored.name == f"{first['sha256'][:16]}_clients_list.csv"
+        assert stored.read_bytes() == content
+
+        second = client.post("/upload", files={"file": ("copy.csv", content, "text/csv")}).json()
+        assert second["duplicate"] and second["path"] == first["path"]
+        assert [path.name for path in Path(directory).iterdir()] == [stored.name]
+
+        # Uploads are found by the stored name and by the original name (sanitized like on upload)
+        assert service.resolve_upload(stored.name) == stored
+        assert service.resolve_upload("clients list.csv") == stored
+        assert service.resolve_upload("other list.csv") is None
+
+    print("✅ Streaming upload test passed")
+
+
+def test_size_limit_and_validation():
+    """Test mid-stream size limit, unsupported types and missing file field"""
+    print("\n" + "=" * 60)
+    print("Testing Size Limit and Validation")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as directory:
+        client = TestClient(_app(_service(directory, max_file_size=100 * 1024)))
+
+        response = client.post("/upload", files={"file": ("big.csv", b"1" * (300 * 1024), "text/csv")})
+        print(f"Oversized: {response.status_code} {response.json()}")
+        assert response.status_code == 413
+
+        # Within the Content-Length allowance for multipart overhead: rejected while streaming
+        response = client.post("/upload", files={"file": ("big.csv", b"1" * (150 * 1024), "text/csv")})
+        assert response.status_code == 413
+
+        response = client.post("/upload", files={"file": ("notes.txt", b"hello", "text/plain")})
+        assert response.status_code == 400
+
+        response = client.post("/upload", data={"other": "value"}, files={"attachment": ("a.csv", b"1", "text/csv")})
+        assert response.status_code == 400
+
+        # Nothing (not even partial temp files) is left behind
+        assert list(Path(directory).iterdir()) == []
+
+    print("✅ Size limit and validation test passed")
+
+
+def test_iin_normalization():
+    """Test vectorized IIN cleaning of text and numeric columns"""
+    print("\n" + "=" * 60)
+    print("Testing IIN Normalization")
+    print("=" * 60)
+
+    service = FileUploadService()
+    text = pd.Series([
+        "900101300123", " 900101-300124 ", "abc", None, "", "50101300126.0",
+        "9.00101300125E+11", "9.00101E+11", "12345"
+    ])
+    iins, valid = service.normalize_iins(text)
+    print(pd.DataFrame({"raw": text, "iin": iins, "valid": valid}))
+    assert iins[valid].tolist() == ["900101300123", "900101300124", "050101300126", "900101300125"]
+    # Empty cells are neither valid nor errors; lossy scientific notation is an error
+    assert (iins.notna() & ~valid).tolist() == [False, False, True, False, False, False, False, True, True]
+
+    # Float column from a reader: NaN for empty cells, leading zero of 2005 births lost
+    numbers = pd.Series([900101300123.0, 50101300123.0, np.nan, 1.5])
+    iins, valid = service.normalize_iins(numbers)
+    assert iins[valid].tolist() == ["900101300123", "050101300123"]
+    assert valid.tolist() == [True, True, False, False] and pd.isna(iins[2])
+
+    assert service._validate_iin_column(pd.Series([900101300123, 50101300123] * 10))
+    assert not service._validate_iin_column(pd.Series(range(1, 200)))
+
+    # 12 digits without a valid birth date / century digit are not IINs
+    iins, valid = service.normalize_iins(pd.Series(["901301300123", "900132300123", "900101700123", "900101600123"]))
+    assert valid.tolist() == [False, False, False, True]
+
+    # Phone numbers (11 digits once read as numbers) are neither padded nor detected as IINs
+    phones = pd.DataFrame({
+        "PHONE": [77011234567 + i for i in range(20)],
+        "CLIENT": [f"Client {i}" for i in range(20)],
+    })
+    iins, valid = service.normalize_iins(phones["PHONE"])
+    assert not valid.any() and iins[0] == "77011234567"
+    assert service.detect_iin_column(phones) is None
+    phones["IIN"] = [50101300123 + i for i in range(20)]
+    assert service.detect_iin_column(phones) == "IIN"
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "clients.csv")
+        pd.DataFrame({
+            "n": range(10),
+            "IIN": ["900101300123"] * 3 + ["bad"] + ["050101300123"] * 5 + [None],
+        }).to_csv(path, index=False)
+        result = service.extract_iins_from_file(path, ".csv")
+
+    print(f"Extraction: {result['message']}")
+    assert result["iin_column"] == "IIN"
+    assert result["iins"] == ["900101300123", "050101300123"]
+    assert result["invalid_count"] == 1
+    assert result["validation_errors"] == ["Строка 4: 'bad' не является корректным IIN"]
+
+    print("✅ IIN normalization test passed")
+
+
+def test_batched_readers():
+    """Test encoding detection and batch-wise IIN extraction from CSV and Parquet"""
+    print("\n" + "=" * 60)
+    print("Testing Batched Readers")
+    print("=" * 60)
+
+    service = FileUploadService()
+    with tempfile.TemporaryDirectory() as directory:
+        # 250k rows, 1000 distinct IINs, one invalid value in the third batch
+        iins = [f"{900101300000 + i % 1000:012d}" for i in range(250000)]
+        iins[200000] = "bad"
+        csv_path = os.path.join(directory, "big.csv")
+        pd.DataFrame({"Клиент": ["Имя"] * len(iins), " IIN ": iins}).to_csv(csv_path, index=False, encoding="cp1251")
+
+        assert service.detect_encoding(csv_path) == "cp1251"
+        result = service.extract_iins_from_file(csv_path, ".csv")
+        print(f"CSV: {result['message']}, {result['load_stats']['load_time']:.2f}s")
+        assert result["success"] and result["iin_column"] == "IIN"
+        assert result["rows_processed"] == 250000
+        assert result["iins_extracted"] == 1000 and result["iins"][:2] == ["900101300000", "900101300001"]
+        assert result["invalid_count"] == 1
+        assert result["validation_errors"] == ["Строка 200001: 'bad' не является корректным IIN"]
+
+        parquet_path = os.path.join(directory, "clients.parquet")
+        pd.DataFrame({"iin": [900101300123, 50101300123, 900101300123] * 10, "x": range(30)}).to_parquet(
+            parquet_path, row_group_size=7
+        )
+        batches = list(service.iter_column_batches(parquet_path, ".parquet", "iin", batch_rows=10))
+        assert sum(map(len, batches)) == 30 and max(map(len, batches)) <= 10
+        result = service.extract_iins_from_file(parquet_path, ".parquet")
+        assert result["iins"] == ["900101300123", "050101300123"]
+        assert result["columns_detected"] == ["iin", "x"]
+
+    print("✅ Batched readers test passed")
+
+
+def test_excel_sidecar():
+    """Test read-only .xlsx streaming with and without the Parquet sidecar"""
+    print("\n" + "=" * 60)
+    print("Testing Excel Ingestion")
+    print("=" * 60)
+
+    import file_upload_service as module
+    from openpyxl import Workbook
+
+    service = FileUploadService()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "campaign.xlsx")
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Лист1")
+        sheet.append(["Name", " ИИН ", None, "Score"])
+        for i in range(300):
+            # Numbers lose the leading zero in Excel, text keeps it
+            sheet.append([f"Client {i}", 50101300100 + i % 100 if i % 2 else f"{50101300100 + i % 100:012d}", i, 0.5])
+        sheet.append(["Broken", "n/a", None])
+        workbook.save(path)
+
+        result = service.extract_iins_from_file(path, ".xlsx")
+        print(f"Sidecar: {result['message']}")
+        sidecar = service.excel_sidecar_path(path)
+        assert sidecar.is_file() and sidecar.name == ".campaign.xlsx.parquet"
+        assert result["iin_column"] == "ИИН"
+        assert result["columns_detected"] == ["Name", "ИИН", "Unnamed: 2", "Score"]
+        assert result["rows_processed"] == 301 and result["iins_extracted"] == 100
+        assert result["iins"][0] == "050101300100"
+        assert result["validation_errors"] == ["Строка 301: 'n/a' не является корректным IIN"]
+        assert result["sample_data"][0]["Unnamed: 2"] == 0 and result["sample_data"][0]["Score"] == 0.5
+
+        # Later reads (e.g. /files/process) use the sidecar even if the workbook is gone
+        os.rename(path, path + ".moved")
+        again = service.extract_iins_from_file(path, ".xlsx", iin_column="ИИН")
+        assert again["iins"] == result["iins"]
+        os.rename(path + ".moved", path)
+        sidecar.unlink()
+
+        # Without the sidecar only the IIN column is streamed from the workbook
+        original = module.UPLOAD_EXCEL_PARQUET_SIDECAR
+        module.UPLOAD_EXCEL_PARQUET_SIDECAR = False
+        try:
+            direct = service.extract_iins_from_file(path, ".xlsx")
+        finally:
+            module.UPLOAD_EXCEL_PARQUET_SIDECAR = original
+        assert not sidecar.exists()
+        assert direct["iins"] == result["iins"] and direct["invalid_count"] == 1
+
+    print("✅ Excel ingestion test passed")
+
+
+def test_upload_iin_sidecar():
+    """Test that processing an upload uses the saved IINs instead of the file"""
+    print("\n" + "=" * 60)
+    print("Testing Upload IIN Sidecar")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as directory:
+        service = _service(directory)
+        content = b"IIN\n900101300123\n050101300123\n900101300123\n"
+        upload_id = service.upload_id_for(hashlib.sha256(content).hexdigest())
+        path = os.path.join(directory, f"{upload_id}_clients.csv")
+        with open(path, "wb") as f:
+            f.write(content)
+        assert service.upload_id_from_path(path) == upload_id
+        assert service.upload_id_from_path(os.path.join(directory, "20240101_120000_old.csv")) is None
+
+        extraction = service.extract_iins_from_file(path, ".csv")
+        service.save_upload_iins(upload_id, extraction["iin_column"], extraction["iin_values"])
+        assert service.has_upload_iins(upload_id, "IIN") and not service.has_upload_iins(upload_id, "OTHER")
+        assert not service.has_upload_iins("../../etc", "IIN")
+
+        # The file itself is no longer needed
+        os.remove(path)
+        result = service.process_file_with_filters(None, "IIN", None, upload_id=upload_id)
+        print(f"Processed: {result['message']}")
+        assert result["success"] and result["iins"] == ["900101300123", "050101300123"]
+        assert not service.process_file_with_filters(None, "OTHER", None, upload_id=upload_id)["success"]
+
+    print("✅ Upload IIN sidecar test passed")
+
+
+def main():
+    """Run all file upload tests"""
+    print("🚀 Starting File Upload Tests")
+    test_streaming_and_duplicates()
+    test_size_limit_and_validation()
+    test_iin_normalization()
+    test_batched_readers()
+    test_excel_sidecar()
+    test_upload_iin_sidecar()
+    print("\n🎉 All file upload tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Test script for the background Job Service
+
+This script tests:
+- Job submission, execution and result persistence
+- Progress reporting and failure handling
+- Resuming / failing jobs interrupted by a restart
+"""
+
+import sys
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from job_service import JobService, STATUS_RUNNING
+
+
+def _wait_for(service, job_id, timeout=5.0):
+    """Poll a job until it finishes"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = service.get_job(job_id)
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish in {timeout}s")
+
+
+def _new_service(tmp_dir, name="jobs.sqlite3"):
+    return JobService(db_path=os.path.join(tmp_dir, name), max_workers=2)
+
+
+def test_job_success_and_progress():
+    """Test that a job runs, reports progress and stores its result"""
+    print("=" * 60)
+    print("Testing Job Success and Progress")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = _new_service(tmp_dir)
+
+        def handler(payload, progress):
+            progress.update(stage="work", rows_total=payload["rows"])
+            for i in range(payload["rows"]):
+                progress.update(rows_processed=i + 1)
+            return {"total": payload["rows"]}
+
+        service.register_handler("demo", handler)
+        service.start()
+        try:
+            job_id = service.submit("demo", {"rows": 3}, created_by="tester")
+            job = _wait_for(service, job_id)
+            print(f"Job finished: {job}")
+
+            assert job["status"] == "succeeded"
+            assert job["rows_processed"] == 3
+            assert job["rows_total"] == 3
+            assert service.get_job(job_id, include_result=True)["result"] == {"total": 3}
+            assert [j["job_id"] for j in service.list_jobs(created_by="tester")] == [job_id]
+            assert service.list_jobs(created_by="someone-else") == []
+        finally:
+            service.shutdown()
+
+    print("✅ Job success test passed")
+
+
+def test_job_failure():
+    """Test that handler errors are stored on the job"""
+    print("\n" + "=" * 60)
+    print("Testing Job Failure")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = _new_service(tmp_dir)
+
+        def handler(payload, progress):
+            raise ValueError("boom")
+
+        service.register_handler("broken", handler)
+        service.start()
+        try:
+            job = _wait_for(service, service.submit("broken", {}))
+            print(f"Job finished: {job}")
+            assert job["status"] == "failed"
+            assert job["error"] == "boom"
+        finally:
+            service.shutdown()
+
+    print("✅ Job failure test passed")
+
+
+def test_restart_recovery():
+    """Test that interrupted jobs are re-queued or failed depending on their stage"""
+    print("\n" + "=" * 60)
+    print("Testing Restart Recovery")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Simulate jobs left "running" by a crashed worker
+        crashed = _new_service(tmp_dir)
+        crashed.register_handler("demo", lambda payload, progress: {"ok": True}, restartable_stages=("query",))
+        crashed.start()
+
+        safe_id = crashed.submit("demo", {})
+        unsafe_id = crashed.submit("demo", {})
+        crashed.shutdown()
+        time.sleep(0.1)
+        crashed._update(safe_id, status=STATUS_RUNNING, stage="query", result=None, finished_at=None)
+        crashed._update(unsafe_id, status=STATUS_RUNNING, stage="theory_creation", result=None, finished_at=None)
+
+        restarted = _new_service(tmp_dir)
+        restarted.register_handler("demo", lambda payload, progress: {"ok": True}, restartable_stages=("query",))
+        restarted.start()
+        try:
+            safe_job = _wait_for(restarted, safe_id)
+            unsafe_job = restarted.get_job(unsafe_id)
+            print(f"Restartable job: {safe_job['status']}, non-restartable job: {unsafe_job['status']}")
+            assert safe_job["status"] == "succeeded"
+            assert unsafe_job["status"] == "failed"
+        finally:
+            restarted.shutdown()
+
+    print("✅ Restart recovery test passed")
+
+
+def test_deduplicated_submit():
+    """Test that a job with the same dedupe key is reused while it is queued or running"""
+    print("\n" + "=" * 60)
+    print("Testing Deduplicated Submit")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = _new_service(tmp_dir)
+        release = threading.Event()
+        calls = []
+
+        def handler(payload, progress):
+            calls.append(payload)
+            release.wait(timeout=5)
+            return {"count": 42}
+
+        service.register_handler("count", handler)
+        service.start()
+        try:
+            first_id = service.submit("count", {"n": 1}, created_by="analyst", dedupe_key="key-a")
+            assert service.submit("count", {"n": 2}, created_by="analyst", dedupe_key="key-a") == first_id
+            other_id = service.submit("count", {"n": 3}, created_by="analyst", dedupe_key="key-b")
+            assert other_id != first_id
+
+            release.set()
+            assert _wait_for(service, first_id)["status"] == "succeeded"
+            _wait_for(service, other_id)
+            assert len(calls) == 2
+
+            # A finished job is not reused
+            assert service.submit("count", {"n": 4}, created_by="analyst", dedupe_key="key-a") != first_id
+        finally:
+            service.shutdown()
+
+    # Stores created before the dedupe_key column existed are migrated
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "jobs.sqlite3")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, job_type TEXT NOT NULL, status TEXT NOT NULL, "
+                     "stage TEXT, rows_processed INTEGER NOT NULL DEFAULT 0, rows_total INTEGER, created_by TEXT, "
+                     "payload TEXT, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                     "created_at TEXT NOT NULL, started_at TEXT, updated_at TEXT NOT NULL, finished_at TEXT)")
+        conn.close()
+        service = JobService(db_path=db_path, max_workers=1)
+        service.register_handler("count", lambda payload, progress: {"count": 1})
+        service.start()
+        try:
+            assert _wait_for(service, service.submit("count", {}, dedupe_key="key-a"))["status"] == "succeeded"
+        finally:
+            service.shutdown()
+
+    print("✅ Deduplicated submit test passed")
+
+
+def test_dedicated_executor():
+    """Test that a job type with its own pool cannot hold up jobs on the shared pool"""
+    print("\n" + "=" * 60)
+    print("Testing Dedicated Executor")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = JobService(db_path=os.path.join(tmp_dir, "jobs.sqlite3"), max_workers=1)
+        release = threading.Event()
+
+        def slow_count(payload, progress):
+            release.wait(timeout=5)
+            return {"count": 1}
+
+        service.register_handler("count", slow_count, max_workers=1)
+        service.register_handler("stratify", lambda payload, progress: {"ok": True})
+        service.start()
+        try:
+            count_ids = [service.submit("count", {"n": n}, created_by="analyst") for n in range(3)]
+            assert service.count_active_jobs("count") == 3
+            assert service.count_active_jobs("count", created_by="analyst") == 3
+            assert service.count_active_jobs("count", created_by="other") == 0
+
+            # The single shared worker is free even though every count job is queued or running
+            assert _wait_for(service, service.submit("stratify", {}))["status"] == "succeeded"
+
+            release.set()
+            for job_id in count_ids:
+                assert _wait_for(service, job_id)["status"] == "succeeded"
+            assert service.count_active_jobs("count") == 0
+        finally:
+            service.shutdown()
+
+    print("✅ Dedicated executor test passed")
+
+
+def main():
+    """Run all job service tests"""
+    print("🚀 Starting Job Service Tests")
+    test_job_success_and_progress()
+    test_job_failure()
+    test_restart_recovery()
+    test_deduplicated_submit()
+    test_dedicated_executor()
+    print("\n🎉 All job service tests completed!")
+
+
+if __name__ == "__main__":
+    main()
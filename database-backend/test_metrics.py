@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for the request metrics middleware
+
+This script tests that per-route latency histograms and per-request Oracle /
+parquet counters are collected (also from sync endpoints running in the
+threadpool), rendered in Prometheus text format and sent as Server-Timing.
+"""
+
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from metrics import (
+    MetricsMiddleware, MetricsRegistry, record_oracle_call, record_connection_acquire,
+    record_parquet_cache, estimate_fetch_round_trips
+)
+
+
+def _app(registry, server_timing=False):
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, registry=registry, server_timing=server_timing)
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: int):
+        # Sync endpoint: runs in the threadpool with a copy of the request context
+        record_connection_acquire(0.002)
+        record_oracle_call(0.010)
+        record_oracle_call(0.005, rows=250, round_trips=3)
+        record_parquet_cache(hit=True)
+        return {"id": item_id}
+
+    return app
+
+
+def test_prometheus_output():
+    """Test route-templated histograms and counters"""
+    print("=" * 60)
+    print("Testing Prometheus Metrics")
+    print("=" * 60)
+
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    client = TestClient(_app(registry))
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 200
+    assert client.get("/missing").status_code == 404
+
+    output = registry.render()
+    print(output)
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2' in output
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/items/{item_id}",status="200",le="+Inf"} 2' in output
+    assert 'route="unmatched",status="404"' in output
+    assert 'oracle_round_trips_total{route="/items/{item_id}"} 8' in output
+    assert 'oracle_rows_fetched_total{route="/items/{item_id}"} 500' in output
+    assert 'oracle_connections_acquired_total{route="/items/{item_id}"} 2' in output
+    assert 'parquet_cache_hits_total{route="/items/{item_id}"} 2' in output
+
+    print("✅ Prometheus metrics test passed")
+
+
+def test_server_timing_header():
+    """Test the optional Server-Timing header"""
+    print("\n" + "=" * 60)
+    print("Testing Server-Timing Header")
+    print("=" * 60)
+
+    client = TestClient(_app(MetricsRegistry(), server_timing=True))
+    header = client.get("/items/1").headers.get("server-timing")
+    print(f"Server-Timing: {header}")
+    assert header.startswith("app;dur=")
+    assert 'db;dur=15.0;desc="4 round-trips, 250 rows"' in header
+    assert "parquet;" in header
+
+    assert "server-timing" not in TestClient(_app(MetricsRegistry())).get("/items/1").headers
+    assert estimate_fetch_round_trips(0, 100) == 1
+    assert estimate_fetch_round_trips(250, 100) == 3
+
+    print("✅ Server-Timing header test passed")
+
+
+def main():
+    """Run all metrics tests"""
+    print("🚀 Starting Metrics Tests")
+    test_prometheus_output()
+    test_server_timing_header()
+    print("\n🎉 All metrics tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test script for QueryBuilder SQL generation
+
+This script tests:
+- Filter values are emitted as bind variables, never inlined into SQL text
+- IN lists are bucketed so different list sizes share a statement
+- Count queries use the same WHERE clause and binds
+- Estimate queries add SAMPLE BLOCK / APPROX_COUNT_DISTINCT around the same filters
+- Bind values are converted to the column type from the metadata index
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from query_builder import QueryBuilder
+
+TABLE = "DSSB_DM.RB_CLIENTS"
+
+
+def _request(filters, **extra):
+    request = {"database_id": "DSSB_APP", "table": TABLE, "filters": filters, "limit": 100}
+    request.update(extra)
+    return request
+
+
+def test_values_are_bound():
+    """Test that literal values never appear in the SQL text"""
+    print("=" * 60)
+    print("Testing Bind Variables")
+    print("=" * 60)
+
+    builder = QueryBuilder()
+    sql, params = builder.build_query(_request([
+        {"column": "last_name", "operator": "equals", "value": "123' OR '1'='1"},
+        {"column": "ocrm_dwh_id", "operator": "greater_than", "value": 30},
+    ]))
+    print(f"SQL: {sql}\nParams: {params}")
+
+    assert "123" not in sql and "30" not in sql
+    assert "LAST_NAME = :b0" in sql and "OCRM_DWH_ID > :b1" in sql
+    assert params["b0"] == "123' OR '1'='1"
+    assert params["b1"] == 30
+    assert "ROWNUM <= :b2" in sql and params["b2"] == 100
+
+    print("✅ Bind variable test passed")
+
+
+def test_like_and_null_operators():
+    """Test LIKE wildcards go into the bind value and NULL checks take no binds"""
+    print("\n" + "=" * 60)
+    print("Testing LIKE and NULL Operators")
+    print("=" * 60)
+
+    builder = QueryBuilder()
+    sql, params = builder.build_count_query(_request([
+        {"column": "last_name", "operator": "contains", "value": "9001"},
+        {"column": "snapshot_date", "operator": "is_null"},
+    ]))
+    print(f"SQL: {sql}\nParams: {params}")
+
+    assert sql == f"SELECT COUNT(*) FROM {TABLE} WHERE LAST_NAME LIKE :b0 AND SNAPSHOT_DATE IS NULL"
+    assert params == {"b0": "%9001%"}
+
+    print("✅ LIKE and NULL test passed")
+
+
+def test_in_list_bucketing():
+    """Test that IN lists of different sizes produce the same SQL text"""
+    print("\n" + "=" * 60)
+    print("Testing IN List Bucketing")
+    print("=" * 60)
+
+    builder = QueryBuilder()
+    sql_3, params_3 = builder.build_count_query(_request([{"column": "gm_system_code", "operator": "in", "value": ["1", "2", "3"]}]))
+    sql_4, params_4 = builder.build_count_query(_request([{"column": "gm_system_code", "operator": "in", "value": "1, 2, 3, 4"}]))
+    print(f"SQL (3 values): {sql_3}\nParams: {params_3}")
+
+    assert sql_3 == sql_4
+    assert list(params_3.values()) == ["1", "2", "3", "3"]
+    assert list(params_4.values()) == ["1", "2", "3", "4"]
+
+    # Lists longer than Oracle's 1000 expression limit are split
+    sql_big, params_big = builder.build_count_query(_request([
+        {"column": "gm_system_code", "operator": "not_in", "value": [str(i) for i in range(1500)]}
+    ]))
+    assert sql_big.count("NOT IN (") == 2 and " AND " in sql_big
+    assert len(params_big) == 1000 + 512
+
+    # Empty lists are skipped instead of producing invalid SQL
+    sql_empty, params_empty = builder.build_count_query(_request([{"column": "gm_system_code", "operator": "in", "value": []}]))
+    assert "WHERE" not in sql_empty and params_empty == {}
+
+    print("✅ IN list bucketing test passed")
+
+
+def test_type_aware_binding():
+    """Test that NUMBER and DATE filter values are bound with native types"""
+    print("\n" + "=" * 60)
+    print("Testing Type-Aware Binding")
+    print("=" * 60)
+
+    builder = QueryBuilder()
+    sql, params = builder.build_count_query(_request([
+        {"column": "IIN_BIN", "operator": "in", "value": "900101300123, 900101300124"},
+        {"column": "Snapshot_Date", "operator": "greater_equal", "value": "01.02.2024"},
+        {"column": "last_name", "operator": "equals", "value": "007"},
+    ]))
+    print(f"SQL: {sql}\nParams: {params}")
+
+    assert params["b0"] == 900101300123 and params["b1"] == 900101300124
+    assert params["b2"] == datetime(2024, 2, 1)
+    assert params["b3"] == "007"
+
+    try:
+        builder.build_count_query(_request([{"column": "iin_bin", "operator": "equals", "value": "abc"}]))
+        raise AssertionError("Expected ValueError for a non-numeric NUMBER filter")
+    except ValueError as e:
+        print(f"Rejected as expected: {e}")
+
+    # Unknown columns are ignored, unknown tables rejected
+    sql, params = builder.build_count_query(_request([{"column": "no_such_column", "operator": "equals", "value": "x"}]))
+    assert "WHERE" not in sql
+    assert not builder.validate_table_access("dssb_app", "dssb_dm.no_such_table")
+    assert builder.validate_table_access("dssb_app", "dssb_dm.rb_clients")
+
+    print("✅ Type-aware binding test passed")
+
+
+def test_estimate_queries():
+    """Test sampled count and approximate distinct count queries"""
+    print("\n" + "=" * 60)
+    print("Testing Estimate Queries")
+    print("=" * 60)
+
+    builder = QueryBuilder()
+    filters = [{"column": "last_name", "operator": "equals", "value": "X"}]
+    sql, params = builder.build_sample_count_query(_request(filters), 0.5)
+    print(f"SQL: {sql}\nParams: {params}")
+    assert sql == f"SELECT COUNT(*) AS sample_rows FROM {TABLE} SAMPLE BLOCK (0.5) WHERE LAST_NAME = :b0"
+    assert params == {"b0": "X"}
+
+    sql, _ = builder.build_sample_count_query(_request(filters), 0.000001)
+    assert "SAMPLE BLOCK (0.000001)" in sql
+    sql, _ = builder.build_sample_count_query(_request(filters), 100)
+    assert "SAMPLE" not in sql
+
+    sql, params = builder.build_distinct_count_query(_request(filters), "iin_bin")
+    assert sql == f"SELECT APPROX_COUNT_DISTINCT(IIN_BIN) AS distinct_count FROM {TABLE} WHERE LAST_NAME = :b0"
+    sql, _ = builder.build_distinct_count_query(_request(filters), "iin_bin", approximate=False)
+    assert sql.startswith("SELECT COUNT(DISTINCT IIN_BIN) AS distinct_count")
+
+    try:
+        builder.build_distinct_count_query(_request(filters), "no_such_column")
+        raise AssertionError("Expected ValueError for an unknown distinct column")
+    except ValueError as e:
+        print(f"Rejected as expected: {e}")
+
+    print("✅ Estimate query test passed")
+
+
+def main():
+    """Run all query builder tests"""
+    print("🚀 Starting QueryBuilder Tests")
+    test_values_are_bound()
+    test_like_and_null_operators()
+    test_in_list_bucketing()
+    test_type_aware_binding()
+    test_estimate_queries()
+    print("\n🎉 All QueryBuilder tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for the Query Result Cache
+
+This script tests cache keys (SQL normalization and bind values), per-table
+TTL expiry, LRU eviction under the byte budget and per-table invalidation.
+"""
+
+import sys
+import os
+import time
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from query_cache import QueryResultCache
+
+
+def test_make_key():
+    """Test that keys ignore whitespace and bind order but not bind values or database"""
+    print("=" * 60)
+    print("Testing Cache Keys")
+    print("=" * 60)
+
+    sql = "SELECT *\n  FROM DSSB_DM.RB_CLIENTS WHERE AGE > :p0 AND CITY = :p1"
+    key = QueryResultCache.make_key(sql, {"p0": 30, "p1": "Almaty"}, "dssb_app")
+
+    assert key == QueryResultCache.make_key(" ".join(sql.split()), {"p1": "Almaty", "p0": 30}, "DSSB_APP")
+    assert key != QueryResultCache.make_key(sql, {"p0": 31, "p1": "Almaty"}, "DSSB_APP")
+    assert key != QueryResultCache.make_key(sql, {"p0": 30, "p1": "Almaty"}, "SPSS")
+    assert key != QueryResultCache.make_key(sql, None, "DSSB_APP")
+    assert QueryResultCache.make_key(sql) == QueryResultCache.make_key(sql, {})
+
+    print("✅ Cache key test passed")
+
+
+def test_ttl_expiry():
+    """Test that entries expire after the TTL of their table"""
+    print("\n" + "=" * 60)
+    print("Testing TTL Expiry")
+    print("=" * 60)
+
+    cache = QueryResultCache(default_ttl=300, enabled=True)
+    cache.table_ttls["DSSB_APP.SC_LOCAL_TARGET"] = 0
+    assert cache.ttl_for_table("dssb_dm.rb_clients") == 900
+    assert cache.ttl_for_table("UNKNOWN.TABLE") == 300
+    assert cache.ttl_for_table(None) == 300
+
+    cache.set("fresh", {"data": [1]}, table="DSSB_DM.RB_CLIENTS")
+    cache.set("expiring", {"data": [2]}, table="dssb_app.sc_local_target")
+    time.sleep(0.01)
+
+    assert cache.get("fresh") == {"data": [1]}
+    assert cache.get("expiring") is None
+    stats = cache.get_stats()
+    print(f"Stats: {stats}")
+    assert stats["entries"] == 1 and stats["hits"] == 1 and stats["misses"] == 1
+
+    print("✅ TTL expiry test passed")
+
+
+def test_eviction_under_byte_budget():
+    """Test least-recently-used eviction once the byte budget is exceeded"""
+    print("\n" + "=" * 60)
+    print("Testing Byte Budget Eviction")
+    print("=" * 60)
+
+    value = {"data": "x" * 100}
+    entry_size = len('{"data": "' + "x" * 100 + '"}')
+    cache = QueryResultCache(max_bytes=entry_size * 3, max_entry_bytes=entry_size * 2, enabled=True)
+
+    for key in ("a", "b", "c"):
+        assert cache.set(key, value)
+    # Touch "a" so "b" is the least recently used entry
+    assert cache.get("a") == value
+    assert cache.set("d", value)
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) == value for key in ("a", "c", "d"))
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["size_bytes"] == entry_size * 3
+
+    # Values above the per-entry limit are never stored
+    assert not cache.set("huge", {"data": "x" * (entry_size * 2)})
+    assert cache.get("huge") is None
+
+    print("✅ Byte budget eviction test passed")
+
+
+def test_invalidate_table():
+    """Test that only the entries of the invalidated table are dropped"""
+    print("\n" + "=" * 60)
+    print("Testing Table Invalidation")
+    print("=" * 60)
+
+    cache = QueryResultCache(enabled=True)
+    cache.set("target_1", {"data": [1]}, table="DSSB_APP.SC_LOCAL_TARGET")
+    cache.set("target_2", {"data": [2]}, table="DSSB_APP.SC_LOCAL_TARGET")
+    cache.set("clients", {"data": [3]}, table="DSSB_DM.RB_CLIENTS")
+
+    assert cache.invalidate_table("dssb_app.sc_local_target") == 2
+    assert cache.get("target_1") is None and cache.get("target_2") is None
+    assert cache.get("clients") == {"data": [3]}
+    assert cache.invalidate_table("DSSB_APP.SC_LOCAL_TARGET") == 0
+    assert cache.get_stats()["entries"] == 1
+
+    print("✅ Table invalidation test passed")
+
+
+def main():
+    """Run all query cache tests"""
+    print("🚀 Starting Query Cache Tests")
+    test_make_key()
+    test_ttl_expiry()
+    test_eviction_under_byte_budget()
+    test_invalidate_table()
+    print("\n🎉 All query cache tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Test script for QueryBuilder query control
+
+This script tests that running queries are registered by request id, get a
+bounded call timeout, can be cancelled by their owner (connection.cancel()),
+are cancelled when the client disconnects and are limited per user.
+"""
+
+import sys
+import os
+import time
+import asyncio
+import threading
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+from query_control import QueryControl, QueryLimitExceeded, CANCEL_REASON_DISCONNECT
+
+
+class FakeConnection:
+    """Blocks like a long Oracle call until cancel() is called"""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after: float):
+        self.disconnect_at = time.monotonic() + disconnect_after
+
+    async def is_disconnected(self):
+        return time.monotonic() >= self.disconnect_at
+
+
+def _long_query(connection, seen_timeouts):
+    def run(on_connect, call_timeout_ms):
+        seen_timeouts.append(call_timeout_ms)
+        on_connect(connection)
+        if connection.cancelled.wait(timeout=5):
+            return {"success": False, "error": "ORA-01013: user requested cancel of current operation"}
+        return {"success": True, "data": []}
+    return run
+
+
+def test_cancel_and_limits():
+    """Test explicit cancellation, timeouts and the per-user limit"""
+    print("=" * 60)
+    print("Testing Query Cancellation and Limits")
+    print("=" * 60)
+
+    control = QueryControl(max_per_user=1, call_timeout_seconds=60, poll_seconds=0.05)
+    assert control.timeout_for(None) == 60
+    assert control.timeout_for(10) == 10
+    assert control.timeout_for(600) == 60
+
+    async def scenario():
+        connection = FakeConnection()
+        timeouts = []
+        task = asyncio.ensure_future(
+            control.run("req-1", "analyst", "SELECT 1 FROM dual", _long_query(connection, timeouts), timeout_seconds=30)
+        )
+        await asyncio.sleep(0.2)
+        assert [query["request_id"] for query in control.list_active("analyst")] == ["req-1"]
+
+        # Second query of the same user is rejected while the first one runs
+        try:
+            await control.run("req-2", "analyst", "SELECT 2 FROM dual", _long_query(FakeConnection(), []))
+            raise AssertionError("Expected QueryLimitExceeded")
+        except QueryLimitExceeded as e:
+            print(f"Limit: {e}")
+
+        # Only the owner (or an admin, username=None) can cancel
+        assert not control.cancel("req-1", username="someone_else")
+        assert control.cancel("req-1", username="analyst")
+        result, query = await task
+        return result, query, timeouts
+
+    result, query, timeouts = asyncio.run(scenario())
+    assert timeouts == [30000]
+    assert not result["success"]
+    assert control.failure_message(query, result) == "Запрос отменен пользователем"
+    assert control.list_active() == []
+
+    timed_out = QueryControl(call_timeout_seconds=5)
+    message = timed_out.failure_message(
+        timed_out._start("req-3", "analyst", "SELECT 3 FROM dual", 5),
+        {"error": "DPI-1067: call timeout of 5000 ms exceeded with ORA-3156"}
+    )
+    assert message == "Превышено время выполнения запроса (5 с)"
+
+    print("✅ Query cancellation and limits test passed")
+
+
+def test_client_disconnect():
+    """Test that a disconnected client cancels the running query"""
+    print("\n" + "=" * 60)
+    print("Testing Cancellation on Client Disconnect")
+    print("=" * 60)
+
+    control = QueryControl(max_per_user=2, call_timeout_seconds=60, poll_seconds=0.05)
+    connection = FakeConnection()
+    started = time.monotonic()
+    result, query = asyncio.run(control.run(
+        "req-4", "analyst", "SELECT 4 FROM dual", _long_query(connection, []),
+        http_request=FakeRequest(disconnect_after=0.2)
+    ))
+    elapsed = time.monotonic() - started
+    print(f"Cancelled after {elapsed:.2f}s")
+
+    assert connection.cancelled.is_set()
+    assert query.cancel_reason == CANCEL_REASON_DISCONNECT
+    assert not result["success"]
+    assert elapsed < 2
+    assert control.list_active() == []
+
+    print("✅ Client disconnect test passed")
+
+
+class RecordingConnection:
+    """Counts cursor() calls; a cancelled query must never open one"""
+
+    def __init__(self):
+        self.cursors = 0
+        self.callTimeout = 0
+
+    def cursor(self):
+        self.cursors += 1
+        raise AssertionError("The cancelled query must not be executed")
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_cancel_before_connect():
+    """Test that a query cancelled before it has a connection never executes"""
+    print("\n" + "=" * 60)
+    print("Testing Cancellation Before Connect")
+    print("=" * 60)
+
+    control = QueryControl(max_per_user=2, call_timeout_seconds=60, poll_seconds=0.05)
+    connection = RecordingConnection()
+    pool_busy = threading.Event()
+
+    def slow_connect():
+        # Waiting for a pooled session while the user cancels
+        pool_busy.wait(timeout=5)
+        return connection
+
+    def run(on_connect, call_timeout_ms):
+        return database.execute_query("SELECT 5 FROM dual", None, call_timeout_ms, on_connect)
+
+    async def scenario():
+        task = asyncio.ensure_future(control.run("req-5", "analyst", "SELECT 5 FROM dual", run))
+        await asyncio.sleep(0.1)
+        assert control.cancel("req-5", username="analyst")
+        pool_busy.set()
+        return await task
+
+    original_connect = database.get_connection_DSSB_APP
+    database.get_connection_DSSB_APP = slow_connect
+    try:
+        result, query = asyncio.run(scenario())
+    finally:
+        database.get_connection_DSSB_APP = original_connect
+
+    print(f"Result: {result}")
+    assert not result["success"]
+    assert "cancelled before it started" in result["error"]
+    assert connection.cursors == 0
+    assert control.failure_message(query, result) == "Запрос отменен пользователем"
+    assert control.list_active() == []
+
+    print("✅ Cancellation before connect test passed")
+
+
+def main():
+    """Run all query control tests"""
+    print("🚀 Starting Query Control Tests")
+    test_cancel_and_limits()
+    test_client_disconnect()
+    test_cancel_before_connect()
+    print("\n🎉 All query control tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent Query History Store
+
+This script tests that entries get autoincrement ids, are listed newest first
+with user/table filters, that dashboard counters are maintained on insert and
+that the retention policy prunes old and overflowing entries.
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from query_history_store import QueryHistoryStore
+
+
+def test_record_and_list():
+    """Test recording, listing and counters"""
+    print("=" * 60)
+    print("Testing Query History Recording")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = QueryHistoryStore(db_path=os.path.join(tmp_dir, "history.sqlite3"))
+        first = store.record("SELECT 1 FROM DUAL", "DSSB_APP", "DSSB_DM.RB_CLIENTS", 0.5, "success", 10, "alice")
+        second = store.record("SELECT 2 FROM DUAL", "DSSB_APP", "DSSB_APP.SC_LOCAL_TARGET", 1.5, "success", 5, "bob")
+        third = store.record("SELECT 3 FROM DUAL", "DSSB_APP", "DSSB_DM.RB_CLIENTS", 9.0, "error", 0, "alice")
+        assert (first, second, third) == (1, 2, 3)
+
+        history = store.list(page=1, limit=2)
+        print(f"Page 1: {[entry['id'] for entry in history]}")
+        assert [entry["id"] for entry in history] == [3, 2]
+        assert history[0]["table"] == "DSSB_DM.RB_CLIENTS"
+        assert history[0]["execution_time"] == "9.000s"
+        assert isinstance(history[0]["created_at"], datetime)
+        assert [entry["id"] for entry in store.list(page=2, limit=2)] == [1]
+        assert [entry["id"] for entry in store.list(user="alice")] == [3, 1]
+        assert [entry["id"] for entry in store.list(table="DSSB_APP.SC_LOCAL_TARGET")] == [2]
+
+        stats = store.get_stats()
+        print(f"Stats: {stats}")
+        assert stats["total_queries"] == 3
+        assert stats["successful_queries"] == 2
+        assert stats["total_users"] == 2
+        assert stats["avg_response_seconds"] == 1.0
+
+    print("✅ Query history recording test passed")
+
+
+def test_retention():
+    """Test pruning by age and by row count"""
+    print("\n" + "=" * 60)
+    print("Testing Query History Retention")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = QueryHistoryStore(db_path=os.path.join(tmp_dir, "history.sqlite3"), retention_days=30, max_rows=3)
+        store.record("old", "DSSB_APP", "T", 0.1, "success", created_at=datetime.now() - timedelta(days=45))
+        for i in range(5):
+            store.record(f"q{i}", "DSSB_APP", "T", 0.1, "success", user="alice")
+
+        deleted = store.prune()
+        remaining = [entry["sql"] for entry in store.list(limit=100)]
+        print(f"Deleted {deleted}, remaining: {remaining}")
+        assert deleted == 3
+        assert remaining == ["q4", "q3", "q2"]
+
+        # Counters keep all-time totals
+        assert store.get_stats()["total_queries"] == 6
+
+    print("✅ Query history retention test passed")
+
+
+def main():
+    """Run all query history store tests"""
+    print("🚀 Starting Query History Store Tests")
+    test_record_and_list()
+    test_retention()
+    print("\n🎉 All query history store tests completed!")
+
+
+if __name__ == "__main__":
+    main()
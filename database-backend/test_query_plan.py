@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test script for the Query Plan Service
+
+This script tests how EXPLAIN PLAN rows are summarized: statement cost and
+cardinality, the largest row source, full scan detection and the warn /
+refuse threshold modes.
+"""
+
+import sys
+import os
+import types
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from query_plan import QueryPlanService
+
+# PLAN_TABLE rows for SELECT * FROM (... WHERE LAST_NAME = :b0) WHERE ROWNUM <= :b1
+FULL_SCAN_PLAN = [
+    {"id": 0, "parent_id": None, "depth": 0, "operation": "SELECT STATEMENT", "options": None,
+     "object_owner": None, "object_name": None, "cost": 91234, "cardinality": 100, "bytes": 52000},
+    {"id": 1, "parent_id": 0, "depth": 1, "operation": "COUNT", "options": "STOPKEY",
+     "object_owner": None, "object_name": None, "cost": None, "cardinality": None, "bytes": None},
+    {"id": 2, "parent_id": 1, "depth": 2, "operation": "TABLE ACCESS", "options": "FULL",
+     "object_owner": "DSSB_DM", "object_name": "RB_CLIENTS", "cost": 91234, "cardinality": 12000000, "bytes": 6240000000},
+]
+
+INDEX_PLAN = [
+    {"id": 0, "parent_id": None, "depth": 0, "operation": "SELECT STATEMENT", "options": None,
+     "object_owner": None, "object_name": None, "cost": 4, "cardinality": 1, "bytes": 520},
+    {"id": 1, "parent_id": 0, "depth": 1, "operation": "TABLE ACCESS", "options": "BY INDEX ROWID",
+     "object_owner": "DSSB_DM", "object_name": "RB_CLIENTS", "cost": 4, "cardinality": 1, "bytes": 520},
+    {"id": 2, "parent_id": 1, "depth": 2, "operation": "INDEX", "options": "UNIQUE SCAN",
+     "object_owner": "DSSB_DM", "object_name": "RB_CLIENTS_IIN_IDX", "cost": 3, "cardinality": 1, "bytes": None},
+]
+
+
+def test_full_scan_detection():
+    """Test that full table scans are flagged and thresholds applied in warn mode"""
+    print("=" * 60)
+    print("Testing Full Scan Detection")
+    print("=" * 60)
+
+    service = QueryPlanService(max_rows=5_000_000, max_cost=0, mode="warn")
+    assessment = service.assess(FULL_SCAN_PLAN)
+    print(f"Assessment: {assessment}")
+
+    assert assessment["estimated_cost"] == 91234
+    assert assessment["estimated_rows"] == 100
+    assert assessment["scanned_rows"] == 12_000_000
+    assert assessment["full_table_scans"][0]["object"] == "DSSB_DM.RB_CLIENTS"
+    assert len(assessment["warnings"]) == 2
+    assert assessment["exceeds_threshold"] and not assessment["blocked"]
+
+    indexed = service.assess(INDEX_PLAN)
+    assert indexed["full_table_scans"] == [] and indexed["warnings"] == []
+    assert not indexed["exceeds_threshold"]
+
+    print("✅ Full scan detection test passed")
+
+
+def test_refuse_mode():
+    """Test that refuse mode blocks plans over the row or cost threshold"""
+    print("\n" + "=" * 60)
+    print("Testing Refuse Mode")
+    print("=" * 60)
+
+    assert QueryPlanService(max_rows=20_000_000, max_cost=50_000, mode="refuse").assess(FULL_SCAN_PLAN)["blocked"]
+    assert not QueryPlanService(max_rows=20_000_000, max_cost=0, mode="refuse").assess(FULL_SCAN_PLAN)["blocked"]
+    assert QueryPlanService(mode="unknown").mode == "warn"
+    assert QueryPlanService().assess([])["estimated_cost"] is None
+
+    print("✅ Refuse mode test passed")
+
+
+class FakeCursor:
+    def __init__(self, calls):
+        self.calls = calls
+        self.rows = []
+
+    def execute(self, sql, *args):
+        self.calls.append((sql, args))
+        if "FROM PLAN_TABLE" in sql and sql.lstrip().startswith("SELECT"):
+            self.rows = [tuple(step.values()) for step in INDEX_PLAN]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def cursor(self):
+        return FakeCursor(self.calls)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_explain_without_binds():
+    """Test that EXPLAIN PLAN is executed without bind values and the plan rows are read back"""
+    print("\n" + "=" * 60)
+    print("Testing EXPLAIN PLAN Execution")
+    print("=" * 60)
+
+    calls = []
+    fake_database = types.ModuleType("database")
+    fake_database.get_connection_DSSB_APP = lambda: FakeConnection(calls)
+    original_database = sys.modules.get("database")
+    sys.modules["database"] = fake_database
+    try:
+        plan = QueryPlanService().explain("SELECT * FROM DSSB_DM.RB_CLIENTS WHERE IIN = :p0")
+    finally:
+        if original_database is not None:
+            sys.modules["database"] = original_database
+        else:
+            sys.modules.pop("database")
+
+    explain_sql, explain_args = calls[0]
+    print(f"Executed: {explain_sql}")
+    assert explain_sql.startswith("EXPLAIN PLAN SET STATEMENT_ID = 'dq_")
+    assert explain_sql.endswith("FOR SELECT * FROM DSSB_DM.RB_CLIENTS WHERE IIN = :p0")
+    # Binds passed to EXPLAIN PLAN fail with ORA-01036
+    assert explain_args == ()
+    assert plan == INDEX_PLAN
+    assert calls[-1][0].startswith("DELETE FROM PLAN_TABLE")
+
+    print("✅ EXPLAIN PLAN execution test passed")
+
+
+def main():
+    """Run all query plan tests"""
+    print("🚀 Starting Query Plan Tests")
+    test_full_scan_detection()
+    test_refuse_mode()
+    test_explain_without_binds()
+    print("\n🎉 All query plan tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test script for the Response Cache
+
+This script tests per-endpoint TTLs, request coalescing, stale-while-revalidate
+and that failed payloads are not cached.
+"""
+
+import sys
+import os
+import asyncio
+import threading
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from response_cache import ResponseCache, _parse_endpoint_ttls
+
+
+def _counting_compute(counter, delay=0.0, payload=None):
+    async def compute():
+        counter["calls"] += 1
+        await asyncio.sleep(delay)
+        return payload if payload is not None else {"success": True, "call": counter["calls"]}
+    return compute
+
+
+def test_coalescing_and_hits():
+    """Test that concurrent misses share one computation and later calls hit"""
+    print("=" * 60)
+    print("Testing Request Coalescing")
+    print("=" * 60)
+
+    async def scenario():
+        cache = ResponseCache(enabled=True, stale_seconds=60, endpoint_ttls={"monitoring/overview": 30})
+        counter = {"calls": 0}
+        compute = _counting_compute(counter, delay=0.05)
+
+        results = await asyncio.gather(*(cache.get_or_compute("monitoring/overview", (), compute) for _ in range(10)))
+        assert counter["calls"] == 1
+        assert all(value == {"success": True, "call": 1} for value, _status, _age in results)
+
+        value, status, age = await cache.get_or_compute("monitoring/overview", (), compute)
+        assert status == "HIT" and age == 0 and counter["calls"] == 1
+
+        # Different parameters are cached separately
+        _value, status, _age = await cache.get_or_compute("monitoring/overview", (7,), compute)
+        assert status == "MISS" and counter["calls"] == 2
+        return cache.get_stats()
+
+    stats = asyncio.run(scenario())
+    print(f"Stats: {stats}")
+    assert stats["coalesced"] == 9
+
+    print("✅ Coalescing test passed")
+
+
+def test_stale_while_revalidate():
+    """Test that an expired entry is served stale and refreshed in the background"""
+    print("\n" + "=" * 60)
+    print("Testing Stale-While-Revalidate")
+    print("=" * 60)
+
+    async def scenario():
+        cache = ResponseCache(enabled=True, stale_seconds=60, endpoint_ttls={"stats": 0})
+        counter = {"calls": 0}
+        compute = _counting_compute(counter)
+
+        await cache.get_or_compute("stats", (), compute)
+        value, status, _age = await cache.get_or_compute("stats", (), compute)
+        assert status == "STALE" and value["call"] == 1
+
+        await asyncio.sleep(0.01)  # let the background refresh finish
+        assert counter["calls"] == 2
+        value, _status, _age = await cache.get_or_compute("stats", (), compute)
+        assert value["call"] == 2
+
+        # Failures are returned but never stored
+        failing = _counting_compute(counter, payload={"success": False, "error": "ORA-00942"})
+        _value, status, _age = await cache.get_or_compute("monitoring/recent-activity", (), failing)
+        _value, status, _age = await cache.get_or_compute("monitoring/recent-activity", (), failing)
+        assert status == "MISS"
+
+        cache.invalidate("stats")
+        _value, status, _age = await cache.get_or_compute("stats", (), compute)
+        assert status == "MISS"
+
+    asyncio.run(scenario())
+    assert _parse_endpoint_ttls("/monitoring/overview=10, stats=5,bad") == {"monitoring/overview": 10.0, "stats": 5.0}
+
+    print("✅ Stale-while-revalidate test passed")
+
+
+def test_invalidate_from_thread():
+    """Test invalidation from worker threads while the event loop fills the cache"""
+    print("\n" + "=" * 60)
+    print("Testing Invalidation From Threads")
+    print("=" * 60)
+
+    async def scenario():
+        cache = ResponseCache(enabled=True, stale_seconds=60)
+        counter = {"calls": 0}
+        compute = _counting_compute(counter)
+        stop = threading.Event()
+        errors = []
+
+        def invalidate_loop():
+            try:
+                while not stop.is_set():
+                    cache.invalidate("monitoring")
+            except Exception as e:
+                errors.append(e)
+
+        worker = threading.Thread(target=invalidate_loop)
+        worker.start()
+        try:
+            for i in range(2000):
+                await cache.get_or_compute("monitoring/overview", (i,), compute)
+        finally:
+            stop.set()
+            worker.join()
+        assert not errors, errors
+
+        # A computation that started before the invalidation does not store its result
+        release = asyncio.Event()
+
+        async def slow_compute():
+            await release.wait()
+            return {"success": True, "value": "before invalidate"}
+
+        pending = asyncio.create_task(cache.get_or_compute("monitoring/overview", ("slow",), slow_compute))
+        await asyncio.sleep(0)
+        await asyncio.to_thread(cache.invalidate, "monitoring/overview")
+        release.set()
+        value, status, _age = await pending
+        assert status == "MISS" and value["value"] == "before invalidate"
+        _value, status, _age = await cache.get_or_compute("monitoring/overview", ("slow",), compute)
+        assert status == "MISS"
+
+    asyncio.run(scenario())
+
+    print("✅ Thread invalidation test passed")
+
+
+def test_cancelled_leader():
+    """Test that callers coalesced onto a cancelled computation do not hang"""
+    print("\n" + "=" * 60)
+    print("Testing Cancelled Leader")
+    print("=" * 60)
+
+    async def scenario():
+        cache = ResponseCache(enabled=True, stale_seconds=60)
+        started = asyncio.Event()
+
+        async def slow_compute():
+            started.set()
+            await asyncio.sleep(10)
+            return {"success": True}
+
+        leader = asyncio.create_task(cache.get_or_compute("monitoring/overview", (), slow_compute))
+        await started.wait()
+        follower = asyncio.create_task(cache.get_or_compute("monitoring/overview", (), slow_compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        try:
+            await asyncio.wait_for(follower, timeout=1)
+            raise AssertionError("Expected the coalesced caller to fail")
+        except RuntimeError as e:
+            print(f"Coalesced caller: {e}")
+        assert leader.cancelled()
+
+        # The key is not stuck: the next call computes again
+        counter = {"calls": 0}
+        _value, status, _age = await cache.get_or_compute("monitoring/overview", (), _counting_compute(counter))
+        assert status == "MISS" and counter["calls"] == 1
+
+    asyncio.run(scenario())
+
+    print("✅ Cancelled leader test passed")
+
+
+def main():
+    """Run all response cache tests"""
+    print("🚀 Starting Response Cache Tests")
+    test_coalescing_and_hits()
+    test_stale_while_revalidate()
+    test_invalidate_from_thread()
+    test_cancelled_leader()
+    print("\n🎉 All response cache tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test script for Response Formats
+
+This script tests the columnar JSON and Arrow IPC encoders, content
+negotiation in tabular_response and that NaN/Infinity are written as null
+with and without orjson.
+"""
+
+import sys
+import os
+import json
+import math
+
+import numpy as np
+import pyarrow as pa
+from starlette.requests import Request
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import response_formats
+from response_formats import (FastJSONResponse, records_to_columnar, records_to_arrow_ipc, tabular_response,
+                              ARROW_STREAM_MEDIA_TYPE, COLUMNAR_FORMAT)
+
+RECORDS = [
+    {"IIN": "900101300123", "AGE": 34, "BALANCE": 1500.5},
+    {"IIN": "050101300123", "AGE": None, "BALANCE": 0.0},
+]
+
+
+def _request(accept: str = "application/json") -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/data", "query_string": b"",
+                    "headers": [(b"accept", accept.encode("latin-1"))]})
+
+
+def test_columnar_encoder():
+    """Test that rows are turned into column lists with the names sent once"""
+    print("=" * 60)
+    print("Testing Columnar Encoder")
+    print("=" * 60)
+
+    assert records_to_columnar(RECORDS) == {
+        "columns": ["IIN", "AGE", "BALANCE"],
+        "values": [["900101300123", "050101300123"], [34, None], [1500.5, 0.0]],
+    }
+    # Explicit columns keep their order and survive an empty page
+    assert records_to_columnar(RECORDS, columns=["AGE", "IIN"])["values"] == [[34, None], ["900101300123", "050101300123"]]
+    assert records_to_columnar([], columns=["IIN"]) == {"columns": ["IIN"], "values": [[]]}
+    assert records_to_columnar([]) == {"columns": [], "values": []}
+
+    print("✅ Columnar encoder test passed")
+
+
+def test_arrow_encoder():
+    """Test that the Arrow IPC stream carries the rows, types and non-row fields"""
+    print("\n" + "=" * 60)
+    print("Testing Arrow IPC Encoder")
+    print("=" * 60)
+
+    records = RECORDS + [{"IIN": "880202400456", "AGE": 51, "BALANCE": "n/a"}]
+    body = records_to_arrow_ipc(records, metadata={"total_count": 3, "success": True})
+    table = pa.ipc.open_stream(body).read_all()
+
+    assert table.column_names == ["IIN", "AGE", "BALANCE"]
+    assert table.column("AGE").to_pylist() == [34, None, 51]
+    assert pa.types.is_integer(table.schema.field("AGE").type)
+    # A mixed-type column falls back to text instead of failing the response
+    assert table.schema.field("BALANCE").type == pa.string()
+    assert table.column("BALANCE").to_pylist() == ["1500.5", "0.0", "n/a"]
+    assert json.loads(table.schema.metadata[b"metadata"]) == {"total_count": 3, "success": True}
+
+    print("✅ Arrow IPC encoder test passed")
+
+
+def test_content_negotiation():
+    """Test that Accept selects Arrow and format=columnar selects columnar JSON"""
+    print("\n" + "=" * 60)
+    print("Testing Content Negotiation")
+    print("=" * 60)
+
+    payload = {"success": True, "data": RECORDS, "total_count": 2}
+
+    response = tabular_response(_request(), payload)
+    assert isinstance(response, FastJSONResponse)
+    assert json.loads(response.body)["data"] == RECORDS
+
+    response = tabular_response(_request(), payload, response_format=COLUMNAR_FORMAT)
+    body = json.loads(response.body)
+    assert body["format"] == COLUMNAR_FORMAT
+    assert body["data"]["columns"] == ["IIN", "AGE", "BALANCE"]
+    assert body["total_count"] == 2
+    # The caller's payload is left untouched
+    assert payload["data"] is RECORDS
+
+    # Arrow wins over format=columnar
+    response = tabular_response(_request(f"{ARROW_STREAM_MEDIA_TYPE}, application/json"), payload,
+                                response_format=COLUMNAR_FORMAT)
+    assert response.media_type == ARROW_STREAM_MEDIA_TYPE
+    table = pa.ipc.open_stream(response.body).read_all()
+    assert table.num_rows == 2
+    assert json.loads(table.schema.metadata[b"metadata"]) == {"success": True, "total_count": 2}
+
+    # Rows under another key
+    response = tabular_response(_request(), {"user_data": RECORDS}, rows_key="user_data",
+                                response_format=COLUMNAR_FORMAT)
+    assert json.loads(response.body)["user_data"]["values"][0] == ["900101300123", "050101300123"]
+
+    print("✅ Content negotiation test passed")
+
+
+def test_non_finite_values():
+    """Test that NaN/Infinity become null with orjson and with the standard encoder fallback"""
+    print("\n" + "=" * 60)
+    print("Testing NaN/Infinity Encoding")
+    print("=" * 60)
+
+    content = {"data": [{"a": math.nan, "b": math.inf, "c": np.float64("nan"), "d": 1.5}], "ratio": -math.inf}
+    expected = {"data": [{"a": None, "b": None, "c": None, "d": 1.5}], "ratio": None}
+
+    if response_formats.orjson is not None:
+        assert json.loads(FastJSONResponse(content=content).body) == expected
+
+    orjson = response_formats.orjson
+    response_formats.orjson = None
+    try:
+        body = FastJSONResponse(content=content).body
+    finally:
+        response_formats.orjson = orjson
+    print(f"Fallback body: {body!r}")
+    assert b"NaN" not in body and b"Infinity" not in body
+    assert json.loads(body) == expected
+
+    print("✅ NaN/Infinity encoding test passed")
+
+
+def main():
+    """Run all response format tests"""
+    print("🚀 Starting Response Format Tests")
+    test_columnar_encoder()
+    test_arrow_encoder()
+    test_content_negotiation()
+    test_non_finite_values()
+    print("\n🎉 All response format tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Test script for the Monitoring Rollup Service
+
+This script tests that insert batches are aggregated per day and THEORY_ID,
+that a rebuild replaces the incremental state and that the read methods return
+the same fields as the monitoring SQL.
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rollup_service import RollupService, SOURCE_CONTROL, SOURCE_TARGET, SOURCE_SPSS, base_campaign_id
+
+
+def _service(tmp_dir):
+    return RollupService(db_path=os.path.join(tmp_dir, "rollups.sqlite3"))
+
+
+def test_incremental_rollups():
+    """Test that record_insert accumulates counts, distinct IINs and tab values"""
+    print("=" * 60)
+    print("Testing Incremental Rollups")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = _service(tmp_dir)
+        now = datetime.now().replace(microsecond=0)
+        service.record_insert(SOURCE_CONTROL, "SC00000001.1", ["1", "2", "3"], {"tab1": "A"}, now)
+        service.record_insert(SOURCE_CONTROL, "SC00000001.1", ["3", "4"], {"tab1": "B"}, now)
+        service.record_insert(SOURCE_CONTROL, "SC00000001.2", ["5"], None, now)
+        service.record_insert(SOURCE_CONTROL, "SC00000002", [], None, now)
+
+        summary = service.get_table_summary(SOURCE_CONTROL)
+        print(f"Summary: {summary}")
+        assert summary["total_users"] == 6
+        assert summary["unique_campaigns"] == 2
+
+        daily = service.get_daily_statistics(SOURCE_CONTROL, 7)
+        print(f"Daily: {daily}")
+        assert len(daily) == 1
+        assert daily[0]["users_uploaded"] == 6
+        assert daily[0]["campaigns_affected"] == 2
+        assert daily[0]["unique_users"] == 5
+
+        assert service.get_base_campaign_counts(SOURCE_CONTROL) == {"SC00000001": 6}
+
+        activity = service.get_recent_activity(SOURCE_CONTROL, 10)
+        assert activity[0]["tab1"] == "B" or activity[1]["tab1"] == "B"
+        assert " " in activity[0]["upload_time"]
+
+        # Nothing has been rebuilt from Oracle yet
+        assert not service.is_ready()
+
+    print("✅ Incremental rollup test passed")
+
+
+def test_refresh_replaces_source():
+    """Test that a rebuild swaps in the Oracle snapshot for the refreshed source only"""
+    print("\n" + "=" * 60)
+    print("Testing Rollup Refresh")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = _service(tmp_dir)
+        today = datetime.now().strftime("%Y-%m-%d")
+        service.record_insert(SOURCE_CONTROL, "SC00000001", ["1", "2"])
+        service.record_insert(SOURCE_TARGET, "SC00000001", ["7"])
+
+        def fake_fetch(source):
+            aggregates = [(source, today, "SC00000003", 10, f"{today}T09:00:00", f"{today}T09:05:00", None, None)]
+            iins = [(source, today, str(i)) for i in range(8)]
+            return datetime.now().replace(microsecond=0), aggregates, iins
+
+        service._fetch_source = fake_fetch
+        results = service.refresh([SOURCE_CONTROL])
+        print(f"Refresh results: {results}")
+        assert results[SOURCE_CONTROL]["success"]
+
+        assert service.get_base_campaign_counts(SOURCE_CONTROL) == {"SC00000003": 10}
+        assert service.get_daily_statistics(SOURCE_CONTROL, 1)[0]["unique_users"] == 8
+        assert service.get_base_campaign_counts(SOURCE_TARGET) == {"SC00000001": 1}
+        assert service.is_ready(SOURCE_CONTROL) and not service.is_ready()
+
+        def failing_fetch(source):
+            raise RuntimeError("ORA-12541: TNS:no listener")
+
+        service._fetch_source = failing_fetch
+        results = service.refresh([SOURCE_TARGET])
+        assert not results[SOURCE_TARGET]["success"]
+        assert "ORA-12541" in service.get_status()["sources"][SOURCE_TARGET]["error"]
+
+    assert base_campaign_id("SC12345678.3") == "SC12345678"
+    assert base_campaign_id("CUSTOM.1") == "CUSTOM.1"
+
+    print("✅ Rollup refresh test passed")
+
+
+def test_refresh_with_concurrent_insert():
+    """Test that an insert made while Oracle is being read is counted exactly once"""
+    print("\n" + "=" * 60)
+    print("Testing Rollup Refresh With Concurrent Inserts")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = _service(tmp_dir)
+        # (THEORY_ID, IIN, insert_datetime) rows of the Oracle table
+        oracle_rows = [("SC00000001", str(i), datetime.now().replace(microsecond=0) - timedelta(minutes=5))
+                       for i in range(10)]
+
+        def fake_fetch(source):
+            # The database clock runs behind the application server; both the snapshot
+            # cutoff and the recorded inserts use the database clock
+            until = datetime.now().replace(microsecond=0) - timedelta(minutes=3)
+            # An insert committed before the rebuild started, recorded only now
+            early = until - timedelta(seconds=1)
+            oracle_rows.extend(("SC00000001", str(i), early) for i in range(10, 12))
+            service.record_insert(source, "SC00000001", ["10", "11"], None, early)
+            # An insert committed after the rebuild started, before the SELECT runs
+            oracle_rows.extend(("SC00000001", str(i), until) for i in range(12, 15))
+            service.record_insert(source, "SC00000001", ["12", "13", "14"], None, until)
+
+            snapshot = [row for row in oracle_rows if row[2] < until]
+            day = until.strftime("%Y-%m-%d")
+            aggregates = [(source, day, "SC00000001", len(snapshot), snapshot[0][2].isoformat(),
+                           snapshot[-1][2].isoformat(), None, None)]
+            return until, aggregates, [(source, day, iin) for _theory_id, iin, _at in snapshot]
+
+        service._fetch_source = fake_fetch
+        assert service.refresh([SOURCE_CONTROL])[SOURCE_CONTROL]["success"]
+
+        counts = service.get_base_campaign_counts(SOURCE_CONTROL)
+        print(f"Counts after refresh: {counts}")
+        assert counts == {"SC00000001": 15}
+        assert service.get_daily_statistics(SOURCE_CONTROL, 1)[0]["unique_users"] == 15
+
+    print("✅ Concurrent insert refresh test passed")
+
+
+def test_record_delete():
+    """Test that deleted THEORY_IDs leave the rollups, also when deleted during a rebuild"""
+    print("\n" + "=" * 60)
+    print("Testing Rollup Deletes")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = _service(tmp_dir)
+        now = datetime.now().replace(microsecond=0)
+        service.record_insert(SOURCE_SPSS, "SC00000001.1", ["1", "2"], None, now)
+        service.record_insert(SOURCE_SPSS, "SC00000001.2", ["3"], None, now)
+
+        service.record_delete(SOURCE_SPSS, ["SC00000001.1"])
+        assert service.get_table_summary(SOURCE_SPSS)["total_users"] == 1
+        assert service.get_base_campaign_counts(SOURCE_SPSS) == {"SC00000001": 1}
+
+        # Rows deleted after the snapshot was read must not come back with the rebuild
+        day = now.strftime("%Y-%m-%d")
+
+        def fake_fetch(source):
+            snapshot = [(source, day, "SC00000002.1", 4, now.isoformat(), now.isoformat(), None, None),
+                        (source, day, "SC00000002.2", 6, now.isoformat(), now.isoformat(), None, None)]
+            service.record_delete(source, ["SC00000002.1"])
+            return now, snapshot, []
+
+        service._fetch_source = fake_fetch
+        assert service.refresh([SOURCE_SPSS])[SOURCE_SPSS]["success"]
+        assert service.get_base_campaign_counts(SOURCE_SPSS) == {"SC00000002": 6}
+
+    print("✅ Rollup delete test passed")
+
+
+def main():
+    """Run all rollup service tests"""
+    print("🚀 Starting Rollup Service Tests")
+    test_incremental_rollups()
+    test_refresh_replaces_source()
+    test_refresh_with_concurrent_insert()
+    test_record_delete()
+    print("\n🎉 All rollup service tests completed!")
+
+
+if __name__ == "__main__":
+    main()
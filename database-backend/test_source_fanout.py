@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for the concurrent Source Fan-out
+
+This script tests that independent source queries run concurrently and that
+a slow or failing source only degrades its own entry in the results.
+"""
+
+import sys
+import os
+import time
+import asyncio
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from source_fanout import SourceFanout, _parse_timeouts
+
+
+def _sleeping(seconds, value):
+    def task(call_timeout_ms):
+        time.sleep(seconds)
+        return value
+    return task
+
+
+def _failing(call_timeout_ms):
+    raise RuntimeError("ORA-12170: TNS:Connect timeout occurred")
+
+
+def test_concurrent_partial_results():
+    """Test concurrency, per-source timeouts and partial results"""
+    print("=" * 60)
+    print("Testing Concurrent Fan-out")
+    print("=" * 60)
+
+    fanout = SourceFanout(max_workers=4, default_timeout=2, timeouts={"SPSS": 0.2})
+    started = time.perf_counter()
+    results = asyncio.run(fanout.gather({
+        "control": ("DSSB_APP", _sleeping(0.3, [{"total_users": 10}])),
+        "target": ("DSSB_APP", _sleeping(0.3, [{"total_users": 20}])),
+        "spss": ("SPSS", _sleeping(1.0, [{"total_users": 30}])),
+        "broken": ("DSSB_APP", _failing),
+    }))
+    elapsed = time.perf_counter() - started
+    print(f"Elapsed: {elapsed:.2f}s, results: {fanout.timings(results)}")
+
+    # Two 0.3s queries ran side by side and the response did not wait for SPSS
+    assert elapsed < 0.8
+    assert results["control"]["data"] == [{"total_users": 10}]
+    assert results["target"]["success"]
+    assert not results["spss"]["success"] and results["spss"]["timed_out"]
+    assert "ORA-12170" in results["broken"]["error"]
+    assert "data" not in fanout.timings(results)["control"]
+
+    fanout.shutdown()
+    print("✅ Concurrent fan-out test passed")
+
+
+def test_timeout_configuration():
+    """Test MONITORING_QUERY_TIMEOUTS parsing"""
+    print("\n" + "=" * 60)
+    print("Testing Timeout Configuration")
+    print("=" * 60)
+
+    assert _parse_timeouts("spss=5, DSSB_APP=20,bad,x=y") == {"SPSS": 5.0, "DSSB_APP": 20.0}
+    fanout = SourceFanout(max_workers=1, default_timeout=7, timeouts={"SPSS": 3})
+    assert fanout.timeout_for("spss") == 3
+    assert fanout.timeout_for("DSSB_APP") == 7
+    fanout.shutdown()
+
+    print("✅ Timeout configuration test passed")
+
+
+def main():
+    """Run all source fan-out tests"""
+    print("🚀 Starting Source Fan-out Tests")
+    test_concurrent_partial_results()
+    test_timeout_configuration()
+    print("\n🎉 All source fan-out tests completed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,13 @@ const CampaignManager = ({ user }) => {
   const [selectedIinColumn, setSelectedIinColumn] = useState('');
   const [supportedFormats, setSupportedFormats] = useState([]);
   
+  // Deployment options and progress
+  const [skipBadRecords, setSkipBadRecords] = useState(false);
+  const [deployProgress, setDeployProgress] = useState(null);
+  
+  // Audience prepared on the server for РБ Автоматический запуск (only its id is sent back)
+  const [rbAudience, setRbAudience] = useState(null);
+  
   // Campaign creation state
   const [campaignForm, setCampaignForm] = useState({
     campaign_type: 'RB1',
@@ -295,7 +302,8 @@ const CampaignManager = ({ user }) => {
       if (result.validation_errors && result.validation_errors.length > 0) {
         setError(`Файл загружен с предупреждениями: ${result.validation_errors.slice(0, 3).join('; ')}`);
       } else {
-        setSuccess(`Файл загружен успешно! Найдено ${result.iins_extracted} IIN в ${result.rows_processed} строках.`);
+        setSuccess(`Файл загружен успешно! Найдено ${result.iins_extracted} IIN в ${result.rows_processed} строках.` +
+          (result.duplicate ? ' Этот файл уже загружался ранее, использован сохраненный результат.' : ''));
       }
 
       // Set IINs to campaign form
@@ -326,7 +334,8 @@ const CampaignManager = ({ user }) => {
       const response = await fileAPI.processFile(
         fileUploadResult.filename,
         selectedIinColumn,
-        campaignForm.filter_config
+        campaignForm.filter_config,
+        fileUploadResult.upload_id
       );
 
       const result = response.data;
@@ -357,6 +366,8 @@ const CampaignManager = ({ user }) => {
   };
 
   const handleFilterChange = (field, value) => {
+    // A loaded audience no longer matches the changed filters
+    setRbAudience(null);
     setCampaignForm(prev => ({
       ...prev,
       filter_config: {
@@ -366,6 +377,23 @@ const CampaignManager = ({ user }) => {
     }));
   };
 
+  // Load the РБ Автоматический запуск audience; the server keeps it for campaign creation
+  const loadRBAudience = async () => {
+    try {
+      setLoading(true);
+      setError(null);
+      const response = await campaignAPI.loadRBAutomaticData(campaignForm.filter_config);
+      setRbAudience({
+        audience_id: response.data.audience_id,
+        total_count: response.data.total_count
+      });
+    } catch (err) {
+      setError('Не удалось загрузить выборку: ' + (err.response?.data?.detail || err.message));
+    } finally {
+      setLoading(false);
+    }
+  };
+
   // Handle IIN list input
   const handleIINsChange = (value) => {
     // Split by commas, newlines, or spaces and filter out empty strings
@@ -378,6 +406,7 @@ const CampaignManager = ({ user }) => {
 
   // Create campaign
   const createCampaign = async () => {
+    let progressTimer = null;
     try {
       setLoading(true);
       setError(null);
@@ -394,15 +423,46 @@ const CampaignManager = ({ user }) => {
         return;
       }
       
-      if (campaignForm.user_iins.length === 0) {
+      if (dataSource === 'rb_automatic' && !rbAudience) {
+        setError('Необходимо загрузить выборку для автоматического запуска');
+        return;
+      }
+      
+      const audienceId = dataSource === 'rb_automatic' ? rbAudience.audience_id : null;
+      if (!audienceId && campaignForm.user_iins.length === 0) {
         setError('Необходимо указать хотя бы один IIN');
         return;
       }
 
-      const response = await campaignAPI.createCampaign(campaignForm);
+      // Poll deployment progress while the campaign is being created
+      progressTimer = setInterval(async () => {
+        try {
+          const progressResponse = await campaignAPI.getDeployProgress();
+          const running = (progressResponse.data.deployments || []).find(
+            deployment => deployment.status === 'running'
+          );
+          if (running) {
+            setDeployProgress(running);
+          }
+        } catch (progressError) {
+          // Progress is informational only
+        }
+      }, 1000);
+
+      // A loaded audience was filtered by load-rb-automatic, its filters are not sent again
+      const response = await campaignAPI.createCampaign({
+        ...campaignForm,
+        filter_config: audienceId ? null : campaignForm.filter_config,
+        audience_id: audienceId,
+        deploy_options: { skip_bad_records: skipBadRecords }
+      });
       
       if (response.data.success) {
-        setSuccess(`Кампания ${response.data.campaign_code} успешно создана!`);
+        const skipped = response.data.deployment_result?.skipped_records || 0;
+        setSuccess(
+          `Кампания ${response.data.campaign_code} успешно создана!` +
+          (skipped > 0 ? ` Пропущено некорректных записей: ${skipped}` : '')
+        );
         setActiveTab('list');
         loadCampaigns();
         
@@ -450,6 +510,7 @@ const CampaignManager = ({ user }) => {
         
         // Reset file upload state
         setDataSource('');
+        setRbAudience(null);
         setUploadedFile(null);
         setFileUploadResult(null);
         setSelectedIinColumn('');
@@ -459,6 +520,10 @@ const CampaignManager = ({ user }) => {
     } catch (err) {
       setError('Не удалось создать кампанию: ' + (err.response?.data?.detail || err.message));
     } finally {
+      if (progressTimer) {
+        clearInterval(progressTimer);
+      }
+      setDeployProgress(null);
       setLoading(false);
     }
   };
@@ -993,6 +1058,28 @@ const CampaignManager = ({ user }) => {
               }}>
                 ℹ️ Базовая выборка будет сформирована автоматически на основе выбранных колонок и фильтров
               </div>
+
+              <div style={{marginTop: '15px', display: 'flex', alignItems: 'center', gap: '12px'}}>
+                <button
+                  onClick={loadRBAudience}
+                  disabled={loading}
+                  style={{
+                    backgroundColor: '#007bff',
+                    color: 'white',
+                    border: 'none',
+                    padding: '8px 16px',
+                    borderRadius: '4px',
+                    cursor: loading ? 'not-allowed' : 'pointer'
+                  }}
+                >
+                  📥 Загрузить выборку
+                </button>
+                {rbAudience && (
+                  <span style={{color: '#28a745'}}>
+                    ✅ Выборка готова: {rbAudience.total_count} клиентов
+                  </span>
+                )}
+              </div>
             </div>
           )}
 
@@ -1850,6 +1937,31 @@ const CampaignManager = ({ user }) => {
                 >
                   {loading ? 'Создание...' : '🚀 Создать кампанию'}
                 </button>
+                <label style={{display: 'flex', alignItems: 'center', gap: '8px', marginTop: '10px'}}>
+                  <input
+                    type="checkbox"
+                    checked={skipBadRecords}
+                    onChange={(e) => setSkipBadRecords(e.target.checked)}
+                    disabled={loading}
+                  />
+                  Пропускать некорректные записи при загрузке
+                </label>
+                {loading && deployProgress && (
+                  <div style={{marginTop: '10px', color: '#424242'}}>
+                    <strong>Развертывание {deployProgress.campaign_code}:</strong>
+                    <ul style={{margin: '8px 0', paddingLeft: '20px'}}>
+                      {Object.entries(deployProgress.tables).map(([table, stats]) => (
+                        <li key={table}>
+                          {table}: {stats.rows_processed}/{stats.rows_total}
+                          {stats.rows_failed > 0 && ` (пропущено ${stats.rows_failed})`}
+                          {stats.status === 'prepared' && ' ⏳ ожидает фиксации'}
+                          {stats.status === 'done' && ' ✅'}
+                          {stats.status === 'failed' && ' ❌'}
+                        </li>
+                      ))}
+                    </ul>
+                  </div>
+                )}
               </div>
             </>
           )}
@@ -17,7 +17,8 @@ const Dashboard = () => {
     totalQueries: 0,
     activeDatabases: 0,
     totalUsers: 0,
-    avgResponseTime: '0s'
+    avgResponseTime: '0s',
+    queryCache: null
   });
   const [recentQueries, setRecentQueries] = useState([]);
   const [databases, setDatabases] = useState([]);
@@ -49,7 +50,8 @@ const Dashboard = () => {
         totalQueries: statsResponse.data.total_queries || 0,
         activeDatabases: statsResponse.data.active_databases || 0,
         totalUsers: statsResponse.data.total_users || 0,
-        avgResponseTime: statsResponse.data.avg_response_time || '0s'
+        avgResponseTime: statsResponse.data.avg_response_time || '0s',
+        queryCache: statsResponse.data.query_cache || null
       });
       
     } catch (err) {
@@ -61,7 +63,8 @@ const Dashboard = () => {
         totalQueries: 0,
         activeDatabases: 0,
         totalUsers: 0,
-        avgResponseTime: 'Н/Д'
+        avgResponseTime: 'Н/Д',
+        queryCache: null
       });
       
       setRecentQueries([]); // Empty array - no dummy data
@@ -180,6 +183,20 @@ const Dashboard = () => {
                 <div className="stat-label">Среднее время ответа</div>
               </div>
             </div>
+
+            {stats.queryCache && (
+              <div className="stat-card">
+                <div className="stat-icon">
+                  <TrendingUp className="nav-icon" />
+                </div>
+                <div className="stat-content">
+                  <div className="stat-number">{(stats.queryCache.hit_rate * 100).toFixed(1)}%</div>
+                  <div className="stat-label">
+                    Кэш запросов: {stats.queryCache.hits} попаданий / {stats.queryCache.misses} промахов
+                  </div>
+                </div>
+              </div>
+            )}
           </div>
 
           <div style={{ display: 'grid', gridTemplateColumns: '1fr 1fr', gap: '1.5rem' }}>
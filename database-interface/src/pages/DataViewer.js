@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { 
   Search, 
   Download, 
@@ -10,6 +10,9 @@ import {
 } from 'lucide-react';
 import { dataAPI, databaseAPI } from '../services/api';
 
+// Page size from which /data is requested in columnar format
+const COLUMNAR_PAGE_SIZE = 200;
+
 const DataViewer = () => {
   const [searchInput, setSearchInput] = useState(''); // Input value for search box
   const [searchTerm, setSearchTerm] = useState(''); // Actual search term used for API calls
@@ -25,6 +28,10 @@ const DataViewer = () => {
   const [selectedTable, setSelectedTable] = useState('');
   const [tables, setTables] = useState([]);
   const [columns, setColumns] = useState([]);
+  // Keyset cursors of already visited pages: page number -> cursor returned by the server.
+  // Sequential navigation seeks by cursor; jumping to an unvisited page falls back to offset.
+  const pageCursors = useRef({ key: null, cursors: {} });
+  const [exportFormat, setExportFormat] = useState('csv');
 
   // No default columns - will be loaded dynamically from actual table structure
 
@@ -88,6 +95,13 @@ const DataViewer = () => {
     setError(null);
     
     try {
+      const cursorKey = [selectedTable, rowsPerPage, sortColumn, sortDirection, searchTerm].join('|');
+      if (pageCursors.current.key !== cursorKey) {
+        pageCursors.current = { key: cursorKey, cursors: {} };
+      }
+      const cursor = pageCursors.current.cursors[currentPage];
+      const useKeyset = currentPage === 1 || !!cursor;
+
       const params = {
         database_id: 'dssb_app',
         table: selectedTable,
@@ -95,12 +109,19 @@ const DataViewer = () => {
         limit: rowsPerPage,
         search: searchTerm,
         sort_by: sortColumn,
-        sort_order: sortDirection
+        sort_order: sortDirection,
+        pagination: useKeyset ? 'keyset' : 'offset',
+        cursor: cursor || undefined,
+        // Column-oriented JSON avoids repeating column names on every row of large pages
+        format: rowsPerPage >= COLUMNAR_PAGE_SIZE ? 'columnar' : undefined
       };
 
       const response = await dataAPI.getData(params);
       const responseData = response.data.data || [];
-      const totalCount = response.data.total || responseData.length;
+      const totalCount = response.data.total_count ?? responseData.length;
+      if (response.data.next_cursor) {
+        pageCursors.current.cursors[currentPage + 1] = response.data.next_cursor;
+      }
       
       setData(responseData);
       setTotalRows(totalCount);
@@ -235,6 +256,7 @@ const DataViewer = () => {
       const response = await dataAPI.exportData({
         database_id: 'dssb_app',
         table: selectedTable,
+        format: exportFormat,
         search: searchTerm,
         sort_by: sortColumn,
         sort_order: sortDirection
@@ -243,7 +265,7 @@ const DataViewer = () => {
       const url = window.URL.createObjectURL(response.data);
       const a = document.createElement('a');
       a.href = url;
-      a.download = `${selectedTable}_export.csv`;
+      a.download = `${selectedTable}_export.${exportFormat}`;
       a.click();
       window.URL.revokeObjectURL(url);
     } catch (err) {
@@ -375,6 +397,8 @@ const DataViewer = () => {
                     <option value={25}>25 строк</option>
                     <option value={50}>50 строк</option>
                     <option value={100}>100 строк</option>
+                    <option value={250}>250 строк</option>
+                    <option value={500}>500 строк</option>
                   </select>
                 </div>
 
@@ -395,6 +419,17 @@ const DataViewer = () => {
                     Обновить
                   </button>
                   
+                  <select
+                    className="form-select"
+                    value={exportFormat}
+                    onChange={(e) => setExportFormat(e.target.value)}
+                    style={{ width: 'auto' }}
+                  >
+                    <option value="csv">CSV</option>
+                    <option value="xlsx">Excel</option>
+                    <option value="parquet">Parquet</option>
+                  </select>
+
                   <button 
                     className="btn btn-success"
                     onClick={exportData}
@@ -42,7 +42,14 @@ const Monitoring = () => {
       setOverview(overviewResponse.data.overview);
       setCampaignDistribution(distributionResponse.data.campaign_distribution);
       setRecentActivity(activityResponse.data.recent_activity);
-      setLastUpdated(new Date());
+
+      // Responses may come from the server cache; show when the oldest one was computed
+      const maxAgeSeconds = Math.max(
+        ...[overviewResponse, distributionResponse, activityResponse].map(
+          (response) => parseInt(response.headers?.age, 10) || 0
+        )
+      );
+      setLastUpdated(new Date(Date.now() - maxAgeSeconds * 1000));
       
     } catch (err) {
       console.error('Error loading monitoring data:', err);
@@ -154,11 +161,17 @@ const Monitoring = () => {
               </div>
               <div className="stat-content">
                 <div className="stat-number">
-                  {formatNumber(overview.tables.sc_local_control?.total_users)}
+                  {overview.tables.sc_local_control?.error 
+                    ? 'Ошибка' 
+                    : formatNumber(overview.tables.sc_local_control?.total_users)
+                  }
                 </div>
                 <div className="stat-label">Контрольная группа</div>
                 <div className="stat-sublabel">
-                  {formatNumber(overview.tables.sc_local_control?.unique_campaigns)} кампаний
+                  {overview.tables.sc_local_control?.error 
+                    ? 'Нет подключения' 
+                    : `${formatNumber(overview.tables.sc_local_control?.unique_campaigns)} кампаний`
+                  }
                 </div>
               </div>
             </div>
@@ -169,11 +182,17 @@ const Monitoring = () => {
               </div>
               <div className="stat-content">
                 <div className="stat-number">
-                  {formatNumber(overview.tables.sc_local_target?.total_users)}
+                  {overview.tables.sc_local_target?.error 
+                    ? 'Ошибка' 
+                    : formatNumber(overview.tables.sc_local_target?.total_users)
+                  }
                 </div>
                 <div className="stat-label">Целевые группы</div>
                 <div className="stat-sublabel">
-                  {formatNumber(overview.tables.sc_local_target?.unique_campaigns)} кампаний
+                  {overview.tables.sc_local_target?.error 
+                    ? 'Нет подключения' 
+                    : `${formatNumber(overview.tables.sc_local_target?.unique_campaigns)} кампаний`
+                  }
                 </div>
               </div>
             </div>
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { 
   Plus, 
   Trash2, 
@@ -9,7 +9,8 @@ import {
   RefreshCw,
   Layers,
   Users,
-  Target
+  Target,
+  XCircle
 } from 'lucide-react';
 import { databaseAPI, queryBuilder } from '../services/api';
 
@@ -23,6 +24,8 @@ const QueryBuilder = () => {
   const [sortOrder, setSortOrder] = useState('ASC');
   const [limit, setLimit] = useState(100);
   const [isLoading, setIsLoading] = useState(false);
+  // Request id of the running query, used to cancel it on the server
+  const activeRequestId = useRef(null);
   const [queryResults, setQueryResults] = useState(null);
   const [databases, setDatabases] = useState([]);
   const [tables, setTables] = useState([]);
@@ -30,6 +33,9 @@ const QueryBuilder = () => {
   const [rowCount, setRowCount] = useState(null);
   const [isCountLoading, setIsCountLoading] = useState(false);
   const [countError, setCountError] = useState(null);
+  // Sampled estimate shown until the exact count job finishes
+  const [countEstimate, setCountEstimate] = useState(null);
+  const exactCountJobId = useRef(null);
 
   // Pagination state for query results
   const [resultsCurrentPage, setResultsCurrentPage] = useState(1);
@@ -199,17 +205,22 @@ const QueryBuilder = () => {
         filters: filters.filter(f => f.column && f.value),
         sort_by: sortBy,
         sort_order: sortOrder,
-        limit
+        limit,
+        // Let the server check the optimizer plan and refuse/flag expensive queries before running them
+        check_plan: true
       };
 
-      const response = await databaseAPI.executeQuery(queryData);
+      const requestId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+      activeRequestId.current = requestId;
+      const response = await databaseAPI.executeQuery(queryData, requestId);
       
       if (response.data.success) {
         setQueryResults({
           columns: response.data.columns || [],
           data: response.data.data || [],
           totalRows: response.data.row_count || 0,
-          executionTime: response.data.execution_time || 'неизвестно'
+          executionTime: response.data.execution_time || 'неизвестно',
+          planWarnings: response.data.plan_warnings || []
         });
 
         // Check for IIN columns after successful query
@@ -249,10 +260,20 @@ const QueryBuilder = () => {
         setQueryResults(mockResults);
       }
     } finally {
+      activeRequestId.current = null;
       setIsLoading(false);
     }
   };
 
+  const cancelQuery = async () => {
+    if (!activeRequestId.current) return;
+    try {
+      await databaseAPI.cancelQuery(activeRequestId.current);
+    } catch (err) {
+      console.error('Query cancel error:', err);
+    }
+  };
+
   // Pagination helper functions for query results
   const getResultsPaginatedData = () => {
     if (!queryResults || !queryResults.data) return [];
@@ -299,6 +320,8 @@ const QueryBuilder = () => {
         const response = await databaseAPI.getRowCount(queryData);
         
         if (response.data.success) {
+          exactCountJobId.current = null;
+          setCountEstimate(null);
           setRowCount(response.data.count);
         } else {
           setCountError(response.data.message || 'Ошибка получения количества строк');
@@ -313,6 +336,52 @@ const QueryBuilder = () => {
     }, 500);
   };
 
+  const estimateRowCount = async () => {
+    if (!selectedTable) return;
+
+    setIsCountLoading(true);
+    setCountError(null);
+
+    try {
+      const response = await databaseAPI.estimateRowCount({
+        database_id: selectedDatabase,
+        table: selectedTable,
+        filters: filters.filter(f => f.column && f.value),
+      });
+
+      if (!response.data.success) {
+        setCountError(response.data.message || 'Ошибка оценки количества строк');
+        return;
+      }
+
+      if (response.data.exact) {
+        setCountEstimate(null);
+        setRowCount(response.data.count.estimate);
+        return;
+      }
+
+      // The exact count runs only on request (run_exact); otherwise "Обновить" gives it
+      const jobId = response.data.exact_job_id;
+      exactCountJobId.current = jobId;
+      setRowCount(null);
+      setCountEstimate(response.data.count);
+      setIsCountLoading(false);
+      if (jobId) {
+        const exact = await databaseAPI.waitForExactCount(jobId);
+        // Ignore the result if the filters changed in the meantime
+        if (exact && exactCountJobId.current === jobId) {
+          setCountEstimate(null);
+          setRowCount(exact.count);
+        }
+      }
+    } catch (err) {
+      console.error('Error estimating row count:', err);
+      setCountError('Ошибка оценки количества строк: ' + (err.response?.data?.detail || err.message));
+    } finally {
+      setIsCountLoading(false);
+    }
+  };
+
   // Theory creation functions
   const checkForIINColumns = async (results) => {
     try {
@@ -848,14 +917,24 @@ const QueryBuilder = () => {
             <h2 className="card-title" style={{ color: '#3b82f6' }}>
               📊 Количество строк для выборки
             </h2>
-            <button 
-              className="btn btn-secondary"
-              onClick={getRowCount}
-              disabled={isCountLoading}
-            >
-              <RefreshCw className={`nav-icon ${isCountLoading ? 'animate-spin' : ''}`} style={{ width: '16px', height: '16px' }} />
-              Обновить
-            </button>
+            <div style={{ display: 'flex', gap: '0.5rem' }}>
+              <button 
+                className="btn btn-secondary"
+                onClick={getRowCount}
+                disabled={isCountLoading}
+              >
+                <RefreshCw className={`nav-icon ${isCountLoading ? 'animate-spin' : ''}`} style={{ width: '16px', height: '16px' }} />
+                Обновить
+              </button>
+              <button 
+                className="btn btn-secondary"
+                onClick={estimateRowCount}
+                disabled={isCountLoading}
+                title="Оценка по выборке блоков таблицы; точное количество — кнопка «Обновить»"
+              >
+                ⚡ Быстрая оценка
+              </button>
+            </div>
           </div>
           
           <div style={{ padding: '1rem' }}>
@@ -868,6 +947,17 @@ const QueryBuilder = () => {
               <div style={{ color: '#dc2626', fontSize: '0.875rem' }}>
                 ⚠️ {countError}
               </div>
+            ) : countEstimate ? (
+              <div style={{ display: 'flex', alignItems: 'center', gap: '1rem' }}>
+                <div style={{ fontSize: '2rem', fontWeight: 'bold', color: '#d97706' }}>
+                  ≈ {countEstimate.estimate.toLocaleString('ru-RU')}
+                </div>
+                <div style={{ color: '#6b7280' }}>
+                  от {countEstimate.lower_bound.toLocaleString('ru-RU')} до {countEstimate.upper_bound.toLocaleString('ru-RU')} строк
+                  (95%, выборка {countEstimate.sample_percent}%)
+                  {exactCountJobId.current ? ' — точный подсчет выполняется...' : ''}
+                </div>
+              </div>
             ) : rowCount !== null ? (
               <div style={{ display: 'flex', alignItems: 'center', gap: '1rem' }}>
                 <div style={{ fontSize: '2rem', fontWeight: 'bold', color: '#059669' }}>
@@ -930,6 +1020,13 @@ const QueryBuilder = () => {
             {isLoading ? 'Выполняется...' : 'Выполнить запрос'}
           </button>
           
+          {isLoading && (
+            <button className="btn btn-secondary" onClick={cancelQuery}>
+              <XCircle className="nav-icon" style={{ width: '16px', height: '16px' }} />
+              Отменить
+            </button>
+          )}
+          
           {queryResults && (
             <button className="btn btn-success">
               <Download className="nav-icon" style={{ width: '16px', height: '16px' }} />
@@ -1054,6 +1151,11 @@ const QueryBuilder = () => {
                 <div style={{ fontSize: '0.875rem', color: '#6b7280', marginTop: '0.25rem' }}>
                   {queryResults.totalRows} строк • Время выполнения: {queryResults.executionTime}
                 </div>
+                {queryResults.planWarnings?.length > 0 && (
+                  <div style={{ fontSize: '0.8rem', color: '#b45309', marginTop: '0.25rem' }}>
+                    ⚠️ {queryResults.planWarnings.join('; ')}
+                  </div>
+                )}
               </div>
               
               <div style={{ display: 'flex', alignItems: 'center', gap: '1rem' }}>
@@ -88,8 +88,17 @@ export const databaseAPI = {
     api.post('/databases/test-connection', connectionData),
   
   // Execute query
-  executeQuery: (queryData) => 
-    api.post('/query/execute', queryData),
+  // requestId lets the running query be cancelled through cancelQuery
+  executeQuery: (queryData, requestId) => 
+    api.post('/query/execute', queryData, requestId ? { headers: { 'X-Request-ID': requestId } } : undefined),
+  
+  // Cancel a running query by its request id
+  cancelQuery: (requestId) => 
+    api.post(`/query/cancel/${encodeURIComponent(requestId)}`),
+  
+  // Optimizer plan preview (cost, estimated rows, full scans) for a query
+  explainQuery: (queryData) => 
+    api.post('/query/explain', queryData),
   
   // Get query history
   getQueryHistory: (page = 1, limit = 10) => 
@@ -111,6 +120,23 @@ export const databaseAPI = {
   getRowCount: (queryData) => 
     api.post('/query/count', queryData),
   
+  // Fast estimate (block sample, APPROX_COUNT_DISTINCT) with 95% bounds; with run_exact the exact count runs as a background job
+  estimateRowCount: (queryData) => 
+    api.post('/query/count/estimate', queryData),
+  
+  // Wait for the exact count job started by estimateRowCount; resolves to null if it failed
+  waitForExactCount: async (jobId) => {
+    let job = { status: 'queued' };
+    while (job.status !== 'succeeded' && job.status !== 'failed') {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      job = (await api.get(`/jobs/${jobId}`)).data;
+    }
+    if (job.status === 'failed') {
+      return null;
+    }
+    return (await api.get(`/jobs/${jobId}/result`)).data;
+  },
+  
   // Get dashboard statistics
   getStats: () => 
     api.get('/stats'),
@@ -125,15 +151,32 @@ export const databaseAPI = {
   detectIINs: (resultsData) => 
     api.post('/theories/detect-iins', resultsData),
 
-  // Stratification and bulk theory creation
-  stratifyAndCreateTheories: async (queryData, stratificationConfig) => {
+  // Stratification and bulk theory creation.
+  // Runs as a background job on the server: submit, poll the status, then fetch the result.
+  stratifyAndCreateTheories: async (queryData, stratificationConfig, onProgress = null) => {
     try {
-      const response = await api.post('/theories/stratify-and-create', {
+      const submitResponse = await api.post('/theories/stratify-and-create/jobs', {
         queryData: queryData,
         stratificationConfig: stratificationConfig
       });
+      const jobId = submitResponse.data.job_id;
+
+      let job = submitResponse.data;
+      while (job.status !== 'succeeded' && job.status !== 'failed') {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        const statusResponse = await api.get(`/jobs/${jobId}`);
+        job = statusResponse.data;
+        if (onProgress) {
+          onProgress(job);
+        }
+      }
+
+      if (job.status === 'failed') {
+        return { success: false, message: job.error };
+      }
 
-      return response.data;
+      const resultResponse = await api.get(`/jobs/${jobId}/result`);
+      return resultResponse.data;
 
     } catch (error) {
       console.error('Stratification and theory creation error:', error);
@@ -141,6 +184,12 @@ export const databaseAPI = {
     }
   },
 
+  getJobStatus: (jobId) =>
+    api.get(`/jobs/${jobId}`),
+
+  getJobs: (limit = 20) =>
+    api.get(`/jobs?limit=${limit}`),
+
   // Monitoring endpoints
   getMonitoringOverview: () => 
     api.get('/monitoring/overview'),
@@ -171,6 +220,10 @@ export const campaignAPI = {
   // Campaign CRUD operations
   createCampaign: (campaignData) => 
     api.post('/campaigns/create', campaignData),
+
+  // Running and recent deployments of the current user
+  getDeployProgress: () =>
+    api.get('/campaigns/deploy-progress'),
   
   getCampaigns: (params = {}) => 
     api.get('/campaigns/list', { params }),
@@ -206,16 +259,41 @@ export const parquetAPI = {
     api.post('/parquet/cache/clear', { dataset_name: datasetName })
 };
 
+// Convert a columnar payload ({ columns, values }) returned with format=columnar back to row objects
+export const columnarToRows = (columnar) => {
+  if (!columnar || !Array.isArray(columnar.columns)) {
+    return columnar || [];
+  }
+  const rowCount = columnar.values.length > 0 ? columnar.values[0].length : 0;
+  const rows = new Array(rowCount);
+  for (let i = 0; i < rowCount; i++) {
+    const row = {};
+    columnar.columns.forEach((column, c) => {
+      row[column] = columnar.values[c][i];
+    });
+    rows[i] = row;
+  }
+  return rows;
+};
+
 // Data API endpoints
 export const dataAPI = {
-  // Get data with filters and pagination
-  getData: (params) => api.get('/data', { params }),
+  // Get data with filters and pagination.
+  // With params.format = 'columnar' the server sends column-oriented JSON; rows are rebuilt here.
+  getData: async (params) => {
+    const response = await api.get('/data', { params });
+    if (response.data && response.data.format === 'columnar') {
+      response.data.data = columnarToRows(response.data.data);
+    }
+    return response;
+  },
   
-  // Export data
+  // Streaming export (csv, parquet, xlsx; gzip optional) - no request timeout for large tables
   exportData: (params) => 
     api.get('/data/export', { 
       params, 
-      responseType: 'blob'
+      responseType: 'blob',
+      timeout: 0
     }),
   
   // Get data statistics
@@ -362,9 +440,10 @@ export const fileAPI = {
   },
 
   // Process uploaded file with filters
-  processFile: async (filename, iinColumn, filterConfig = null) => {
+  processFile: async (filename, iinColumn, filterConfig = null, uploadId = null) => {
     const response = await api.post('/files/process', {
       filename,
+      upload_id: uploadId,
       iin_column: iinColumn,
       filter_config: filterConfig
     });
@@ -13,7 +13,7 @@ import random
 from datetime import datetime
 from sqlalchemy import text
 from Jira import jira_main
-from itertools import islice
+from itertools import islice, repeat
 import logging
 from SQL_helper import sql_main
 import smtplib
@@ -83,22 +83,18 @@ def run_main_app():
            
             st.session_state.df = st.session_state.df.merge(constraint_df1, on='P_SID', how='left')
 
-    def fetch_campaign_data_by_id(conn, table_name):
-        # Assuming 'campaign_id' is the column name in your table that holds the campaign ID.
-
-        query = f"select max(CAMPAIGNCODE) as CAMPAIGNCODE from {table_name} where length(CAMPAIGNCODE) = 10 and CAMPAIGNCODE like 'C0000%'"
-
+    def fetch_next_code_from_sequence(conn, sequence_name, code_format):
+        # CAMPAIGNCODE / XLS_OW_ID come from the same Oracle sequences as the DataQuery backend
+        # (database-backend/code_allocator.py). MAX(code)+1 is not safe: the backend hands out
+        # codes from a block it has already reserved, and MAX+1 would fall inside that block.
         cursor = conn.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-       
-        if result:
-            # Assuming the result is a tuple in the order of the SQL table columns
-            # Convert this to a dictionary where keys are the column names for easier access
-            columns = [desc[0] for desc in cursor.description]
-            return dict(zip(columns, result))
-        else:
-            return None
+        cursor.execute(f"select {sequence_name}.nextval from dual")
+        number = int(cursor.fetchone()[0])
+        cursor.close()
+        return code_format.format(number)
+
+    def fetch_next_campaign_code(conn):
+        return fetch_next_code_from_sequence(conn, 'dssb_ocds.campaign_code_seq', 'C{:09d}')
 
     def fetch_campaign_data_by_id_main(conn, CAMPAIGNCODE, table_name):
 
@@ -114,22 +110,8 @@ def run_main_app():
         else:
             return None
 
-    def fetch_campaign_data_by_XLS(conn):
-        # Assuming 'campaign_id' is the column name in your table that holds the campaign ID.
-
-        query = f"select max(XLS_OW_ID) as XLS_OW_ID from dssb_ocds.rb3_tr_campaign_dict where length(XLS_OW_ID) = 8 and XLS_OW_ID like 'KKB_%'"
-
-        cursor = conn.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-       
-        if result:
-            # Assuming the result is a tuple in the order of the SQL table columns
-            # Convert this to a dictionary where keys are the column names for easier access
-            columns = [desc[0] for desc in cursor.description]
-            return dict(zip(columns, result))
-        else:
-            return None
+    def fetch_next_xls_ow_id(conn):
+        return fetch_next_code_from_sequence(conn, 'dssb_ocds.rb3_xls_ow_id_seq', 'KKB_{:04d}')
 
     def send_email(email_recipient, email_subject, email_message, attachment_location = ''):
    
@@ -665,24 +647,6 @@ where lower(d.sub_stream) like '%{stream_rb3}%' and date_end > sysdate + 0.5"""
        
    
    
-    def increment_string(s):
-        prefix = s[0]  # Get the first character
-        number_str = s[1:]  # Get the numeric part as a string
-        number = int(number_str)  # Convert the numeric part to an integer
-        incremented_number = number + 1  # Increment the number
-        incremented_number_str = str(incremented_number).zfill(len(number_str))  # Convert back to string, preserving leading zeros
-        return f"{prefix}{incremented_number_str}"
-
-    def increment_string_XLS(s):
-        prefix = s[0]  # Get the first character
-        prefix1 = s[1]  # Get the first character
-        prefix2 = s[2]  # Get the first character
-        prefix3 = s[3]  # Get the first character
-        number_str = s[4:]  # Get the numeric part as a string
-        number = int(number_str)  # Convert the numeric part to an integer
-        incremented_number = number + 1  # Increment the number
-        incremented_number_str = str(incremented_number).zfill(len(number_str))  # Convert back to string, preserving leading zeros
-        return f"{prefix}{prefix1}{prefix2}{prefix3}{incremented_number_str}"
 
 
 
@@ -1928,6 +1892,29 @@ where lower(d.sub_stream) like '%{stream_rb3}%' and date_end > sysdate + 0.5"""
                 return False
 
 
+        def build_insert_rows(df, all_keys, column_mapping, additional_info):
+            """
+            Build executemany rows column-wise: mapped columns come from the dataframe,
+            other keys are constants from additional_info broadcast to every row
+            """
+            # Target column -> first source column mapped to it
+            source_by_key = {}
+            for col, mapped_col in column_mapping.items():
+                source_by_key.setdefault(mapped_col, col)
+        
+            columns = []
+            for key in all_keys:
+                if key in source_by_key:
+                    original_col = source_by_key[key]
+                    if original_col in df.columns:
+                        columns.append(df[original_col].tolist())
+                    else:
+                        columns.append(repeat(None, len(df)))
+                else:
+                    columns.append(repeat(additional_info.get(key), len(df)))
+            return list(zip(*columns))
+
+
         def insert_dataframe_to_oracle(df, conn, table_name, column_mapping, additional_info, batch_size=10000):
             """
             Insert dataframe to Oracle database with comprehensive error handling
@@ -1956,16 +1943,7 @@ where lower(d.sub_stream) like '%{stream_rb3}%' and date_end > sysdate + 0.5"""
                 insert_query = f"INSERT INTO {table_name} ({fields}) VALUES ({', '.join([':' + str(i+1) for i in range(len(all_keys))])})"
         
                 # Prepare data for insertion
-                data_to_insert = []
-                for _, row in df.iterrows():
-                    row_data = []
-                    for key in all_keys:
-                        if key in column_mapping.values():
-                            original_col = next(col for col, mapped_col in column_mapping.items() if mapped_col == key)
-                            row_data.append(row[original_col] if original_col in df.columns else None)
-                        else:
-                            row_data.append(additional_info.get(key))
-                    data_to_insert.append(row_data)
+                data_to_insert = build_insert_rows(df, all_keys, column_mapping, additional_info)
         
                 total_records = len(data_to_insert)
                 num_batches = (total_records + batch_size - 1) // batch_size
@@ -2075,16 +2053,7 @@ where lower(d.sub_stream) like '%{stream_rb3}%' and date_end > sysdate + 0.5"""
                 insert_query = f"INSERT INTO {table_name} ({fields}) VALUES ({', '.join([':' + str(i+1) for i in range(len(all_keys))])})"
            
                 # Prepare data for insertion
-                data_to_insert = []
-                for idx, (_, row) in enumerate(df.iterrows()):
-                    row_data = []
-                    for key in all_keys:
-                        if key in column_mapping.values():
-                            original_col = next(col for col, mapped_col in column_mapping.items() if mapped_col == key)
-                            row_data.append(row[original_col] if original_col in df.columns else None)
-                        else:
-                            row_data.append(additional_info.get(key))
-                    data_to_insert.append((idx, row_data))
+                data_to_insert = list(enumerate(build_insert_rows(df, all_keys, column_mapping, additional_info)))
            
                 # Initialize Streamlit progress indicators
                 progress_bar = st.progress(0)
@@ -2323,13 +2292,10 @@ where lower(d.sub_stream) like '%{stream_rb3}%' and date_end > sysdate + 0.5"""
                 else:
                     table_name = 'msbmckinsey.URK_00035232_CDS_MSB'
                     with get_connection_DSSB_OCDS() as conn:
-                        campaign_data = fetch_campaign_data_by_id(conn, 'dssb_ocds.mb01_camp_dict')
-                        if campaign_data:
-                            st.session_state['CAMPAIGNCODE'] = campaign_data.get('CAMPAIGNCODE')
-                            CAMPAIGNCODE_old = campaign_data.get('CAMPAIGNCODE')
-                            CAMPAIGNCODE_var = increment_string(CAMPAIGNCODE_old)
-                            st.session_state.camp = CAMPAIGNCODE_var
-                            st.session_state.saved_data = 0
+                        CAMPAIGNCODE_var = fetch_next_campaign_code(conn)
+                        st.session_state['CAMPAIGNCODE'] = CAMPAIGNCODE_var
+                        st.session_state.camp = CAMPAIGNCODE_var
+                        st.session_state.saved_data = 0
 
             if 'CAMPAIGNCODE' not in st.session_state:
                 st.warning('Выберите CAMPAIGNCODE')
@@ -2365,12 +2331,9 @@ where lower(d.sub_stream) like '%{stream_rb3}%' and date_end > sysdate + 0.5"""
                     if is_bonus:
                         if st.button('Новый код XLS_OW_ID'):
                             with get_connection_DSSB_OCDS() as conn:
-                                campaign_data = fetch_campaign_data_by_XLS(conn)
-                                if campaign_data:
-                                    st.session_state['XLS_OW_ID'] = campaign_data.get('XLS_OW_ID')
-                                    CAMPAIGNCODE_old = campaign_data.get('XLS_OW_ID')
-                                    CAMPAIGNCODE_var = increment_string_XLS(CAMPAIGNCODE_old)
-                                    st.success(f'Новый XLS_OW_ID: {CAMPAIGNCODE_var}')
+                                CAMPAIGNCODE_var = fetch_next_xls_ow_id(conn)
+                                st.session_state['XLS_OW_ID'] = CAMPAIGNCODE_var
+                                st.success(f'Новый XLS_OW_ID: {CAMPAIGNCODE_var}')
 
                 RB_channel_path = st.radio("Выберите channel:",('RB1', 'RB3'))
 